@@ -580,19 +580,27 @@ class AccountingDB(DB):
       bucketTimeLength = self.calculateBucketLengthForTime(typeName, nowEpoch, currentBucketStart)
     return buckets
 
-  def __insertInQueueTable(self, typeName, startTime, endTime, valuesList):
-    sqlFields = ['id', 'taken', 'takenSince'] + self.dbCatalog[typeName]['typeFields']
+  def __getQueueTableFields(self, typeName):
+    return ['id', 'taken', 'takenSince'] + self.dbCatalog[typeName]['typeFields']
+
+  def __getQueueTableValues(self, typeName, startTime, endTime, valuesList):
     sqlValues = ['0', '0', 'UTC_TIMESTAMP()'] + valuesList + [startTime, endTime]
-    if len(sqlFields) != len(sqlValues):
+    if len(self.__getQueueTableFields(typeName)) != len(sqlValues):
       numRcv = len(valuesList) + 2
       numExp = len(self.dbCatalog[typeName]['typeFields'])
       return S_ERROR("Fields mismatch for record %s. %s fields and %s expected" % (typeName,
                                                                                    numRcv,
                                                                                    numExp))
+    return S_OK(sqlValues)
+
+  def __insertInQueueTable(self, typeName, startTime, endTime, valuesList):
+    retVal = self.__getQueueTableValues(typeName, startTime, endTime, valuesList)
+    if not retVal['OK']:
+      return retVal
     retVal = self.insertFields(
         _getTableName("in", typeName),
-        sqlFields,
-        sqlValues
+        self.__getQueueTableFields(typeName),
+        retVal['Value']
     )
     if not retVal['OK']:
       return retVal
@@ -601,15 +609,23 @@ class AccountingDB(DB):
   def insertRecordBundleThroughQueue(self, recordsToQueue):
     if self.__readOnly:
       return S_ERROR("ReadOnly mode enabled. No modification allowed")
-    recordsToProcess = []
-    now = Time.toEpoch()
+    # Insert the records of each type with multi-row statements
+    sqlValuesByType = {}
     for record in recordsToQueue:
       typeName, startTime, endTime, valuesList = record
-      result = self.__insertInQueueTable(typeName, startTime, endTime, valuesList)
+      if typeName not in self.dbCatalog:
+        return S_ERROR("Type %s has not been defined in the db" % typeName)
+      result = self.__getQueueTableValues(typeName, startTime, endTime, valuesList)
+      if not result['OK']:
+        return result
+      sqlValuesByType.setdefault(typeName, []).append(result['Value'])
+
+    for typeName, sqlValuesList in sqlValuesByType.items():
+      result = self.insertMultipleFields(_getTableName("in", typeName),
+                                         self.__getQueueTableFields(typeName),
+                                         sqlValuesList)
       if not result['OK']:
         return result
-      iD = result['Value']
-      recordsToProcess.append((iD, typeName, startTime, endTime, valuesList, now))
 
     return S_OK()
 
@@ -60,6 +60,28 @@ class ConfigurationHandler(RequestHandler):
       retDict['data'] = gServiceInterface.getCompressedConfigurationData()
     return S_OK(retDict)
 
+  types_getCompressedDataOrPatchIfNewer = [basestring]
+
+  @classmethod
+  def export_getCompressedDataOrPatchIfNewer(cls, sClientVersion):
+    """ Get the changes of the configuration since the version of the client if it is one of
+        the last versions, or the whole compressed configuration otherwise
+
+        :param str sClientVersion: version of the configuration of the client
+
+        :return: S_OK(dict) -- with newestVersion, and if it is newer than the version of the client,
+                 either patch and checksum (see ConfigurationData.applyRemoteCFGPatch) or data
+    """
+    sVersion = gServiceInterface.getVersion()
+    retDict = {'newestVersion': sVersion}
+    if sClientVersion < sVersion:
+      result = gServiceInterface.getPatch(sClientVersion)
+      if result['OK']:
+        retDict['patch'], retDict['checksum'] = result['Value']
+      else:
+        retDict['data'] = gServiceInterface.getCompressedConfigurationData()
+    return S_OK(retDict)
+
   types_publishSlaveServer = [basestring]
 
   @classmethod
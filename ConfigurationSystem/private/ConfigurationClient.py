@@ -156,6 +156,30 @@ class ConfigurationClient(object):
     else:
       requestedType = typeValue
 
+    # The cast values are kept until the configuration changes
+    typedValues = gConfigurationData.getTypedValuesCache()
+    try:
+      value = typedValues[(requestedType, optionValue)]
+    except KeyError:
+      result = self.__castValue(optionValue, requestedType, typeValue)
+      if not result['OK']:
+        return result
+      value = typedValues[(requestedType, optionValue)] = result['Value']
+    # Do not give the cached object to the caller if it can be modified
+    if requestedType in (list, set, dict):
+      value = requestedType(value)
+    return S_OK(value)
+
+  @staticmethod
+  def __castValue(optionValue, requestedType, typeValue):
+    """ Cast the value of an option
+
+        :param str optionValue: value of the option
+        :param type requestedType: type of the value to return
+        :param typeValue: type or default value given to getOption
+
+        :return: S_OK()/S_ERROR()
+    """
     if requestedType in (list, tuple, set):
       try:
         return S_OK(requestedType(List.fromChar(optionValue, ',')))
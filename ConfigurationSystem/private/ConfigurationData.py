@@ -5,6 +5,8 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 import os.path
+import collections
+import hashlib
 import zlib
 import zipfile
 import thread
@@ -30,12 +32,19 @@ class ConfigurationData(object):
     self.threadingLock = lr.getLock()
     self.runningThreadsNumber = 0
     self.__compressedConfigurationData = None
+    # { version : remote CFG served for this version } for the last versions
+    self.__versionsHistory = collections.OrderedDict()
+    # ( current version, checksum of its remote CFG, { client version : patch } )
+    self.__patches = (None, None, {})
+    self.__patchesLock = lr.getLock()
     self.configurationPath = "/DIRAC/Configuration"
     self.backupsDir = os.path.join(DIRAC.rootPath, "etc", "csbackup")
     self._isService = False
     self.localCFG = CFG()
     self.remoteCFG = CFG()
     self.mergedCFG = CFG()
+    # ( mergedCFG, { full path of option : value }, { ( type, value ) : cast value } )
+    self.__optionIndex = (None, {}, {})
     self.remoteServerList = []
     if loadDefaultCFG:
       defaultCFGFile = os.path.join(DIRAC.rootPath, "etc", "dirac.cfg")
@@ -96,6 +105,26 @@ class ConfigurationData(object):
     self.unlock()
     self.sync()
 
+  def applyRemoteCFGPatch(self, modList, checksum):
+    """ Apply to the remote CFG the modifications sent by a server since the local version
+
+        :param list modList: modifications, as returned by CFG.getModifications
+        :param str checksum: checksum of the remote CFG of the server once patched
+
+        :return: S_OK()/S_ERROR()
+    """
+    newCFG = self.remoteCFG.clone()
+    result = newCFG.applyModifications(modList)
+    if not result['OK']:
+      return result
+    if self.__getCFGChecksum(newCFG) != checksum:
+      return S_ERROR("Patched configuration differs from the one of the server")
+    self.lock()
+    self.remoteCFG = newCFG
+    self.unlock()
+    self.sync()
+    return S_OK()
+
   def loadConfigurationData(self, fileName=False):
     name = self.getName()
     self.lock()
@@ -149,9 +178,48 @@ class ConfigurationData(object):
       pass
     return self.dangerZoneEnd(None)
 
+  def __getOptionIndex(self):
+    """ Get the index of the options of the merged CFG, it is built the first time it is needed
+        after each change of the merged CFG
+
+        :return: tuple ( { full path of option : value }, { ( type, value ) : cast value } )
+    """
+    mergedCFG, index, typedValues = self.__optionIndex
+    if mergedCFG is not self.mergedCFG:
+      mergedCFG = self.mergedCFG
+      index = {}
+      typedValues = {}
+      self.dangerZoneStart()
+      try:
+        self.__indexCFG(mergedCFG, "", index)
+      finally:
+        self.dangerZoneEnd()
+      # The index is stored with the CFG it was built from, it is replaced in one go
+      self.__optionIndex = (mergedCFG, index, typedValues)
+    return index, typedValues
+
+  def __indexCFG(self, cfg, sectionPath, index):
+    for option in cfg.listOptions():
+      index["%s/%s" % (sectionPath, option)] = cfg[option]
+    for section in cfg.listSections():
+      self.__indexCFG(cfg[section], "%s/%s" % (sectionPath, section), index)
+
+  def getTypedValuesCache(self):
+    """ Get the cache of the values of the options cast to a type, which is emptied when
+        the merged CFG changes
+
+        :return: dict { ( type, value ) : cast value }
+    """
+    return self.__getOptionIndex()[1]
+
   def extractOptionFromCFG(self, path, cfg=False, disableDangerZones=False):
-    if not cfg:
-      cfg = self.mergedCFG
+    if not cfg or cfg is self.mergedCFG:
+      index = self.__getOptionIndex()[0]
+      try:
+        return index[path]
+      except KeyError:
+        levelList = [level.strip() for level in path.split("/") if level.strip() != ""]
+        return index.get("/%s" % "/".join(levelList))
     if not disableDangerZones:
       self.dangerZoneStart()
     try:
@@ -280,11 +348,60 @@ class ConfigurationData(object):
     self.setOptionInCFG("%s/MasterServer" % self.configurationPath, sURL, self.remoteCFG)
     self.sync()
 
+  def getPatchesHistorySize(self):
+    try:
+      return int(self.extractOptionFromCFG("%s/PatchesHistorySize" % self.configurationPath, self.mergedCFG))
+    except BaseException:
+      return 10
+
   def getCompressedData(self):
     if self.__compressedConfigurationData is None:
+      self.__recordVersion()
       self.__compressedConfigurationData = zlib.compress(str(self.remoteCFG), 9)
     return self.__compressedConfigurationData
 
+  @staticmethod
+  def __getCFGChecksum(cfg):
+    return hashlib.md5(str(cfg)).hexdigest()
+
+  def __recordVersion(self):
+    """ Keep the remote CFG served for the current version, to compute the patches
+        from this version to the next ones
+
+        :return: str -- current version
+    """
+    version = self.getVersion()
+    with self.__patchesLock:
+      if version not in self.__versionsHistory:
+        self.__versionsHistory[version] = self.remoteCFG.clone()
+        while len(self.__versionsHistory) > max(1, self.getPatchesHistorySize()):
+          self.__versionsHistory.popitem(last=False)
+    return version
+
+  def getPatch(self, fromVersion):
+    """ Get the modifications of the remote CFG from a version to the current one
+
+        :param str fromVersion: version of the configuration of the client
+
+        :return: S_OK( ( list of modifications, checksum of the patched CFG ) )/S_ERROR() if
+                 fromVersion is not among the last versions
+    """
+    version = self.__recordVersion()
+    with self.__patchesLock:
+      if fromVersion not in self.__versionsHistory:
+        return S_ERROR("Version %s is not kept to compute patches" % fromVersion)
+      currentCFG = self.__versionsHistory.get(version)
+      if currentCFG is None:
+        return S_ERROR("Version %s is not kept to compute patches" % version)
+      patchesVersion, checksum, patches = self.__patches
+      if patchesVersion != version:
+        checksum = self.__getCFGChecksum(currentCFG)
+        patches = {}
+        self.__patches = (version, checksum, patches)
+      if fromVersion not in patches:
+        patches[fromVersion] = self.__versionsHistory[fromVersion].getModifications(currentCFG)
+      return S_OK((patches[fromVersion], checksum))
+
   def isMaster(self):
     value = self.extractOptionFromCFG("%s/Master" % self.configurationPath, self.localCFG)
     if value and value.lower() in ("yes", "true", "y"):
@@ -261,6 +261,9 @@ class ServiceInterface(threading.Thread):
   def getCompressedConfigurationData(self):
     return gConfigurationData.getCompressedData()
 
+  def getPatch(self, fromVersion):
+    return gConfigurationData.getPatch(fromVersion)
+
   def getVersion(self):
     return gConfigurationData.getVersion()
 
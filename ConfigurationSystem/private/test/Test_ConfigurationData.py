@@ -0,0 +1,134 @@
+""" Unit tests for the index of the options and the patches of ConfigurationData,
+    and the cast values of ConfigurationClient
+"""
+# pylint: disable=protected-access, missing-docstring
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from diraccfg import CFG
+
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+from DIRAC.ConfigurationSystem.private.ConfigurationClient import ConfigurationClient
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+
+cfgContent = """
+DIRAC
+{
+  Setup = TestSetup
+}
+Registry
+{
+  Users
+  {
+    user1
+    {
+      DN = /DC=ch/CN=user1
+      Email = user1@cern.ch
+    }
+  }
+  Groups
+  {
+    user
+    {
+      Users = user1, user2
+      Properties = NormalUser
+      JobShare = 200
+    }
+  }
+}
+"""
+
+
+def _loadCFG(confData, content):
+  cfg = CFG()
+  cfg.loadFromBuffer(content)
+  confData.mergeWithLocal(cfg)
+
+
+def test_extractOption():
+  confData = ConfigurationData(loadDefaultCFG=False)
+  _loadCFG(confData, cfgContent)
+  assert confData.extractOptionFromCFG('/DIRAC/Setup') == 'TestSetup'
+  assert confData.extractOptionFromCFG('Registry/Users/user1/DN/') == '/DC=ch/CN=user1'
+  assert confData.extractOptionFromCFG('/Registry/ Groups /user/JobShare') == '200'
+  assert confData.extractOptionFromCFG('/Registry/Users/user1') is None
+  assert confData.extractOptionFromCFG('/Registry/Users/user2/DN') is None
+  assert confData.extractOptionFromCFG('') is None
+  # Same results as without the index
+  for path in ('/DIRAC/Setup', '/Registry/Users/user1', 'Registry/Groups/user/Users'):
+    assert confData.extractOptionFromCFG(path) == confData.extractOptionFromCFG(path, confData.localCFG)
+
+
+def test_indexRebuilt():
+  confData = ConfigurationData(loadDefaultCFG=False)
+  _loadCFG(confData, cfgContent)
+  assert confData.extractOptionFromCFG('/DIRAC/Setup') == 'TestSetup'
+  _loadCFG(confData, "DIRAC\n{\nSetup = OtherSetup\n}\n")
+  assert confData.extractOptionFromCFG('/DIRAC/Setup') == 'OtherSetup'
+  confData.setOptionInCFG('/DIRAC/NewOption', 'value')
+  assert confData.extractOptionFromCFG('/DIRAC/NewOption') == 'value'
+  confData.deleteOptionInCFG('/DIRAC/NewOption')
+  assert confData.extractOptionFromCFG('/DIRAC/NewOption') is None
+  confData.mergedCFG = CFG()
+  assert confData.extractOptionFromCFG('/DIRAC/Setup') is None
+
+
+def test_typedValues():
+  _loadCFG(gConfigurationData, cfgContent)
+  gConfig = ConfigurationClient()
+  users = gConfig.getValue('/Registry/Groups/user/Users', [])
+  assert users == ['user1', 'user2']
+  users.append('user3')
+  assert gConfig.getValue('/Registry/Groups/user/Users', []) == ['user1', 'user2']
+  assert gConfig.getValue('/Registry/Groups/user/Users', set()) == set(['user1', 'user2'])
+  assert gConfig.getValue('/Registry/Groups/user/JobShare', 0) == 200
+  assert gConfig.getValue('/Registry/Groups/user/JobShare', 0.) == 200.
+  assert not gConfig.getOption('/Registry/Groups/user/Properties', int)['OK']
+  assert (int, '200') in gConfigurationData.getTypedValuesCache()
+  gConfigurationData.setOptionInCFG('/Registry/Groups/user/JobShare', '100')
+  assert (int, '200') not in gConfigurationData.getTypedValuesCache()
+  assert gConfig.getValue('/Registry/Groups/user/JobShare', 0) == 100
+
+
+def _serverAndClient():
+  server = ConfigurationData(loadDefaultCFG=False)
+  server.remoteCFG.loadFromBuffer(cfgContent)
+  server.setVersion('2020-01-01 00:00:00')
+  client = ConfigurationData(loadDefaultCFG=False)
+  client.loadRemoteCFGFromCompressedMem(server.getCompressedData())
+  return server, client
+
+
+def test_patch():
+  server, client = _serverAndClient()
+  server.setOptionInCFG('/Registry/Users/user1/Email', 'user1@cern.fr', server.remoteCFG)
+  server.setOptionInCFG('/Registry/Users/user2/DN', '/DC=ch/CN=user2', server.remoteCFG)
+  server.deleteOptionInCFG('/Registry/Groups/user/JobShare', server.remoteCFG)
+  server.setVersion('2020-01-02 00:00:00')
+  result = server.getPatch(client.getVersion())
+  assert result['OK']
+  modList, checksum = result['Value']
+  assert client.applyRemoteCFGPatch(modList, checksum)['OK']
+  assert client.getVersion() == '2020-01-02 00:00:00'
+  assert str(client.remoteCFG) == str(server.remoteCFG)
+  assert client.extractOptionFromCFG('/Registry/Users/user2/DN') == '/DC=ch/CN=user2'
+  assert client.extractOptionFromCFG('/Registry/Groups/user/JobShare') is None
+
+
+def test_patchUnknownVersion():
+  server, client = _serverAndClient()
+  assert not server.getPatch('2019-01-01 00:00:00')['OK']
+  server.setOptionInCFG('%s/PatchesHistorySize' % server.configurationPath, '1', server.localCFG)
+  server.setVersion('2020-01-02 00:00:00')
+  assert not server.getPatch(client.getVersion())['OK']
+
+
+def test_patchMismatch():
+  server, client = _serverAndClient()
+  client.setOptionInCFG('/Registry/Users/user1/Email', 'other@cern.ch', client.remoteCFG)
+  server.setVersion('2020-01-02 00:00:00')
+  modList, checksum = server.getPatch(client.getVersion())['Value']
+  assert not client.applyRemoteCFGPatch(modList, checksum)['OK']
+  assert client.getVersion() == '2020-01-01 00:00:00'
@@ -6,7 +6,7 @@ from __future__ import division
 from __future__ import print_function
 
 from DIRAC import gLogger, gConfig
-from DIRAC.Core.Utilities.MySQL import MySQL
+from DIRAC.Core.Utilities.MySQL import MySQL, MAXCONNECTIONS, MINCONNECTIONS, PINGIDLETIME, CONNECTIONWAITTIMEOUT
 from DIRAC.ConfigurationSystem.Client.Utilities import getDBParameters
 from DIRAC.ConfigurationSystem.Client.PathFinder import getDatabaseSection
 
@@ -34,12 +34,22 @@ class DB(MySQL):
     self.dbPass = dbParameters['Password']
     self.dbName = dbParameters['DBName']
 
+    # Options of the pool of connections, which can also be defined for all the DBs
+    connectionPoolOptions = {}
+    for option, optionName, defaultValue in (('maxConnections', 'MaxConnections', MAXCONNECTIONS),
+                                             ('minConnections', 'MinConnections', MINCONNECTIONS),
+                                             ('pingIdleTime', 'PingIdleTime', PINGIDLETIME),
+                                             ('waitTimeout', 'ConnectionWaitTimeout', CONNECTIONWAITTIMEOUT)):
+      defaultValue = gConfig.getValue('/Systems/Databases/%s' % optionName, defaultValue)
+      connectionPoolOptions[option] = self.getCSOption(optionName, defaultValue)
+
     super(DB, self).__init__(hostName=self.dbHost,
                              userName=self.dbUser,
                              passwd=self.dbPass,
                              dbName=self.dbName,
                              port=self.dbPort,
-                             debug=debug)
+                             debug=debug,
+                             connectionPoolOptions=connectionPoolOptions)
 
     if not self._connected:
       raise RuntimeError("Can not connect to DB '%s', exiting..." % self.dbName)
@@ -125,6 +125,8 @@ class RequestHandler(object):
     try:
       if actionType == "RPC":
         retVal = self.__doRPC(actionTuple[1])
+      elif actionType == "StreamRPC":
+        retVal = self.__doStreamRPC(actionTuple[1])
       elif actionType == "FileTransfer":
         retVal = self.__doFileTransfer(actionTuple[1])
       elif actionType == "Connection":
@@ -338,6 +340,65 @@ class RequestHandler(object):
       return S_ERROR(sError)
     return S_OK()
 
+#####
+#
+# Streaming RPC Methods
+#
+#####
+
+  def __doStreamRPC(self, method):
+    """
+    Execute a streaming RPC action
+
+    The stream_<method> function of the handler is a generator of S_OK/S_ERROR structures.
+    Every S_OK is sent to the client as soon as it is produced, flagged with StreamChunk.
+    The stream is closed by the final response, S_OK(number of chunks sent) or the first S_ERROR.
+    The arguments are checked and authorized against the rules of the RPC method with the same name.
+
+    :type method: string
+    :param method: Method to execute
+    :return: S_OK/S_ERROR
+    """
+    retVal = self.__trPool.receive(self.__trid)
+    if not retVal['OK']:
+      raise RequestHandler.ConnectionError("Error while receiving arguments %s %s" %
+                                           (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
+    args = retVal['Value']
+    self.__logRemoteQuery("StreamRPC/%s" % method, args)
+
+    realMethod = "stream_%s" % method
+    gLogger.debug("Streaming RPC to %s" % realMethod)
+    try:
+      oMethod = getattr(self, realMethod)
+    except BaseException:
+      return S_ERROR("Unknown streaming method %s" % method)
+    dRetVal = self.__checkExpectedArgumentTypes(method, args)
+    if not dRetVal['OK']:
+      return dRetVal
+    self.__lockManager.lock("StreamRPC/%s" % method)
+    try:
+      try:
+        nChunks = 0
+        for chunkResult in oMethod(*args):
+          if not isReturnStructure(chunkResult):
+            return S_ERROR("Streaming method %s does not yield S_OK/S_ERROR!" % method)
+          if not chunkResult['OK']:
+            return chunkResult
+          chunkResult['StreamChunk'] = True
+          retVal = self.__trPool.send(self.__trid, chunkResult)
+          if not retVal['OK']:
+            raise RequestHandler.ConnectionError("Error while sending chunk %s %s" %
+                                                 (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
+          nChunks += 1
+        return S_OK(nChunks)
+      finally:
+        self.__lockManager.unlock("StreamRPC/%s" % method)
+    except RequestHandler.ConnectionError:
+      raise
+    except Exception as e:
+      gLogger.exception("Uncaught exception when serving streaming RPC", "Function %s" % method, lException=e)
+      return S_ERROR("Server error while serving %s: %s" % (method, str(e)))
+
 ####
 #
 #  Connection methods
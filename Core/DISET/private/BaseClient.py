@@ -20,6 +20,7 @@ from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServic
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import skipCACheck
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ConnectionPool import getGlobalConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 
@@ -43,6 +44,10 @@ class BaseClient(object):
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_PERSISTENT_CONNECTION = "persistentConnection"
+
+  # Whether the subclass can reuse the connections of the ConnectionPool
+  _allowPersistentConnection = False
 
   __threadConfig = ThreadConfig()
 
@@ -63,6 +68,7 @@ class BaseClient(object):
         :param proxyChain: Specify the proxy chain
         :param skipCACheck: Do not check the CA
         :param keepAliveLapse: Duration for keepAliveLapse (heartbeat like)
+        :param persistentConnection: Reuse the connections to the service across calls (default True)
     """
 
     if not isinstance(serviceName, six.string_types):
@@ -459,6 +465,17 @@ and this is thread %s
     if self.__enableThreadCheck:
       self.__checkThreadID()
 
+    connectionKey = None
+    if self.__usePersistentConnection():
+      connectionKey = getGlobalConnectionPool().generateKey(self.serviceURL, self.__extraCredentials, self.kwargs)
+      transport = getGlobalConnectionPool().get(connectionKey)
+      if transport:
+        gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+        trid = getGlobalTransportPool().add(transport)
+        getGlobalTransportPool().associateData(trid, 'connectionPoolKey', connectionKey)
+        getGlobalTransportPool().associateData(trid, 'reusedConnection', True)
+        return S_OK((trid, transport))
+
     gLogger.debug("Trying to connect to: %s" % self.serviceURL)
     try:
       # Calls the transport method of the apropriate protocol.
@@ -510,15 +527,42 @@ and this is thread %s
     # We add the connection to the transport pool
     gLogger.debug("Connected to: %s" % self.serviceURL)
     trid = getGlobalTransportPool().add(transport)
+    if connectionKey:
+      getGlobalConnectionPool().register(transport, connectionKey)
+      getGlobalTransportPool().associateData(trid, 'connectionPoolKey', connectionKey)
 
     return S_OK((trid, transport))
 
-  def _disconnect(self, trid):
+  def _disconnect(self, trid, keepConnection=False):
     """ Disconnect the connection.
 
         :param str trid: Transport ID in the transportPool
+        :param bool keepConnection: give the connection back to the ConnectionPool instead of closing it.
+                                    Only done if the server agreed to keep it open.
+    """
+    transportPool = getGlobalTransportPool()
+    connectionKey = transportPool.getAssociatedData(trid, 'connectionPoolKey')
+    if connectionKey:
+      transport = transportPool.get(trid)
+      if keepConnection and transport:
+        transportPool.remove(trid)
+        getGlobalConnectionPool().put(connectionKey, transport)
+        return
+      getGlobalConnectionPool().forget(transport)
+    transportPool.close(trid)
+
+  @staticmethod
+  def _isReusedConnection(trid):
+    """ Check if the connection was taken from the ConnectionPool
+
+        :param str trid: Transport ID in the transportPool
+    """
+    return bool(getGlobalTransportPool().getAssociatedData(trid, 'reusedConnection'))
+
+  def __usePersistentConnection(self):
+    """ Persistent connections are used by the subclasses allowing them, unless disabled in kwargs
     """
-    getGlobalTransportPool().close(trid)
+    return self._allowPersistentConnection and self.kwargs.get(self.KW_PERSISTENT_CONNECTION, True)
 
   @staticmethod
   def _serializeStConnectionInfo(stConnectionInfo):
@@ -537,6 +581,8 @@ and this is thread %s
           * VO
           * action
           * extraCredentials
+          * DIRAC version
+          * whether the client wants to keep the connection open after the action
 
         It is kind of a handshake.
 
@@ -557,6 +603,8 @@ and this is thread %s
                         action,
                         self.__extraCredentials,
                         DIRAC.version)
+    if self.__usePersistentConnection():
+      stConnectionInfo += (True, )
 
     # Send the connection info and get the answer back
     retVal = transport.sendData(S_OK(BaseClient._serializeStConnectionInfo(stConnectionInfo)))
@@ -0,0 +1,173 @@
+""" Event loop of the connections of a service waiting for data from their client
+
+    A single thread selects on the connections which are either doing the SSL handshake or
+    waiting for the proposal of the client: the new connections (if the EventLoop option of the
+    service is enabled), and the persistent connections between two requests. The handshake and
+    the reception of the proposal are done without blocking, and only once the proposal has been
+    fully received the connection is given to the thread pool of the service to execute the action.
+    Idle connections therefore don't use any thread of the service.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import select
+import socket
+import threading
+import time
+
+from DIRAC import gLogger
+
+
+class ConnectionEventLoop(object):
+
+  def __init__(self, name, transportPool, handshakeCallback, requestCallback, maxProposalSize=1024):
+    """ c'tor
+
+        :param str name: name of the service, for the logs
+        :param transportPool: TransportPool of the service
+        :param handshakeCallback: called with the transport once its handshake is done,
+                                  returns the transport ID in the transport pool (or None to drop it)
+        :param requestCallback: called with the transport ID once the proposal is fully received
+        :param int maxProposalSize: size of the proposal above which it is not buffered anymore
+    """
+    self.log = gLogger.getSubLogger("EventLoop")
+    self.__name = name
+    self.__transportPool = transportPool
+    self.__handshakeCallback = handshakeCallback
+    self.__requestCallback = requestCallback
+    self.__maxProposalSize = maxProposalSize
+    self.__lock = threading.Lock()
+    # { transport : [ trid (None before the handshake), deadline ] }
+    self.__connections = {}
+    self.__thread = None
+    # Pipe used to wake up the thread when a connection is added
+    self.__wakeUpRead, self.__wakeUpWrite = os.pipe()
+
+  def getNumberOfConnections(self):
+    """ Number of connections waiting for data
+    """
+    return len(self.__connections)
+
+  def addNewConnection(self, transport, timeout):
+    """ Add a connection that has just been accepted, the handshake is done in the loop.
+        Transports which can only do their handshake at once are refused, as it would block the loop.
+
+        :param transport: transport of the client connection
+        :param int timeout: seconds allowed for the handshake and the proposal
+        :returns: bool, True if the connection was added
+    """
+    if not transport.hasNonBlockingHandshake():
+      return False
+    self.__add(transport, None, timeout)
+    return True
+
+  def addIdleConnection(self, trid, timeout):
+    """ Add a connection waiting for a new proposal of the client
+
+        :param str trid: ID of the connection in the transport pool
+        :param int timeout: seconds after which the connection is closed if there is no new proposal
+    """
+    transport = self.__transportPool.get(trid)
+    if transport:
+      self.__add(transport, trid, timeout)
+
+  def __add(self, transport, trid, timeout):
+    with self.__lock:
+      self.__connections[transport] = [trid, time.time() + timeout]
+      if not self.__thread:
+        self.__thread = threading.Thread(target=self.__loop, name="%s event loop" % self.__name)
+        self.__thread.setDaemon(True)
+        self.__thread.start()
+    os.write(self.__wakeUpWrite, b"x")
+
+  def __drop(self, transport, close=False):
+    """ Remove a connection from the loop, and close it if requested
+    """
+    with self.__lock:
+      trid = self.__connections.pop(transport, [None])[0]
+    if not close:
+      return
+    if trid:
+      self.__transportPool.close(trid)
+    else:
+      transport.close()
+
+  def __expireConnections(self):
+    """ Close the connections that waited for too long
+    """
+    now = time.time()
+    with self.__lock:
+      expired = [transport for transport, (_trid, deadline) in self.__connections.items() if deadline < now]
+    for transport in expired:
+      self.log.debug("Closing connection without activity", str(transport.getRemoteAddress()))
+      self.__drop(transport, close=True)
+
+  def __getReadyConnections(self):
+    """ Get the connections with data to process, waiting at most one second
+    """
+    with self.__lock:
+      transports = list(self.__connections)
+    # A whole proposal may already be buffered in the transport, the others wait for more data
+    ready = [transport for transport in transports
+             if transport.byteStream and transport.isMessageBuffered(self.__maxProposalSize)]
+    if ready:
+      return ready
+    sockets = dict((transport.getSocket(), transport) for transport in transports)
+    try:
+      inList, _outList, _exList = select.select([self.__wakeUpRead] + list(sockets), [], [], 1)
+    except (select.error, socket.error, ValueError):
+      # One of the connections is broken, processing it will close it
+      return [transport for sock, transport in sockets.items() if not self.__isSelectable(sock)]
+    if self.__wakeUpRead in inList:
+      os.read(self.__wakeUpRead, 4096)
+    return [sockets[sock] for sock in inList if sock in sockets]
+
+  @staticmethod
+  def __isSelectable(sock):
+    try:
+      select.select([sock], [], [], 0)
+    except (select.error, socket.error, ValueError):
+      return False
+    return True
+
+  def __processConnection(self, transport):
+    """ Progress in the handshake or the reception of the proposal of a connection
+    """
+    with self.__lock:
+      if transport not in self.__connections:
+        return
+      trid = self.__connections[transport][0]
+    if not trid:
+      result = transport.handshakeStep()
+      if not result['OK']:
+        self.log.debug("Handshake failed", result['Message'])
+        self.__drop(transport, close=True)
+        return
+      if not result['Value']:
+        return
+      trid = self.__handshakeCallback(transport)
+      if not trid:
+        self.__drop(transport)
+        return
+      with self.__lock:
+        self.__connections[transport][0] = trid
+    result = transport.bufferIncomingMessage(self.__maxProposalSize)
+    if result['OK'] and not result['Value']:
+      return
+    # The proposal is complete or the connection is broken, receiving it will report the error
+    self.__drop(transport)
+    self.__requestCallback(trid)
+
+  def __loop(self):
+    while True:
+      try:
+        self.__expireConnections()
+        for transport in self.__getReadyConnections():
+          self.__processConnection(transport)
+      except Exception:  # pylint: disable=broad-except
+        self.log.exception("Error in the event loop of %s" % self.__name)
+        time.sleep(0.1)
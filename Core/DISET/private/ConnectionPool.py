@@ -0,0 +1,254 @@
+""" Process wide pool of persistent client connections
+
+    After an RPC call, if the service agreed to keep the connection open, the client
+    gives the transport back to the pool instead of closing it. The next call to the same
+    service with the same credentials picks it up and skips the TCP connection and the
+    SSL handshake.
+
+    The connections are kept at most IDLE_TIMEOUT seconds, which has to be lower than the
+    ConnectionIdleTimeout of the services (60 s by default), and are checked before being reused.
+
+    As the services only authenticate a connection when it is established, the connections are
+    only shared by the clients using the same proxy file, which the transports take from the
+    environment when it is not given (see executeWithUserProxy), and they are not reused after
+    the expiry of the proxy.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import select
+import socket
+import calendar
+import threading
+import time
+
+from DIRAC import gLogger
+from DIRAC.Core.Security import Locations
+from DIRAC.Core.Security.m2crypto.X509Chain import X509Chain
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+
+class ConnectionPool(object):
+
+  # Seconds during which an idle connection can be reused
+  IDLE_TIMEOUT = 30
+  # Seconds after which a connection is not reused anymore (renewal of the credentials)
+  MAX_AGE = 3600
+  # Maximum number of idle connections kept per service and credentials
+  MAX_IDLE_PER_KEY = 10
+  # Seconds before the expiry of the proxy after which a connection is not reused anymore
+  EXPIRY_MARGIN = 60
+
+  def __init__(self, idleTimeout=IDLE_TIMEOUT, maxAge=MAX_AGE, maxIdlePerKey=MAX_IDLE_PER_KEY):
+    self.log = gLogger.getSubLogger("ConnectionPool")
+    self.__idleTimeout = idleTimeout
+    self.__maxAge = maxAge
+    self.__maxIdlePerKey = maxIdlePerKey
+    self.__lock = threading.Lock()
+    # { key : [ ( transport, deadline, time of the return to the pool ) ] }
+    self.__connections = {}
+    # { transport : time after which it can't be reused }
+    self.__deadlines = {}
+    # { proxy identity : expiry time of the proxy }
+    self.__proxyExpiries = {}
+    self.__stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+    result = gThreadScheduler.addPeriodicTask(max(1, idleTimeout // 2), self.purge)
+    if not result['OK']:
+      self.log.error("Cannot add task to thread scheduler", result['Message'])
+
+  @staticmethod
+  def generateKey(serviceURL, extraCredentials, kwargs):
+    """ Generate the key of the connections to a service: the connections are only shared by the clients
+        of the same service, with the same credentials and connection options
+
+        :param str serviceURL: URL of the service
+        :param extraCredentials: extra credentials sent in the proposal
+        :param dict kwargs: arguments of the client (proxy location, useCertificates...)
+        :returns: tuple
+    """
+    return (serviceURL, str(extraCredentials),
+            tuple(sorted((str(key), str(value)) for key, value in kwargs.items())),
+            ConnectionPool.getProxyIdentity(kwargs))
+
+  @staticmethod
+  def getProxyIdentity(kwargs):
+    """ Identify the proxy file used by a client: the one given in its arguments, or the one the transports
+        find in the environment. A proxy file replaced in place is identified by its inode and modification time.
+
+        :param dict kwargs: arguments of the client
+        :returns: ( path, inode, modification time ), or None if no proxy file is used
+    """
+    if kwargs.get('useCertificates') or kwargs.get('proxyString'):
+      return None
+    proxyLocation = kwargs.get('proxyLocation') or Locations.getProxyLocation()
+    if not proxyLocation:
+      return None
+    try:
+      fileStat = os.stat(proxyLocation)
+    except OSError:
+      return (proxyLocation, None, None)
+    return (proxyLocation, fileStat.st_ino, fileStat.st_mtime)
+
+  def __getProxyExpiry(self, proxyIdentity):
+    """ Get the expiry time of a proxy file, 0 if it can't be loaded
+    """
+    with self.__lock:
+      if proxyIdentity in self.__proxyExpiries:
+        return self.__proxyExpiries[proxyIdentity]
+    chain = X509Chain()
+    result = chain.loadChainFromFile(proxyIdentity[0])
+    if result['OK']:
+      result = chain.getNotAfterDate()
+    if result['OK']:
+      expiry = calendar.timegm(result['Value'].utctimetuple())
+    else:
+      self.log.debug("Cannot get the expiry of the proxy, its connections are not reused", result['Message'])
+      expiry = 0
+    with self.__lock:
+      self.__proxyExpiries[proxyIdentity] = expiry
+    return expiry
+
+  def __getDeadline(self, key, now):
+    """ Get the time after which a new connection of a key can't be reused: after MAX_AGE, or before the
+        expiry of its proxy
+    """
+    deadline = now + self.__maxAge
+    proxyIdentity = key[-1] if isinstance(key, tuple) else None
+    if proxyIdentity:
+      deadline = min(deadline, self.__getProxyExpiry(proxyIdentity) - self.EXPIRY_MARGIN)
+    return deadline
+
+  @staticmethod
+  def isAlive(transport):
+    """ Check that a connection can be reused: nothing should be readable on an idle connection,
+        otherwise the server closed it or sent unexpected data
+    """
+    try:
+      readable, _writable, _error = select.select([transport.getSocket()], [], [], 0)
+    except (select.error, socket.error, ValueError):
+      return False
+    return not readable and not transport.byteStream
+
+  def __isExpired(self, deadline, returnTime, now):
+    return now - returnTime > self.__idleTimeout or now > deadline
+
+  def get(self, key):
+    """ Get an idle connection from the pool
+
+        :param key: key generated by generateKey
+        :returns: transport or None if there is no connection available
+    """
+    now = time.time()
+    toClose = []
+    transport = None
+    with self.__lock:
+      connList = self.__connections.get(key, [])
+      while connList:
+        # Take the most recently used connection, the least likely to be closed by the server
+        candidate, deadline, returnTime = connList.pop()
+        if not self.__isExpired(deadline, returnTime, now) and self.isAlive(candidate):
+          transport = candidate
+          self.__deadlines[transport] = deadline
+          break
+        toClose.append(candidate)
+      if not connList:
+        self.__connections.pop(key, None)
+      self.__stats['hits' if transport else 'misses'] += 1
+      self.__stats['discarded'] += len(toClose)
+    self.__close(toClose)
+    return transport
+
+  def put(self, key, transport):
+    """ Give a connection back to the pool
+
+        :param key: key generated by generateKey
+        :param transport: transport connected to the service, ready for a new proposal
+    """
+    now = time.time()
+    with self.__lock:
+      deadline = self.__deadlines.pop(transport, None)
+    if deadline is None:
+      deadline = self.__getDeadline(key, now)
+    with self.__lock:
+      connList = self.__connections.setdefault(key, [])
+      if len(connList) < self.__maxIdlePerKey and not self.__isExpired(deadline, now, now):
+        connList.append((transport, deadline, now))
+        return
+      self.__stats['discarded'] += 1
+    self.__close([transport])
+
+  def register(self, transport, key=None):
+    """ Record the creation of a new connection that might be put in the pool
+
+        :param transport: new transport
+        :param key: key generated by generateKey
+    """
+    deadline = self.__getDeadline(key, time.time())
+    with self.__lock:
+      self.__deadlines[transport] = deadline
+
+  def forget(self, transport):
+    """ The connection is closed and won't come back to the pool
+    """
+    with self.__lock:
+      self.__deadlines.pop(transport, None)
+
+  def flush(self, key=None):
+    """ Close the idle connections of a key, or all of them
+    """
+    with self.__lock:
+      if key is None:
+        connLists = list(self.__connections.values())
+        self.__connections = {}
+      else:
+        connLists = [self.__connections.pop(key, [])]
+    self.__close([conn[0] for connList in connLists for conn in connList])
+
+  def purge(self):
+    """ Close the connections idle for too long, or closed by the server
+    """
+    now = time.time()
+    toClose = []
+    with self.__lock:
+      for key in list(self.__connections):
+        alive = []
+        for transport, deadline, returnTime in self.__connections[key]:
+          if self.__isExpired(deadline, returnTime, now) or not self.isAlive(transport):
+            toClose.append(transport)
+          else:
+            alive.append((transport, deadline, returnTime))
+        if alive:
+          self.__connections[key] = alive
+        else:
+          del self.__connections[key]
+      self.__stats['discarded'] += len(toClose)
+    self.__close(toClose)
+
+  def getStats(self):
+    """ Get the number of idle connections and the reuse counters
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['idle'] = sum(len(connList) for connList in self.__connections.values())
+    return stats
+
+  def __close(self, transports):
+    for transport in transports:
+      try:
+        transport.close()
+      except Exception as e:  # pylint: disable=broad-except
+        self.log.debug("Error closing idle connection", repr(e))
+
+
+gConnectionPool = None
+
+
+def getGlobalConnectionPool():
+  global gConnectionPool
+  if not gConnectionPool:
+    gConnectionPool = ConnectionPool()
+  return gConnectionPool
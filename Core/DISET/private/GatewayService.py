@@ -255,13 +255,18 @@ class GatewayService(Service):
 
   def __forwardRPCCall(self, targetService, clientInitArgs, method, params):
     if targetService == "Configuration/Server":
-      if method == "getCompressedDataIfNewer":
+      if method in ("getCompressedDataIfNewer", "getCompressedDataOrPatchIfNewer"):
         # Relay CS data directly
         serviceVersion = gConfigurationData.getVersion()
         retDict = {'newestVersion': serviceVersion}
         clientVersion = params[0]
         if clientVersion < serviceVersion:
-          retDict['data'] = gConfigurationData.getCompressedData()
+          if method == "getCompressedDataOrPatchIfNewer":
+            result = gConfigurationData.getPatch(clientVersion)
+            if result['OK']:
+              retDict['patch'], retDict['checksum'] = result['Value']
+          if 'patch' not in retDict:
+            retDict['data'] = gConfigurationData.getCompressedData()
         return S_OK(retDict)
     # Default
     rpcClient = RPCClient(targetService, **clientInitArgs)
@@ -7,7 +7,7 @@ from __future__ import print_function
 __RCSID__ = "$Id$"
 
 from DIRAC.Core.DISET.private.BaseClient import BaseClient
-from DIRAC.Core.Utilities.ReturnValues import S_OK
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities.DErrno import cmpError, ENOAUTH
 
 
@@ -20,8 +20,13 @@ class InnerRPCClient(BaseClient):
         * sends the method parameters
         * retrieve the result
         * disconnect
+
+      If the service agrees, the connection is not closed but given back to the ConnectionPool,
+      and reused by the next calls to the same service with the same credentials.
   """
 
+  _allowPersistentConnection = True
+
   # Number of times we retry the call.
   # The connection retry is handled by BaseClient
   __retry = 0
@@ -47,6 +52,7 @@ class InnerRPCClient(BaseClient):
       return retVal
     # Get the transport connection ID as well as the Transport object
     trid, transport = retVal['Value']
+    keepConnection = False
     try:
       # Handshake to perform the RPC call for functionName
       retVal = self._proposeAction(transport, ("RPC", functionName))
@@ -54,6 +60,9 @@ class InnerRPCClient(BaseClient):
         if cmpError(retVal, ENOAUTH):  # This query is unauthorized
           retVal['rpcStub'] = stub
           return retVal
+        elif self._isReusedConnection(trid):
+          # The service closed the persistent connection in the meantime, try with another one
+          return self.executeRPC(functionName, args)
         else:  # we have network problem or the service is not responding
           if self.__retry < 3:
             self.__retry += 1
@@ -61,6 +70,7 @@ class InnerRPCClient(BaseClient):
           else:
             retVal['rpcStub'] = stub
             return retVal
+      serverAgreed = isinstance(retVal.get('Value'), dict) and retVal['Value'].get('keepConnection', False)
 
       # Send the arguments to the function
       # Note: we need to convert the arguments to list
@@ -76,7 +86,61 @@ class InnerRPCClient(BaseClient):
       # processes the request.
       receivedData = transport.receiveData()
       if isinstance(receivedData, dict):
+        # Errors can come from the transport, in which case the connection cannot be reused
+        keepConnection = serverAgreed and receivedData['OK']
         receivedData['rpcStub'] = stub
       return receivedData
+    finally:
+      self._disconnect(trid, keepConnection=keepConnection)
+
+  def executeStreamingRPC(self, functionName, args):
+    """ Perform a streaming RPC call: the server sends the result in several chunks,
+        produced by the stream_<functionName> method of the handler.
+
+        The connection is kept open until the returned iterator is exhausted (or garbage collected).
+        It yields the S_OK structures of the chunks as they arrive, so that only one chunk
+        at a time has to be received and decoded. If the server fails, the last item yielded
+        is the S_ERROR structure.
+
+        :param functionName: name of the function
+        :param args: arguments to the function
+
+        :return: S_OK(iterator over the chunks)/S_ERROR
+    """
+    retVal = self._connect()
+    stub = [self._getBaseStub(), functionName, list(args)]
+    if not retVal['OK']:
+      retVal['rpcStub'] = stub
+      return retVal
+    trid, transport = retVal['Value']
+    retVal = self._proposeAction(transport, ("StreamRPC", functionName))
+    if not retVal['OK'] and not cmpError(retVal, ENOAUTH) and self._isReusedConnection(trid):
+      # The service closed the persistent connection in the meantime, try with another one
+      self._disconnect(trid)
+      return self.executeStreamingRPC(functionName, args)
+    if retVal['OK']:
+      retVal = transport.sendData(S_OK(list(args)))
+    if not retVal['OK']:
+      self._disconnect(trid)
+      retVal['rpcStub'] = stub
+      return retVal
+    return S_OK(self.__receiveStream(trid, transport, stub))
+
+  def __receiveStream(self, trid, transport, stub):
+    """ Generator receiving the chunks of a streaming RPC call until the final response
+    """
+    try:
+      while True:
+        receivedData = transport.receiveData()
+        if not isinstance(receivedData, dict):
+          yield S_ERROR("Unexpected data received in stream: %s" % str(receivedData)[:50])
+          return
+        if not receivedData.pop('StreamChunk', False):
+          # Final response of the server
+          if not receivedData['OK']:
+            receivedData['rpcStub'] = stub
+            yield receivedData
+          return
+        yield receivedData
     finally:
       self._disconnect(trid)
@@ -32,6 +32,7 @@ from DIRAC.Core.DISET.private.LockManager import LockManager
 from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
 from DIRAC.Core.DISET.private.ServiceConfiguration import ServiceConfiguration
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ConnectionEventLoop import ConnectionEventLoop
 from DIRAC.Core.DISET.private.MessageBroker import MessageBroker, MessageSender
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
@@ -41,6 +42,7 @@ from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.MonitoringSystem.Client.MonitoringReporter import MonitoringReporter
 from DIRAC.Core.DISET.RequestHandler import getServiceOption
+from DIRAC.Core.DISET import DEFAULT_CONNECTION_TIMEOUT
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
 __RCSID__ = "$Id$"
@@ -49,6 +51,7 @@ __RCSID__ = "$Id$"
 class Service(object):
 
   SVC_VALID_ACTIONS = {'RPC': 'export',
+                       'StreamRPC': 'stream',
                        'FileTransfer': 'transfer',
                        'Message': 'msg',
                        'Connection': 'Message'}
@@ -82,6 +85,9 @@ class Service(object):
     self._transportPool = getGlobalTransportPool()
     self.__cloneId = 0
     self.__maxFD = 0
+    # Connections doing the handshake or waiting for a proposal
+    self.__eventLoop = ConnectionEventLoop(self._name, self._transportPool,
+                                           self.__registerConnection, self.__queueRequest)
 
   def setCloneProcessId(self, cloneId):
     self.__cloneId = cloneId
@@ -241,7 +247,8 @@ class Service(object):
         self._lockManager.createLock("%s/%s" % (actionType, exportedName),
                                      self._cfg.getMaxThreadsForMethod(actionType, exportedName))
         # Look for type and auth rules
-        if actionType == 'RPC':
+        # A streaming method shares the type and auth rules of the RPC method with the same name
+        if actionType in ('RPC', 'StreamRPC'):
           typeAttr = "types_%s" % exportedName
           authAttr = "auth_%s" % exportedName
         else:
@@ -349,17 +356,27 @@ class Service(object):
       This method may be called by ServiceReactor.
       The method stacks openened connection in a queue, another thread
       read this queue and handle connection.
+      If the EventLoop option is enabled, the handshake and the proposal are received
+      by the event loop first, and only the execution of the action uses the thread pool.
 
       :param clientTransport: Object wich describe opened connection (PlainTransport or SSLTransport)
     """
     self._stats['connections'] += 1
     self._monitor.setComponentExtraParam('queries', self._stats['connections'])
+    if self._cfg.useEventLoop():
+      # The handshake and the proposal are received by the event loop, unless the handshake would block it
+      self.__maxFD = max(self.__maxFD, clientTransport.oSocket.fileno())
+      if self.__eventLoop.addNewConnection(clientTransport, DEFAULT_CONNECTION_TIMEOUT):
+        return
+    self.__queueInThreadPool(self._processInThread, clientTransport)
+
+  def __queueInThreadPool(self, function, *args):
     # TODO: remove later
     if useThreadPoolExecutor:
-      self._threadPool.submit(self._processInThread, clientTransport)
+      self._threadPool.submit(function, *args)
     else:
-      self._threadPool.generateJobAndQueueIt(self._processInThread,
-                                             args=(clientTransport,))
+      self._threadPool.generateJobAndQueueIt(function,
+                                             args=args)
 
   # Threaded process function
   def _processInThread(self, clientTransport):
@@ -403,34 +420,97 @@ class Service(object):
       except BaseException:
         return
       # Add to the transport pool
-      trid = self._transportPool.add(clientTransport)
+      trid = self.__registerConnection(clientTransport)
       if not trid:
         return
-      # Receive and check proposal
-      result = self._receiveAndCheckProposal(trid)
-      if not result['OK']:
-        self._transportPool.sendAndClose(trid, result)
-        return
-      proposalTuple = result['Value']
-      # Instantiate handler
-      result = self._instantiateHandler(trid, proposalTuple)
-      if not result['OK']:
-        self._transportPool.sendAndClose(trid, result)
+      return self.__processRequest(trid)
+    finally:
+      self._lockManager.unlockGlobal()
+      if monReport:
+        self.__endReportToMonitoring(*monReport)
+
+  def __registerConnection(self, clientTransport):
+    """
+    Add a connection to the transport pool once the handshake is done
+
+    :return: transport ID
+    """
+    trid = self._transportPool.add(clientTransport)
+    if trid:
+      # The authorization modifies the credentials, keep the ones of the handshake
+      # for the next requests of a persistent connection
+      self._transportPool.associateData(trid, 'handshakeCredentials',
+                                        dict(clientTransport.getConnectingCredentials()))
+    return trid
+
+  def __queueRequest(self, trid):
+    """
+    Process in the thread pool the proposal received by the event loop
+    """
+    self.__queueInThreadPool(self._processRequestInThread, trid)
+
+  def _processRequestInThread(self, trid):
+    """
+    Handle a request once the proposal is received by the event loop,
+    the handshake has already been done
+
+    :param str trid: transport ID of the connection
+    """
+    self._lockManager.lockGlobal()
+    try:
+      monReport = self.__startReportToMonitoring()
+    except Exception:
+      monReport = False
+    try:
+      clientTransport = self._transportPool.get(trid)
+      if not clientTransport:
         return
-      handlerObj = result['Value']
-      # Execute the action
-      result = self._processProposal(trid, proposalTuple, handlerObj)
-      # Close the connection if required
-      if result['closeTransport'] or not result['OK']:
-        if not result['OK']:
-          gLogger.error("Error processing proposal", result['Message'])
-        self._transportPool.close(trid)
-      return result
+      clientTransport.peerCredentials = dict(self._transportPool.getAssociatedData(trid, 'handshakeCredentials'))
+      return self.__processRequest(trid)
     finally:
       self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring(*monReport)
 
+  def __processRequest(self, trid):
+    """
+    Receive the proposal of the client and execute the action
+
+    :param str trid: transport ID of the connection
+    """
+    # Receive and check proposal
+    result = self._receiveAndCheckProposal(trid)
+    if not result['OK']:
+      self._transportPool.sendAndClose(trid, result)
+      return
+    proposalTuple = result['Value']
+    # Instantiate handler
+    result = self._instantiateHandler(trid, proposalTuple)
+    if not result['OK']:
+      self._transportPool.sendAndClose(trid, result)
+      return
+    handlerObj = result['Value']
+    # Execute the action
+    result = self._processProposal(trid, proposalTuple, handlerObj)
+    # Close the connection if required
+    if result['closeTransport'] or not result['OK']:
+      if not result['OK']:
+        gLogger.error("Error processing proposal", result['Message'])
+      self._transportPool.close(trid)
+    elif result.get('keepConnection'):
+      self.__eventLoop.addIdleConnection(trid, self._cfg.getConnectionIdleTimeout())
+    return result
+
+  def __acceptPersistentConnection(self, proposalTuple):
+    """
+    The connection is kept open after an RPC call if the client asks for it (5th element of the proposal)
+    """
+    if len(proposalTuple) < 5 or not proposalTuple[4] or proposalTuple[1][0] != 'RPC':
+      return False
+    if not self._cfg.getConnectionIdleTimeout():
+      return False
+    return self.__eventLoop.getNumberOfConnections() < self._cfg.getMaxIdleConnections()
+
   def _createIdentityString(self, credDict, clientTransport=None):
     if 'username' in credDict:
       if 'group' in credDict:
@@ -493,7 +573,7 @@ class Service(object):
       csAuthPath = "%s/Default" % actionTuple[0]
       hardcodedMethodAuth = self._actions['auth'][actionTuple[0]]
     else:
-      if actionTuple[0] == 'RPC':
+      if actionTuple[0] in ('RPC', 'StreamRPC'):
         csAuthPath = actionTuple[1]
       else:
         csAuthPath = "/".join(actionTuple)
@@ -571,8 +651,10 @@ class Service(object):
     return S_OK(handlerInstance)
 
   def _processProposal(self, trid, proposalTuple, handlerObj):
+    keepConnection = self.__acceptPersistentConnection(proposalTuple)
     # Notify the client we're ready to execute the action
-    retVal = self._transportPool.send(trid, S_OK())
+    # and whether the connection will be kept open afterwards
+    retVal = self._transportPool.send(trid, S_OK({'keepConnection': True}) if keepConnection else S_OK())
     if not retVal['OK']:
       return retVal
 
@@ -600,7 +682,8 @@ class Service(object):
       if not result['OK']:
         self._msgBroker.removeTransport(trid)
 
-    result['closeTransport'] = not messageConnection or not result['OK']
+    result['closeTransport'] = not (messageConnection or keepConnection) or not result['OK']
+    result['keepConnection'] = keepConnection and result['OK']
     return result
 
   def _mbConnect(self, trid, handlerObj=None):
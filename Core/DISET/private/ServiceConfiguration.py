@@ -82,6 +82,26 @@ class ServiceConfiguration:
     except BaseException:
       return 20
 
+  def getConnectionIdleTimeout(self):
+    """ Seconds during which an idle persistent client connection is kept open, 0 disables them
+    """
+    try:
+      return int(self.getOption("ConnectionIdleTimeout"))
+    except BaseException:
+      return 60
+
+  def getMaxIdleConnections(self):
+    try:
+      return int(self.getOption("MaxIdleConnections"))
+    except BaseException:
+      return 500
+
+  def useEventLoop(self):
+    """ Whether the handshake and the proposal of the new connections are received by the event loop,
+        instead of a thread of the pool
+    """
+    return str(self.getOption("EventLoop")).lower() in ("yes", "true")
+
   def getMaxThreadsForMethod(self, actionType, method):
     try:
       return int(self.getOption("ThreadLimit/%s/%s" % (actionType, method)))
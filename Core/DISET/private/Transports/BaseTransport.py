@@ -23,6 +23,7 @@ from __future__ import print_function
 
 __RCSID__ = "$Id$"
 
+import six
 import time
 import select
 import cStringIO
@@ -84,6 +85,27 @@ class BaseTransport(object):
     """
     return S_OK()
 
+  def handshakeStep(self):
+    """ Progress in the handshake without blocking, used by the event loop of the services.
+        By default, the whole handshake is done at once.
+
+        :returns: S_OK(True) when the handshake is done, S_OK(False) if it waits for data from the peer
+    """
+    result = self.handshake()
+    if not result['OK']:
+      return result
+    return S_OK(True)
+
+  def hasNonBlockingHandshake(self):
+    """ Check if handshakeStep can be called without blocking: the transport implements it,
+        or it has no handshake to do
+    """
+    cls = type(self)
+    ownHandshakeStep = six.get_unbound_function(cls.handshakeStep) is not \
+        six.get_unbound_function(BaseTransport.handshakeStep)
+    ownHandshake = six.get_unbound_function(cls.handshake) is not six.get_unbound_function(BaseTransport.handshake)
+    return ownHandshakeStep or not ownHandshake
+
   def close(self):
     self.oSocket.close()
 
@@ -165,6 +187,57 @@ class BaseTransport(object):
   def _write(self, buf):
     return S_OK(self.oSocket.send(buf))
 
+  def _readNonBlocking(self, bufSize=4096):
+    """ Read the data already available
+
+        :returns: S_OK(data), with None as data if there is nothing to read
+    """
+    try:
+      inList, dummy, dummy = select.select([self.oSocket], [], [], 0)
+      if not inList:
+        return S_OK(None)
+      data = self.oSocket.recv(bufSize)
+    except Exception as e:
+      return S_ERROR("Exception while reading from peer: %s" % str(e))
+    if not data:
+      return S_ERROR("Connection closed by peer")
+    return S_OK(data)
+
+  def bufferIncomingMessage(self, maxBufferSize=0):
+    """ Read without blocking the data available, until a whole message is in the buffer.
+        The message can then be received with receiveData without blocking.
+
+        :param int maxBufferSize: size of the message above which it is not buffered
+        :returns: S_OK(True) if receiveData can be called without blocking, S_OK(False) otherwise
+    """
+    while not self.isMessageBuffered(maxBufferSize):
+      result = self._readNonBlocking(16384)
+      if not result['OK']:
+        return result
+      if result['Value'] is None:
+        return S_OK(False)
+      self.byteStream += result['Value']
+    return S_OK(True)
+
+  def isMessageBuffered(self, maxBufferSize=0):
+    """ Check if the byte stream contains a whole message, or something that receiveData
+        would not wait for (errors, keep alives...)
+
+        :param int maxBufferSize: size of the message above which it is not buffered
+    """
+    if self.receivedMessages:
+      return True
+    iSeparatorPosition = self.byteStream.find(":", 0, 10)
+    if iSeparatorPosition == -1:
+      return len(self.byteStream) >= 10
+    try:
+      pkgSize = int(self.byteStream[:iSeparatorPosition])
+    except ValueError:
+      return True
+    if maxBufferSize and pkgSize > maxBufferSize:
+      return True
+    return len(self.byteStream) - iSeparatorPosition - 1 >= pkgSize
+
   def sendData(self, uData, prefix=False):
     self.__updateLastActionTimestamp()
     sCodedData = MixedEncode.encode(uData)
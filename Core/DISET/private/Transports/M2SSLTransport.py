@@ -9,6 +9,7 @@ from __future__ import print_function
 __RCSID__ = "$Id$"
 
 import os
+import errno
 import socket
 from M2Crypto import SSL, threading as M2Threading
 from M2Crypto.SSL.Checker import SSLVerificationError
@@ -79,6 +80,7 @@ class SSLTransport(BaseTransport):
     self.__timeout = kwargs.get(SSLTransport.KW_TIMEOUT, DEFAULT_RPC_TIMEOUT)
 
     self.__locked = False  # We don't support locking, so this is always false.
+    self.__handshakeStarted = False
 
     self.__ctx = kwargs.pop('ctx', None)
     if not self.__ctx:
@@ -306,6 +308,11 @@ class SSLTransport(BaseTransport):
     # This isn't used any more, the handshake is done inside the M2Crypto library
     return S_OK()
 
+  def handshakeStep_singleStep(self):
+    """ The handshake was done when accepting the connection, nothing to wait for
+    """
+    return S_OK(True)
+
   def handshake_multipleSteps(self):
     """ Perform SSL handshakes.
         This has to be called after the connection was accepted (acceptConnection_multipleSteps)
@@ -343,6 +350,36 @@ class SSLTransport(BaseTransport):
     except (socket.error, SSL.SSLError, SSLVerificationError) as e:
       return S_ERROR("Error in handhsake: %s %s" % (e, repr(e)))
 
+  def handshakeStep_multipleSteps(self):
+    """ Progress in the SSL handshake without blocking (event loop of the services).
+        This has to be called after the connection was accepted (acceptConnection_multipleSteps)
+        and each time the socket is readable, until it returns S_OK(True).
+
+        The remote credentials are gathered once it is done
+    """
+    try:
+      if not self.__handshakeStarted:
+        self.oSocket.setup_ssl()
+        self.oSocket.set_accept_state()
+        self.oSocket.setblocking(False)
+        self.__handshakeStarted = True
+      # With a non blocking socket, -1 means that data from the client is needed
+      if self.oSocket.accept_ssl() != 1:
+        return S_OK(False)
+      check = getattr(self.oSocket, 'postConnectionCheck',
+                      self.oSocket.serverPostConnectionCheck)
+      if check is not None:
+        if not check(self.oSocket.get_peer_cert(), self.oSocket.addr[0]):
+          raise SSL.Checker.SSLVerificationError(
+              'post connection check failed')
+
+      self.peerCredentials = getM2PeerInfo(self.oSocket)
+      # Timeout of the RPC operations, as in handshake_multipleSteps
+      self.oSocket.settimeout(DEFAULT_RPC_TIMEOUT)
+      return S_OK(True)
+    except (socket.error, SSL.SSLError, SSLVerificationError) as e:
+      return S_ERROR("Error in handhsake: %s %s" % (e, repr(e)))
+
   def setClientSocket_singleStep(self, oSocket):
     """ Set the inner socket (i.e. SSL.Connection object) of this instance
         to the value of oSocket.
@@ -445,10 +482,12 @@ class SSLTransport(BaseTransport):
   if os.getenv('DIRAC_M2CRYPTO_SPLIT_HANDSHAKE', 'Yes').lower() in ('yes', 'true'):
     acceptConnection = acceptConnection_multipleSteps
     handshake = handshake_multipleSteps
+    handshakeStep = handshakeStep_multipleSteps
     setClientSocket = setClientSocket_multipleSteps
   else:
     acceptConnection = acceptConnection_singleStep
     handshake = handshake_singleStep
+    handshakeStep = handshakeStep_singleStep
     setClientSocket = setClientSocket_singleStep
 
   def _read(self, bufSize=4096, skipReadyCheck=False):
@@ -466,6 +505,32 @@ class SSLTransport(BaseTransport):
     except (socket.error, SSL.SSLError, SSLVerificationError) as e:
       return S_ERROR("Error in _read: %s %s" % (e, repr(e)))
 
+  def _readNonBlocking(self, bufSize=4096):
+    """ Read the data already available.
+
+        :param bufSize: size of the buffer to read
+
+        :returns: S_OK(data), with None as data if there is nothing to read
+    """
+    timeout = self.oSocket.socket.gettimeout()
+    data = None
+    try:
+      self.oSocket.setblocking(False)
+      data = self.oSocket.read(bufSize)
+      # Nothing was decrypted: either the data is incomplete, or the peer closed the connection
+      if data is None and self.oSocket.socket.recv(1, socket.MSG_PEEK) == b'':
+        data = b''
+    except socket.error as e:
+      if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+        return S_ERROR("Error in _read: %s %s" % (e, repr(e)))
+    except (SSL.SSLError, SSLVerificationError) as e:
+      return S_ERROR("Error in _read: %s %s" % (e, repr(e)))
+    finally:
+      self.oSocket.settimeout(timeout)
+    if data == b'':
+      return S_ERROR("Connection closed by peer")
+    return S_OK(data)
+
   def isLocked(self):
     """ Returns if this instance is locked.
         Always returns false.
@@ -0,0 +1,145 @@
+""" Unit tests for the event loop receiving the proposals of the clients
+"""
+# pylint: disable=protected-access, missing-docstring, invalid-name
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import socket
+import threading
+import time
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities import MixedEncode
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+from DIRAC.Core.DISET.private.ConnectionEventLoop import ConnectionEventLoop
+
+
+def _encode(data):
+  encoded = MixedEncode.encode(data)
+  return "%s:%s" % (len(encoded), encoded)
+
+
+@pytest.fixture
+def connection():
+  """ Client socket and server transport of a connection
+  """
+  listening = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  listening.bind(('127.0.0.1', 0))
+  listening.listen(1)
+  client = socket.create_connection(listening.getsockname())
+  serverSocket, _address = listening.accept()
+  listening.close()
+  transport = PlainTransport(('127.0.0.1', 0))
+  transport.setClientSocket(serverSocket)
+  yield client, transport
+  client.close()
+  transport.close()
+
+
+class Callbacks(object):
+
+  def __init__(self, transport):
+    self.transport = transport
+    self.requests = []
+    self.event = threading.Event()
+    self.transportPool = MagicMock()
+    self.transportPool.get.return_value = transport
+
+  def handshake(self, transport):
+    assert transport is self.transport
+    return 'trid'
+
+  def request(self, trid):
+    self.requests.append(trid)
+    self.event.set()
+
+
+def test_newConnection(connection):
+  client, transport = connection
+  callbacks = Callbacks(transport)
+  eventLoop = ConnectionEventLoop('Test/Service', callbacks.transportPool, callbacks.handshake, callbacks.request)
+  eventLoop.addNewConnection(transport, 10)
+  assert eventLoop.getNumberOfConnections() == 1
+
+  proposal = _encode(S_OK([['Test/Service', 'Setup', 'VO'], ['RPC', 'ping'], '', 'v7r1', True]))
+  client.sendall(proposal[:10])
+  assert not callbacks.event.wait(0.3)
+  client.sendall(proposal[10:])
+  assert callbacks.event.wait(5)
+  assert callbacks.requests == ['trid']
+  assert eventLoop.getNumberOfConnections() == 0
+  # The proposal is buffered, it is received without blocking
+  result = transport.receiveData(1024)
+  assert result['OK']
+  assert result['Value'][1] == ['RPC', 'ping']
+
+
+def test_idleConnection(connection):
+  _client, transport = connection
+  callbacks = Callbacks(transport)
+  eventLoop = ConnectionEventLoop('Test/Service', callbacks.transportPool, callbacks.handshake, callbacks.request)
+  eventLoop.addIdleConnection('trid', 0.2)
+  time.sleep(1.5)
+  assert eventLoop.getNumberOfConnections() == 0
+  callbacks.transportPool.close.assert_called_once_with('trid')
+  assert not callbacks.requests
+
+
+def test_closedConnection(connection):
+  client, transport = connection
+  callbacks = Callbacks(transport)
+  eventLoop = ConnectionEventLoop('Test/Service', callbacks.transportPool, callbacks.handshake, callbacks.request)
+  eventLoop.addIdleConnection('trid', 10)
+  client.close()
+  # Receiving the proposal reports the error
+  assert callbacks.event.wait(5)
+  assert not transport.receiveData(1024)['OK']
+
+
+def test_bufferIncomingMessage(connection):
+  client, transport = connection
+  assert transport.bufferIncomingMessage()['Value'] is False
+  message = _encode(S_OK('x' * 100))
+  client.sendall(message[:50])
+  time.sleep(0.1)
+  assert transport.bufferIncomingMessage()['Value'] is False
+  client.sendall(message[50:])
+  time.sleep(0.1)
+  assert transport.bufferIncomingMessage()['Value'] is True
+  # Too big for a proposal, no need to wait for the end of it
+  client.sendall(_encode(S_OK('x' * 2000)))
+  assert transport.receiveData()['Value'] == 'x' * 100
+  time.sleep(0.1)
+  assert transport.bufferIncomingMessage(1024)['Value'] is True
+
+
+def test_partialMessageBuffered(connection):
+  """ A connection with a partial proposal in its buffer waits for data like the others
+  """
+  client, transport = connection
+  eventLoop = ConnectionEventLoop('Test/Service', MagicMock(), MagicMock(), MagicMock())
+  eventLoop._ConnectionEventLoop__connections[transport] = ['trid', time.time() + 10]
+  transport.byteStream = _encode(S_OK('x' * 100))[:50]
+  startTime = time.time()
+  assert eventLoop._ConnectionEventLoop__getReadyConnections() == []
+  assert time.time() - startTime > 0.5
+  client.sendall(b"more")
+  assert eventLoop._ConnectionEventLoop__getReadyConnections() == [transport]
+  transport.byteStream = _encode(S_OK('x' * 100))
+  assert eventLoop._ConnectionEventLoop__getReadyConnections() == [transport]
+
+
+def test_blockingHandshake(connection):
+  """ The transports that can't do their handshake step by step are not handled by the loop
+  """
+  _client, transport = connection
+  eventLoop = ConnectionEventLoop('Test/Service', MagicMock(), MagicMock(), MagicMock())
+  transport.hasNonBlockingHandshake = MagicMock(return_value=False)
+  assert eventLoop.addNewConnection(transport, 10) is False
+  assert eventLoop.getNumberOfConnections() == 0
+  assert PlainTransport(('127.0.0.1', 0)).hasNonBlockingHandshake()
@@ -0,0 +1,191 @@
+""" Unit tests for the pool of persistent client connections
+"""
+# pylint: disable=protected-access, missing-docstring, invalid-name
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import socket
+import datetime
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+
+
+class FakeTransport(object):
+  """ Transport with a real socket, the other end is the "server"
+  """
+
+  def __init__(self):
+    self.sock, self.server = socket.socketpair()
+    self.byteStream = ""
+    self.closed = False
+
+  def getSocket(self):
+    return self.sock
+
+  def close(self):
+    self.closed = True
+    self.sock.close()
+    self.server.close()
+
+
+@pytest.fixture
+def pool():
+  return ConnectionPool(idleTimeout=30, maxAge=3600, maxIdlePerKey=2)
+
+
+def test_reuse(pool):
+  key = pool.generateKey('dips://server:9135/System/Service', '', {'timeout': 600})
+  assert key == pool.generateKey('dips://server:9135/System/Service', '', {'timeout': 600})
+  assert key != pool.generateKey('dips://server:9135/System/Service', ('/DN', 'group'), {'timeout': 600})
+  assert pool.get(key) is None
+
+  transport = FakeTransport()
+  pool.register(transport)
+  pool.put(key, transport)
+  assert pool.getStats()['idle'] == 1
+  assert pool.get(key) is transport
+  assert pool.get(key) is None
+  assert not transport.closed
+  stats = pool.getStats()
+  assert stats['hits'] == 1 and stats['misses'] == 2 and stats['idle'] == 0
+
+
+def test_maxIdlePerKey(pool):
+  transports = [FakeTransport() for _ in range(3)]
+  for transport in transports:
+    pool.put('key', transport)
+  assert pool.getStats()['idle'] == 2
+  assert transports[2].closed
+  # The most recently returned connection is used first
+  assert pool.get('key') is transports[1]
+
+
+def test_healthCheck():
+  pool = ConnectionPool(idleTimeout=30, maxAge=3600, maxIdlePerKey=3)
+  closedByServer = FakeTransport()
+  closedByServer.server.close()
+  withData = FakeTransport()
+  withData.server.send(b"unexpected")
+  healthy = FakeTransport()
+  for transport in (healthy, withData, closedByServer):
+    pool.put('key', transport)
+  assert pool.get('key') is healthy
+  assert closedByServer.closed
+  assert withData.closed
+
+
+def test_expiration(mocker):
+  pool = ConnectionPool(idleTimeout=30, maxAge=3600, maxIdlePerKey=10)
+  mockTime = mocker.patch('DIRAC.Core.DISET.private.ConnectionPool.time.time')
+  old = FakeTransport()
+  idle = FakeTransport()
+  mockTime.return_value = 0
+  pool.register(old)
+  mockTime.return_value = 3590
+  pool.put('key', old)
+  pool.put('key', idle)
+  mockTime.return_value = 3610
+  # Too old, even if recently used
+  pool.purge()
+  assert old.closed
+  assert pool.getStats()['idle'] == 1
+  mockTime.return_value = 3625
+  assert pool.get('key') is None
+  assert idle.closed
+
+
+def test_proxyFromEnvironment(mocker, tmpdir):
+  """ The connections are not shared by clients using different proxies from the environment
+  """
+  pool = ConnectionPool(idleTimeout=30, maxAge=3600, maxIdlePerKey=10)
+  proxies = []
+  for name in ('proxy1', 'proxy2'):
+    proxyFile = tmpdir.join(name)
+    proxyFile.write('proxy')
+    proxies.append(str(proxyFile))
+  getProxyLocation = mocker.patch('DIRAC.Core.DISET.private.ConnectionPool.Locations.getProxyLocation')
+  getProxyLocation.return_value = proxies[0]
+  key1 = pool.generateKey('dips://server:9135/System/Service', '', {})
+  getProxyLocation.return_value = proxies[1]
+  key2 = pool.generateKey('dips://server:9135/System/Service', '', {})
+  assert key1 != key2
+  # The proxy given explicitly is used
+  assert pool.generateKey('dips://server:9135/System/Service', '', {'proxyLocation': proxies[0]})[-1] == key1[-1]
+  assert pool.generateKey('dips://server:9135/System/Service', '', {'useCertificates': True})[-1] is None
+
+
+def test_proxyExpiry(mocker):
+  """ The connections are not reused after the expiry of their proxy
+  """
+  pool = ConnectionPool(idleTimeout=30, maxAge=3600, maxIdlePerKey=10)
+  chain = mocker.patch('DIRAC.Core.DISET.private.ConnectionPool.X509Chain').return_value
+  chain.loadChainFromFile.return_value = S_OK()
+  chain.getNotAfterDate.return_value = S_OK(datetime.datetime.utcfromtimestamp(1000))
+  mockTime = mocker.patch('DIRAC.Core.DISET.private.ConnectionPool.time.time')
+  key = ('dips://server:9135/System/Service', '', (), ('/tmp/proxy', 1, 1))
+  transport = FakeTransport()
+  mockTime.return_value = 0
+  pool.register(transport, key)
+  mockTime.return_value = 900
+  pool.put(key, transport)
+  assert pool.get(key) is transport
+  pool.put(key, transport)
+  mockTime.return_value = 1000 - ConnectionPool.EXPIRY_MARGIN + 1
+  assert pool.get(key) is None
+  assert transport.closed
+  assert chain.loadChainFromFile.call_count == 1
+
+
+def _rpcClient(mocker, proposalReply, response, reused=False):
+  mocker.patch.object(InnerRPCClient, '__init__', return_value=None)
+  client = InnerRPCClient()
+  transport = MagicMock()
+  transport.sendData.return_value = S_OK()
+  transport.receiveData.return_value = response
+  client._connect = MagicMock(return_value=S_OK(('trid', transport)))
+  client._proposeAction = MagicMock(return_value=proposalReply)
+  client._disconnect = MagicMock()
+  client._getBaseStub = MagicMock(return_value=[])
+  mocker.patch.object(InnerRPCClient, '_isReusedConnection', return_value=reused)
+  return client
+
+
+@pytest.mark.parametrize("proposalReply, response, keepConnection", [
+    (S_OK({'keepConnection': True}), S_OK('result'), True),
+    # Old services
+    (S_OK(), S_OK('result'), False),
+    # The error may come from the transport
+    (S_OK({'keepConnection': True}), S_ERROR('Network error'), False),
+])
+def test_rpcKeepConnection(mocker, proposalReply, response, keepConnection):
+  client = _rpcClient(mocker, proposalReply, response)
+  result = client.executeRPC('method', ())
+  assert result['OK'] == response['OK']
+  client._disconnect.assert_called_once_with('trid', keepConnection=keepConnection)
+
+
+def test_rpcReusedConnectionClosed(mocker):
+  client = _rpcClient(mocker, S_ERROR('Peer closed connection'), S_OK('result'), reused=True)
+  client._proposeAction.side_effect = [S_ERROR('Peer closed connection'), S_OK({'keepConnection': True})]
+  result = client.executeRPC('method', ())
+  assert result['OK']
+  assert client._connect.call_count == 2
+  assert client._disconnect.call_args_list[0][1] == {'keepConnection': True}
+  assert client._disconnect.call_args_list[1][1] == {'keepConnection': False}
+
+
+def test_streamingRPCReusedConnectionClosed(mocker):
+  client = _rpcClient(mocker, S_ERROR('Peer closed connection'), S_OK(), reused=True)
+  client._proposeAction.side_effect = [S_ERROR('Peer closed connection'), S_OK()]
+  result = client.executeStreamingRPC('method', ())
+  assert result['OK']
+  assert client._connect.call_count == 2
+  assert list(result['Value']) == []
+  assert client._disconnect.call_count == 2
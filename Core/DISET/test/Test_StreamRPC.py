@@ -0,0 +1,126 @@
+""" Unit tests for the streaming RPC calls
+"""
+# pylint: disable=protected-access, missing-docstring, invalid-name
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+
+
+class StreamingHandler(RequestHandler):
+
+  types_numbers = [int]
+
+  def stream_numbers(self, nChunks):
+    for chunk in range(nChunks):
+      yield S_OK({'Successful': {chunk: chunk}, 'Failed': {}})
+
+  types_failing = [int]
+
+  def stream_failing(self, nChunks):
+    for chunk in range(nChunks):
+      yield S_OK({'Successful': {chunk: chunk}, 'Failed': {}})
+    yield S_ERROR("Stream failure")
+    yield S_OK("Never sent")
+
+
+def _executeStreamAction(method, args):
+  """ Execute a StreamRPC action in a handler with a fake transport pool,
+      and return the list of messages sent to the client
+  """
+  sentMessages = []
+  trPool = MagicMock()
+  trPool.receive.return_value = S_OK(list(args))
+  trPool.send.side_effect = lambda trid, message: sentMessages.append(dict(message)) or S_OK()
+  msgBroker = MagicMock()
+  msgBroker.getTransportPool.return_value = trPool
+  StreamingHandler._rh__initializeClass({'serviceName': 'Test/Streaming', 'csPaths': []},
+                                        MagicMock(), msgBroker, MagicMock())
+  handler = StreamingHandler({}, 1)
+  result = handler._rh_executeAction((('Test/Streaming', 'Setup', 'VO'), ('StreamRPC', method), ''))
+  assert result['OK'], result
+  return sentMessages
+
+
+def test_streamChunks():
+  sentMessages = _executeStreamAction('numbers', (3,))
+  assert len(sentMessages) == 4
+  for chunk, message in enumerate(sentMessages[:3]):
+    assert message['StreamChunk']
+    assert message['Value']['Successful'] == {chunk: chunk}
+  # Final response
+  assert 'StreamChunk' not in sentMessages[-1]
+  assert sentMessages[-1]['Value'] == 3
+
+
+def test_streamErrors():
+  sentMessages = _executeStreamAction('failing', (2,))
+  assert len(sentMessages) == 3
+  assert not sentMessages[-1]['OK']
+  assert sentMessages[-1]['Message'] == "Stream failure"
+
+  sentMessages = _executeStreamAction('numbers', ('wrongType',))
+  assert len(sentMessages) == 1
+  assert not sentMessages[0]['OK']
+
+  sentMessages = _executeStreamAction('unknown', ())
+  assert len(sentMessages) == 1
+  assert 'Unknown streaming method' in sentMessages[0]['Message']
+
+
+def _streamingClient(mocker, receivedMessages):
+  mocker.patch.object(InnerRPCClient, '__init__', return_value=None)
+  client = InnerRPCClient()
+  transport = MagicMock()
+  transport.sendData.return_value = S_OK()
+  transport.receiveData.side_effect = receivedMessages
+  client._connect = MagicMock(return_value=S_OK((1, transport)))
+  client._proposeAction = MagicMock(return_value=S_OK())
+  client._disconnect = MagicMock()
+  client._getBaseStub = MagicMock(return_value=[])
+  return client
+
+
+def test_clientIterator(mocker):
+  chunks = [S_OK({'Successful': {chunk: chunk}, 'Failed': {}}) for chunk in range(3)]
+  for chunk in chunks:
+    chunk['StreamChunk'] = True
+  client = _streamingClient(mocker, chunks + [S_OK(3)])
+
+  result = client.executeStreamingRPC('numbers', (3,))
+  assert result['OK']
+  client._proposeAction.assert_called_once()
+  assert client._proposeAction.call_args[0][1] == ('StreamRPC', 'numbers')
+  # Nothing is received before iterating
+  client._disconnect.assert_not_called()
+  received = list(result['Value'])
+  assert [chunk['Value']['Successful'] for chunk in received] == [{0: 0}, {1: 1}, {2: 2}]
+  assert all(chunk['OK'] and 'StreamChunk' not in chunk for chunk in received)
+  client._disconnect.assert_called_once_with(1)
+
+
+def test_clientIteratorError(mocker):
+  chunk = S_OK({'Successful': {0: 0}, 'Failed': {}})
+  chunk['StreamChunk'] = True
+  client = _streamingClient(mocker, [chunk, S_ERROR("Stream failure")])
+
+  result = client.executeStreamingRPC('failing', (1,))
+  assert result['OK']
+  received = list(result['Value'])
+  assert len(received) == 2
+  assert received[0]['OK']
+  assert not received[1]['OK']
+  assert 'rpcStub' in received[1]
+  client._disconnect.assert_called_once_with(1)
+
+  client = _streamingClient(mocker, [])
+  client._proposeAction.return_value = S_ERROR("Unauthorized query")
+  result = client.executeStreamingRPC('numbers', (1,))
+  assert not result['OK']
+  client._disconnect.assert_called_once_with(1)
@@ -481,28 +481,129 @@ g_dEncodeFunctions[types.DictType] = encodeDict
 g_dDecodeFunctions["d"] = decodeDict
 
 
+# Fast path
+#
+# The functions below produce and read exactly the same format as the functions above,
+# which remain the reference implementation (and are still used when
+# DIRAC_DEBUG_DENCODE_CALLSTACK is set).
+# The containers are dispatched by exact type through their own tables, and the strings,
+# which are most of the leaves of the DISET payloads, are encoded and decoded inline
+# without a function call. Decoding only moves an offset in the buffer, the data is
+# sliced for the leaf values only.
+
+def _fastEncodeDict(dValue, eList):
+  """ Encoding dictionary, strings inline """
+
+  eList.append("d")
+  for key in sorted(dValue):
+    if type(key) is str:
+      eList.extend(('s', str(len(key)), ':', key))
+    else:
+      _fastEncodeFunctions[type(key)](key, eList)
+    value = dValue[key]
+    if type(value) is str:
+      eList.extend(('s', str(len(value)), ':', value))
+    else:
+      _fastEncodeFunctions[type(value)](value, eList)
+  eList.append("e")
+
+
+def _fastEncodeSequence(typeCode):
+  """ Build the encoding function of a list or a tuple, strings inline """
+
+  def encodeSequence(lValue, eList):
+    eList.append(typeCode)
+    for value in lValue:
+      if type(value) is str:
+        eList.extend(('s', str(len(value)), ':', value))
+      else:
+        _fastEncodeFunctions[type(value)](value, eList)
+    eList.append("e")
+
+  return encodeSequence
+
+
+def _fastDecodeDict(data, i):
+  """ Decoding dictionary, strings inline """
+
+  oD = {}
+  i += 1
+  typeCode = data[i]
+  while typeCode != "e":
+    if typeCode == "s":
+      colon = data.index(":", i + 1)
+      i = colon + 1 + int(data[i + 1: colon])
+      key = data[colon + 1: i]
+    else:
+      key, i = _fastDecodeFunctions[typeCode](data, i)
+    typeCode = data[i]
+    if typeCode == "s":
+      colon = data.index(":", i + 1)
+      i = colon + 1 + int(data[i + 1: colon])
+      oD[key] = data[colon + 1: i]
+    else:
+      oD[key], i = _fastDecodeFunctions[typeCode](data, i)
+    typeCode = data[i]
+  return (oD, i + 1)
+
+
+def _fastDecodeList(data, i):
+  """ Decoding list, strings inline """
+
+  oL = []
+  i += 1
+  typeCode = data[i]
+  while typeCode != "e":
+    if typeCode == "s":
+      colon = data.index(":", i + 1)
+      i = colon + 1 + int(data[i + 1: colon])
+      oL.append(data[colon + 1: i])
+    else:
+      ob, i = _fastDecodeFunctions[typeCode](data, i)
+      oL.append(ob)
+    typeCode = data[i]
+  return (oL, i + 1)
+
+
+def _fastDecodeTuple(data, i):
+  """ Decoding tuple, strings inline """
+
+  oL, i = _fastDecodeList(data, i)
+  return (tuple(oL), i)
+
+
+_fastEncodeFunctions = dict(g_dEncodeFunctions)
+_fastEncodeFunctions[types.DictType] = _fastEncodeDict
+_fastEncodeFunctions[types.ListType] = _fastEncodeSequence("l")
+_fastEncodeFunctions[types.TupleType] = _fastEncodeSequence("t")
+
+_fastDecodeFunctions = dict(g_dDecodeFunctions)
+_fastDecodeFunctions["d"] = _fastDecodeDict
+_fastDecodeFunctions["l"] = _fastDecodeList
+_fastDecodeFunctions["t"] = _fastDecodeTuple
+
+
 # Encode function
 def encode(uObject):
   """ Generic encoding function """
 
-  try:
-    eList = []
-    # print "ENCODE FUNCTION : %s" % g_dEncodeFunctions[ type( uObject ) ]
+  eList = []
+  if DIRAC_DEBUG_DENCODE_CALLSTACK:
+    # The type functions print the debugging call stack
     g_dEncodeFunctions[type(uObject)](uObject, eList)
-    return "".join(eList)
-  except Exception:
-    raise
+  else:
+    _fastEncodeFunctions[type(uObject)](uObject, eList)
+  return "".join(eList)
 
 
 def decode(data):
   """ Generic decoding function """
   if not data:
     return data
-  try:
-    # print "DECODE FUNCTION : %s" % g_dDecodeFunctions[ sStream [ iIndex ] ]
+  if DIRAC_DEBUG_DENCODE_CALLSTACK:
+    # The type functions print the debugging call stack
     return g_dDecodeFunctions[data[0]](data, 0)
-  except Exception:
-    raise
+  return _fastDecodeFunctions[data[0]](data, 0)
 
 
 if __name__ == "__main__":
@@ -29,9 +29,11 @@
     Returns S_OK or S_ERROR.
 
 
-    _query( cmd, [conn] )
+    _query( cmd, [conn, args] )
 
     Executes SQL command "cmd".
+    If "args" is given, the values it contains replace the %s placeholders
+    of "cmd" once escaped by the MySQLdb driver.
     Gets a connection from the Queue (or open a new one if none is available),
     the used connection is  back into the Queue.
     If a connection to the the DB is passed as second argument this connection
@@ -39,9 +41,10 @@
     Returns S_OK with fetchall() out in Value or S_ERROR upon failure.
 
 
-    _update( cmd, [conn] )
+    _update( cmd, [conn, args] )
 
     Executes SQL command "cmd" and issue a commit
+    "args" are the parameters of the command, as for _query.
     Gets a connection from the Queue (or open a new one if none is available),
     the used connection is  back into the Queue.
     If a connection to the the DB is passed as second argument this connection
@@ -54,12 +57,20 @@
     Create a new Table in the DB
 
 
-    _getConnection()
+    _getConnection( [retries, checkout] )
 
     Gets a connection from the Queue (or open a new one if none is available)
     Returns S_OK with connection in Value or S_ERROR
     the calling method is responsible for closing this connection once it is no
     longer needed.
+    With checkout=True, the connection can't be given to another thread until
+    _releaseConnection() is called.
+
+    The connections are kept in a pool per server, each thread keeps its own
+    connection. The size of the pool is bounded, it can be configured with the
+    MaxConnections, MinConnections, PingIdleTime and ConnectionWaitTimeout
+    options of the DB (see DIRAC.Core.Base.DB). The counters of the pool are
+    returned by getConnectionPoolStats() and regularly reported to the monitoring.
 
 
 
@@ -80,6 +91,8 @@
       that are requested to be >= or < than the corresponding value.
       For compatibility with current usage it uses Exceptions to exit in case of
       invalid arguments
+      _buildCondition takes the same arguments and returns the condition with %s
+      placeholders and the list of values to give as "args" to _query or _update.
 
 
     insertFields( self, tableName, inFields = None, inValues = None, conn = None, inDict = None ):
@@ -90,6 +103,26 @@
       String type values will be appropriately escaped.
 
 
+    insertMultipleFields( self, tableName, inFields, inValuesList, conn = None, onDuplicateUpdate = None ):
+
+      Insert several rows in "tableName", each element of "inValuesList" being the list
+      of values of a row for the fields "inFields", with as few multi-row INSERT statements
+      as allowed by the max_allowed_packet of the server.
+      If "onDuplicateUpdate" is given (list of fields, or True for all the "inFields"), the rows
+      already existing are updated with the new values of these fields (upsert).
+      String type values will be appropriately escaped.
+      return S_OK( number of affected rows )
+
+
+    updateMultipleFields( self, tableName, updateFields, condFields, valuesList, conn = None ):
+
+      Update "updateFields" from "tableName" for each element of "valuesList", containing the
+      new values of "updateFields" followed by the values of "condFields" selecting the rows to
+      update. The values are given as parameters of a single statement executed for all the
+      elements (executemany), and therefore escaped by the MySQLdb driver.
+      return S_OK( number of updated rows )
+
+
     updateFields( self, tableName, updateFields = None, updateValues = None,
                   condDict = None,
                   limit = False, conn = None,
@@ -160,6 +193,7 @@ from DIRAC import gLogger
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Utilities.Time import fromString
 from DIRAC.Core.Utilities import DErrno
+from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 
 # This is for proper initialization of embedded server, it should only be called once
 try:
@@ -172,6 +206,13 @@ gInstancesCount = 0
 __RCSID__ = "$Id$"
 
 MAXCONNECTRETRY = 10
+# Default parameters of the connection pools, see MySQL.ConnectionPool
+MAXCONNECTIONS = 50
+MINCONNECTIONS = 10
+PINGIDLETIME = 30
+CONNECTIONWAITTIMEOUT = 60
+# Used if the max_allowed_packet of the server can't be obtained
+DEFAULT_MAX_ALLOWED_PACKET = 4 * 1024 * 1024
 
 
 def _checkFields(inFields, inValues):
@@ -211,6 +252,20 @@ def _quotedList(fieldList=None):
   return ', '.join(quotedFields)
 
 
+class _AssignedConnection(object):
+  """ Connection of the ConnectionPool assigned to a thread
+  """
+  __slots__ = ('conn', 'dbName', 'lastUse', 'busy', 'inTransaction')
+
+  def __init__(self, conn, dbName, lastUse):
+    self.conn = conn
+    self.dbName = dbName
+    self.lastUse = lastUse
+    # Number of operations in progress with the connection
+    self.busy = 0
+    self.inTransaction = False
+
+
 class MySQL(object):
   """
   Basic multithreaded DIRAC MySQL Client Class
@@ -220,18 +275,52 @@ class MySQL(object):
   class ConnectionPool(object):
     """
     Management of connections per thread
+
+    Each thread gets its own connection, which stays assigned to it until the thread ends or
+    does not use it for graceTime seconds. It is then kept as spare connection for another
+    thread, at most minConnections spare connections are kept open.
+
+    At most maxConnections connections are open (0 for no limit): when they are all assigned,
+    a thread without connection takes the one of a finished thread or of a thread which has not
+    used it for graceTime seconds, or waits up to waitTimeout seconds for one. A connection
+    can hold session state created with plain SQL (transactions, locks, temporary tables) and
+    be kept by its thread between calls, so the connections of the live threads are never
+    given to another thread before graceTime, and never while in use or in a transaction.
+
+    The connections are only pinged when they have not been used for pingIdleTime seconds.
     """
 
-    def __init__(self, host, user, passwd, port=3306, graceTime=600):
+    # Seconds between two looks for a connection to reclaim while waiting for one
+    RECLAIM_INTERVAL = 2
+    # Minimum number of seconds between two cleanings
+    CLEAN_INTERVAL = 1
+    # Seconds between two reports of the counters to the monitoring
+    REPORT_INTERVAL = 60
+
+    def __init__(self, host, user, passwd, port=3306, graceTime=600,
+                 maxConnections=MAXCONNECTIONS, minConnections=MINCONNECTIONS,
+                 pingIdleTime=PINGIDLETIME, waitTimeout=CONNECTIONWAITTIMEOUT):
       self.__host = host
       self.__user = user
       self.__passwd = passwd
       self.__port = port
       self.__graceTime = graceTime
+      self.__maxConnections = maxConnections
+      self.__minConnections = minConnections
+      self.__pingIdleTime = pingIdleTime
+      self.__waitTimeout = waitTimeout
+      # ( connection, dbName, time of last use )
       self.__spares = collections.deque()
-      self.__maxSpares = 10
       self.__lastClean = 0
+      # { thread : _AssignedConnection }
       self.__assigned = {}
+      # Number of connections being opened
+      self.__opening = 0
+      self.__condition = threading.Condition()
+      self.__stats = dict.fromkeys(('checkouts', 'waits', 'timeouts', 'pings', 'reconnects', 'opened', 'reclaimed'),
+                                   0)
+      self.__reportedStats = dict(self.__stats)
+      self.__lastReport = time.time()
 
     @property
     def __thid(self):
@@ -253,47 +342,67 @@ class MySQL(object):
       cursor.close()
       return res
 
-    def get(self, dbName, retries=10):
+    def get(self, dbName, retries=10, checkout=False):
+      """ Get the connection of the thread
+
+          :param str dbName: DB to select
+          :param int retries: number of retries to connect
+          :param bool checkout: if True, the connection is marked as used until release is called,
+                                it can't be given to another thread meanwhile
+      """
       retries = max(0, min(MAXCONNECTRETRY, retries))
       self.clean()
-      return self.__getWithRetry(dbName, retries, retries)
+      result = self.__getWithRetry(dbName, retries, retries)
+      if result['OK'] and not checkout:
+        self.release()
+      return result
+
+    def release(self):
+      """ Mark the end of the use of the connection of the thread started by get( checkout = True )
+      """
+      with self.__condition:
+        assigned = self.__assigned.get(self.__thid)
+        if assigned and assigned.busy:
+          assigned.busy -= 1
+          assigned.lastUse = time.time()
 
     def __getWithRetry(self, dbName, totalRetries, retriesLeft):
       sleepTime = 5 * (totalRetries - retriesLeft)
       if sleepTime > 0:
         time.sleep(sleepTime)
       try:
-        conn, lastName, thid = self.__innerGet()
+        result = self.__innerGet()
       except MySQLdb.MySQLError as excp:
         if retriesLeft > 0:
           return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
         return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % excp)
+      if not result['OK']:
+        return result
+      assigned, idleTime = result['Value']
+      conn = assigned.conn
 
-      if not self.__ping(conn):
-        try:
-          self.__assigned.pop(thid)
-        except KeyError:
-          pass
+      if idleTime > self.__pingIdleTime and not self.__ping(conn):
+        self.__pop(self.__thid, reuse=False)
+        with self.__condition:
+          self.__stats['reconnects'] += 1
         if retriesLeft > 0:
           return self.__getWithRetry(dbName, totalRetries, retriesLeft)
         return S_ERROR(DErrno.EMYSQL, "Could not connect")
 
-      if lastName != dbName:
+      if assigned.dbName != dbName:
         try:
           conn.select_db(dbName)
         except MySQLdb.MySQLError as excp:
+          self.release()
           if retriesLeft > 0:
             return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
           return S_ERROR(DErrno.EMYSQL, "Could not select db %s: %s" % (dbName, excp))
-        try:
-          self.__assigned[thid][1] = dbName
-        except KeyError:
-          if retriesLeft > 0:
-            return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
-          return S_ERROR(DErrno.EMYSQL, "Could not connect")
+        assigned.dbName = dbName
       return S_OK(conn)
 
     def __ping(self, conn):
+      with self.__condition:
+        self.__stats['pings'] += 1
       try:
         conn.ping(True)
         return True
@@ -301,64 +410,158 @@ class MySQL(object):
         return False
 
     def __innerGet(self):
+      """ Get the connection of the thread, or assign it a spare connection, a new one,
+          the one of an idle thread, or the first one available before waitTimeout.
+          The connection is marked as used.
+
+          :return: S_OK( ( _AssignedConnection, seconds since its last use ) )
+      """
       thid = self.__thid
-      now = time.time()
-      if thid in self.__assigned:
-        data = self.__assigned[thid]
-        conn = data[0]
-        data[2] = now
-        return data[0], data[1], thid
-      # Not cached
+      deadline = None
+      with self.__condition:
+        self.__stats['checkouts'] += 1
+        while True:
+          now = time.time()
+          assigned = self.__assigned.get(thid)
+          if not assigned and self.__spares:
+            assigned = _AssignedConnection(*self.__spares.pop())
+          if not assigned:
+            assigned = self.__reclaim(now)
+          if assigned:
+            idleTime = now - assigned.lastUse
+            assigned.lastUse = now
+            assigned.busy += 1
+            self.__assigned[thid] = assigned
+            return S_OK((assigned, idleTime))
+          if not self.__maxConnections or self.__getNumberOfConnections() < self.__maxConnections:
+            self.__opening += 1
+            break
+          # All the connections are in use
+          if deadline is None:
+            self.__stats['waits'] += 1
+            deadline = now + self.__waitTimeout
+          if now >= deadline:
+            self.__stats['timeouts'] += 1
+            return S_ERROR(DErrno.EMYSQL, "Timeout waiting for one of the %s connections to %s" %
+                           (self.__maxConnections, self.__host))
+          # Wake up regularly, the connections of the finished or idle threads can be reclaimed
+          self.__condition.wait(min(deadline - now, self.RECLAIM_INTERVAL))
+
       try:
-        conn, dbName = self.__spares.pop()
-      except IndexError:
         conn = self.__newConn()
-        dbName = ""
-
-      self.__assigned[thid] = [conn, dbName, now]
-      return conn, dbName, thid
-
-    def __pop(self, thid):
+      except BaseException:
+        with self.__condition:
+          self.__opening -= 1
+          self.__condition.notify()
+        raise
+      with self.__condition:
+        self.__opening -= 1
+        self.__stats['opened'] += 1
+        assigned = _AssignedConnection(conn, "", time.time())
+        assigned.busy = 1
+        self.__assigned[thid] = assigned
+      return S_OK((assigned, 0))
+
+    def __getNumberOfConnections(self):
+      return len(self.__assigned) + len(self.__spares) + self.__opening
+
+    def __reclaim(self, now):
+      """ Take the connection of a finished thread or of the thread that has not used its
+          connection for the longest time (more than graceTime seconds), must be called with the lock
+      """
+      candidates = [(0, thid) if not thid.isAlive() else (assigned.lastUse, thid)
+                    for thid, assigned in self.__assigned.items()
+                    if not thid.isAlive() or not (assigned.busy or assigned.inTransaction)]
+      candidates = [candidate for candidate in candidates if now - candidate[0] > self.__graceTime]
+      if not candidates:
+        return None
+      _lastUse, thid = min(candidates, key=lambda candidate: candidate[0])
+      self.__stats['reclaimed'] += 1
+      return self.__assigned.pop(thid)
+
+    def __pop(self, thid, reuse=True):
+      with self.__condition:
+        data = self.__assigned.pop(thid, None)
+        if not data:
+          return
+        if reuse and len(self.__spares) < self.__minConnections:
+          self.__spares.append((data.conn, data.dbName, data.lastUse))
+          self.__condition.notify()
+          return
+        self.__condition.notify()
       try:
-        data = self.__assigned.pop(thid)
-        if len(self.__spares) < self.__maxSpares:
-          self.__spares.append((data[0], data[1]))
-        else:
-          try:
-            data[0].close()
-          except MySQLdb.ProgrammingError as exc:
-            gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
-          except BaseException as exc:
-            gLogger.warn("Exception while closing MySQL connection: %s" % exc)
-      except KeyError:
-        pass
+        data.conn.close()
+      except MySQLdb.ProgrammingError as exc:
+        gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
+      except BaseException as exc:
+        gLogger.warn("Exception while closing MySQL connection: %s" % exc)
 
     def clean(self, now=False):
       if not now:
         now = time.time()
+      if now - self.__lastClean < self.CLEAN_INTERVAL:
+        return
       self.__lastClean = now
-      for thid in list(self.__assigned):
-        if not thid.isAlive():
-          self.__pop(thid)
-        try:
-          data = self.__assigned[thid]
-        except KeyError:
-          continue
-        if now - data[2] > self.__graceTime:
-          self.__pop(thid)
+      with self.__condition:
+        toPop = [thid for thid, data in self.__assigned.items()
+                 if not thid.isAlive() or (now - data.lastUse > self.__graceTime and
+                                           not data.busy and not data.inTransaction)]
+      for thid in toPop:
+        self.__pop(thid)
+      if now - self.__lastReport > self.REPORT_INTERVAL:
+        self.__reportStats(now)
+
+    def getStats(self):
+      """ Get the counters of the pool, and the current number of connections
+
+          :return: dict
+      """
+      with self.__condition:
+        stats = dict(self.__stats)
+        stats['open'] = self.__getNumberOfConnections()
+        stats['busy'] = len([data for data in self.__assigned.values() if data.busy or data.inTransaction])
+        stats['spare'] = len(self.__spares)
+      return stats
+
+    def __reportStats(self, now):
+      """ Report the evolution of the counters through the monitoring activities of the component
+      """
+      self.__lastReport = now
+      stats = self.getStats()
+      for name, description, operation in (('checkouts', 'MySQL connection checkouts', gMonitor.OP_SUM),
+                                           ('waits', 'Waits for a MySQL connection', gMonitor.OP_SUM),
+                                           ('pings', 'MySQL connection pings', gMonitor.OP_SUM),
+                                           ('reconnects', 'MySQL reconnections', gMonitor.OP_SUM),
+                                           ('open', 'Open MySQL connections', gMonitor.OP_MEAN)):
+        activity = "MySQL%s" % name.capitalize()
+        gMonitor.registerActivity(activity, description, "MySQL", name.capitalize(), operation)
+        if operation == gMonitor.OP_MEAN:
+          gMonitor.addMark(activity, stats[name])
+        else:
+          gMonitor.addMark(activity, stats[name] - self.__reportedStats[name])
+          self.__reportedStats[name] = stats[name]
 
-    def transactionStart(self, dbName):
+    def __setTransaction(self, dbName, inTransaction):
       result = self.get(dbName)
+      if not result['OK']:
+        return result
+      with self.__condition:
+        self.__assigned[self.__thid].inTransaction = inTransaction
+      return result
+
+    def transactionStart(self, dbName):
+      result = self.__setTransaction(dbName, True)
       if not result['OK']:
         return result
       conn = result['Value']
       try:
         return S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
       except MySQLdb.MySQLError as excp:
+        self.__setTransaction(dbName, False)
         return S_ERROR(DErrno.EMYSQL, "Could not begin transaction: %s" % excp)
 
     def transactionCommit(self, dbName):
-      result = self.get(dbName)
+      result = self.__setTransaction(dbName, False)
       if not result['OK']:
         return result
       conn = result['Value']
@@ -369,7 +572,7 @@ class MySQL(object):
         return S_ERROR(DErrno.EMYSQL, "Could not commit transaction: %s" % excp)
 
     def transactionRollback(self, dbName):
-      result = self.get(dbName)
+      result = self.__setTransaction(dbName, False)
       if not result['OK']:
         return result
       conn = result['Value']
@@ -381,11 +584,15 @@ class MySQL(object):
 
   __connectionPools = {}
 
-  def __init__(self, hostName='localhost', userName='dirac', passwd='dirac', dbName='', port=3306, debug=False):
+  def __init__(self, hostName='localhost', userName='dirac', passwd='dirac', dbName='', port=3306, debug=False,
+               connectionPoolOptions=None):
     """
     set MySQL connection parameters and try to connect
 
     :param debug: unused
+    :param dict connectionPoolOptions: arguments of the ConnectionPool (maxConnections, minConnections,
+                                       pingIdleTime, waitTimeout), only used by the first instance
+                                       connecting to a server
     """
     global gInstancesCount
     gInstancesCount += 1
@@ -407,8 +614,9 @@ class MySQL(object):
     self.__port = port
     cKey = (self.__hostName, self.__userName, self.__passwd, self.__port)
     if cKey not in MySQL.__connectionPools:
-      MySQL.__connectionPools[cKey] = MySQL.ConnectionPool(*cKey)
+      MySQL.__connectionPools[cKey] = MySQL.ConnectionPool(*cKey, **(connectionPoolOptions or {}))
     self.__connectionPool = MySQL.__connectionPools[cKey]
+    self.__maxAllowedPacket = None
 
     self.__initialized = True
     result = self._connect()
@@ -451,17 +659,18 @@ class MySQL(object):
     except BaseException:
       return False
 
-  def __escapeString(self, myString):
+  def __escapeString(self, myString, connection=None):
     """
     To be used for escaping any MySQL string before passing it to the DB
     this should prevent passing non-MySQL accepted characters to the DB
     It also includes quotation marks " around the given string
     """
 
-    retDict = self._getConnection()
-    if not retDict['OK']:
-      return retDict
-    connection = retDict['Value']
+    if not connection:
+      retDict = self._getConnection()
+      if not retDict['OK']:
+        return retDict
+      connection = retDict['Value']
 
     try:
       myString = str(myString)
@@ -534,16 +743,22 @@ class MySQL(object):
     if not inValues:
       return S_OK(inEscapeValues)
 
+    # Getting a connection pings the server, it is done only once for all the values
+    retDict = self._getConnection()
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
     for value in inValues:
       if isinstance(value, six.string_types):
-        retDict = self.__escapeString(value)
+        retDict = self.__escapeString(value, connection)
         if not retDict['OK']:
           return retDict
         inEscapeValues.append(retDict['Value'])
       elif isinstance(value, (tuple, list)):
         tupleValues = []
         for val in value:
-          retDict = self.__escapeString(val)
+          retDict = self.__escapeString(val, connection)
           if not retDict['OK']:
             return retDict
           tupleValues.append(retDict['Value'])
@@ -551,7 +766,7 @@ class MySQL(object):
       elif isinstance(value, bool):
         inEscapeValues = [str(value)]
       else:
-        retDict = self.__escapeString(str(value))
+        retDict = self.__escapeString(str(value), connection)
         if not retDict['OK']:
           return retDict
         inEscapeValues.append(retDict['Value'])
@@ -584,11 +799,13 @@ class MySQL(object):
     self._connected = True
     return S_OK()
 
-  def _query(self, cmd, conn=None, debug=False):
+  def _query(self, cmd, conn=None, debug=False, args=None):
     """
     execute MySQL query command
 
     :param debug: unused
+    :param args: parameters of the command, replacing its %s placeholders once escaped by the driver
+                 (the "%" characters of the command have then to be doubled)
 
     return S_OK structure with fetchall result as tuple
     it returns an empty tuple if no matching rows are found
@@ -597,14 +814,14 @@ class MySQL(object):
 
     # self.logger.debug('_query: %s' % self._safeCmd(cmd))
 
-    retDict = self._getConnection()
+    retDict = self._getConnection(checkout=True)
     if not retDict['OK']:
       return retDict
     connection = retDict['Value']
 
     try:
       cursor = connection.cursor()
-      if cursor.execute(cmd):
+      if cursor.execute(cmd, args):
         res = cursor.fetchall()
       else:
         res = ()
@@ -625,13 +842,16 @@ class MySQL(object):
       cursor.close()
     except BaseException:
       pass
+    self._releaseConnection()
 
     return retDict
 
-  def _update(self, cmd, conn=None, debug=False):
+  def _update(self, cmd, conn=None, debug=False, args=None):
     """ execute MySQL update command
 
         :param debug: unused
+        :param args: parameters of the command, replacing its %s placeholders once escaped by the driver
+                     (the "%" characters of the command have then to be doubled)
 
         return S_OK with number of updated registers upon success
         return S_ERROR upon error
@@ -639,14 +859,14 @@ class MySQL(object):
 
     # self.logger.debug('_update: %s' % self._safeCmd(cmd))
 
-    retDict = self._getConnection()
+    retDict = self._getConnection(checkout=True)
     if not retDict['OK']:
       return retDict
     connection = retDict['Value']
 
     try:
       cursor = connection.cursor()
-      res = cursor.execute(cmd)
+      res = cursor.execute(cmd, args)
       retDict = S_OK(res)
       if cursor.lastrowid:
         retDict['lastRowId'] = cursor.lastrowid
@@ -658,6 +878,7 @@ class MySQL(object):
       cursor.close()
     except Exception:
       pass
+    self._releaseConnection()
 
     return retDict
 
@@ -676,7 +897,7 @@ class MySQL(object):
     # # get connection
     connection = conn
     if not connection:
-      retDict = self._getConnection()
+      retDict = self._getConnection(checkout=True)
       if not retDict['OK']:
         return retDict
       connection = retDict['Value']
@@ -688,15 +909,64 @@ class MySQL(object):
       for cmd in cmdList:
         cmdRet.append((cmd, cursor.execute(cmd)))
       connection.commit()
+      # # close cursor
+      cursor.close()
     except Exception as error:
       self.logger.exception(error)
-      # # rollback, put back connection to the pool
+      # # rollback
       connection.rollback()
       return S_ERROR(DErrno.EMYSQL, error)
-    # # close cursor, put back connection to the pool
-    cursor.close()
+    finally:
+      # # put back connection to the pool
+      if not conn:
+        self._releaseConnection()
     return S_OK(cmdRet)
 
+  def _updatemany(self, cmd, argsList, conn=None):
+    """ execute the same MySQL update command for several sets of parameters
+
+        :param str cmd: command with one %s placeholder per parameter, the parameters are escaped
+                        by the driver and must not be quoted in the command
+        :param list argsList: list of tuples of parameters
+
+        return S_OK with number of updated registers upon success
+        return S_ERROR upon error
+    """
+    if not argsList:
+      return S_OK(0)
+
+    retDict = self._getConnection(checkout=True)
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
+    try:
+      cursor = connection.cursor()
+      retDict = S_OK(cursor.executemany(cmd, argsList))
+    except Exception as x:
+      retDict = self._except('_updatemany', x, 'Execution failed.')
+
+    try:
+      cursor.close()
+    except Exception:
+      pass
+    self._releaseConnection()
+
+    return retDict
+
+  def _getMaxAllowedPacket(self):
+    """ Get the maximum size of a statement accepted by the server, queried only once
+    """
+    if not self.__maxAllowedPacket:
+      result = self._query("SELECT @@max_allowed_packet")
+      if result['OK'] and result['Value']:
+        self.__maxAllowedPacket = int(result['Value'][0][0])
+      else:
+        self.log.warn("Cannot get max_allowed_packet, using the default",
+                      result.get('Message', DEFAULT_MAX_ALLOWED_PACKET))
+        return DEFAULT_MAX_ALLOWED_PACKET
+    return self.__maxAllowedPacket
+
   def _createViews(self, viewsDict, force=False):
     """ create view based on query
 
@@ -930,7 +1200,7 @@ class MySQL(object):
     """
     return param[0].tostring()
 
-  def _getConnection(self, retries=MAXCONNECTRETRY):
+  def _getConnection(self, retries=MAXCONNECTRETRY, checkout=False):
     """ Return  a new connection to the DB,
 
         Try the Queue, if it is empty add a newConnection to the Queue and retry
@@ -938,6 +1208,8 @@ class MySQL(object):
         an error if it fails.
 
         :param int retries: Number of time it will retry to open a connection
+        :param bool checkout: if True, the connection is reserved for the thread until
+                              _releaseConnection is called
     """
     # self.log.debug('_getConnection:')
 
@@ -946,7 +1218,19 @@ class MySQL(object):
       gLogger.error(error)
       return S_ERROR(DErrno.EMYSQL, error)
 
-    return self.__connectionPool.get(self.__dbName, retries)
+    return self.__connectionPool.get(self.__dbName, retries, checkout=checkout)
+
+  def _releaseConnection(self):
+    """ End the use of the connection obtained with _getConnection( checkout = True )
+    """
+    self.__connectionPool.release()
+
+  def getConnectionPoolStats(self):
+    """ Get the counters of the pool of connections to the server of the DB
+
+        :return: dict
+    """
+    return self.__connectionPool.getStats()
 
 ########################################################################################
 #
@@ -1077,8 +1361,57 @@ class MySQL(object):
         For compatibility with current usage it uses Exceptions to exit in case of
         invalid arguments
     """
+    condition, args = self._buildCondition(condDict=condDict, older=older, newer=newer,
+                                           timeStamp=timeStamp, orderAttribute=orderAttribute, limit=limit,
+                                           greater=greater, smaller=smaller, offset=offset)
+    if not args:
+      return condition % ()
+
+    # All the values are escaped with a single connection
+    retDict = self._getConnection()
+    if not retDict['OK']:
+      raise Exception(retDict['Message'])
+    connection = retDict['Value']
+    return condition % tuple(connection.literal(arg) for arg in args)
+
+  def __conditionValue(self, value):
+    """ Get the SQL placeholders and the parameters for a value of a condition,
+        the time functions accepted by __escapeString are kept in the statement
+    """
+    if isinstance(value, six.string_types):
+      if value.strip() == 'UTC_TIMESTAMP()':
+        return 'UTC_TIMESTAMP()', []
+      if value.strip().startswith(('TIMESTAMPDIFF(', 'TIMESTAMPADD(')):
+        retDict = self.__escapeString(value)
+        if not retDict['OK']:
+          raise Exception(retDict['Message'])
+        return retDict['Value'].replace('%', '%%'), []
+      return '%s', [value]
+    if isinstance(value, bool):
+      return '%s', [value]
+    if isinstance(value, (tuple, list)):
+      placeholders = []
+      args = []
+      for val in value:
+        valPlaceholder, valArgs = self.__conditionValue(val)
+        placeholders.append(valPlaceholder)
+        args.extend(valArgs)
+      return '(' + ', '.join(placeholders) + ')', args
+    # As for the escaped values, other types are compared as strings
+    return '%s', [str(value)]
+
+  def _buildCondition(self, condDict=None, older=None, newer=None,
+                      timeStamp=None, orderAttribute=None, limit=False,
+                      greater=None, smaller=None, offset=None):
+    """ Same as buildCondition, but the values are not escaped and included in the statement:
+        they are replaced by %s placeholders, to be given to _query or _update as parameters.
+        The "%" characters of the condition are doubled.
+
+        :return: tuple ( condition, list of parameters )
+    """
     condition = ''
     conjunction = "WHERE"
+    args = []
 
     if condDict is not None:
       for aName, attrValue in condDict.iteritems():
@@ -1090,31 +1423,26 @@ class MySQL(object):
           error = 'Invalid condDict argument'
           # self.log.debug('buildCondition:', error)
           raise Exception(error)
+        attrName = attrName.replace('%', '%%')
         if isinstance(attrValue, list):
-          retDict = self._escapeValues(attrValue)
-          if not retDict['OK']:
-            # self.log.debug('buildCondition:', retDict['Message'])
-            raise Exception(retDict['Message'])
-          else:
-            escapeInValues = retDict['Value']
-            multiValue = ', '.join(escapeInValues)
-            condition = ' %s %s %s IN ( %s )' % (condition,
-                                                 conjunction,
-                                                 attrName,
-                                                 multiValue)
-            conjunction = "AND"
+          placeholders = []
+          for value in attrValue:
+            placeholder, valueArgs = self.__conditionValue(value)
+            placeholders.append(placeholder)
+            args.extend(valueArgs)
+          condition = ' %s %s %s IN ( %s )' % (condition,
+                                               conjunction,
+                                               attrName,
+                                               ', '.join(placeholders))
+          conjunction = "AND"
         else:
-          retDict = self._escapeValues([attrValue])
-          if not retDict['OK']:
-            # self.log.debug('buildCondition:', retDict['Message'])
-            raise Exception(retDict['Message'])
-          else:
-            escapeInValue = retDict['Value'][0]
-            condition = ' %s %s %s = %s' % (condition,
-                                            conjunction,
-                                            attrName,
-                                            escapeInValue)
-            conjunction = "AND"
+          placeholder, valueArgs = self.__conditionValue(attrValue)
+          args.extend(valueArgs)
+          condition = ' %s %s %s = %s' % (condition,
+                                          conjunction,
+                                          attrName,
+                                          placeholder)
+          conjunction = "AND"
 
     if timeStamp:
       timeStamp = _quotedList([timeStamp])
@@ -1122,69 +1450,41 @@ class MySQL(object):
         error = 'Invalid timeStamp argument'
         # self.log.debug('buildCondition:', error)
         raise Exception(error)
+      timeStamp = timeStamp.replace('%', '%%')
       if newer:
-        retDict = self._escapeValues([newer])
-        if not retDict['OK']:
-          # self.log.debug('buildCondition:', retDict['Message'])
-          raise Exception(retDict['Message'])
-        else:
-          escapeInValue = retDict['Value'][0]
-          condition = ' %s %s %s >= %s' % (condition,
-                                           conjunction,
-                                           timeStamp,
-                                           escapeInValue)
-          conjunction = "AND"
+        placeholder, valueArgs = self.__conditionValue(newer)
+        args.extend(valueArgs)
+        condition = ' %s %s %s >= %s' % (condition,
+                                         conjunction,
+                                         timeStamp,
+                                         placeholder)
+        conjunction = "AND"
       if older:
-        retDict = self._escapeValues([older])
-        if not retDict['OK']:
-          # self.log.debug('buildCondition:', retDict['Message'])
-          raise Exception(retDict['Message'])
-        else:
-          escapeInValue = retDict['Value'][0]
-          condition = ' %s %s %s < %s' % (condition,
-                                          conjunction,
-                                          timeStamp,
-                                          escapeInValue)
-
-    if isinstance(greater, dict):
-      for attrName, attrValue in greater.iteritems():
-        attrName = _quotedList([attrName])
-        if not attrName:
-          error = 'Invalid greater argument'
-          # self.log.debug('buildCondition:', error)
-          raise Exception(error)
-
-        retDict = self._escapeValues([attrValue])
-        if not retDict['OK']:
-          # self.log.debug('buildCondition:', retDict['Message'])
-          raise Exception(retDict['Message'])
-        else:
-          escapeInValue = retDict['Value'][0]
-          condition = ' %s %s %s >= %s' % (condition,
-                                           conjunction,
-                                           attrName,
-                                           escapeInValue)
-          conjunction = "AND"
-
-    if isinstance(smaller, dict):
-      for attrName, attrValue in smaller.iteritems():
+        placeholder, valueArgs = self.__conditionValue(older)
+        args.extend(valueArgs)
+        condition = ' %s %s %s < %s' % (condition,
+                                        conjunction,
+                                        timeStamp,
+                                        placeholder)
+
+    for attrDict, operator in ((greater, '>='), (smaller, '<')):
+      if not isinstance(attrDict, dict):
+        continue
+      for attrName, attrValue in attrDict.iteritems():
         attrName = _quotedList([attrName])
         if not attrName:
-          error = 'Invalid smaller argument'
+          error = 'Invalid %s argument' % ('greater' if operator == '>=' else 'smaller')
           # self.log.debug('buildCondition:', error)
           raise Exception(error)
 
-        retDict = self._escapeValues([attrValue])
-        if not retDict['OK']:
-          # self.log.debug('buildCondition:', retDict['Message'])
-          raise Exception(retDict['Message'])
-        else:
-          escapeInValue = retDict['Value'][0]
-          condition = ' %s %s %s < %s' % (condition,
-                                          conjunction,
-                                          attrName,
-                                          escapeInValue)
-          conjunction = "AND"
+        placeholder, valueArgs = self.__conditionValue(attrValue)
+        args.extend(valueArgs)
+        condition = ' %s %s %s %s %s' % (condition,
+                                         conjunction,
+                                         attrName.replace('%', '%%'),
+                                         operator,
+                                         placeholder)
+        conjunction = "AND"
 
     orderList = []
     orderAttrList = orderAttribute
@@ -1216,7 +1516,7 @@ class MySQL(object):
         orderList.append(orderAttr)
 
     if orderList:
-      condition = "%s ORDER BY %s" % (condition, ', '.join(orderList))
+      condition = "%s ORDER BY %s" % (condition, ', '.join(orderList).replace('%', '%%'))
 
     if limit:
       if offset:
@@ -1224,7 +1524,7 @@ class MySQL(object):
       else:
         condition = "%s LIMIT %d" % (condition, limit)
 
-    return condition
+    return condition, args
 
 #############################################################################
   def getFields(self, tableName, outFields=None,
@@ -1267,14 +1567,16 @@ class MySQL(object):
       except TypeError:
         mylimit = limit
         myoffset = None
-      condition = self.buildCondition(condDict=condDict, older=older, newer=newer,
-                                      timeStamp=timeStamp, orderAttribute=orderAttribute, limit=mylimit,
-                                      greater=greater, smaller=smaller, offset=myoffset)
+      condition, args = self._buildCondition(condDict=condDict, older=older, newer=newer,
+                                             timeStamp=timeStamp, orderAttribute=orderAttribute, limit=mylimit,
+                                             greater=greater, smaller=smaller, offset=myoffset)
     except Exception as x:
       return S_ERROR(DErrno.EMYSQL, x)
 
+    # The values of the condition are given as parameters, escaped by the driver
     return self._query('SELECT %s FROM %s %s' %
-                       (quotedOutFields, table, condition), conn)
+                       (quotedOutFields.replace('%', '%%'), table.replace('%', '%%'), condition), conn,
+                       args=args)
 
 #############################################################################
   def deleteEntries(self, tableName,
@@ -1432,8 +1734,100 @@ class MySQL(object):
     return self._update('INSERT INTO %s %s VALUES %s' %
                         (table, inFieldString, inValueString), conn)
 
+#############################################################################
+  def insertMultipleFields(self, tableName, inFields, inValuesList, conn=None, onDuplicateUpdate=None):
+    """
+      Insert several rows in "tableName", each element of "inValuesList" being the list
+      of values of a row for the fields "inFields". The rows are sent in multi-row INSERT
+      statements, split to remain below the max_allowed_packet of the server.
+      If "onDuplicateUpdate" is given (list of fields, or True for all the "inFields"), the rows
+      already existing are updated with the new values of these fields.
+      String type values will be appropriately escaped.
+
+      return S_OK( number of affected rows ), note that MySQL counts 2 for each updated row
+    """
+    if not inValuesList:
+      return S_OK(0)
+
+    table = _quotedList([tableName])
+    if not table:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid tableName argument')
+
+    inFieldString = _quotedList(inFields)
+    if inFieldString is None:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid inFields arguments')
+
+    cmd = 'INSERT INTO %s ( %s ) VALUES ' % (table, inFieldString)
+    suffix = ''
+    if onDuplicateUpdate:
+      if onDuplicateUpdate is True:
+        onDuplicateUpdate = inFields
+      if _quotedList(onDuplicateUpdate) is None:
+        return S_ERROR(DErrno.EMYSQL, 'Invalid onDuplicateUpdate arguments')
+      suffix = ' ON DUPLICATE KEY UPDATE %s' % ', '.join('{0} = VALUES({0})'.format(_quotedList([field]))
+                                                         for field in onDuplicateUpdate)
+
+    rowStrings = []
+    for inValues in inValuesList:
+      retDict = _checkFields(inFields, inValues)
+      if not retDict['OK']:
+        return retDict
+      retDict = self._escapeValues(inValues)
+      if not retDict['OK']:
+        return retDict
+      rowStrings.append('( %s )' % ', '.join(retDict['Value']))
+
+    # Keep some margin for the protocol overhead
+    maxLength = int(self._getMaxAllowedPacket() * 0.9) - len(cmd) - len(suffix)
+    chunks = [[]]
+    chunkLength = 0
+    for rowString in rowStrings:
+      if chunks[-1] and chunkLength + len(rowString) + 1 > maxLength:
+        chunks.append([])
+        chunkLength = 0
+      chunks[-1].append(rowString)
+      chunkLength += len(rowString) + 1
+
+    affected = 0
+    for chunk in chunks:
+      retDict = self._update(cmd + ','.join(chunk) + suffix, conn)
+      if not retDict['OK']:
+        return retDict
+      affected += retDict['Value']
+
+    return S_OK(affected)
+
+#############################################################################
+  def updateMultipleFields(self, tableName, updateFields, condFields, valuesList, conn=None):
+    """
+      Update "updateFields" from "tableName" for each element of "valuesList", which contains
+      the new values of "updateFields" followed by the values of "condFields" identifying the
+      rows to update. A single statement is executed for all the elements, the values are
+      escaped by the driver.
+
+      return S_OK( number of updated rows )
+    """
+    if not valuesList:
+      return S_OK(0)
+
+    table = _quotedList([tableName])
+    if not table:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid tableName argument')
+
+    if not updateFields or _quotedList(updateFields) is None or _quotedList(condFields) is None:
+      return S_ERROR(DErrno.EMYSQL, 'Invalid updateFields or condFields arguments')
+
+    nFields = len(updateFields) + len(condFields)
+    if any(len(values) != nFields for values in valuesList):
+      return S_ERROR(DErrno.EMYSQL, 'Mismatch between fields and values.')
+
+    cmd = 'UPDATE %s SET %s WHERE %s' % (table,
+                                         ', '.join('%s = %%s' % _quotedList([field]) for field in updateFields),
+                                         ' AND '.join('%s = %%s' % _quotedList([field]) for field in condFields))
+    return self._updatemany(cmd, [tuple(values) for values in valuesList], conn)
+
   def executeStoredProcedure(self, packageName, parameters, outputIds):
-    conDict = self._getConnection()
+    conDict = self._getConnection(checkout=True)
     if not conDict['OK']:
       return conDict
 
@@ -1455,11 +1849,12 @@ class MySQL(object):
       cursor.close()
     except Exception:
       pass
+    self._releaseConnection()
     return retDict
 
   # For the procedures that execute a select without storing the result
   def executeStoredProcedureWithCursor(self, packageName, parameters):
-    conDict = self._getConnection()
+    conDict = self._getConnection(checkout=True)
     if not conDict['OK']:
       return conDict
 
@@ -1479,5 +1874,6 @@ class MySQL(object):
       cursor.close()
     except Exception:
       pass
+    self._releaseConnection()
 
     return retDict
@@ -16,13 +16,14 @@ import datetime
 import sys
 
 
-from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
+from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions, \
+    g_dDecodeFunctions
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
 from DIRAC.Core.Utilities.MixedEncode import encode as mixEncode, decode as mixDecode
 
 from hypothesis import given, settings, HealthCheck
 from hypothesis.strategies import builds, integers, lists, recursive, floats, text,\
-    booleans, none, dictionaries, tuples, datetimes
+    booleans, none, dictionaries, tuples, datetimes, binary
 
 from pytest import mark, approx, raises, fixture
 parametrize = mark.parametrize
@@ -90,6 +91,14 @@ nestedStrategyJson = recursive(
         text(),
         x))
 
+# Byte strings are most of the leaves of the DISET payloads, and are handled
+# separately by the DEncode fast path
+nestedStrategyDiset = recursive(
+    initialStrategies | binary() | floats(allow_nan=False),
+    lambda x: lists(x) | dictionaries(
+        binary() | integers(),
+        x) | tuples(x))
+
 
 def test_everyBaseTypeIsTested():
   """ Make sure that each supported base type in the original
@@ -234,6 +243,21 @@ def test_nestedStructure(enc_dec_without_json, data):
   agnosticTestFunction(enc_dec_without_json, data)
 
 
+@settings(suppress_health_check=(HealthCheck.too_slow,))
+@given(data=nestedStrategyDiset)
+def test_disetFastPathEquivalence(data):
+  """ The DEncode encode and decode functions must produce and read exactly
+      the same data as the per type reference functions
+  """
+  eList = []
+  g_dEncodeFunctions[type(data)](data, eList)
+  referenceData = ''.join(eList)
+
+  encodedData = disetEncode(data)
+  assert encodedData == referenceData
+  assert disetDecode(encodedData) == g_dDecodeFunctions[referenceData[0]](referenceData, 0)
+
+
 # DEncode raises KeyError.....
 # Others raise TypeError
 # @parametrize('enc_dec', enc_dec_imp)
@@ -0,0 +1,113 @@
+""" Unit tests for the conditions built by the MySQL class and its pool of connections
+"""
+# pylint: disable=protected-access, missing-docstring
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+
+@pytest.fixture
+def mysqlDB(mocker):
+  mocker.patch.object(MySQL, '__init__', return_value=None)
+  db = MySQL()
+  connection = MagicMock()
+  connection.literal.side_effect = lambda value: "'%s'" % value
+  db._getConnection = MagicMock(return_value=S_OK(connection))
+  return db
+
+
+def test_buildConditionParameters(mysqlDB):
+  condition, args = mysqlDB._buildCondition(condDict={'Status': ['Done', 'Failed'], 'Site': 'LCG.CERN.cern'},
+                                            older='UTC_TIMESTAMP()', timeStamp='LastUpdate',
+                                            orderAttribute='JobID:DESC', limit=10)
+  assert 'IN ( %s, %s )' in condition
+  assert '`Site` = %s' in condition
+  # The time functions are kept in the condition
+  assert '`LastUpdate` < UTC_TIMESTAMP()' in condition
+  assert condition.endswith('ORDER BY `JobID` DESC LIMIT 10')
+  assert sorted(args) == ['Done', 'Failed', 'LCG.CERN.cern']
+  assert not mysqlDB._getConnection.called
+
+
+def test_buildCondition(mysqlDB):
+  condition = mysqlDB.buildCondition(condDict={'JobID': [1, 2]}, greater={'Count': 5}, orderAttribute='100%')
+  assert condition == "   WHERE `JobID` IN ( '1', '2' ) AND `Count` >= '5' ORDER BY 100%"
+  # A single connection is used to escape all the values
+  assert mysqlDB._getConnection.call_count == 1
+
+
+def test_buildConditionError(mysqlDB):
+  with pytest.raises(Exception):
+    mysqlDB.buildCondition(orderAttribute='JobID:SIDEWAYS')
+
+
+@pytest.fixture
+def connectionPool(mocker):
+  mocker.patch.object(MySQL.ConnectionPool, '_ConnectionPool__newConn', side_effect=lambda: MagicMock())
+  pool = MySQL.ConnectionPool('host', 'user', 'passwd', graceTime=0.1, maxConnections=1, minConnections=1,
+                              pingIdleTime=30, waitTimeout=0.5)
+  pool.RECLAIM_INTERVAL = 0.05
+  return pool
+
+
+def _getInThread(pool, checkout=False):
+  results = []
+  thread = threading.Thread(target=lambda: results.append(pool.get('DB', checkout=checkout)))
+  thread.start()
+  thread.join()
+  return results[0]
+
+
+def test_connectionAffinity(connectionPool):
+  conn = connectionPool.get('DB')['Value']
+  assert connectionPool.get('DB')['Value'] is conn
+  conn.select_db.assert_called_once_with('DB')
+  # Not used by the thread for graceTime, it can be given to another one
+  assert _getInThread(connectionPool)['Value'] is conn
+  stats = connectionPool.getStats()
+  assert stats['open'] == 1 and stats['opened'] == 1 and stats['reclaimed'] == 1
+
+
+def test_connectionSession(connectionPool):
+  connectionPool._ConnectionPool__graceTime = 600
+  conn = connectionPool.get('DB')['Value']
+  # The thread may still use the session of its connection, it is kept for it
+  assert not _getInThread(connectionPool)['OK']
+  assert connectionPool.get('DB')['Value'] is conn
+  # The connection of a finished thread is reclaimed right away
+  connectionPool._ConnectionPool__pop(threading.current_thread())
+  conn = _getInThread(connectionPool)['Value']
+  assert connectionPool.get('DB')['Value'] is conn
+
+
+def test_connectionBound(connectionPool):
+  conn = connectionPool.get('DB', checkout=True)['Value']
+  result = _getInThread(connectionPool)
+  assert not result['OK']
+  assert connectionPool.getStats()['timeouts'] == 1
+  connectionPool.release()
+  assert _getInThread(connectionPool, checkout=True)['Value'] is conn
+  # The connection of the finished thread was still marked as used
+  assert connectionPool.get('DB')['Value'] is conn
+
+
+def test_connectionPing(connectionPool):
+  conn = connectionPool.get('DB')['Value']
+  connectionPool.get('DB')
+  assert not conn.ping.called
+  connectionPool._ConnectionPool__pingIdleTime = -1
+  conn.ping.side_effect = Exception('Server has gone away')
+  newConn = connectionPool.get('DB')['Value']
+  assert newConn is not conn
+  conn.close.assert_called_once_with()
+  stats = connectionPool.getStats()
+  assert stats['reconnects'] == 1 and stats['opened'] == 2 and stats['open'] == 1
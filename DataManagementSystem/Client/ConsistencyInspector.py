@@ -18,6 +18,7 @@ import errno
 import DIRAC
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
+from DIRAC.DataManagementSystem.Client.DirectoryWalker import DirectoryWalker
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
 from DIRAC.Core.Utilities.List import breakListIntoChunks
@@ -489,6 +490,104 @@ class ConsistencyInspector(object):
 
     return S_OK(retDict)
 
+  ##########################################################################
+  # Lineage checks
+
+  def getDescendants(self, lfns, depth=1):
+    """ Get the descendants of the given files from the lineage graph of the catalog,
+        obtained with one bulk query per chunk of files
+
+        :param list lfns: list of LFNs
+        :param int depth: number of generations of descendants
+
+        :return: S_OK( { lfn : set( descendants ) } ) for the files found in the catalog
+    """
+    graph = {}
+    for lfnChunk in breakListIntoChunks(lfns, 10000):
+      res = self.fileCatalog.getFileLineage(lfnChunk, depth, True)
+      if not res['OK']:
+        gLogger.error('Failed to get the descendants', res['Message'])
+        return res
+      for lfn, error in res['Value']['Failed'].items():
+        self.__logVerbose('Failed to get the descendants of %s' % lfn, error)
+      graph.update(res['Value']['Successful'])
+
+    descendants = {}
+    for lfn in lfns:
+      if lfn not in graph:
+        continue
+      found = set()
+      generation = [lfn]
+      for _ in range(depth):
+        generation = [desc for parent in generation for desc in graph.get(parent, []) if desc not in found]
+        if not generation:
+          break
+        found.update(generation)
+      descendants[lfn] = found
+    return S_OK(descendants)
+
+  def checkDescendants(self, processedLFNs, nonProcessedLFNs=None, depth=1):
+    """ Check the descendants of the processed and non processed input files of a transformation,
+        the processed files being expected to have descendants and the others not. It sets:
+          - prcdWithDesc, prcdWithoutDesc, prcdWithMultDesc and descForPrcdLFNs for the processed files
+          - nonPrcdWithDesc, nonPrcdWithoutDesc, nonPrcdWithMultDesc and descForNonPrcdLFNs for the others
+          - ancestors { descendant : [ ancestors ] }
+          - multipleDescendants { lfn : [ descendants ] } for the files with more than one descendant
+          - commonAncestors { descendant : [ ancestors ] } for the descendants of more than one file
+          - absentLFNsInFC for the files not found in the catalog
+
+        :param list processedLFNs: LFNs of the processed files
+        :param list nonProcessedLFNs: LFNs of the non processed files
+        :param int depth: number of generations of descendants
+    """
+    processedLFNs = list(processedLFNs)
+    nonProcessedLFNs = list(nonProcessedLFNs) if nonProcessedLFNs else []
+    res = self.getDescendants(processedLFNs + nonProcessedLFNs, depth)
+    if not res['OK']:
+      return res
+    descendants = res['Value']
+
+    self.absentLFNsInFC = [lfn for lfn in processedLFNs + nonProcessedLFNs if lfn not in descendants]
+    self.ancestors = {}
+    for lfn, descs in descendants.items():
+      for desc in descs:
+        self.ancestors.setdefault(desc, []).append(lfn)
+    self.commonAncestors = dict((desc, sorted(ancs)) for desc, ancs in self.ancestors.items() if len(ancs) > 1)
+    self.multipleDescendants = dict((lfn, sorted(descs)) for lfn, descs in descendants.items() if len(descs) > 1)
+
+    self.prcdWithDesc, self.prcdWithoutDesc, self.prcdWithMultDesc, self.descForPrcdLFNs = \
+        self._classifyByDescendants(processedLFNs, descendants)
+    self.nonPrcdWithDesc, self.nonPrcdWithoutDesc, self.nonPrcdWithMultDesc, self.descForNonPrcdLFNs = \
+        self._classifyByDescendants(nonProcessedLFNs, descendants)
+
+    self.__logVerbose('Processed files: %d with descendants (%d with multiple), %d without' %
+                      (len(self.prcdWithDesc), len(self.prcdWithMultDesc), len(self.prcdWithoutDesc)))
+    self.__logVerbose('Non processed files: %d with descendants (%d with multiple), %d without' %
+                      (len(self.nonPrcdWithDesc), len(self.nonPrcdWithMultDesc), len(self.nonPrcdWithoutDesc)))
+    return S_OK()
+
+  @staticmethod
+  def _classifyByDescendants(lfns, descendants):
+    """ Split the files found in descendants according to their number of descendants
+
+        :return: tuple ( files with descendants, files without, files with several, all the descendants )
+    """
+    withDesc = []
+    withoutDesc = []
+    withMultDesc = []
+    allDesc = set()
+    for lfn in lfns:
+      if lfn not in descendants:
+        continue
+      if descendants[lfn]:
+        withDesc.append(lfn)
+        allDesc.update(descendants[lfn])
+        if len(descendants[lfn]) > 1:
+          withMultDesc.append(lfn)
+      else:
+        withoutDesc.append(lfn)
+    return withDesc, withoutDesc, withMultDesc, sorted(allDesc)
+
   ##########################################################################
   # properties
 
@@ -684,53 +783,16 @@ class ConsistencyInspector(object):
     """ Obtain the contents of the supplied directory, recursively
     """
 
-    def _getDirectoryContent(directory):
-      """ Inner function: recursively scan a directory, returns list of LFNs
-      """
-      filesInDirectory = {}
-
-      gLogger.debug("Examining %s" % directory)
-
-      res = self.fileCatalog.listDirectory(directory)
-      if not res['OK']:
-        gLogger.error('Failed to get directory contents', res['Message'])
-        return res
-      if directory in res['Value']['Failed']:
-        gLogger.error('Failed to get directory content', '%s %s' %
-                      (directory, res['Value']['Failed'][directory]))
-        return S_ERROR('Failed to get directory content')
-      if directory not in res['Value']['Successful']:
-        return S_ERROR('Directory not existing?')
-
-      # first, adding the files found in the current directory
-      gLogger.debug("Files in %s: %d" % (directory, len(
-          res['Value']['Successful'][directory]['Files'])))
-      filesInDirectory.update(res['Value']['Successful'][directory]['Files'])
-
-      # then, looking for subDirectories content
-      if res['Value']['Successful'][directory]['SubDirs']:
-        for l_dir in res['Value']['Successful'][directory]['SubDirs']:
-          # recursion here
-          subDirContent = _getDirectoryContent(l_dir)
-          if not subDirContent['OK']:
-            return subDirContent
-          else:
-            filesInDirectory.update(subDirContent['Value'])
-
-      return S_OK(filesInDirectory)
-
     gLogger.info(
         'Obtaining the catalog contents for %d directories' % len(lfnDirs))
 
     allFiles = {}
-    for lfnDir in lfnDirs:
-      dirContent = _getDirectoryContent(lfnDir)
-      if not dirContent['OK']:
-        return dirContent
-      else:
-        gLogger.debug("Content of directory %s: %d files" %
-                      (lfnDir, len(dirContent['Value'])))
-        allFiles.update(dirContent['Value'])
+    for lfnDir, res in DirectoryWalker(self.fileCatalog).walk(lfnDirs):
+      if not res['OK']:
+        gLogger.error('Failed to get directory content', '%s %s' % (lfnDir, res['Message']))
+        return S_ERROR('Failed to get directory content')
+      gLogger.debug("Files in %s: %d" % (lfnDir, len(res['Value']['Files'])))
+      allFiles.update(res['Value']['Files'])
 
     gLogger.debug("Content of directories examined: %d files" % len(allFiles))
 
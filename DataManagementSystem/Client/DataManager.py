@@ -33,6 +33,7 @@ from DIRAC.Core.Security.ProxyInfo import getProxyInfo
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.AccountingSystem.Client.DataStoreClient import gDataStoreClient
 from DIRAC.AccountingSystem.Client.Types.DataOperation import DataOperation
+from DIRAC.DataManagementSystem.Client.DirectoryWalker import DirectoryWalker
 from DIRAC.DataManagementSystem.Utilities.DMSHelpers import DMSHelpers
 from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
 from DIRAC.Resources.Storage.StorageElement import StorageElement
@@ -272,23 +273,14 @@ class DataManager(object):
     log = self.log.getSubLogger('__getCatalogDirectoryContents')
     log.debug('Obtaining the catalog contents for %d directories:' %
               len(directories))
-    activeDirs = directories
-    allFiles = {}
-    while len(activeDirs) > 0:
-      currentDir = activeDirs[0]
-      res = returnSingleResult(
-          self.fileCatalog.listDirectory(currentDir, verbose=True))
-      activeDirs.remove(currentDir)
-
-      if not res['OK']:
-        log.debug("Problem getting the %s directory content" %
-                  currentDir, res['Message'])
-      else:
-        dirContents = res['Value']
-        activeDirs.extend(dirContents['SubDirs'])
-        allFiles.update(dirContents['Files'])
-        if includeDirectories:
-          allFiles.update(dirContents['SubDirs'])
+    res = DirectoryWalker(self.fileCatalog, verbose=True).getFiles(directories)
+    if not res['OK']:
+      return res
+    for currentDir, reason in res['Value']['Failed'].items():
+      log.debug("Problem getting the %s directory content" % currentDir, reason)
+    allFiles = res['Value']['Files']
+    if includeDirectories:
+      allFiles.update(res['Value']['SubDirs'])
     log.debug("Found %d files" % len(allFiles))
     return S_OK(allFiles)
 
@@ -326,14 +318,12 @@ class DataManager(object):
               (days, len(directories)))
     for folder in directories:
       log.debug(folder)
-    activeDirs = directories
+    # We only need the metadata (verbose) if a limit date is given
+    walker = DirectoryWalker(self.fileCatalog, verbose=(days != 0))
     allFiles = []
-    while len(activeDirs) > 0:
-      currentDir = activeDirs[0]
-      # We only need the metadata (verbose) if a limit date is given
-      res = returnSingleResult(
-          self.fileCatalog.listDirectory(currentDir, verbose=(days != 0)))
-      activeDirs.remove(currentDir)
+    for currentDir, res in walker.walk(directories,
+                                       dirFilter=lambda _subdir, dirDict: (not days) or
+                                       _isOlderThan(dirDict['CreationDate'], days)):
       if not res['OK']:
         log.debug("Error retrieving directory contents", "%s %s" %
                   (currentDir, res['Message']))
@@ -343,11 +333,6 @@ class DataManager(object):
         files = dirContents['Files']
         log.debug("%s: %d files, %d sub-directories" %
                   (currentDir, len(files), len(subdirs)))
-        for subdir in subdirs:
-          if (not days) or _isOlderThan(subdirs[subdir]['CreationDate'], days):
-            if subdir[0] != '/':
-              subdir = currentDir + '/' + subdir
-            activeDirs.append(subdir)
         for fileName in files:
           fileInfo = files[fileName]
           fileInfo = fileInfo.get('Metadata', fileInfo)
@@ -0,0 +1,129 @@
+""" Concurrent recursive walk of the directories of a file catalog
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import six
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from DIRAC import S_OK, S_ERROR, gLogger
+from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
+
+
+class DirectoryWalker(object):
+  """ Walk the directory trees of a file catalog with a bounded pool of threads, each listDirectory
+      call listing a batch of directories. The directories are yielded as soon as they are listed,
+      in no particular order.
+
+      Example::
+
+        walker = DirectoryWalker(maxWorkers=8)
+        for path, result in walker.walk('/vo/user/j/joe'):
+          if result['OK']:
+            lfns += list(result['Value']['Files'])
+  """
+
+  def __init__(self, fileCatalog=None, maxWorkers=8, batchSize=20, verbose=False, timeout=None):
+    """ C'tor
+
+        :param fileCatalog: catalog client, FileCatalog() if None
+        :param int maxWorkers: maximum number of concurrent listDirectory calls
+        :param int batchSize: maximum number of directories per listDirectory call
+        :param bool verbose: get the metadata of the files and directories
+        :param int timeout: timeout of the listDirectory calls, the catalog default if None
+    """
+    self.fileCatalog = fileCatalog if fileCatalog else FileCatalog()
+    self.maxWorkers = max(1, maxWorkers)
+    self.batchSize = max(1, batchSize)
+    self.verbose = verbose
+    self.timeout = timeout
+    self.log = gLogger.getSubLogger('DirectoryWalker')
+
+  def __listDirectories(self, paths):
+    """ List a batch of directories
+
+        :param list paths: directories
+
+        :return: dict { path : S_OK( { 'Files', 'SubDirs', 'Links' } )/S_ERROR }
+    """
+    kwargs = {'timeout': self.timeout} if self.timeout else {}
+    res = self.fileCatalog.listDirectory(paths, self.verbose, **kwargs)
+    if not res['OK']:
+      return dict((path, S_ERROR(res['Message'])) for path in paths)
+    results = {}
+    for path in paths:
+      if path in res['Value']['Successful']:
+        results[path] = S_OK(res['Value']['Successful'][path])
+      else:
+        results[path] = S_ERROR(res['Value']['Failed'].get(path, 'Directory not listed'))
+    return results
+
+  def walk(self, paths, dirFilter=None):
+    """ Generator listing recursively the given directories
+
+        :param paths: directory or list of directories
+        :param dirFilter: callable( subdirectory, subdirectory metadata ), returning whether the
+                          subdirectory has to be listed, all subdirectories are listed if None
+
+        :return: generator of tuples ( path, S_OK( { 'Files', 'SubDirs', 'Links' } )/S_ERROR ),
+                 the entries of the directories being LFNs
+    """
+    if isinstance(paths, six.string_types):
+      paths = [paths]
+    toList = deque()
+    seen = set()
+    for path in paths:
+      if path not in seen:
+        seen.add(path)
+        toList.append(path)
+    running = set()
+
+    executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+    try:
+      while toList or running:
+        while toList and len(running) < self.maxWorkers:
+          batch = [toList.popleft() for _ in range(min(self.batchSize, len(toList)))]
+          running.add(executor.submit(self.__listDirectories, batch))
+
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+          for path, result in future.result().items():
+            if result['OK']:
+              subDirs = result['Value']['SubDirs']
+              for subDir in sorted(subDirs):
+                subDirLFN = subDir if subDir.startswith('/') else os.path.join(path, subDir)
+                if subDirLFN in seen:
+                  continue
+                if dirFilter is None or dirFilter(subDirLFN, subDirs[subDir]):
+                  seen.add(subDirLFN)
+                  toList.append(subDirLFN)
+            else:
+              self.log.debug("Failed to list directory", "%s %s" % (path, result['Message']))
+            yield path, result
+    finally:
+      executor.shutdown(wait=True)
+
+  def getFiles(self, paths, dirFilter=None):
+    """ Get recursively the files of the given directories
+
+        :param paths: directory or list of directories
+        :param dirFilter: callable( subdirectory, subdirectory metadata ), see walk()
+
+        :return: S_OK( { 'Files' : { lfn : metadata }, 'SubDirs' : { path : metadata },
+                         'Failed' : { path : reason } } )
+    """
+    files = {}
+    subDirs = {}
+    failed = {}
+    for path, result in self.walk(paths, dirFilter=dirFilter):
+      if result['OK']:
+        files.update(result['Value']['Files'])
+        subDirs.update(result['Value']['SubDirs'])
+      else:
+        failed[path] = result['Message']
+    return S_OK({'Files': files, 'SubDirs': subDirs, 'Failed': failed})
@@ -2198,19 +2198,41 @@ File Catalog Client $Revision: 1.17 $Date:
     """ Rebuild auxiliary tables
 
         Usage:
-           rebuild <option>
+           rebuild usage            rebuild the directory storage usage
+           rebuild metaindex        rebuild the index of the inherited directory metadata
+           rebuild metaindex check  check the index of the inherited directory metadata
     """
 
     argss = args.split()
-    _option = argss[0]
+    option = argss[0] if argss else 'usage'
     start = time.time()
+    if option == 'metaindex':
+      if len(argss) > 1 and argss[1] == 'check':
+        result = self.fc.checkMetadataIndex(timeout=300)
+        if not result['OK']:
+          print("Error:", result['Message'])
+          return
+        fields = ['Metadata', 'Missing', 'Wrong', 'Extra']
+        records = []
+        for meta, counters in sorted(result['Value'].items()):
+          records.append([meta] + [str(counters[counter]) for counter in fields[1:]])
+        printTable(fields, records)
+        return
+      result = self.fc.rebuildMetadataIndex(timeout=300)
+      if not result['OK']:
+        print("Error:", result['Message'])
+        return
+      total = time.time() - start
+      print("Metadata index of %d directories rebuilt in %.2f sec" % (sum(result['Value'].values()), total))
+      return
+
     result = self.fc.rebuildDirectoryUsage(timeout=300)
     if not result['OK']:
       print("Error:", result['Message'])
       return
 
     total = time.time() - start
-    print("Directory storage info rebuilt in %.2f sec", total)
+    print("Directory storage info rebuilt in %.2f sec" % total)
 
   def do_repair(self, args):
     """ Repair catalog inconsistencies
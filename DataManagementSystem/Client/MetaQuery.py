@@ -169,6 +169,34 @@ class MetaQuery(object):
 
     return json.dumps(self.__metaQueryDict)
 
+  def findFiles(self, path='/', fileCatalog=None):
+    """ Find the files satisfying the query in the catalog. The catalog service evaluates the most
+        selective metadata first and the directory metadata, including the inherited one, in as few
+        queries as possible.
+
+        :param str path: directory in which the files are searched
+        :param fileCatalog: catalog client, the FileCatalogClient by default
+
+        :return: S_OK( list of LFNs ) / S_ERROR
+    """
+    if fileCatalog is None:
+      from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+      fileCatalog = FileCatalogClient()
+    return fileCatalog.findFilesByMetadata(self.__metaQueryDict, path)
+
+  def findDirectories(self, path='/', fileCatalog=None):
+    """ Find the directories satisfying the directory metadata of the query in the catalog
+
+        :param str path: directory in which the directories are searched
+        :param fileCatalog: catalog client, the FileCatalogClient by default
+
+        :return: S_OK( { dirID : path } ) / S_ERROR
+    """
+    if fileCatalog is None:
+      from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+      fileCatalog = FileCatalogClient()
+    return fileCatalog.findDirectoriesByMetadata(self.__metaQueryDict, path)
+
   def applyQuery(self, userMetaDict):
     """  Return a list of tuples with tables and conditions to locate files for a given user Metadata
     """
@@ -157,6 +157,37 @@ class ConsistencyInspectorSuccess(UtilitiesTestCase):
 
     self.assertEqual(res['Value'], resExpected)
 
+  def test_checkDescendants(self):
+    fcMock = MagicMock()
+    fcMock.getFileLineage.return_value = {'OK': True,
+                                          'Value': {'Successful': {'/a.raw': ['/a.dst', '/ab.dst'],
+                                                                   '/b.raw': ['/ab.dst'],
+                                                                   '/c.raw': [],
+                                                                   '/d.raw': ['/d.dst']},
+                                                    'Failed': {'/e.raw': 'No such file or directory'}}}
+    self.ci.fileCatalog = fcMock
+
+    res = self.ci.checkDescendants(['/a.raw', '/b.raw', '/c.raw', '/e.raw'], ['/d.raw'])
+    self.assertTrue(res['OK'])
+    fcMock.getFileLineage.assert_called_once_with(['/a.raw', '/b.raw', '/c.raw', '/e.raw', '/d.raw'], 1, True)
+    self.assertEqual(self.ci.prcdWithDesc, ['/a.raw', '/b.raw'])
+    self.assertEqual(self.ci.prcdWithoutDesc, ['/c.raw'])
+    self.assertEqual(self.ci.prcdWithMultDesc, ['/a.raw'])
+    self.assertEqual(self.ci.descForPrcdLFNs, ['/a.dst', '/ab.dst'])
+    self.assertEqual(self.ci.nonPrcdWithDesc, ['/d.raw'])
+    self.assertEqual(self.ci.absentLFNsInFC, ['/e.raw'])
+    self.assertEqual(self.ci.multipleDescendants, {'/a.raw': ['/a.dst', '/ab.dst']})
+    self.assertEqual(self.ci.commonAncestors, {'/ab.dst': ['/a.raw', '/b.raw']})
+
+  def test_getDescendants(self):
+    fcMock = MagicMock()
+    fcMock.getFileLineage.return_value = {'OK': True,
+                                          'Value': {'Successful': {'/a.raw': ['/a.dst'], '/a.dst': ['/a.root']},
+                                                    'Failed': {}}}
+    self.ci.fileCatalog = fcMock
+    res = self.ci.getDescendants(['/a.raw'], depth=2)
+    self.assertEqual(res['Value'], {'/a.raw': set(['/a.dst', '/a.root'])})
+
 
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(UtilitiesTestCase)
@@ -0,0 +1,60 @@
+""" Unit test for DirectoryWalker
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from mock import MagicMock
+
+# sut
+from DIRAC.DataManagementSystem.Client.DirectoryWalker import DirectoryWalker
+
+# { directory : ( subdirectories, files ) }
+tree = {'/vo': (['/vo/a', '/vo/b'], ['/vo/f1']),
+        '/vo/a': (['/vo/a/c'], ['/vo/a/f2', '/vo/a/f3']),
+        '/vo/b': ([], []),
+        '/vo/a/c': ([], ['/vo/a/c/f4'])}
+
+
+def listDirectory(paths, verbose, **kwargs):
+  successful = {}
+  failed = {}
+  for path in paths:
+    if path in tree:
+      successful[path] = {'Files': dict.fromkeys(tree[path][1], {}),
+                          'SubDirs': dict.fromkeys(tree[path][0], {'CreationDate': path}),
+                          'Links': {}}
+    else:
+      failed[path] = 'No such file or directory'
+  return {'OK': True, 'Value': {'Successful': successful, 'Failed': failed}}
+
+
+def test_walk():
+  fcMock = MagicMock()
+  fcMock.listDirectory.side_effect = listDirectory
+  walker = DirectoryWalker(fcMock, maxWorkers=2, batchSize=2)
+
+  results = dict(walker.walk(['/vo', '/missing']))
+  assert sorted(results) == ['/missing', '/vo', '/vo/a', '/vo/a/c', '/vo/b']
+  assert results['/missing']['OK'] is False
+  assert sorted(results['/vo/a']['Value']['Files']) == ['/vo/a/f2', '/vo/a/f3']
+  # The directories are listed by batches
+  assert fcMock.listDirectory.call_count == 3
+  assert all(len(call[0][0]) <= 2 for call in fcMock.listDirectory.call_args_list)
+
+
+def test_getFiles():
+  fcMock = MagicMock()
+  fcMock.listDirectory.side_effect = listDirectory
+  walker = DirectoryWalker(fcMock)
+
+  res = walker.getFiles('/vo', dirFilter=lambda path, _dirDict: path != '/vo/a')
+  assert res['OK'] is True
+  assert sorted(res['Value']['Files']) == ['/vo/f1']
+  assert sorted(res['Value']['SubDirs']) == ['/vo/a', '/vo/b']
+  assert res['Value']['Failed'] == {}
+
+  fcMock.listDirectory.side_effect = None
+  fcMock.listDirectory.return_value = {'OK': False, 'Message': 'Connection refused'}
+  res = walker.getFiles(['/vo', '/vo/a'])
+  assert res['Value']['Failed'] == {'/vo': 'Connection refused', '/vo/a': 'Connection refused'}
@@ -35,6 +35,11 @@ class DirectoryClosure(DirectoryTreeBase):
     self.directoryTable = 'FC_DirectoryList'
     self.closureTable = 'FC_DirectoryClosure'
 
+  def getClosureTable(self):
+    """ Get the name of the closure table
+    """
+    return self.closureTable
+
   def findDir(self, path, connection=False):
     """  Find directory ID for the given path
 
@@ -44,6 +49,12 @@ class DirectoryClosure(DirectoryTreeBase):
     """
 
     dpath = os.path.normpath(path)
+    cached = self.dirCache.getDirID(dpath)
+    if cached:
+      res = S_OK(cached[0])
+      res['Level'] = cached[1]
+      return res
+
     result = self.db.executeStoredProcedure('ps_find_dir', (dpath, 'ret1', 'ret2'), outputIds=[1, 2])
     if not result['OK']:
       return result
@@ -51,6 +62,7 @@ class DirectoryClosure(DirectoryTreeBase):
     if not result['Value']:
       return S_OK(0)
 
+    self.dirCache.add(dpath, result['Value'][0], result['Value'][1])
     res = S_OK(result['Value'][0])
     res['Level'] = result['Value'][1]
     return res
@@ -63,15 +75,16 @@ class DirectoryClosure(DirectoryTreeBase):
         :returns: S_OK( { path : ID} )
     """
 
-    dirDict = {}
-    if not paths:
+    dirDict, missingPaths = self.dirCache.getDirIDs([os.path.normpath(path) for path in paths])
+    if not missingPaths:
       return S_OK(dirDict)
-    dpaths = stringListToString([os.path.normpath(path) for path in paths])
+    dpaths = stringListToString(missingPaths)
     result = self.db.executeStoredProcedureWithCursor('ps_find_dirs', (dpaths, ))
     if not result['OK']:
       return result
     for dirName, dirID in result['Value']:
       dirDict[dirName] = dirID
+      self.dirCache.add(dirName, dirID)
 
     return S_OK(dirDict)
 
@@ -98,6 +111,7 @@ class DirectoryClosure(DirectoryTreeBase):
 
     dirId = result['Value']
     result = self.db.executeStoredProcedure('ps_remove_dir', (dirId, ), outputIds=[])
+    self.dirCache.remove(os.path.normpath(path), dirId)
     if not result['OK']:
       return result
 
@@ -130,6 +144,10 @@ class DirectoryClosure(DirectoryTreeBase):
 
     """
 
+    cachedPaths = self.dirCache.getPaths([dirID])[0]
+    if cachedPaths:
+      return S_OK(cachedPaths[dirID])
+
     result = self.db.executeStoredProcedure('ps_get_dirName_from_id', (dirID, 'out'), outputIds=[1])
     if not result['OK']:
       return result
@@ -139,6 +157,7 @@ class DirectoryClosure(DirectoryTreeBase):
     if not dirName:
       return S_ERROR('Directory with id %d not found' % int(dirID))
 
+    self.dirCache.add(dirName, dirID)
     return S_OK(dirName)
 
   def getDirectoryPaths(self, dirIDList):
@@ -152,16 +171,19 @@ class DirectoryClosure(DirectoryTreeBase):
     if not isinstance(dirIDList, list):
       dirs = [dirIDList]
 
-    dirDict = {}
+    dirDict, missingDirs = self.dirCache.getPaths(dirs)
+    if not missingDirs:
+      return S_OK(dirDict)
 
     # Format the list
-    dIds = intListToString(dirs)
+    dIds = intListToString(missingDirs)
     result = self.db.executeStoredProcedureWithCursor('ps_get_dirNames_from_ids', (dIds, ))
     if not result['OK']:
       return result
 
     for dirId, dirName in result['Value']:
       dirDict[dirId] = dirName
+      self.dirCache.add(dirName, dirId)
 
     return S_OK(dirDict)
 
@@ -378,6 +400,7 @@ class DirectoryClosure(DirectoryTreeBase):
         return result
 
       dirId = result['Value'][0][0]
+      self.dirCache.add(dpath, dirId)
 
       result = S_OK(dirId)
       result['NewDirectory'] = True
@@ -35,7 +35,14 @@ class DirectoryLevelTree(DirectoryTreeBase):
     """  Find directory ID for the given path
     """
 
-    dpath = self.db._escapeString(os.path.normpath(path))
+    normPath = os.path.normpath(path)
+    cached = self.dirCache.getDirID(normPath)
+    if cached:
+      res = S_OK(cached[0])
+      res['Level'] = cached[1]
+      return res
+
+    dpath = self.db._escapeString(normPath)
     if not dpath['OK']:
       return dpath
     dpath = dpath['Value']
@@ -47,27 +54,33 @@ class DirectoryLevelTree(DirectoryTreeBase):
     if not result['Value']:
       return S_OK('')
 
-    res = S_OK(result['Value'][0][0])
-    res['Level'] = result['Value'][0][1]
+    dirID = result['Value'][0][0]
+    level = result['Value'][0][1]
+    self.dirCache.add(normPath, dirID, level)
+    res = S_OK(dirID)
+    res['Level'] = level
     return res
 
   def findDirs(self, paths, connection=False):
     """ Find DirIDs for the given path list
     """
+    dirDict, missingPaths = self.dirCache.getDirIDs([os.path.normpath(path) for path in paths])
+    if not missingPaths:
+      return S_OK(dirDict)
     dpathList = []
-    for path in paths:
-      dpath = self.db._escapeString(os.path.normpath(path))
+    for path in missingPaths:
+      dpath = self.db._escapeString(path)
       if not dpath['OK']:
         return dpath
       dpathList.append(dpath['Value'])
     dpaths = ','.join(dpathList)
-    req = "SELECT DirName,DirID from FC_DirectoryLevelTree WHERE DirName in (%s)" % dpaths
+    req = "SELECT DirName,DirID,Level from FC_DirectoryLevelTree WHERE DirName in (%s)" % dpaths
     result = self.db._query(req, connection)
     if not result['OK']:
       return result
-    dirDict = {}
-    for dirName, dirID in result['Value']:
+    for dirName, dirID, level in result['Value']:
       dirDict[dirName] = dirID
+      self.dirCache.add(dirName, dirID, level)
 
     return S_OK(dirDict)
 
@@ -86,6 +99,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
     dirID = result['Value']
     req = "DELETE FROM FC_DirectoryLevelTree WHERE DirID=%d" % dirID
     result = self.db._update(req)
+    self.dirCache.remove(os.path.normpath(path), dirID)
     result['DirID'] = dirID
     return result
 
@@ -193,6 +207,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
     else:
       result = self.db._query("ROLLBACK;", conn)
 
+    self.dirCache.add(os.path.normpath(path), dirID, level)
     result = S_OK(dirID)
     result['NewDirectory'] = True
     return result
@@ -240,6 +255,9 @@ class DirectoryLevelTree(DirectoryTreeBase):
   def getDirectoryPath(self, dirID):
     """ Get directory name by directory ID
     """
+    cachedPaths = self.dirCache.getPaths([int(dirID)])[0]
+    if cachedPaths:
+      return S_OK(cachedPaths[int(dirID)])
     req = "SELECT DirName FROM FC_DirectoryLevelTree WHERE DirID=%d" % int(dirID)
     result = self.db._query(req)
     if not result['OK']:
@@ -247,6 +265,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
     if not result['Value']:
       return S_ERROR('Directory with id %d not found' % int(dirID))
 
+    self.dirCache.add(result['Value'][0][0], int(dirID))
     return S_OK(result['Value'][0][0])
 
   def getDirectoryPaths(self, dirIDList):
@@ -259,17 +278,20 @@ class DirectoryLevelTree(DirectoryTreeBase):
     if not dirs:
       return S_OK({})
 
-    dirListString = ','.join([str(d) for d in dirs])
+    resultDict, missingDirs = self.dirCache.getPaths([int(d) for d in dirs])
+    if not missingDirs:
+      return S_OK(resultDict)
+    dirListString = ','.join([str(d) for d in missingDirs])
     req = "SELECT DirID,DirName FROM FC_DirectoryLevelTree WHERE DirID in ( %s )" % dirListString
     result = self.db._query(req)
     if not result['OK']:
       return result
-    if not result['Value']:
+    if not result['Value'] and not resultDict:
       return S_ERROR('Directories not found: %s' % dirListString)
 
-    resultDict = {}
     for row in result['Value']:
       resultDict[int(row[0])] = row[1]
+      self.dirCache.add(row[1], int(row[0]))
 
     return S_OK(resultDict)
 
@@ -534,6 +556,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
       result = self.__rebuildLevelIndexes(parentID, connection)
       resUnlock = self.db._query("UNLOCK TABLES", connection)
 
+    # The IDs of the recovered directories may have changed
+    self.dirCache.clear()
     return S_OK()
 
   def _getConnection(self, connection=False):
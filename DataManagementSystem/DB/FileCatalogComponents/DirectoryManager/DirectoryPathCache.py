@@ -0,0 +1,158 @@
+""" Bounded LRU cache of the directory paths and IDs of the FileCatalog directory managers
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import collections
+import threading
+import time
+
+
+class DirectoryPathCache(object):
+  """ Cache of the directory path -> ( DirID, Level ) and DirID -> path mappings, shared by the threads
+      of the service. The least recently used directories are dropped when there are more than maxSize
+      of them, and the entries older than lifeTime seconds are ignored, as the directories can be
+      removed by other FileCatalog services using the same database.
+  """
+
+  def __init__(self, maxSize=100000, lifeTime=600):
+    """ C'tor
+
+        :param int maxSize: maximum number of directories, 0 disables the cache
+        :param int lifeTime: maximum number of seconds an entry is used
+    """
+    self.maxSize = maxSize
+    self.lifeTime = lifeTime
+    self.__lock = threading.Lock()
+    # { path : ( dirID, level, insertion time ) }, the most recently used last
+    self.__dirIDs = collections.OrderedDict()
+    # { dirID : path }
+    self.__paths = {}
+    self.__hits = 0
+    self.__misses = 0
+
+  def __getEntry(self, path, now):
+    """ Get the entry of a path and mark it as used, must be called with the lock
+    """
+    entry = self.__dirIDs.pop(path, None)
+    if entry is None:
+      return None
+    if now - entry[2] > self.lifeTime:
+      self.__paths.pop(entry[0], None)
+      return None
+    self.__dirIDs[path] = entry
+    return entry
+
+  def getDirID(self, path):
+    """ Get the ID of a directory
+
+        :param str path: normalized path of the directory
+
+        :return: tuple ( dirID, level ) or None if the directory is not in the cache
+    """
+    if not self.maxSize:
+      return None
+    with self.__lock:
+      entry = self.__getEntry(path, time.time())
+      if entry is None:
+        self.__misses += 1
+        return None
+      self.__hits += 1
+      return entry[:2]
+
+  def getDirIDs(self, paths):
+    """ Get the IDs of directories
+
+        :param list paths: normalized paths of the directories
+
+        :return: tuple ( { path : dirID } for the cached directories, list of the other paths )
+    """
+    dirIDs = {}
+    missing = []
+    if not self.maxSize:
+      return dirIDs, list(paths)
+    now = time.time()
+    with self.__lock:
+      for path in paths:
+        entry = self.__getEntry(path, now)
+        if entry is None:
+          missing.append(path)
+        else:
+          dirIDs[path] = entry[0]
+      self.__hits += len(dirIDs)
+      self.__misses += len(missing)
+    return dirIDs, missing
+
+  def getPaths(self, dirIDs):
+    """ Get the paths of directories
+
+        :param list dirIDs: IDs of the directories
+
+        :return: tuple ( { dirID : path } for the cached directories, list of the other IDs )
+    """
+    paths = {}
+    missing = []
+    if not self.maxSize:
+      return paths, list(dirIDs)
+    now = time.time()
+    with self.__lock:
+      for dirID in dirIDs:
+        path = self.__paths.get(dirID)
+        if path is None or self.__getEntry(path, now) is None:
+          missing.append(dirID)
+        else:
+          paths[dirID] = path
+      self.__hits += len(paths)
+      self.__misses += len(missing)
+    return paths, missing
+
+  def add(self, path, dirID, level=None):
+    """ Add a directory
+
+        :param str path: normalized path of the directory
+        :param int dirID: ID of the directory
+        :param int level: depth of the directory
+    """
+    if not self.maxSize or not dirID:
+      return
+    with self.__lock:
+      entry = self.__dirIDs.pop(path, None)
+      if entry is not None:
+        self.__paths.pop(entry[0], None)
+        if level is None:
+          level = entry[1]
+      self.__dirIDs[path] = (dirID, level, time.time())
+      self.__paths[dirID] = path
+      while len(self.__dirIDs) > self.maxSize:
+        _path, entry = self.__dirIDs.popitem(last=False)
+        self.__paths.pop(entry[0], None)
+
+  def remove(self, path=None, dirID=None):
+    """ Remove a directory given by its path or its ID
+    """
+    with self.__lock:
+      if path is None:
+        path = self.__paths.get(dirID)
+      entry = self.__dirIDs.pop(path, None)
+      if entry is not None:
+        self.__paths.pop(entry[0], None)
+      if dirID is not None:
+        self.__paths.pop(dirID, None)
+
+  def clear(self):
+    """ Remove all the directories
+    """
+    with self.__lock:
+      self.__dirIDs.clear()
+      self.__paths.clear()
+
+  def getStats(self):
+    """ Get the counters of the cache
+
+        :return: dict with the number of Hits, Misses and cached Directories
+    """
+    with self.__lock:
+      return {'Hits': self.__hits, 'Misses': self.__misses, 'Directories': len(self.__dirIDs)}
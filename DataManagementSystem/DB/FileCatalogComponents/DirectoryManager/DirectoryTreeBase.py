@@ -13,6 +13,8 @@ import stat
 
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities import getIDSelectString
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryPathCache import \
+    DirectoryPathCache
 
 DEBUG = 0
 
@@ -25,6 +27,11 @@ class DirectoryTreeBase(object):
     self.db = database
     self.lock = threading.Lock()
     self.treeTable = ''
+    # Cache of the paths and IDs of the directories, used by the directory managers supporting it,
+    # disabled until configured by setDirectoryCache
+    self.dirCache = DirectoryPathCache(maxSize=0)
+    # Incremented each time a directory is created, for the caches of directory sets
+    self.treeVersion = 0
 
 ############################################################################
 #
@@ -58,6 +65,11 @@ class DirectoryTreeBase(object):
     """
     return S_ERROR("To be implemented on derived class")
 
+  def getDirectoryPaths(self, dirIDList):
+    """ Get directory names by directory ID list
+    """
+    return S_ERROR("To be implemented on derived class")
+
   def countSubdirectories(self, dirId, includeParent=True):
     return S_ERROR("To be implemented on derived class")
 
@@ -85,6 +97,55 @@ class DirectoryTreeBase(object):
   def setDatabase(self, database):
     self.db = database
 
+  def setDirectoryCache(self, maxSize, lifeTime):
+    """ Configure the cache of the directory paths and IDs
+
+        :param int maxSize: maximum number of cached directories, 0 to disable the cache
+        :param int lifeTime: maximum number of seconds a directory is cached
+    """
+    self.dirCache.maxSize = maxSize
+    self.dirCache.lifeTime = lifeTime
+    self.dirCache.clear()
+
+  def warmDirectoryCache(self, nDirectories):
+    """ Fill the cache of the directory paths and IDs with the directories having the largest numbers of files
+
+        :param int nDirectories: number of directories to cache
+
+        :return: S_OK(int) -- number of cached directories/S_ERROR()
+    """
+    nDirectories = min(nDirectories, self.dirCache.maxSize)
+    if nDirectories <= 0:
+      return S_OK(0)
+    req = "SELECT DirID FROM FC_DirectoryUsage GROUP BY DirID ORDER BY MAX(SEFiles) DESC LIMIT %d" % nDirectories
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    dirIDs = [row[0] for row in result['Value']]
+    if not dirIDs:
+      return S_OK(0)
+    result = self.getDirectoryPaths(dirIDs)
+    if not result['OK']:
+      return result
+    for dirID, path in result['Value'].items():
+      self.dirCache.add(path, dirID)
+    return S_OK(len(result['Value']))
+
+  def getClosureTable(self):
+    """ Get the name of the table with a ( ParentID, ChildID, Depth ) row for each directory and each of
+        its ancestors including itself, if the directory manager has one
+
+        :return: table name or None
+    """
+    return None
+
+  def getDirectoryCacheStats(self):
+    """ Get the counters of the cache of the directory paths and IDs
+
+        :return: dict
+    """
+    return self.dirCache.getStats()
+
   def makeDirectory(self, path, credDict, status=0):
     """Create a new directory. The return value is the dictionary
        containing all the parameters of the newly created directory
@@ -111,6 +172,7 @@ class DirectoryTreeBase(object):
       return result
     dirID = result['Value']
     if result['NewDirectory']:
+      self.treeVersion += 1
       req = "INSERT INTO FC_DirectoryInfo (DirID,UID,GID,CreationDate,ModificationDate,Mode,Status) Values "
       req = req + "(%d,%d,%d,UTC_TIMESTAMP(),UTC_TIMESTAMP(),%d,%d)" % (dirID, l_uid, l_gid, self.db.umask, status)
       result = self.db._update(req)
@@ -124,6 +186,10 @@ class DirectoryTreeBase(object):
     if not dirDict:
       self.removeDir(path)
       return S_ERROR('Failed to create directory %s' % path)
+    if self.db.dmeta:
+      result = self.db.dmeta.indexNewDirectory(dirID, path)
+      if not result['OK']:
+        gLogger.error('Failed to add the directory to the metadata index', '%s: %s' % (path, result['Message']))
     return S_OK(dirID)
 
 #####################################################################
@@ -786,7 +852,11 @@ class DirectoryTreeBase(object):
         failed[path] = "Directory not found"
         continue
       dirID = result['Value']
-      req = "SELECT SESize, SEFiles FROM FC_DirectoryUsage WHERE SEID=0 AND DirID=%d" % dirID
+      if self.db.usageWriteBehind:
+        # Add the pending changes of the journal in the same query, to read a consistent snapshot
+        req = "SELECT SUM(U.SESize), SUM(U.SEFiles) FROM ( %s ) AS U" % self.__getUsageUnion(dirID, 'SEID=0')
+      else:
+        req = "SELECT SESize, SEFiles FROM FC_DirectoryUsage WHERE SEID=0 AND DirID=%d" % dirID
 
       result = self.db._query(req, connection)
       if not result['OK']:
@@ -872,8 +942,13 @@ class DirectoryTreeBase(object):
         continue
       dirID = result['Value']
 
-      req = "SELECT S.SEID, S.SEName, D.SESize, D.SEFiles FROM FC_DirectoryUsage as D, FC_StorageElements as S"
-      req += "  WHERE S.SEID=D.SEID AND D.DirID=%d" % dirID
+      if self.db.usageWriteBehind:
+        req = "SELECT S.SEID, S.SEName, SUM(D.SESize), SUM(D.SEFiles) FROM ( %s ) as D, FC_StorageElements as S" % \
+            self.__getUsageUnion(dirID)
+        req += "  WHERE S.SEID=D.SEID GROUP BY S.SEID, S.SEName"
+      else:
+        req = "SELECT S.SEID, S.SEName, D.SESize, D.SEFiles FROM FC_DirectoryUsage as D, FC_StorageElements as S"
+        req += "  WHERE S.SEID=D.SEID AND D.DirID=%d" % dirID
       result = self.db._query(req, connection)
       if not result['OK']:
         failed[path] = result['Message']
@@ -888,7 +963,8 @@ class DirectoryTreeBase(object):
             seDict[seName] = {'Size': seSize, 'Files': seFiles}
             totalSize += seSize
             totalFiles += seFiles
-          else:
+          elif not self.db.usageWriteBehind:
+            # With pending changes in the journal, the empty entries are left to the next flush
             req = 'DELETE FROM FC_DirectoryUsage WHERE SEID=%d AND DirID=%d' % (seID, dirID)
             result = self.db._update(req)
             if not result['OK']:
@@ -901,6 +977,22 @@ class DirectoryTreeBase(object):
 
     return S_OK({'Successful': successful, 'Failed': failed})
 
+  @staticmethod
+  def __getUsageUnion(dirID, condition=None):
+    """ Get the query of the FC_DirectoryUsage entries of a directory together with the pending
+        changes of the FC_DirectoryUsageJournal
+
+        :param int dirID: directory ID
+        :param str condition: additional condition on the entries
+
+        :return: str query returning the SEID, SESize and SEFiles columns
+    """
+    where = "DirID=%d" % dirID
+    if condition:
+      where += " AND %s" % condition
+    return "SELECT SEID, SESize, SEFiles FROM FC_DirectoryUsage WHERE %s UNION ALL " \
+           "SELECT SEID, SESize, SEFiles FROM FC_DirectoryUsageJournal WHERE %s" % (where, where)
+
   def _getDirectoryPhysicalSizeFromUsage_old(self, lfns, connection):
     """ Get the total size of the requested directories
     """
@@ -1009,6 +1101,12 @@ class DirectoryTreeBase(object):
     """ Recreate and replenish the Storage Usage tables
     """
 
+    # The pending changes of the journal are superseded by the rebuilt usage
+    req = "DELETE FROM FC_DirectoryUsageJournal"
+    result = self.db._update(req)
+    if not result['OK']:
+      gLogger.warn('Failed to clear FC_DirectoryUsageJournal', result['Message'])
+
     req = "DROP TABLE IF EXISTS FC_DirectoryUsage_backup"
     result = self.db._update(req)
     req = "RENAME TABLE FC_DirectoryUsage TO FC_DirectoryUsage_backup"
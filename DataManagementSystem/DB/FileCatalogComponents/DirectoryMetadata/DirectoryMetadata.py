@@ -10,15 +10,30 @@ __RCSID__ = "$Id$"
 
 import six
 import os
+import threading
+import time
+
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.List import intListToString
 from DIRAC.Core.Utilities.Time import queryTime
 
+# Lifetime of the statistics of the metadata fields and of the cached directory sets, as other
+# FileCatalog services sharing the database can change the metadata
+META_CACHE_LIFETIME = 300
+# Maximum number of cached directory sets
+MAX_CACHED_DIR_SETS = 1000
+
 
 class DirectoryMetadata(object):
 
   def __init__(self, database=None):
 
     self.db = database
+    self.__cacheLock = threading.Lock()
+    # { metaName : ( time, number of directories defining it, number of distinct values ) }
+    self.__metaFieldStats = {}
+    # { ( metaName, value, pathSelection ) : ( time, dtree version, frozenset of DirIDs ) }
+    self.__dirSetCache = {}
 
   def setDatabase(self, database):
     self.db = database
@@ -52,32 +67,30 @@ class DirectoryMetadata(object):
       return S_ERROR('Attempt to add an existing metadata with different type: %s/%s' %
                      (pType, result['Value'][pName]))
 
-    valueType = pType
-    if pType.lower()[:3] == 'int':
-      valueType = 'INT'
-    elif pType.lower() == 'string':
-      valueType = 'VARCHAR(128)'
-    elif pType.lower() == 'float':
-      valueType = 'FLOAT'
-    elif pType.lower() == 'date':
-      valueType = 'DATETIME'
-    elif pType == "MetaSet":
-      valueType = "VARCHAR(64)"
-
+    valueType = self.__getValueType(pType)
     req = "CREATE TABLE FC_Meta_%s ( DirID INTEGER NOT NULL, Value %s, PRIMARY KEY (DirID), INDEX (Value) )" \
         % (pName, valueType)
     result = self.db._query(req)
     if not result['OK']:
       return result
+    if self.db.inheritedMetadataIndex:
+      result = self.__createMetaIndexTable(pName, pType)
+      if not result['OK']:
+        return result
 
     result = self.db.insertFields('FC_MetaFields', ['MetaName', 'MetaType'], [pName, pType])
     if not result['OK']:
       return result
 
     metadataID = result['lastRowId']
+    self._clearMetaCaches(pName)
     result = self.__transformMetaParameterToData(pName)
     if not result['OK']:
       return result
+    if self.db.inheritedMetadataIndex:
+      result = self.__rebuildMetaIndex(pName)
+      if not result['OK']:
+        return result
 
     return S_OK("Added new metadata: %d" % metadataID)
 
@@ -90,11 +103,16 @@ class DirectoryMetadata(object):
         :return: S_OK/S_ERROR
     """
 
+    self._clearMetaCaches(pName)
     req = "DROP TABLE FC_Meta_%s" % pName
     result = self.db._update(req)
     error = ''
     if not result['OK']:
       error = result["Message"]
+    req = "DROP TABLE IF EXISTS FC_MetaIndex_%s" % pName
+    result = self.db._update(req)
+    if not result['OK']:
+      error = '; '.join([msg for msg in (error, result['Message']) if msg])
     req = "DELETE FROM FC_MetaFields WHERE MetaName='%s'" % pName
     result = self.db._update(req)
     if not result['OK']:
@@ -102,6 +120,27 @@ class DirectoryMetadata(object):
         result["Message"] = error + "; " + result["Message"]
     return result
 
+  @staticmethod
+  def __getValueType(pType):
+    """ Get the MySQL type of the values of a metadata field
+
+        :param str pType: metadata type, as given by the user
+
+        :return: MySQL type
+    """
+    valueType = pType
+    if pType.lower()[:3] == 'int':
+      valueType = 'INT'
+    elif pType.lower() == 'string':
+      valueType = 'VARCHAR(128)'
+    elif pType.lower() == 'float':
+      valueType = 'FLOAT'
+    elif pType.lower() == 'date':
+      valueType = 'DATETIME'
+    elif pType == "MetaSet":
+      valueType = "VARCHAR(64)"
+    return valueType
+
   def getMetadataFields(self, credDict):
     """ Get all the defined metadata fields
 
@@ -240,6 +279,7 @@ class DirectoryMetadata(object):
       # Check that the metadata is not defined for the parent directories
       if metaName in dirmeta['Value']:
         return S_ERROR('Metadata conflict detected for %s for directory %s' % (metaName, dPath))
+      self._clearMetaCaches(metaName)
       result = self.db.insertFields('FC_Meta_%s' % metaName, ['DirID', 'Value'], [dirID, metaValue])
       if not result['OK']:
         if result['Message'].find('Duplicate') != -1:
@@ -249,6 +289,9 @@ class DirectoryMetadata(object):
             return result
         else:
           return result
+      result = self.__updateMetaIndex(metaName, dirID)
+      if not result['OK']:
+        return result
 
     return S_OK()
 
@@ -277,10 +320,13 @@ class DirectoryMetadata(object):
     for meta in metaData:
       if meta in metaFields:
         # Indexed meta case
+        self._clearMetaCaches(meta)
         req = "DELETE FROM FC_Meta_%s WHERE DirID=%d" % (meta, dirID)
         result = self.db._update(req)
+        if result['OK']:
+          result = self.__updateMetaIndex(meta, dirID)
         if not result['OK']:
-          failedMeta[meta] = result['Value']
+          failedMeta[meta] = result['Message']
       else:
         # Meta parameter case
         req = "DELETE FROM FC_DirMeta WHERE MetaKey='%s' AND DirID=%d" % (meta, dirID)
@@ -376,10 +422,20 @@ class DirectoryMetadata(object):
         :return: S_OK/S_ERROR, Value dictionary of metadata
     """
 
-    result = self.db.dtree.getPathIDs(path)
-    if not result['OK']:
-      return result
-    pathIDs = result['Value']
+    useIndex = self.db.inheritedMetadataIndex and inherited and ownData
+    if useIndex:
+      # The index gives the effective metadata of the directory, no need for the parent directories
+      result = self.db.dtree.findDir(path)
+      if not result['OK']:
+        return result
+      if not result['Value']:
+        return S_ERROR('Directory %s not found' % path)
+      pathIDs = [result['Value']]
+    else:
+      result = self.db.dtree.getPathIDs(path)
+      if not result['OK']:
+        return result
+      pathIDs = result['Value']
 
     result = self._getMetadataFields(credDict)
     if not result['OK']:
@@ -397,7 +453,10 @@ class DirectoryMetadata(object):
     pathString = ','.join([str(x) for x in pathIDs])
 
     for meta in metaFields:
-      req = "SELECT Value,DirID FROM FC_Meta_%s WHERE DirID in (%s)" % (meta, pathString)
+      if useIndex:
+        req = "SELECT Value,OwnerID FROM FC_MetaIndex_%s WHERE DirID=%d" % (meta, dirID)
+      else:
+        req = "SELECT Value,DirID FROM FC_Meta_%s WHERE DirID in (%s)" % (meta, pathString)
       result = self.db._query(req)
       if not result['OK']:
         return result
@@ -661,6 +720,270 @@ class DirectoryMetadata(object):
     else:
       return S_OK(result['Value'][0][0])
 
+  def _clearMetaCaches(self, metaName=None):
+    """ Forget the statistics and the cached directory sets of a metadata field, or of all of them
+
+        :param str metaName: metadata name, None for all the fields
+    """
+    with self.__cacheLock:
+      if metaName is None:
+        self.__metaFieldStats.clear()
+        self.__dirSetCache.clear()
+      else:
+        self.__metaFieldStats.pop(metaName, None)
+        for key in [key for key in self.__dirSetCache if key[0] == metaName]:
+          del self.__dirSetCache[key]
+
+  def __getMetaFieldStats(self, metaName):
+    """ Get the number of directories defining the given metadata and the number of its distinct values
+
+        :param str metaName: metadata name
+
+        :return: S_OK/S_ERROR, Value tuple ( directories, distinct values )
+    """
+    now = time.time()
+    with self.__cacheLock:
+      stats = self.__metaFieldStats.get(metaName)
+    if stats and now - stats[0] < META_CACHE_LIFETIME:
+      return S_OK(stats[1:])
+
+    req = "SELECT COUNT(*), COUNT(DISTINCT Value) FROM FC_Meta_%s" % metaName
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    nDirs, nValues = result['Value'][0]
+    with self.__cacheLock:
+      self.__metaFieldStats[metaName] = (now, nDirs, nValues)
+    return S_OK((nDirs, nValues))
+
+  def __estimateMetaSelection(self, metaName, value):
+    """ Estimate the number of directories defining the given metadata with a value satisfying
+        the selection, assuming the directories are evenly spread over the distinct values
+
+        :param str metaName: metadata name
+        :param value: selection of the metadata value, as in the queries
+
+        :return: S_OK/S_ERROR, Value estimated number of directories
+    """
+    if value == 'Missing':
+      # Always evaluated last, it selects all the directories but those defining the metadata
+      return S_OK(float('inf'))
+    result = self.__getMetaFieldStats(metaName)
+    if not result['OK']:
+      return result
+    nDirs, nValues = result['Value']
+    dirsPerValue = float(nDirs) / max(nValues, 1)
+
+    if value == 'Any':
+      estimate = nDirs
+    elif isinstance(value, list):
+      estimate = dirsPerValue * len(value)
+    elif isinstance(value, dict):
+      estimate = nDirs
+      for operation, operand in value.items():
+        if operation in ['in', '=']:
+          nSelected = len(operand) if isinstance(operand, list) else 1
+          estimate = min(estimate, dirsPerValue * nSelected)
+        elif operation in ['>', '<', '>=', '<=']:
+          estimate = min(estimate, nDirs / 3.)
+    else:
+      estimate = dirsPerValue
+    return S_OK(min(estimate, nDirs))
+
+  def __planMetaSelections(self, metaDict):
+    """ Order the metadata selections by increasing estimated number of selected directories
+
+        :param dict metaDict: metadata selections
+
+        :return: S_OK/S_ERROR, Value list of ( metaName, value ) tuples
+    """
+    estimates = {}
+    for metaName, value in metaDict.items():
+      result = self.__estimateMetaSelection(metaName, value)
+      if not result['OK']:
+        return result
+      estimates[metaName] = result['Value']
+    return S_OK([(metaName, metaDict[metaName])
+                 for metaName in sorted(metaDict, key=lambda name: (estimates[name], name))])
+
+  def __getSelectedDirSet(self, metaName, value, pathSelection):
+    """ Get the set of directories defining the given metadata with a value satisfying the selection
+        and their subdirectories, which inherit the metadata
+
+        :param str metaName: metadata name
+        :param value: selection of the metadata value, as in the queries
+        :param str pathSelection: directory path selection string
+
+        :return: S_OK/S_ERROR, Value frozenset of directory IDs
+    """
+    key = (metaName, repr(value), pathSelection)
+    treeVersion = self.db.dtree.treeVersion
+    now = time.time()
+    with self.__cacheLock:
+      cached = self.__dirSetCache.get(key)
+    if cached and cached[1] == treeVersion and now - cached[0] < META_CACHE_LIFETIME:
+      return S_OK(cached[2])
+
+    if value == "Missing":
+      result = self.__findSubdirMissingMeta(metaName, pathSelection)
+    else:
+      result = self.__findSubdirByMeta(metaName, value, pathSelection)
+    if not result['OK']:
+      return result
+    dirSet = frozenset(result['Value'])
+    with self.__cacheLock:
+      if len(self.__dirSetCache) >= MAX_CACHED_DIR_SETS:
+        self.__dirSetCache.clear()
+      self.__dirSetCache[key] = (now, treeVersion, dirSet)
+    return S_OK(dirSet)
+
+  def __findDirIDsWithClosure(self, metaSelections, pathDirID, closureTable):
+    """ Find the directories satisfying all the metadata selections with a single query joining the
+        metadata tables with the closure table of the directory tree, in the order of the selections
+
+        :param list metaSelections: list of ( metaName, value ) tuples
+        :param int pathDirID: ID of the directory the selected directories must be in, 0 for all
+        :param str closureTable: name of the closure table
+
+        :return: S_OK/S_ERROR, Value list of directory IDs
+    """
+    tables = []
+    conditions = []
+    childID = None
+    for index, (metaName, value) in enumerate(metaSelections):
+      if value == 'Missing':
+        continue
+      result = self.__createMetaSelection(value, "M%d." % index)
+      if not result['OK']:
+        return result
+      selectString = result['Value']
+      if childID is None:
+        # The most selective metadata table drives the query
+        tables.append("FC_Meta_%s AS M%d JOIN %s AS C%d ON C%d.ParentID=M%d.DirID" %
+                      (metaName, index, closureTable, index, index, index))
+        childID = "C%d.ChildID" % index
+        if selectString:
+          conditions.append(selectString)
+      else:
+        table = "JOIN %s AS C%d ON C%d.ChildID=%s JOIN FC_Meta_%s AS M%d ON M%d.DirID=C%d.ParentID" % \
+            (closureTable, index, index, childID, metaName, index, index, index)
+        if selectString:
+          table += " AND %s" % selectString
+        tables.append(table)
+
+    if childID is None:
+      tables.append("%s AS D" % closureTable)
+      childID = "D.ChildID"
+      conditions.append("D.Depth=0")
+
+    for index, (metaName, value) in enumerate(metaSelections):
+      if value == 'Missing':
+        conditions.append("NOT EXISTS ( SELECT 1 FROM %s AS C%d JOIN FC_Meta_%s AS M%d ON M%d.DirID=C%d.ParentID "
+                          "WHERE C%d.ChildID=%s )" % (closureTable, index, metaName, index, index, index, index,
+                                                      childID))
+
+    if pathDirID:
+      conditions.append("%s IN ( SELECT ChildID FROM %s WHERE ParentID=%d )" % (childID, closureTable, pathDirID))
+
+    req = "SELECT DISTINCT STRAIGHT_JOIN %s FROM %s" % (childID, ' '.join(tables))
+    if conditions:
+      req += " WHERE %s" % ' AND '.join(conditions)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    return S_OK([row[0] for row in result['Value']])
+
+  def __findDirIDsWithIndex(self, metaSelections, pathSelection):
+    """ Find the directories satisfying all the metadata selections with a single query joining the
+        tables of the inherited metadata index, in the order of the selections
+
+        :param list metaSelections: list of ( metaName, value ) tuples
+        :param str pathSelection: directory path selection string
+
+        :return: S_OK/S_ERROR, Value list of directory IDs
+    """
+    tables = []
+    conditions = []
+    dirID = None
+    for index, (metaName, value) in enumerate(metaSelections):
+      if value == 'Missing':
+        continue
+      result = self.__createMetaSelection(value, "I%d." % index)
+      if not result['OK']:
+        return result
+      selectString = result['Value']
+      if dirID is None:
+        tables.append("FC_MetaIndex_%s AS I%d" % (metaName, index))
+        dirID = "I%d.DirID" % index
+        if selectString:
+          conditions.append(selectString)
+      else:
+        table = "JOIN FC_MetaIndex_%s AS I%d ON I%d.DirID=%s" % (metaName, index, index, dirID)
+        if selectString:
+          table += " AND %s" % selectString
+        tables.append(table)
+
+    if dirID is None:
+      tables.append("FC_DirectoryInfo AS D")
+      dirID = "D.DirID"
+
+    for index, (metaName, value) in enumerate(metaSelections):
+      if value == 'Missing':
+        conditions.append("NOT EXISTS ( SELECT 1 FROM FC_MetaIndex_%s AS I%d WHERE I%d.DirID=%s )" %
+                          (metaName, index, index, dirID))
+
+    if pathSelection:
+      conditions.append("%s IN ( %s )" % (dirID, pathSelection))
+
+    req = "SELECT STRAIGHT_JOIN %s FROM %s" % (dirID, ' '.join(tables))
+    if conditions:
+      req += " WHERE %s" % ' AND '.join(conditions)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    return S_OK([row[0] for row in result['Value']])
+
+  def __findDirIDsByMetaSelections(self, metaDict, pathDirID):
+    """ Find the directories satisfying all the metadata selections, directly or by inheritance.
+        The selections are evaluated by increasing estimated number of selected directories: in a
+        single query of the inherited metadata index if it is enabled, or joining the closure table
+        of the directory tree if it has one, otherwise by intersecting the cached sets of directories
+        selected by each of them, stopping as soon as the intersection is empty.
+
+        :param dict metaDict: metadata selections
+        :param int pathDirID: ID of the directory the selected directories must be in, 0 for all
+
+        :return: S_OK/S_ERROR, Value list of directory IDs
+    """
+    result = self.__planMetaSelections(metaDict)
+    if not result['OK']:
+      return result
+    metaSelections = result['Value']
+
+    closureTable = self.db.dtree.getClosureTable()
+    if closureTable and not self.db.inheritedMetadataIndex:
+      return self.__findDirIDsWithClosure(metaSelections, pathDirID, closureTable)
+
+    pathSelection = ''
+    if pathDirID:
+      result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True, requestString=True)
+      if not result['OK']:
+        return result
+      pathSelection = result['Value']
+
+    if self.db.inheritedMetadataIndex:
+      return self.__findDirIDsWithIndex(metaSelections, pathSelection)
+
+    dirSet = None
+    for metaName, value in metaSelections:
+      result = self.__getSelectedDirSet(metaName, value, pathSelection)
+      if not result['OK']:
+        return result
+      dirSet = result['Value'] if dirSet is None else dirSet & result['Value']
+      if not dirSet:
+        break
+    return S_OK(list(dirSet))
+
   @queryTime
   def findDirIDsByMetadata(self, queryDict, path, credDict):
     """ Find Directories satisfying the given metadata and being subdirectories of
@@ -702,31 +1025,10 @@ class DirectoryMetadata(object):
         del finalMetaDict[meta]
 
     if finalMetaDict:
-      pathSelection = ''
-      if pathDirID:
-        result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True, requestString=True)
-        if not result['OK']:
-          return result
-        pathSelection = result['Value']
-      dirList = []
-      first = True
-      for meta, value in finalMetaDict.iteritems():
-        if value == "Missing":
-          result = self.__findSubdirMissingMeta(meta, pathSelection)
-        else:
-          result = self.__findSubdirByMeta(meta, value, pathSelection)
-        if not result['OK']:
-          return result
-        mList = result['Value']
-        if first:
-          dirList = mList
-          first = False
-        else:
-          newList = []
-          for d in dirList:
-            if d in mList:
-              newList.append(d)
-          dirList = newList
+      result = self.__findDirIDsByMetaSelections(finalMetaDict, pathDirID)
+      if not result['OK']:
+        return result
+      dirList = result['Value']
     else:
       if pathDirID:
         result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
@@ -960,7 +1262,11 @@ class DirectoryMetadata(object):
     anyMeta = True
     if metaDict:
       anyMeta = False
-      for meta, value in metaDict.iteritems():
+      # The most selective metadata first, to restrict the following searches as early as possible
+      result = self.__planMetaSelections(metaDict)
+      if not result['OK']:
+        return result
+      for meta, value in result['Value']:
         result = self.__findCompatibleDirectories(meta, value, fromList)
         if not result['OK']:
           return result
@@ -1001,13 +1307,234 @@ class DirectoryMetadata(object):
     if not result['OK']:
       return result
     metaFields = result['Value']
+    self._clearMetaCaches()
 
     for meta in metaFields:
       req = "DELETE FROM FC_Meta_%s WHERE DirID in ( %s )" % (meta, dirListString)
       result = self.db._query(req)
+      if result['OK'] and self.db.inheritedMetadataIndex:
+        req = "DELETE FROM FC_MetaIndex_%s WHERE DirID in ( %s )" % (meta, dirListString)
+        result = self.db._query(req)
       if not result['OK']:
         failed[meta] = result['Message']
       else:
         successful[meta] = 'OK'
 
     return S_OK({'Successful': successful, 'Failed': failed})
+
+################################################################################################
+#
+# Index of the inherited metadata: for each metadata field, the FC_MetaIndex_<field> table gives
+# the value of the metadata for every directory defining it or inheriting it, and the OwnerID of
+# the directory defining it
+
+  def __createMetaIndexTable(self, metaName, metaType):
+    """ Create the index table of a metadata field if it does not exist
+
+        :param str metaName: metadata name
+        :param str metaType: metadata type, as given by the user
+
+        :return: S_OK/S_ERROR
+    """
+    req = "CREATE TABLE IF NOT EXISTS FC_MetaIndex_%s ( DirID INTEGER NOT NULL, Value %s, " \
+          "OwnerID INTEGER NOT NULL, PRIMARY KEY (DirID), INDEX (Value), INDEX (OwnerID) )" % \
+          (metaName, self.__getValueType(metaType))
+    return self.db._update(req)
+
+  def __computeMetaIndex(self, definitions, inherited=None, subtree=None):
+    """ Compute the effective value of a metadata for the directories defining it and their subdirectories
+
+        :param dict definitions: { DirID : value } for the directories defining the metadata
+        :param tuple inherited: ( value, OwnerID ) of the metadata inherited by all the directories of subtree
+        :param list subtree: directory IDs of the subtree in which the definitions are
+
+        :return: S_OK/S_ERROR, Value dictionary { DirID : ( value, OwnerID ) }
+    """
+    subdirs = {}
+    for ownerID in definitions:
+      result = self.db.dtree.getSubdirectoriesByID(ownerID, includeParent=True)
+      if not result['OK']:
+        return result
+      subdirs[ownerID] = list(result['Value']) or [ownerID]
+
+    indexDict = {}
+    if inherited:
+      indexDict = dict.fromkeys(subtree, tuple(inherited))
+    # A directory defining the metadata below another one has a smaller subtree, and its value
+    # takes precedence in its subtree
+    for ownerID in sorted(subdirs, key=lambda dirID: len(subdirs[dirID]), reverse=True):
+      for dirID in subdirs[ownerID]:
+        indexDict[dirID] = (definitions[ownerID], ownerID)
+    return S_OK(indexDict)
+
+  def __updateMetaIndex(self, metaName, dirID):
+    """ Update the index of a metadata for a directory and its subdirectories after a change of its
+        value for the directory
+
+        :param str metaName: metadata name
+        :param int dirID: directory ID
+
+        :return: S_OK/S_ERROR
+    """
+    if not self.db.inheritedMetadataIndex:
+      return S_OK()
+
+    result = self.db.dtree.getSubdirectoriesByID(dirID, includeParent=True)
+    if not result['OK']:
+      return result
+    subtree = list(result['Value']) or [dirID]
+    subtreeString = intListToString(subtree)
+
+    req = "SELECT DirID,Value FROM FC_Meta_%s WHERE DirID IN (%s)" % (metaName, subtreeString)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    definitions = dict(result['Value'])
+
+    # Value inherited from the parent directory, if the directory does not define it
+    inherited = None
+    if dirID not in definitions:
+      result = self.db.dtree.getDirectoryPath(dirID)
+      if not result['OK']:
+        return result
+      path = result['Value']
+      if path != '/':
+        result = self.db.dtree.findDir(os.path.dirname(path))
+        if not result['OK']:
+          return result
+        req = "SELECT Value,OwnerID FROM FC_MetaIndex_%s WHERE DirID=%d" % (metaName, result['Value'])
+        result = self.db._query(req)
+        if not result['OK']:
+          return result
+        if result['Value']:
+          inherited = result['Value'][0]
+
+    result = self.__computeMetaIndex(definitions, inherited, subtree)
+    if not result['OK']:
+      return result
+    indexDict = result['Value']
+
+    req = "DELETE FROM FC_MetaIndex_%s WHERE DirID IN (%s)" % (metaName, subtreeString)
+    result = self.db._update(req)
+    if not result['OK']:
+      return result
+    return self.db.insertMultipleFields('FC_MetaIndex_%s' % metaName, ['DirID', 'Value', 'OwnerID'],
+                                        [[dID, value, ownerID] for dID, (value, ownerID) in indexDict.items()])
+
+  def __getMetaIndexFromDefinitions(self, metaName):
+    """ Compute the whole index of a metadata from the directories defining it
+
+        :param str metaName: metadata name
+
+        :return: S_OK/S_ERROR, Value dictionary { DirID : ( value, OwnerID ) }
+    """
+    req = "SELECT DirID,Value FROM FC_Meta_%s" % metaName
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    return self.__computeMetaIndex(dict(result['Value']))
+
+  def __rebuildMetaIndex(self, metaName):
+    """ Rebuild the index of a metadata from scratch
+
+        :param str metaName: metadata name
+
+        :return: S_OK/S_ERROR, Value number of indexed directories
+    """
+    result = self.__getMetaIndexFromDefinitions(metaName)
+    if not result['OK']:
+      return result
+    indexDict = result['Value']
+
+    result = self.db._update("DELETE FROM FC_MetaIndex_%s" % metaName)
+    if not result['OK']:
+      return result
+    result = self.db.insertMultipleFields('FC_MetaIndex_%s' % metaName, ['DirID', 'Value', 'OwnerID'],
+                                          [[dirID, value, ownerID] for dirID, (value, ownerID) in indexDict.items()])
+    if not result['OK']:
+      return result
+    return S_OK(len(indexDict))
+
+  def rebuildMetadataIndex(self, credDict):
+    """ Rebuild from scratch the index of the inherited metadata, creating its tables if needed
+
+        :param dict credDict: client credential dictionary
+
+        :return: S_OK/S_ERROR, Value dictionary { metaName : number of indexed directories }
+    """
+    if not self.db.inheritedMetadataIndex:
+      return S_ERROR('The inherited metadata index is not enabled')
+    result = self._getMetadataFields(credDict)
+    if not result['OK']:
+      return result
+    metaFields = result['Value']
+
+    indexed = {}
+    for metaName, metaType in metaFields.items():
+      result = self.__createMetaIndexTable(metaName, metaType)
+      if not result['OK']:
+        return result
+      result = self.__rebuildMetaIndex(metaName)
+      if not result['OK']:
+        return result
+      indexed[metaName] = result['Value']
+    return S_OK(indexed)
+
+  def checkMetadataIndex(self, credDict):
+    """ Check the index of the inherited metadata against the metadata defined in the directory tree
+
+        :param dict credDict: client credential dictionary
+
+        :return: S_OK/S_ERROR, Value dictionary { metaName : { 'Missing' : n, 'Wrong' : n, 'Extra' : n } }
+                 with the number of directories missing from the index, with a wrong value or owner
+                 in the index and indexed while they should not be
+    """
+    if not self.db.inheritedMetadataIndex:
+      return S_ERROR('The inherited metadata index is not enabled')
+    result = self._getMetadataFields(credDict)
+    if not result['OK']:
+      return result
+    metaFields = result['Value']
+
+    report = {}
+    for metaName in metaFields:
+      result = self.__getMetaIndexFromDefinitions(metaName)
+      if not result['OK']:
+        return result
+      expected = result['Value']
+      result = self.db._query("SELECT DirID,Value,OwnerID FROM FC_MetaIndex_%s" % metaName)
+      if not result['OK']:
+        return result
+      indexDict = dict((dirID, (value, ownerID)) for dirID, value, ownerID in result['Value'])
+
+      report[metaName] = {'Missing': len(set(expected) - set(indexDict)),
+                          'Extra': len(set(indexDict) - set(expected)),
+                          'Wrong': len([dirID for dirID in set(expected) & set(indexDict)
+                                        if expected[dirID] != indexDict[dirID]])}
+    return S_OK(report)
+
+  def indexNewDirectory(self, dirID, path):
+    """ Add to the inherited metadata index a new directory, inheriting the metadata of its parent
+
+        :param int dirID: ID of the new directory
+        :param str path: path of the new directory
+
+        :return: S_OK/S_ERROR
+    """
+    if not self.db.inheritedMetadataIndex or path == '/':
+      return S_OK()
+    result = self.db.dtree.findDir(os.path.dirname(path))
+    if not result['OK']:
+      return result
+    parentID = result['Value']
+    result = self._getMetadataFields({})
+    if not result['OK']:
+      return result
+
+    for metaName in result['Value']:
+      req = "INSERT INTO FC_MetaIndex_%s (DirID,Value,OwnerID) " % metaName
+      req += "SELECT %d,Value,OwnerID FROM FC_MetaIndex_%s WHERE DirID=%d" % (dirID, metaName, parentID)
+      result = self.db._update(req)
+      if not result['OK']:
+        return result
+    return S_OK()
@@ -819,3 +819,77 @@ class FileManager(FileManagerBase):
 
     result = self.db._query(req, connection)
     return result
+
+  def _getSEDumpChunk(self, seID, lastRepID, chunkSize):
+    """ Get a chunk of the replicas at a given SE, ordered by replica ID
+
+        :param int seID: ID of the StorageElement
+        :param int lastRepID: the replicas with a larger ID are returned
+        :param int chunkSize: maximum number of replicas
+
+        :returns: S_OK with list of tuples (repID, lfn, checksum, size)
+    """
+    req = "SELECT R.RepID, F.DirID, F.FileName, I.Checksum, F.Size FROM FC_Replicas AS R "
+    req += "JOIN FC_Files AS F ON F.FileID=R.FileID JOIN FC_FileInfo AS I ON I.FileID=F.FileID "
+    req += "WHERE R.SEID=%d AND R.RepID>%d ORDER BY R.RepID LIMIT %d" % (seID, lastRepID, chunkSize)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_OK([])
+    return self._getSEDumpLFNs(result['Value'])
+
+  def _findFilesInSubtree(self, dirID, filters, lastFileID, chunkSize):
+    """ Get a chunk of the files of a directory subtree, ordered by file ID
+
+        :param int dirID: ID of the top directory of the subtree
+        :param dict filters: validated filters, the statuses being a list and the dates strings
+        :param int lastFileID: the files with a larger ID are returned
+        :param int chunkSize: maximum number of files
+
+        :returns: S_OK with list of tuples (fileID, lfn)
+    """
+    result = self.db.dtree.getSubdirectoriesByID(dirID, requestString=True, includeParent=True)
+    if not result['OK']:
+      return result
+    conditions = ["F.DirID IN ( %s )" % result['Value'], "F.FileID>%d" % lastFileID]
+
+    if filters.get('MinSize') is not None:
+      conditions.append("F.Size>=%d" % int(filters['MinSize']))
+    if filters.get('MaxSize') is not None:
+      conditions.append("F.Size<=%d" % int(filters['MaxSize']))
+    if filters.get('Status'):
+      result = self.db._escapeValues(filters['Status'])
+      if not result['OK']:
+        return result
+      conditions.append("F.Status IN ( SELECT StatusID FROM FC_Statuses WHERE Status IN ( %s ) )" %
+                        ','.join(result['Value']))
+    joinInfo = False
+    for key, field, operation in (('CreatedAfter', 'CreationDate', '>='),
+                                  ('CreatedBefore', 'CreationDate', '<'),
+                                  ('ModifiedAfter', 'ModificationDate', '>='),
+                                  ('ModifiedBefore', 'ModificationDate', '<')):
+      if filters.get(key):
+        result = self.db._escapeString(filters[key])
+        if not result['OK']:
+          return result
+        conditions.append("I.%s%s%s" % (field, operation, result['Value']))
+        joinInfo = True
+
+    req = "SELECT F.FileID, F.DirID, F.FileName FROM FC_Files AS F "
+    if joinInfo:
+      req += "JOIN FC_FileInfo AS I ON I.FileID=F.FileID "
+    req += "WHERE %s ORDER BY F.FileID LIMIT %d" % (' AND '.join(conditions), chunkSize)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    rows = result['Value']
+    if not rows:
+      return S_OK([])
+
+    result = self.db.dtree.getDirectoryPaths(list(set(row[1] for row in rows)))
+    if not result['OK']:
+      return result
+    dirPaths = result['Value']
+    return S_OK([(fileID, os.path.join(dirPaths[dirID], fileName) if dirID in dirPaths else None)
+                 for fileID, dirID, fileName in rows])
@@ -11,10 +11,20 @@ __RCSID__ = "$Id$"
 import six
 import os
 import stat
+import datetime
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.Core.Utilities.List import intListToString
+from DIRAC.Core.Utilities.List import intListToString, breakListIntoChunks
 from DIRAC.Core.Utilities.Pfn import pfnunparse
+from DIRAC.Core.Utilities.Time import fromString, toString
+
+# Number of files per query of the replicas of many files
+REPLICA_CHUNK_SIZE = 10000
+# Number of replicas per query of the SE dumps
+SE_DUMP_CHUNK_SIZE = 10000
+# Filters of the files searched in a directory subtree
+SUBTREE_FILTERS = ['MinSize', 'MaxSize', 'Status',
+                   'CreatedAfter', 'CreatedBefore', 'ModifiedAfter', 'ModifiedBefore']
 
 
 class FileManagerBase(object):
@@ -172,6 +182,65 @@ class FileManagerBase(object):
 
     return S_ERROR("To be implemented on derived class")
 
+  def _findFileIDsInBulk(self, lfns, connection=False):
+    """ Find lfn <-> FileID correspondence for many files at once: the IDs of all the directories
+        are resolved first, then the FileIDs are obtained with a single join of FC_Files with a
+        temporary table filled with the ( DirID, FileName ) of the files.
+        The temporary table belongs to the MySQL session, so it is not seen by the other threads.
+
+        :param lfns: list or dict of lfns
+
+        :returns: S_OK with the Successful/Failed convention, Successful being { lfn : FileID }
+    """
+    connection = self._getConnection(connection)
+    failed = {}
+    successful = {}
+
+    result = self.db.dtree.findDirs(list(set(os.path.dirname(lfn) for lfn in lfns)))
+    if not result['OK']:
+      return result
+    directoryIDs = result['Value']
+
+    # ( DirID, FileName ) -> lfn for the files in existing directories
+    lfnKeys = {}
+    for lfn in lfns:
+      dirID = directoryIDs.get(os.path.dirname(lfn))
+      if dirID:
+        lfnKeys[(dirID, os.path.basename(lfn))] = lfn
+      else:
+        failed[lfn] = "No such file or directory"
+
+    if lfnKeys:
+      tmpTable = 'FC_TmpFileNames'
+      req = "DROP TEMPORARY TABLE IF EXISTS %s" % tmpTable
+      result = self.db._update(req, connection)
+      if not result['OK']:
+        return result
+      req = "CREATE TEMPORARY TABLE %s ( DirID INT NOT NULL, " % tmpTable
+      req += "FileName VARCHAR(128) CHARACTER SET latin1 COLLATE latin1_bin NOT NULL, "
+      req += "PRIMARY KEY (DirID, FileName) ) ENGINE = MEMORY"
+      result = self.db._update(req, connection)
+      if not result['OK']:
+        return result
+      result = self.db.insertMultipleFields(tmpTable, ['DirID', 'FileName'], list(lfnKeys), conn=connection)
+      if result['OK']:
+        req = "SELECT T.DirID, T.FileName, F.FileID FROM %s AS T " % tmpTable
+        req += "JOIN FC_Files AS F ON F.DirID = T.DirID AND F.FileName = T.FileName"
+        result = self.db._query(req, connection)
+      self.db._update("DROP TEMPORARY TABLE IF EXISTS %s" % tmpTable, connection)
+      if not result['OK']:
+        return result
+      for dirID, fileName, fileID in result['Value']:
+        lfn = lfnKeys.get((dirID, fileName))
+        if lfn:
+          successful[lfn] = fileID
+
+    for lfn in lfns:
+      if lfn not in successful:
+        failed.setdefault(lfn, "No such file or directory")
+
+    return S_OK({"Successful": successful, "Failed": failed})
+
   def _getDirectoryReplicas(self, dirID, allStatus=False, connection=False):
     """ To be implemented on derived class
 
@@ -389,7 +458,16 @@ class FileManagerBase(object):
     return S_OK({'Successful': successful, 'Failed': failed})
 
   def _updateDirectoryUsage(self, directorySEDict, change, connection=False):
+    """ Propagate the usage changes of directories to all their parents. In the write-behind mode,
+        the changes are only appended to the FC_DirectoryUsageJournal table, and coalesced later
+        into FC_DirectoryUsage by flushDirectoryUsageJournal
+
+        :param dict directorySEDict: { dirID : { seID : { 'Files' : nFiles, 'Size' : size } } }
+        :param str change: '+' or '-'
+    """
     connection = self._getConnection(connection)
+    sign = -1 if change == '-' else 1
+    journalRows = []
     for directoryID in directorySEDict.keys():
       result = self.db.dtree.getPathIDsByID(directoryID)
       if not result['OK']:
@@ -400,6 +478,9 @@ class FileManagerBase(object):
         seDict = dirDict[seID]
         files = seDict['Files']
         size = seDict['Size']
+        if self.db.usageWriteBehind:
+          journalRows += [(dirID, seID, sign * size, sign * files) for dirID in parentIDs]
+          continue
         insertTuples = []
         for dirID in parentIDs:
           insertTuples.append('(%d,%d,%d,%d,UTC_TIMESTAMP())' % (dirID, seID, size, files))
@@ -411,8 +492,48 @@ class FileManagerBase(object):
         res = self.db._update(req)
         if not res['OK']:
           gLogger.warn("Failed to update FC_DirectoryUsage", res['Message'])
+    if journalRows:
+      res = self.db.insertMultipleFields('FC_DirectoryUsageJournal', ['DirID', 'SEID', 'SESize', 'SEFiles'],
+                                         journalRows)
+      if not res['OK']:
+        gLogger.warn("Failed to update FC_DirectoryUsageJournal", res['Message'])
     return S_OK()
 
+  def _createDirectoryUsageJournal(self):
+    """ Create the journal of the directory usage changes if it does not exist
+    """
+    req = "CREATE TABLE IF NOT EXISTS FC_DirectoryUsageJournal ( EntryID BIGINT NOT NULL AUTO_INCREMENT, " \
+          "DirID INTEGER NOT NULL, SEID INTEGER NOT NULL, SESize BIGINT NOT NULL, SEFiles BIGINT NOT NULL, " \
+          "PRIMARY KEY (EntryID), INDEX (DirID, SEID) ) ENGINE = INNODB"
+    return self.db._update(req)
+
+  def flushDirectoryUsageJournal(self):
+    """ Coalesce the journal of the directory usage changes into FC_DirectoryUsage. The journal entries
+        are summed per directory and SE, applied and removed in a single transaction, so that the
+        sum of FC_DirectoryUsage and of the journal stays exact for the readers
+
+        :return: S_OK( number of coalesced journal entries )/S_ERROR
+    """
+    result = self.db._query("SELECT MAX(EntryID) FROM FC_DirectoryUsageJournal")
+    if not result['OK']:
+      return result
+    maxID = result['Value'][0][0] if result['Value'] else None
+    if not maxID:
+      return S_OK(0)
+
+    reqInsert = "INSERT INTO FC_DirectoryUsage (DirID,SEID,SESize,SEFiles,LastUpdate) "
+    reqInsert += "SELECT J.DirID, J.SEID, J.Size, J.Files, UTC_TIMESTAMP() FROM "
+    reqInsert += "( SELECT DirID, SEID, SUM(SESize) AS Size, SUM(SEFiles) AS Files FROM FC_DirectoryUsageJournal "
+    reqInsert += "WHERE EntryID<=%d GROUP BY DirID, SEID ) AS J " % maxID
+    reqInsert += "ON DUPLICATE KEY UPDATE SESize=SESize+J.Size, SEFiles=SEFiles+J.Files, LastUpdate=UTC_TIMESTAMP()"
+    reqDelete = "DELETE FROM FC_DirectoryUsageJournal WHERE EntryID<=%d" % maxID
+    # The connections are in autocommit mode: the transaction has to be started explicitly for both
+    # statements to be committed together, or rolled back if one of them fails
+    result = self.db._transaction(["START TRANSACTION", reqInsert, reqDelete])
+    if not result['OK']:
+      return result
+    return S_OK(result['Value'][2][1])
+
   def _populateFileAncestors(self, lfns, connection=False):
     connection = self._getConnection(connection)
     successful = {}
@@ -579,6 +700,107 @@ class FileManagerBase(object):
   def getFileDescendents(self, lfns, depths, connection=False):
     return self._getFileRelatives(lfns, depths, 'descendent', connection)
 
+  def getFileLineage(self, lfns, maxDepth, descendents=False, connection=False):
+    """ Get the lineage graph of many files at once, following the direct relations
+        (AncestorDepth 1) of FC_FileAncestors up to maxDepth levels
+
+        :param lfns: list or dict of lfns
+        :param int maxDepth: number of levels of ancestors (descendents) to expand
+        :param bool descendents: expand the descendents instead of the ancestors
+
+        :returns: S_OK with the Successful/Failed convention, Successful being the adjacency
+                  { lfn : [ lfns of its direct ancestors (descendents) ] } of the given files and of
+                  their relatives found less than maxDepth levels away from them
+    """
+    connection = self._getConnection(connection)
+    res = None
+    if self.db.bulkQueryThreshold and len(lfns) >= self.db.bulkQueryThreshold:
+      res = self._findFileIDsInBulk(lfns, connection=connection)
+      if not res['OK']:
+        gLogger.warn("Failed to find the file IDs in bulk, querying by directory", res['Message'])
+    if not res or not res['OK']:
+      res = self._findFileIDs(lfns, connection=connection)
+    if not res['OK']:
+      return res
+    failed = res['Value']['Failed']
+    fileIDs = set(res['Value']['Successful'].values())
+    if not fileIDs:
+      return S_OK({'Successful': {}, 'Failed': failed})
+
+    res = self._getLineageGraph(fileIDs, maxDepth, descendents, connection=connection)
+    if not res['OK']:
+      return res
+    graph = res['Value']
+
+    allIDs = set(graph)
+    for relativeIDs in graph.values():
+      allIDs.update(relativeIDs)
+    fileIDLFNs = {}
+    for fileIDChunk in breakListIntoChunks(sorted(allIDs), REPLICA_CHUNK_SIZE):
+      res = self._getFileLFNs(fileIDChunk)
+      if not res['OK']:
+        return res
+      fileIDLFNs.update(res['Value']['Successful'])
+
+    successful = {}
+    for fileID, relativeIDs in graph.items():
+      if fileID in fileIDLFNs:
+        successful[fileIDLFNs[fileID]] = sorted(fileIDLFNs[relID] for relID in relativeIDs if relID in fileIDLFNs)
+    return S_OK({'Successful': successful, 'Failed': failed})
+
+  def _getLineageGraph(self, fileIDs, maxDepth, descendents=False, connection=False):
+    """ Expand the lineage of the given files level by level: the files of a level are put in a
+        temporary table, joined with FC_FileAncestors to get the files of the next level,
+        so that there is a single query per level whatever the number of files.
+        The temporary table belongs to the MySQL session, so it is not seen by the other threads.
+
+        :param fileIDs: IDs of the files to start from
+        :param int maxDepth: number of levels to expand
+        :param bool descendents: expand the descendents instead of the ancestors
+
+        :returns: S_OK( { fileID : set( IDs of its direct ancestors (descendents) ) } ) for the
+                  given files and the files of the first maxDepth - 1 levels
+    """
+    connection = self._getConnection(connection)
+    fromField, toField = ('AncestorID', 'FileID') if descendents else ('FileID', 'AncestorID')
+    graph = dict((fileID, set()) for fileID in fileIDs)
+    level = set(fileIDs)
+
+    tmpTable = 'FC_TmpLineageFiles'
+    req = "DROP TEMPORARY TABLE IF EXISTS %s" % tmpTable
+    result = self.db._update(req, connection)
+    if not result['OK']:
+      return result
+    req = "CREATE TEMPORARY TABLE %s ( FileID INT NOT NULL PRIMARY KEY ) ENGINE = MEMORY" % tmpTable
+    result = self.db._update(req, connection)
+    if not result['OK']:
+      return result
+
+    req = "SELECT A.%s, A.%s FROM FC_FileAncestors AS A " % (fromField, toField)
+    req += "JOIN %s AS T ON T.FileID = A.%s WHERE A.AncestorDepth = 1" % (tmpTable, fromField)
+    for depth in range(1, maxDepth + 1):
+      result = self.db._update("DELETE FROM %s" % tmpTable, connection)
+      if result['OK']:
+        result = self.db.insertMultipleFields(tmpTable, ['FileID'], [(fileID,) for fileID in level], conn=connection)
+      if result['OK']:
+        result = self.db._query(req, connection)
+      if not result['OK']:
+        break
+      nextLevel = set()
+      for fileID, relativeID in result['Value']:
+        graph[fileID].add(relativeID)
+        if relativeID not in graph:
+          nextLevel.add(relativeID)
+      if not nextLevel or depth == maxDepth:
+        break
+      for fileID in nextLevel:
+        graph[fileID] = set()
+      level = nextLevel
+    self.db._update("DROP TEMPORARY TABLE IF EXISTS %s" % tmpTable, connection)
+    if not result['OK']:
+      return result
+    return S_OK(graph)
+
   def _getExistingMetadata(self, lfns, connection=False):
     connection = self._getConnection(connection)
     # Check whether the files already exist before adding
@@ -980,16 +1202,18 @@ class FileManagerBase(object):
       fields = []
       if not self.db.lfnPfnConvention or self.db.lfnPfnConvention == "Weak":
         fields = ['PFN']
-      res = self._getFileReplicas(fileIDLfnDict.keys(), fields_input=fields,
-                                  allStatus=allStatus, connection=connection)
-      if not res['OK']:
-        return res
-      for fileID, seDict in res['Value'].iteritems():
-        lfn = fileIDLfnDict[fileID]
-        replicas[lfn] = {}
-        for se, repDict in seDict.iteritems():
-          pfn = repDict.get('PFN', '')
-          replicas[lfn][se] = pfn
+      # Large chunks keep the number of queries low without building huge IN clauses
+      for fileIDs in breakListIntoChunks(list(fileIDLfnDict), REPLICA_CHUNK_SIZE):
+        res = self._getFileReplicas(fileIDs, fields_input=fields,
+                                    allStatus=allStatus, connection=connection)
+        if not res['OK']:
+          return res
+        for fileID, seDict in res['Value'].iteritems():
+          lfn = fileIDLfnDict[fileID]
+          replicas[lfn] = {}
+          for se, repDict in seDict.iteritems():
+            pfn = repDict.get('PFN', '')
+            replicas[lfn][se] = pfn
 
     result = S_OK(replicas)
     return result
@@ -998,8 +1222,14 @@ class FileManagerBase(object):
     """ Get file replicas from the catalog """
     connection = self._getConnection(connection)
 
-    # Get FileID <-> LFN correspondence first
-    res = self._findFileIDs(lfns, connection=connection)
+    # Get FileID <-> LFN correspondence first, with a single query for large requests
+    res = None
+    if self.db.bulkQueryThreshold and len(lfns) >= self.db.bulkQueryThreshold:
+      res = self._findFileIDsInBulk(lfns, connection=connection)
+      if not res['OK']:
+        gLogger.warn("Failed to find the file IDs in bulk, querying by directory", res['Message'])
+    if not res or not res['OK']:
+      res = self._findFileIDs(lfns, connection=connection)
     if not res['OK']:
       return res
     failed = res['Value']['Failed']
@@ -1328,4 +1558,141 @@ class FileManagerBase(object):
 
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
+    dump = []
+    for result in self.getSEDumpChunks(seName):
+      if not result['OK']:
+        return result
+      dump.extend(result['Value'])
+    return S_OK(tuple(dump))
+
+  def getSEDumpChunks(self, seName, chunkSize=SE_DUMP_CHUNK_SIZE):
+    """ Generator of the files at a given SE, together with checksum and size, by chunks of replicas.
+        Each chunk is a separate query resuming after the last replica ID of the previous chunk,
+        so that the dump of a large SE does not keep a query open nor the whole list in memory
+
+        :param seName: name of the StorageElement
+        :param int chunkSize: number of replicas per chunk
+
+        :returns: S_OK with list of tuples (lfn, checksum, size) for each chunk,
+                  or S_ERROR ending the iteration
+    """
+    result = self.db.seManager.findSE(seName)
+    if not result['OK']:
+      yield result
+      return
+    seID = result['Value']
+
+    lastRepID = 0
+    while True:
+      result = self._getSEDumpChunk(seID, lastRepID, chunkSize)
+      if not result['OK']:
+        yield result
+        return
+      rows = result['Value']
+      if not rows:
+        return
+      lastRepID = rows[-1][0]
+      yield S_OK([row[1:] for row in rows if row[1]])
+
+  def _getSEDumpChunk(self, seID, lastRepID, chunkSize):
+    """ Get a chunk of the replicas at a given SE, ordered by replica ID
+
+        :param int seID: ID of the StorageElement
+        :param int lastRepID: the replicas with a larger ID are returned
+        :param int chunkSize: maximum number of replicas
+
+        :returns: S_OK with list of tuples (repID, lfn, checksum, size)
+    """
+    return S_ERROR("To be implemented on derived class")
+
+  def _getSEDumpLFNs(self, rows):
+    """ Build the LFNs of a chunk of the SE dump
+
+        :param rows: list of tuples (repID, dirID, fileName, checksum, size)
+
+        :returns: S_OK with list of tuples (repID, lfn, checksum, size), the lfn being None if the
+                  directory of the file does not exist
+    """
+    result = self.db.dtree.getDirectoryPaths(list(set(row[1] for row in rows)))
+    if not result['OK']:
+      return result
+    dirPaths = result['Value']
+    dumpRows = []
+    for repID, dirID, fileName, checksum, size in rows:
+      lfn = os.path.join(dirPaths[dirID], fileName) if dirID in dirPaths else None
+      dumpRows.append((repID, lfn, checksum, size))
+    return S_OK(dumpRows)
+
+  def findFilesInSubtree(self, dirID, filters, chunkSize, lastFileID=0):
+    """ Get a page of the files of a directory subtree satisfying the given filters, ordered by
+        file ID. The next page is obtained by passing back the returned LastFileID, the search
+        being completed when less than chunkSize files are returned
+
+        :param int dirID: ID of the top directory of the subtree
+        :param dict filters: optional filters, the keys being in SUBTREE_FILTERS:
+                             MinSize, MaxSize (bytes), Status (status or list of statuses),
+                             CreatedAfter, CreatedBefore, ModifiedAfter, ModifiedBefore (dates)
+        :param int chunkSize: maximum number of files
+        :param int lastFileID: the files with a larger ID are returned
+
+        :returns: S_OK( { 'LFNs' : list, 'LastFileID' : int, 'Completed' : bool } )
+    """
+    result = self._checkSubtreeFilters(filters)
+    if not result['OK']:
+      return result
+    filters = result['Value']
+
+    chunkSize = max(1, chunkSize)
+    result = self._findFilesInSubtree(dirID, filters, lastFileID, chunkSize)
+    if not result['OK']:
+      return result
+    rows = result['Value']
+    resultDict = {'LFNs': [row[1] for row in rows if row[1]],
+                  'LastFileID': rows[-1][0] if rows else lastFileID,
+                  'Completed': len(rows) < chunkSize}
+    return S_OK(resultDict)
+
+  @staticmethod
+  def _checkSubtreeFilters(filters):
+    """ Validate and normalize the filters of findFilesInSubtree
+
+        :param dict filters: filters, see findFilesInSubtree
+
+        :returns: S_OK( dict ) of the filters which are set, the sizes being integers,
+                  the statuses a list and the dates strings
+    """
+    checkedFilters = {}
+    for key, value in filters.items():
+      if key not in SUBTREE_FILTERS:
+        return S_ERROR('Illegal filter %s' % key)
+      if value is None or value == '' or value == []:
+        continue
+      if key in ('MinSize', 'MaxSize'):
+        try:
+          checkedFilters[key] = int(value)
+        except (TypeError, ValueError):
+          return S_ERROR('Illegal %s %s' % (key, value))
+      elif key == 'Status':
+        statuses = [value] if isinstance(value, six.string_types) else list(value)
+        for status in statuses:
+          if not isinstance(status, six.string_types) or set(status) & set('"\\\','):
+            return S_ERROR('Illegal file status %s' % status)
+        checkedFilters[key] = statuses
+      else:
+        date = fromString(value) if isinstance(value, six.string_types) else value
+        if not isinstance(date, (datetime.date, datetime.datetime)):
+          return S_ERROR('Illegal %s date %s' % (key, value))
+        checkedFilters[key] = toString(date)
+    return S_OK(checkedFilters)
+
+  def _findFilesInSubtree(self, dirID, filters, lastFileID, chunkSize):
+    """ Get a chunk of the files of a directory subtree, ordered by file ID
+
+        :param int dirID: ID of the top directory of the subtree
+        :param dict filters: validated filters, the statuses being a list and the dates strings
+        :param int lastFileID: the files with a larger ID are returned
+        :param int chunkSize: maximum number of files
+
+        :returns: S_OK with list of tuples (fileID, lfn)
+    """
     return S_ERROR("To be implemented on derived class")
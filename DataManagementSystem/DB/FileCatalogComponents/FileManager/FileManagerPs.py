@@ -10,7 +10,7 @@ import six
 import os
 import datetime
 
-from DIRAC import S_OK, S_ERROR
+from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager.FileManagerBase import FileManagerBase
 from DIRAC.Core.Utilities.List import stringListToString, \
     intListToString, \
@@ -24,6 +24,8 @@ class FileManagerPs(FileManagerBase):
 
   def __init__(self, database=None):
     super(FileManagerPs, self).__init__(database)
+    # Set to False when the database predates the ps_get_se_dump_chunk procedure
+    self._seDumpChunkProcedure = True
 
   ######################################################
   #
@@ -941,3 +943,54 @@ class FileManagerPs(FileManagerBase):
     seID = res['Value']
 
     return self.db.executeStoredProcedureWithCursor('ps_get_se_dump', (seID,))
+
+  def _getSEDumpChunk(self, seID, lastRepID, chunkSize):
+    """ Get a chunk of the replicas at a given SE, ordered by replica ID
+
+        :param int seID: ID of the StorageElement
+        :param int lastRepID: the replicas with a larger ID are returned
+        :param int chunkSize: maximum number of replicas
+
+        :returns: S_OK with list of tuples (repID, lfn, checksum, size)
+    """
+    if self._seDumpChunkProcedure:
+      result = self.db.executeStoredProcedureWithCursor('ps_get_se_dump_chunk', (seID, lastRepID, chunkSize))
+      if result['OK']:
+        return result
+      # The databases installed before the procedure was introduced are dumped with plain SQL
+      res = self.db._query("SELECT COUNT(*) FROM information_schema.ROUTINES WHERE ROUTINE_SCHEMA = DATABASE() "
+                           "AND ROUTINE_NAME = 'ps_get_se_dump_chunk'")
+      if not res['OK'] or res['Value'][0][0]:
+        return result
+      gLogger.warn("Procedure ps_get_se_dump_chunk not found, dumping the SE with plain SQL")
+      self._seDumpChunkProcedure = False
+
+    req = "SELECT r.RepID, f.DirID, f.FileName, f.Checksum, f.Size FROM FC_Replicas r "
+    req += "JOIN FC_Files f ON f.FileID = r.FileID "
+    req += "WHERE r.SEID = %d AND r.RepID > %d ORDER BY r.RepID LIMIT %d" % (seID, lastRepID, chunkSize)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_OK([])
+    return self._getSEDumpLFNs(result['Value'])
+
+  def _findFilesInSubtree(self, dirID, filters, lastFileID, chunkSize):
+    """ Get a chunk of the files of a directory subtree, ordered by file ID
+
+        :param int dirID: ID of the top directory of the subtree
+        :param dict filters: validated filters, the statuses being a list and the dates strings
+        :param int lastFileID: the files with a larger ID are returned
+        :param int chunkSize: maximum number of files
+
+        :returns: S_OK with list of tuples (fileID, lfn)
+    """
+    # The unset filters are passed as -1 or empty strings, which the procedure ignores
+    return self.db.executeStoredProcedureWithCursor('ps_find_files_in_subtree',
+                                                    (dirID, lastFileID, chunkSize,
+                                                     filters.get('MinSize', -1), filters.get('MaxSize', -1),
+                                                     ','.join(filters.get('Status', [])),
+                                                     filters.get('CreatedAfter', ''),
+                                                     filters.get('CreatedBefore', ''),
+                                                     filters.get('ModifiedAfter', ''),
+                                                     filters.get('ModifiedBefore', '')))
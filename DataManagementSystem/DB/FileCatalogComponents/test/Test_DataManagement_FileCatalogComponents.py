@@ -11,11 +11,14 @@ from mock import MagicMock
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryTreeBase import DirectoryTreeBase
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryLevelTree import DirectoryLevelTree
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryPathCache import DirectoryPathCache
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectorySimpleTree import DirectorySimpleTree
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryFlatTree import DirectoryFlatTree
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryNodeTree import DirectoryNodeTree
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager.FileManagerBase import FileManagerBase
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager.FileManagerPs import FileManagerPs
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata.DirectoryMetadata import DirectoryMetadata
 
 dbMock = MagicMock()
 ugManagerMock = MagicMock()
@@ -102,3 +105,321 @@ def test_Base_addFile():
   res = fmb.addFile({'aa': 'aaa/bbb'}, {})
   assert res['OK'] is True  # this will need to be implemented on a derived class, but it anyway returns S_OK()
   assert 'aa' in res['Value']['Failed']
+
+
+####################################################################################
+# DirectoryPathCache
+
+def test_DirectoryPathCache():
+  cache = DirectoryPathCache(maxSize=2)
+  cache.add('/vo/a', 1, 2)
+  cache.add('/vo/b', 2, 2)
+  assert cache.getDirID('/vo/a') == (1, 2)
+  # /vo/b is the least recently used
+  cache.add('/vo/c', 3)
+  assert cache.getDirID('/vo/b') is None
+  assert cache.getDirIDs(['/vo/a', '/vo/b', '/vo/c']) == ({'/vo/a': 1, '/vo/c': 3}, ['/vo/b'])
+  assert cache.getPaths([1, 2]) == ({1: '/vo/a'}, [2])
+  cache.remove('/vo/a')
+  assert cache.getDirID('/vo/a') is None
+  cache.remove(dirID=3)
+  assert cache.getPaths([3]) == ({}, [3])
+  assert cache.getStats() == {'Hits': 4, 'Misses': 5, 'Directories': 0}
+
+
+def test_DirectoryPathCacheLifeTime():
+  cache = DirectoryPathCache(lifeTime=-1)
+  cache.add('/vo/a', 1)
+  assert cache.getDirID('/vo/a') is None
+  assert cache.getPaths([1]) == ({}, [1])
+  cache = DirectoryPathCache(maxSize=0)
+  cache.add('/vo/a', 1)
+  assert cache.getDirID('/vo/a') is None
+
+
+def test_Level_findDirCache():
+  levelTree = DirectoryLevelTree()
+  levelTree.setDirectoryCache(10, 600)
+  levelTree.db = MagicMock()
+  levelTree.db._escapeString.side_effect = lambda path: {'OK': True, 'Value': "'%s'" % path}
+  levelTree.db._query.return_value = {'OK': True, 'Value': ((5, 2),)}
+  assert levelTree.findDir('/vo/data/')['Value'] == 5
+  assert levelTree.findDir('/vo/data')['Value'] == 5
+  assert levelTree.findDirs(['/vo/data'])['Value'] == {'/vo/data': 5}
+  assert levelTree.getDirectoryPath(5)['Value'] == '/vo/data'
+  assert levelTree.db._query.call_count == 1
+  levelTree.db._update.return_value = {'OK': True, 'Value': 1}
+  assert levelTree.removeDir('/vo/data')['DirID'] == 5
+  levelTree.db._query.return_value = {'OK': True, 'Value': ()}
+  assert levelTree.findDir('/vo/data')['Value'] == ''
+
+
+def test_Base_findFileIDsInBulk():
+  fileManager = FileManagerBase()
+  fileManager.db = MagicMock()
+  fileManager.db.dtree.findDirs.return_value = {'OK': True, 'Value': {'/vo/data': 1}}
+  fileManager.db._update.return_value = {'OK': True, 'Value': 0}
+  fileManager.db.insertMultipleFields.return_value = {'OK': True, 'Value': 2}
+  fileManager.db._query.return_value = {'OK': True, 'Value': ((1, 'f1', 10),)}
+  res = fileManager._findFileIDsInBulk(['/vo/data/f1', '/vo/data/f2', '/vo/other/f3'])
+  assert res['OK'] is True
+  assert res['Value']['Successful'] == {'/vo/data/f1': 10}
+  assert sorted(res['Value']['Failed']) == ['/vo/data/f2', '/vo/other/f3']
+  rows = fileManager.db.insertMultipleFields.call_args[0][2]
+  assert sorted(rows) == [(1, 'f1'), (1, 'f2')]
+  # The FileIDs are obtained with a single query
+  assert fileManager.db._query.call_count == 1
+
+
+def test_Base_getReplicasBulkFallback():
+  fileManager = FileManagerBase()
+  fileManager.db = MagicMock()
+  fileManager.db.bulkQueryThreshold = 2
+  fileManager.db.lfnPfnConvention = False
+  fileManager._findFileIDsInBulk = MagicMock(return_value={'OK': False, 'Message': 'No privilege'})
+  fileManager._findFileIDs = MagicMock(return_value={'OK': True,
+                                                     'Value': {'Successful': {'/vo/f1': 10, '/vo/f2': 11},
+                                                               'Failed': {}}})
+  fileManager._getFileReplicas = MagicMock(return_value={'OK': True,
+                                                         'Value': {10: {'SE1': {'PFN': 'pfn1'}}, 11: {}}})
+  res = fileManager.getReplicas(['/vo/f1', '/vo/f2'], False)
+  assert res['OK'] is True
+  assert res['Value']['Successful'] == {'/vo/f1': {'SE1': 'pfn1'}, '/vo/f2': {}}
+  fileManager._findFileIDsInBulk.assert_called_once()
+  fileManager._findFileIDs.assert_called_once()
+
+
+def test_Base_updateDirectoryUsageWriteBehind():
+  fileManager = FileManagerBase()
+  fileManager.db = MagicMock()
+  fileManager.db.usageWriteBehind = True
+  fileManager.db.dtree.getPathIDsByID.return_value = {'OK': True, 'Value': [1, 2, 5]}
+  res = fileManager._updateDirectoryUsage({5: {0: {'Files': 2, 'Size': 30}, 3: {'Files': 1, 'Size': 10}}}, '-')
+  assert res['OK'] is True
+  fileManager.db._update.assert_not_called()
+  fileManager.db.insertMultipleFields.assert_called_once()
+  table, fields, rows = fileManager.db.insertMultipleFields.call_args[0]
+  assert table == 'FC_DirectoryUsageJournal'
+  assert fields == ['DirID', 'SEID', 'SESize', 'SEFiles']
+  assert sorted(rows) == [(1, 0, -30, -2), (1, 3, -10, -1), (2, 0, -30, -2), (2, 3, -10, -1),
+                          (5, 0, -30, -2), (5, 3, -10, -1)]
+
+
+def test_Base_flushDirectoryUsageJournal():
+  fileManager = FileManagerBase()
+  fileManager.db = MagicMock()
+  fileManager.db._query.return_value = {'OK': True, 'Value': ((None,),)}
+  res = fileManager.flushDirectoryUsageJournal()
+  assert res == {'OK': True, 'Value': 0}
+  fileManager.db._transaction.assert_not_called()
+
+  fileManager.db._query.return_value = {'OK': True, 'Value': ((42,),)}
+  fileManager.db._transaction.return_value = {'OK': True, 'Value': [('start', 0), ('insert', 7), ('delete', 12)]}
+  res = fileManager.flushDirectoryUsageJournal()
+  assert res == {'OK': True, 'Value': 12}
+  reqStart, reqInsert, reqDelete = fileManager.db._transaction.call_args[0][0]
+  assert reqStart == 'START TRANSACTION'
+  assert reqInsert.startswith('INSERT INTO FC_DirectoryUsage ')
+  assert 'WHERE EntryID<=42 GROUP BY DirID, SEID' in reqInsert
+  assert reqDelete == 'DELETE FROM FC_DirectoryUsageJournal WHERE EntryID<=42'
+
+
+def test_Base_getSEDumpChunks():
+  fileManager = FileManagerBase()
+  fileManager.db = MagicMock()
+  fileManager.db.seManager.findSE.return_value = {'OK': True, 'Value': 3}
+  fileManager.db.dtree.getDirectoryPaths.return_value = {'OK': True, 'Value': {1: '/vo', 2: '/vo/data'}}
+  chunks = [[(5, 1, 'f1', 'ad1', 10), (8, 2, 'f2', 'ad2', 20)], [(12, 7, 'orphan', 'ad3', 30)], []]
+  fileManager._getSEDumpChunk = MagicMock(side_effect=lambda seID, lastRepID, chunkSize:
+                                          fileManager._getSEDumpLFNs(chunks.pop(0)) if chunks[0] else
+                                          {'OK': True, 'Value': chunks.pop(0)})
+  res = list(fileManager.getSEDumpChunks('SE', chunkSize=2))
+  assert res == [{'OK': True, 'Value': [('/vo/f1', 'ad1', 10), ('/vo/data/f2', 'ad2', 20)]},
+                 {'OK': True, 'Value': []}]
+  assert [call[0] for call in fileManager._getSEDumpChunk.call_args_list] == [(3, 0, 2), (3, 8, 2), (3, 12, 2)]
+
+  fileManager._getSEDumpChunk = MagicMock(return_value={'OK': False, 'Message': 'Lost connection'})
+  res = fileManager.getSEDump('SE')
+  assert res['OK'] is False
+
+
+def test_Ps_getSEDumpChunkWithoutProcedure():
+  fileManager = FileManagerPs()
+  fileManager.db = MagicMock()
+  fileManager.db.executeStoredProcedureWithCursor.return_value = {'OK': False, 'Message': 'PROCEDURE does not exist'}
+  fileManager.db.dtree.getDirectoryPaths.return_value = {'OK': True, 'Value': {1: '/vo'}}
+  fileManager.db._query.side_effect = [{'OK': True, 'Value': ((0,),)},
+                                       {'OK': True, 'Value': ((5, 1, 'f1', 'ad1', 10),)},
+                                       {'OK': True, 'Value': ()}]
+  assert fileManager._getSEDumpChunk(3, 0, 2) == {'OK': True, 'Value': [(5, '/vo/f1', 'ad1', 10)]}
+  assert 'r.RepID > 0' in fileManager.db._query.call_args[0][0]
+  # The procedure is not looked for again
+  assert fileManager._getSEDumpChunk(3, 5, 2) == {'OK': True, 'Value': []}
+  assert fileManager.db.executeStoredProcedureWithCursor.call_count == 1
+
+  # A failure of an existing procedure is reported
+  fileManager = FileManagerPs()
+  fileManager.db = MagicMock()
+  fileManager.db.executeStoredProcedureWithCursor.return_value = {'OK': False, 'Message': 'Lost connection'}
+  fileManager.db._query.return_value = {'OK': True, 'Value': ((1,),)}
+  assert fileManager._getSEDumpChunk(3, 0, 2)['Message'] == 'Lost connection'
+
+
+def test_Base_findFilesInSubtree():
+  fileManager = FileManagerBase()
+  fileManager._findFilesInSubtree = MagicMock(return_value={'OK': True,
+                                                            'Value': [(4, '/vo/f1'), (9, None), (12, '/vo/a/f2')]})
+  res = fileManager.findFilesInSubtree(2, {'Status': 'AprioriGood', 'MinSize': '10',
+                                           'CreatedAfter': '2020-01-01 00:00:00'}, 3)
+  assert res['OK'] is True
+  assert res['Value'] == {'LFNs': ['/vo/f1', '/vo/a/f2'], 'LastFileID': 12, 'Completed': False}
+  dirID, filters, lastFileID, chunkSize = fileManager._findFilesInSubtree.call_args[0]
+  assert (dirID, lastFileID, chunkSize) == (2, 0, 3)
+  assert filters['Status'] == ['AprioriGood']
+  assert filters['MinSize'] == 10
+  assert filters['CreatedAfter'].startswith('2020-01-01')
+
+  fileManager._findFilesInSubtree.return_value = {'OK': True, 'Value': []}
+  res = fileManager.findFilesInSubtree(2, {}, 3, lastFileID=12)
+  assert res['Value'] == {'LFNs': [], 'LastFileID': 12, 'Completed': True}
+
+  for filters in ({'Owner': 'joe'}, {'MaxSize': 'large'}, {'Status': "Good' OR '1"}, {'ModifiedBefore': 'yesterday'}):
+    assert fileManager.findFilesInSubtree(2, filters, 3)['OK'] is False
+
+
+def test_Base_getFileLineage():
+  # ( FileID, AncestorID ) of the direct ancestors
+  edges = [(2, 1), (3, 2), (4, 3), (5, 1), (5, 6)]
+  level = []
+
+  def insertMultipleFields(table, fields, rows, conn=None):
+    level[:] = [row[0] for row in rows]
+    return {'OK': True, 'Value': len(rows)}
+
+  fileManager = FileManagerBase()
+  fileManager.db = MagicMock()
+  fileManager.db.bulkQueryThreshold = 0
+  fileManager.db._update.return_value = {'OK': True, 'Value': 0}
+  fileManager.db.insertMultipleFields.side_effect = insertMultipleFields
+  # ( AncestorID, FileID ) of the descendents of the files in the temporary table
+  fileManager.db._query.side_effect = lambda req, conn: {'OK': True, 'Value': [(ancID, fileID)
+                                                                               for fileID, ancID in edges
+                                                                               if ancID in level]}
+  fileManager._findFileIDs = MagicMock(return_value={'OK': True,
+                                                     'Value': {'Successful': {'/f1': 1},
+                                                               'Failed': {'/f0': 'No such file'}}})
+  fileManager._getFileLFNs = MagicMock(side_effect=lambda ids: {'OK': True, 'Value': {
+      'Successful': dict((i, '/f%d' % i) for i in ids), 'Failed': {}}})
+
+  res = fileManager.getFileLineage(['/f0', '/f1'], 2, descendents=True)
+  assert res['OK'] is True
+  assert res['Value'] == {'Successful': {'/f1': ['/f2', '/f5'], '/f2': ['/f3'], '/f5': []},
+                          'Failed': {'/f0': 'No such file'}}
+  # One query per level, the temporary table being dropped at the end
+  assert fileManager.db._query.call_count == 2
+  assert fileManager.db._update.call_args[0][0] == 'DROP TEMPORARY TABLE IF EXISTS FC_TmpLineageFiles'
+
+
+####################################################################################
+# DirectoryMetadata
+
+def _metaQueryMock(selected):
+  """ _query of a database with the integer fields A (10 values) and B (1000 values) defined for 1000 directories,
+      selected being the { metadata table : rows } returned by the searches of the directories
+  """
+  def query(req):
+    if req.startswith('SELECT MetaName'):
+      return {'OK': True, 'Value': (('A', 'INT'), ('B', 'INT'))}
+    if req.startswith('SELECT COUNT'):
+      return {'OK': True, 'Value': ((1000, 1000 if req.endswith('FC_Meta_B') else 10),)}
+    if 'IN (0)' in req:
+      # No metadata defined for the root directory
+      return {'OK': True, 'Value': ()}
+    for table, rows in selected.items():
+      if req.startswith(' SELECT M.DirID FROM %s ' % table):
+        return {'OK': True, 'Value': rows}
+    return {'OK': True, 'Value': ((3,), (4,))}
+  return query
+
+
+def test_DirectoryMetadata_findDirIDsWithClosure():
+  dmeta = DirectoryMetadata()
+  dmeta.db = MagicMock()
+  dmeta.db.inheritedMetadataIndex = False
+  dmeta.db.dtree.getClosureTable.return_value = 'FC_DirectoryClosure'
+  dmeta.db._query.side_effect = _metaQueryMock({})
+  res = dmeta.findDirIDsByMetadata({'A': 1, 'B': 2}, '/', {})
+  assert res['OK'] is True
+  assert sorted(res['Value']) == [3, 4]
+  # A single query, driven by the most selective metadata
+  req = dmeta.db._query.call_args[0][0]
+  assert req.startswith('SELECT DISTINCT STRAIGHT_JOIN C0.ChildID FROM FC_Meta_B AS M0')
+  assert 'JOIN FC_Meta_A AS M1' in req
+
+
+def test_DirectoryMetadata_findDirIDsBySets():
+  dmeta = DirectoryMetadata()
+  dmeta.db = MagicMock()
+  dmeta.db.inheritedMetadataIndex = False
+  dmeta.db.dtree.getClosureTable.return_value = None
+  dmeta.db.dtree.treeVersion = 0
+  dmeta.db.dtree.getAllSubdirectoriesByID.return_value = {'OK': True, 'Value': []}
+  dmeta.db._query.side_effect = _metaQueryMock({'FC_Meta_A': ((3,), (4,)), 'FC_Meta_B': ((4,), (5,))})
+  res = dmeta.findDirIDsByMetadata({'A': 1, 'B': 2}, '/', {})
+  assert res['OK'] is True
+  assert res['Value'] == [4]
+
+  # The directory sets are cached until the metadata or the directory tree change
+  nQueries = dmeta.db._query.call_count
+  assert dmeta.findDirIDsByMetadata({'A': 1, 'B': 2}, '/', {})['Value'] == [4]
+  searches = [args[0][0] for args in dmeta.db._query.call_args_list[nQueries:]
+              if args[0][0].startswith(' SELECT M.DirID')]
+  assert searches == []
+  dmeta._clearMetaCaches('A')
+  nQueries = dmeta.db._query.call_count
+  dmeta.findDirIDsByMetadata({'A': 1, 'B': 2}, '/', {})
+  searches = [args[0][0] for args in dmeta.db._query.call_args_list[nQueries:]
+              if args[0][0].startswith(' SELECT M.DirID')]
+  assert len(searches) == 1 and 'FC_Meta_A' in searches[0]
+
+
+def test_DirectoryMetadata_metadataIndex():
+  dmeta = DirectoryMetadata()
+  dmeta.db = MagicMock()
+  dmeta.db.inheritedMetadataIndex = True
+  # Directories 1/2/3, the metadata A being defined for 1 and 3
+  subdirs = {1: {1: 0, 2: 1, 3: 2}, 2: {2: 1, 3: 2}, 3: {3: 2}}
+  dmeta.db.dtree.getSubdirectoriesByID.side_effect = lambda dirID, **kwargs: {'OK': True, 'Value': subdirs[dirID]}
+  indexRows = ((1, 10, 1), (2, 10, 1), (3, 10, 1))
+
+  def query(req):
+    if req.startswith('SELECT MetaName'):
+      return {'OK': True, 'Value': (('A', 'INT'),)}
+    if req == 'SELECT DirID,Value FROM FC_Meta_A':
+      return {'OK': True, 'Value': ((1, 10), (3, 30))}
+    if req == 'SELECT DirID,Value,OwnerID FROM FC_MetaIndex_A':
+      return {'OK': True, 'Value': indexRows}
+    if req.startswith('SELECT COUNT'):
+      return {'OK': True, 'Value': ((2, 2),)}
+    if req.startswith('SELECT STRAIGHT_JOIN'):
+      return {'OK': True, 'Value': ((1,), (2,))}
+    return {'OK': True, 'Value': ()}
+  dmeta.db._query.side_effect = query
+  dmeta.db._update.return_value = {'OK': True, 'Value': 0}
+  dmeta.db.insertMultipleFields.return_value = {'OK': True, 'Value': 3}
+
+  res = dmeta.rebuildMetadataIndex({})
+  assert res['OK'] is True
+  assert res['Value'] == {'A': 3}
+  # The value defined for 3 overrides the one inherited from 1
+  assert sorted(dmeta.db.insertMultipleFields.call_args[0][2]) == [[1, 10, 1], [2, 10, 1], [3, 30, 3]]
+
+  res = dmeta.checkMetadataIndex({})
+  assert res['OK'] is True
+  assert res['Value'] == {'A': {'Missing': 0, 'Wrong': 1, 'Extra': 0}}
+
+  # The searches are single lookups of the index
+  res = dmeta.findDirIDsByMetadata({'A': 10}, '/', {})
+  assert res['OK'] is True
+  assert res['Value'] == [1, 2]
+  assert dmeta.db._query.call_args[0][0].startswith("SELECT STRAIGHT_JOIN I0.DirID FROM FC_MetaIndex_A AS I0 WHERE")
@@ -60,6 +60,12 @@ class FileCatalogDB(DB):
     self.validReplicaStatus = databaseConfig['ValidReplicaStatus']
     self.visibleFileStatus = databaseConfig['VisibleFileStatus']
     self.visibleReplicaStatus = databaseConfig['VisibleReplicaStatus']
+    # Number of LFNs from which the file IDs are looked up with a single query (0 to disable)
+    self.bulkQueryThreshold = databaseConfig.get('BulkQueryThreshold', 1000)
+    # Maintain and use the index of the inherited directory metadata
+    self.inheritedMetadataIndex = databaseConfig.get('InheritedMetadataIndex', False)
+    # Journal the directory usage changes, coalesced periodically by the service
+    self.usageWriteBehind = databaseConfig.get('UsageWriteBehind', False)
 
     # Obtain the plugins to be used for DB interaction
     self.objectLoader = ObjectLoader()
@@ -79,6 +85,22 @@ class FileCatalogDB(DB):
         return result
       self.__setattr__(compAttribute, result['Value'])
 
+    # Cache of the directory paths and IDs
+    self.dtree.setDirectoryCache(databaseConfig.get('DirectoryCacheSize', 0),
+                                 databaseConfig.get('DirectoryCacheLifeTime', 10))
+    result = self.dtree.warmDirectoryCache(databaseConfig.get('DirectoryCacheWarmUp', 0))
+    if not result['OK']:
+      gLogger.warn('Failed to fill the directory cache', result['Message'])
+
+    # The journal can be left with pending changes by a previous write-behind configuration
+    result = self.fileManager._createDirectoryUsageJournal()
+    if result['OK']:
+      result = self.fileManager.flushDirectoryUsageJournal()
+    if not result['OK']:
+      if self.usageWriteBehind:
+        return result
+      gLogger.warn('Failed to flush the directory usage journal', result['Message'])
+
     return S_OK()
 
   def __loadCatalogComponent(self, componentType, componentName):
@@ -778,6 +800,35 @@ class FileCatalogDB(DB):
     successful = res['Value']['Successful']
     return S_OK({'Successful': successful, 'Failed': failed})
 
+  def getFileLineage(self, lfns, maxDepth, descendents, credDict):
+    """
+        Get the lineage graph of many files
+
+        :param lfns: list of LFNs
+        :param int maxDepth: number of levels of ancestors (descendents) to expand
+        :param bool descendents: expand the descendents instead of the ancestors
+        :param creDict: credential
+
+        :return: Successful/Failed dict.
+            Successful is the adjacency { lfn : [ direct ancestors (descendents) ] } of the lfns
+            and of their relatives found less than maxDepth levels away
+    """
+    res = self._checkPathPermissions('getFileDescendents' if descendents else 'getFileAncestors', lfns, credDict)
+    if not res['OK']:
+      return res
+    failed = res['Value']['Failed']
+
+    # if no successful, just return
+    if not res['Value']['Successful']:
+      return S_OK({'Successful': {}, 'Failed': failed})
+
+    res = self.fileManager.getFileLineage(res['Value']['Successful'], maxDepth, descendents=descendents)
+    if not res['OK']:
+      return res
+    failed.update(res['Value']['Failed'])
+    successful = res['Value']['Successful']
+    return S_OK({'Successful': successful, 'Failed': failed})
+
   def getFileDetails(self, lfnList, credDict):
     """ Get all the metadata for the given files
     """
@@ -922,6 +973,32 @@ class FileCatalogDB(DB):
     successful = res['Value']['Successful']
     return S_OK({'Successful': successful, 'Failed': failed})
 
+  def findFilesInSubtree(self, path, filters, credDict, chunkSize, lastFileID=0):
+    """
+        Find the files of a directory subtree, page by page
+
+        :param str path: top directory of the subtree
+        :param dict filters: optional MinSize, MaxSize, Status, CreatedAfter, CreatedBefore,
+                             ModifiedAfter and ModifiedBefore filters
+        :param creDict: credential
+        :param int chunkSize: maximum number of files in the page
+        :param int lastFileID: LastFileID of the previous page, 0 for the first one
+
+        :return: S_OK( { 'LFNs' : list, 'LastFileID' : int, 'Completed' : bool } )
+    """
+    res = self._checkPathPermissions('listDirectory', path, credDict)
+    if not res['OK']:
+      return res
+    if path in res['Value']['Failed']:
+      return S_ERROR(res['Value']['Failed'][path])
+
+    res = self.dtree.findDir(path)
+    if not res['OK']:
+      return res
+    if not res['Value']:
+      return S_ERROR('No such file or directory')
+    return self.fileManager.findFilesInSubtree(res['Value'], filters, chunkSize, lastFileID)
+
   def isDirectory(self, lfns, credDict):
     """
         Checks whether a list of LFNS are directories or not
@@ -1026,6 +1103,21 @@ class FileCatalogDB(DB):
     result = self.dtree._rebuildDirectoryUsage()
     return result
 
+  def flushDirectoryUsage(self):
+    """ Coalesce the pending changes of the directory usage journal into DirectoryUsage
+    """
+    return self.fileManager.flushDirectoryUsageJournal()
+
+  def rebuildMetadataIndex(self, credDict):
+    """ Rebuild the index of the inherited directory metadata from scratch
+    """
+    return self.dmeta.rebuildMetadataIndex(credDict)
+
+  def checkMetadataIndex(self, credDict):
+    """ Check the index of the inherited directory metadata against the directory metadata
+    """
+    return self.dmeta.checkMetadataIndex(credDict)
+
   def repairCatalog(self, directoryFlag=True, credDict={}):
     """ Repair catalog inconsistencies
     """
@@ -1142,6 +1234,8 @@ class FileCatalogDB(DB):
     if not res['OK']:
       return res
     counterDict.update(res['Value'])
+    for counter, value in self.dtree.getDirectoryCacheStats().items():
+      counterDict['Directory Cache %s' % counter] = value
     return S_OK(counterDict)
 
   ########################################################################
@@ -1184,3 +1278,13 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return self.fileManager.getSEDump(seName)
+
+  def getSEDumpChunks(self, seName):
+    """
+         Generator of the files at a given SE, together with checksum and size, chunk by chunk
+
+        :param seName: name of the StorageElement
+
+        :returns: generator of S_OK with list of tuples (lfn, checksum, size)
+    """
+    return self.fileManager.getSEDumpChunks(seName)
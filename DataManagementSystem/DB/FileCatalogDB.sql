@@ -238,6 +238,18 @@ CREATE TABLE FC_DirectoryUsage(
 
 -- ------------------------------------------------------------------------------
 
+CREATE TABLE FC_DirectoryUsageJournal(
+   EntryID BIGINT NOT NULL AUTO_INCREMENT,
+   DirID INTEGER NOT NULL,
+   SEID INTEGER NOT NULL,
+   SESize BIGINT NOT NULL,
+   SEFiles BIGINT NOT NULL,
+   PRIMARY KEY (EntryID),
+   INDEX (DirID, SEID)
+) ENGINE = INNODB;
+
+-- ------------------------------------------------------------------------------
+
 CREATE TABLE FC_MetaFields (
   MetaID INT AUTO_INCREMENT PRIMARY KEY,
   MetaName VARCHAR(64) CHARACTER SET latin1 COLLATE latin1_bin NOT NULL,
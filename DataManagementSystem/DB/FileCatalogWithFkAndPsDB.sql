@@ -1863,6 +1863,67 @@ END //
 DELIMITER ;
 
 
+-- ps_get_se_dump_chunk : dump a chunk of the lfns in an SE, with checksum and size
+-- se_id : storageElement's ID
+-- last_rep_id : the replicas with a larger ID are dumped
+-- chunk_size : maximum number of replicas
+-- output : RepID, LFN, Checksum, Size, ordered by RepID
+
+DROP PROCEDURE IF EXISTS ps_get_se_dump_chunk;
+DELIMITER //
+CREATE PROCEDURE ps_get_se_dump_chunk
+(IN se_id INT, IN last_rep_id INT, IN chunk_size INT)
+BEGIN
+
+  SELECT SQL_NO_CACHE r.RepID, CONCAT(d.Name, '/', f.FileName), f.Checksum, f.Size
+         FROM FC_Replicas r
+         JOIN FC_Files f on f.FileID = r.FileID
+         JOIN FC_DirectoryList d on d.DirID = f.DirID
+         WHERE r.SEID = se_id AND r.RepID > last_rep_id
+         ORDER BY r.RepID
+         LIMIT chunk_size;
+
+END //
+DELIMITER ;
+
+
+-- ps_find_files_in_subtree : find a chunk of the files of a directory subtree
+-- dir_id : ID of the top directory of the subtree
+-- last_file_id : the files with a larger ID are returned
+-- chunk_size : maximum number of files
+-- min_size, max_size : size range of the files, ignored if negative
+-- statuses : comma separated list of file statuses, ignored if empty
+-- created_after, created_before, modified_after, modified_before : date ranges, ignored if empty
+-- output : FileID, LFN, ordered by FileID
+
+DROP PROCEDURE IF EXISTS ps_find_files_in_subtree;
+DELIMITER //
+CREATE PROCEDURE ps_find_files_in_subtree
+(IN dir_id INT, IN last_file_id INT, IN chunk_size INT, IN min_size BIGINT, IN max_size BIGINT,
+ IN statuses TEXT, IN created_after VARCHAR(32), IN created_before VARCHAR(32),
+ IN modified_after VARCHAR(32), IN modified_before VARCHAR(32))
+BEGIN
+
+  SELECT SQL_NO_CACHE f.FileID, CONCAT(d.Name, '/', f.FileName)
+         FROM FC_DirectoryClosure c
+         JOIN FC_Files f on f.DirID = c.ChildID
+         JOIN FC_DirectoryList d on d.DirID = f.DirID
+         JOIN FC_Statuses s on s.StatusID = f.Status
+         WHERE c.ParentID = dir_id AND f.FileID > last_file_id
+         AND (min_size < 0 OR f.Size >= min_size)
+         AND (max_size < 0 OR f.Size <= max_size)
+         AND (statuses = '' OR FIND_IN_SET(s.Status, statuses))
+         AND (created_after = '' OR f.CreationDate >= created_after)
+         AND (created_before = '' OR f.CreationDate < created_before)
+         AND (modified_after = '' OR f.ModificationDate >= modified_after)
+         AND (modified_before = '' OR f.ModificationDate < modified_before)
+         ORDER BY f.FileID
+         LIMIT chunk_size;
+
+END //
+DELIMITER ;
+
+
 
 -- Consistency checks
 
@@ -19,9 +19,12 @@ import six
 import cStringIO
 import csv
 import os
+import zlib
 from types import IntType, LongType, DictType, StringTypes, BooleanType, ListType
 # from DIRAC
 from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
@@ -66,13 +69,22 @@ def initializeFileCatalogHandler(serviceInfo):
                    'ValidFileStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                    'ValidReplicaStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                    'VisibleFileStatus': ['AprioriGood'],
-                   'VisibleReplicaStatus': ['AprioriGood']}
+                   'VisibleReplicaStatus': ['AprioriGood'],
+                   'DirectoryCacheSize': 0,
+                   'DirectoryCacheLifeTime': 10,
+                   'DirectoryCacheWarmUp': 0,
+                   'BulkQueryThreshold': 1000,
+                   'InheritedMetadataIndex': False,
+                   'UsageWriteBehind': False,
+                   'UsageFlushPeriod': 60}
   for configKey in sorted(defaultConfig.keys()):
     defaultValue = defaultConfig[configKey]
     configValue = getServiceOption(serviceInfo, configKey, defaultValue)
     gLogger.info("%-20s : %-20s" % (str(configKey), str(configValue)))
     databaseConfig[configKey] = configValue
   res = gFileCatalogDB.setConfig(databaseConfig)
+  if res['OK'] and databaseConfig['UsageWriteBehind']:
+    gThreadScheduler.addPeriodicTask(databaseConfig['UsageFlushPeriod'], flushDirectoryUsage)
 
   gMonitor.registerActivity("AddFile", "Amount of addFile calls",
                             "FileCatalogHandler", "calls/min", gMonitor.OP_SUM)
@@ -108,6 +120,59 @@ def initializeFileCatalogHandler(serviceInfo):
   return res
 
 
+def flushDirectoryUsage():
+  """ Periodic task coalescing the journal of the directory usage changes """
+  result = gFileCatalogDB.flushDirectoryUsage()
+  if not result['OK']:
+    gLogger.error("Failed to flush the directory usage journal", result['Message'])
+  elif result['Value']:
+    gLogger.verbose("Directory usage journal flushed", "%d entries" % result['Value'])
+
+
+class SEDumpSource(object):
+  """ Data source reading the CSV dump of an SE, produced chunk by chunk from the catalog
+  """
+
+  def __init__(self, dumpChunks, compress=False):
+    """ C'tor
+
+        :param dumpChunks: generator of S_OK with list of tuples (lfn, checksum, size)
+        :param bool compress: gzip compress the dump
+    """
+    self.__dumpChunks = dumpChunks
+    self.__compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    self.__buffer = ''
+    self.__finished = False
+
+  def __readChunk(self):
+    """ Add the next chunk of the dump to the buffer
+    """
+    try:
+      result = next(self.__dumpChunks)
+    except StopIteration:
+      self.__finished = True
+      if self.__compressor:
+        self.__buffer += self.__compressor.flush()
+      return
+    if not result['OK']:
+      raise IOError("Failed to get the SE dump: %s" % result['Message'])
+    csvOutput = cStringIO.StringIO()
+    writer = csv.writer(csvOutput, delimiter='|')
+    writer.writerows(result['Value'])
+    data = csvOutput.getvalue()
+    csvOutput.close()
+    self.__buffer += self.__compressor.compress(data) if self.__compressor else data
+
+  def read(self, size):
+    """ Read at most size bytes of the dump, an empty string at the end
+    """
+    while len(self.__buffer) < size and not self.__finished:
+      self.__readChunk()
+    data = self.__buffer[:size]
+    self.__buffer = self.__buffer[size:]
+    return data
+
+
 class FileCatalogHandler(RequestHandler):
   """
   ..class:: FileCatalogHandler
@@ -115,6 +180,20 @@ class FileCatalogHandler(RequestHandler):
   A simple Replica and Metadata Catalog service.
   """
 
+  def __getStreamChunks(self, lfns):
+    """ Split the lfns argument of a streaming method (string, list or dict) into chunks
+        of StreamChunkSize items of the same type
+    """
+    if isinstance(lfns, six.string_types):
+      lfns = [lfns]
+    chunkSize = max(1, self.srv_getCSOption('StreamChunkSize', 1000))
+    lfnList = sorted(lfns)
+    for lfnChunk in breakListIntoChunks(lfnList, chunkSize):
+      if isinstance(lfns, DictType):
+        yield dict((lfn, lfns[lfn]) for lfn in lfnChunk)
+      else:
+        yield lfnChunk
+
   ########################################################################
   # Path operations (not updated)
   #
@@ -345,6 +424,11 @@ class FileCatalogHandler(RequestHandler):
     """ Get replicas for supplied lfns """
     return gFileCatalogDB.getReplicas(lfns, allStatus, self.getRemoteCredentials())
 
+  def stream_getReplicas(self, lfns, allStatus=False):
+    """ Get replicas for supplied lfns, streamed in chunks of StreamChunkSize lfns """
+    for lfnChunk in self.__getStreamChunks(lfns):
+      yield gFileCatalogDB.getReplicas(lfnChunk, allStatus, self.getRemoteCredentials())
+
   types_getReplicaStatus = [[ListType, DictType] + list(StringTypes)]
 
   def export_getReplicaStatus(self, lfns):
@@ -371,6 +455,12 @@ class FileCatalogHandler(RequestHandler):
     lfnDict = dict.fromkeys(lfns, True)
     return gFileCatalogDB.getFileDescendents(lfnDict, dList, self.getRemoteCredentials())
 
+  types_getFileLineage = [[ListType, DictType] + list(StringTypes), [IntType, LongType], BooleanType]
+
+  def export_getFileLineage(self, lfns, maxDepth, descendents):
+    """ Get the graph of the ancestors (descendents) of the supplied lfns up to maxDepth levels """
+    return gFileCatalogDB.getFileLineage(lfns, maxDepth, descendents, self.getRemoteCredentials())
+
   types_getLFNForGUID = [[ListType, DictType] + list(StringTypes)]
 
   def export_getLFNForGUID(self, guids):
@@ -406,6 +496,31 @@ class FileCatalogHandler(RequestHandler):
     gMonitor.addMark('ListDirectory', 1)
     return gFileCatalogDB.listDirectory(lfns, self.getRemoteCredentials(), verbose=verbose)
 
+  def stream_listDirectory(self, lfns, verbose):
+    """ List the contents of supplied directories, streamed in chunks of StreamChunkSize directories """
+    gMonitor.addMark('ListDirectory', 1)
+    for lfnChunk in self.__getStreamChunks(lfns):
+      yield gFileCatalogDB.listDirectory(lfnChunk, self.getRemoteCredentials(), verbose=verbose)
+
+  types_findFilesInSubtree = [StringTypes, DictType, [IntType, LongType]]
+
+  def export_findFilesInSubtree(self, path, filters, chunkSize, lastFileID=0):
+    """ Find a page of at most chunkSize files of a directory subtree, satisfying the optional
+        filters (MinSize, MaxSize, Status, CreatedAfter, CreatedBefore, ModifiedAfter, ModifiedBefore).
+        The next page is obtained by passing back the LastFileID of the result
+    """
+    return gFileCatalogDB.findFilesInSubtree(path, filters, self.getRemoteCredentials(), chunkSize, lastFileID)
+
+  def stream_findFilesInSubtree(self, path, filters, chunkSize, lastFileID=0):
+    """ Find the files of a directory subtree, streamed in pages of at most chunkSize files """
+    credDict = self.getRemoteCredentials()
+    while True:
+      result = gFileCatalogDB.findFilesInSubtree(path, filters, credDict, chunkSize, lastFileID)
+      yield result
+      if not result['OK'] or result['Value']['Completed']:
+        break
+      lastFileID = result['Value']['LastFileID']
+
   types_isDirectory = [[ListType, DictType] + list(StringTypes)]
 
   def export_isDirectory(self, lfns):
@@ -448,6 +563,18 @@ class FileCatalogHandler(RequestHandler):
     """ Rebuild DirectoryUsage table from scratch """
     return gFileCatalogDB.rebuildDirectoryUsage()
 
+  types_rebuildMetadataIndex = []
+
+  def export_rebuildMetadataIndex(self):
+    """ Rebuild the index of the inherited directory metadata from scratch """
+    return gFileCatalogDB.rebuildMetadataIndex(self.getRemoteCredentials())
+
+  types_checkMetadataIndex = []
+
+  def export_checkMetadataIndex(self):
+    """ Check the index of the inherited directory metadata against the directory metadata """
+    return gFileCatalogDB.checkMetadataIndex(self.getRemoteCredentials())
+
   types_repairCatalog = []
 
   def export_repairCatalog(self):
@@ -747,7 +874,8 @@ class FileCatalogHandler(RequestHandler):
 
   def transfer_toClient(self, seName, token, fileHelper):
     """ This method used to transfer the SEDump to the client,
-        formated as CSV with '|' separation
+        formated as CSV with '|' separation. The dump is streamed chunk by chunk,
+        gzip compressed if the token contains "gzip"
 
         :param seName: name of the se to dump
 
@@ -756,21 +884,13 @@ class FileCatalogHandler(RequestHandler):
 
     """
 
-    retVal = self.getSEDump(seName)
-
+    dumpSource = SEDumpSource(gFileCatalogDB.getSEDumpChunks(seName), compress='gzip' in token)
     try:
-      csvOutput = cStringIO.StringIO()
-      writer = csv.writer(csvOutput, delimiter='|')
-      for lfn in retVal:
-        writer.writerow(lfn)
-
-      csvOutput.seek(0)
-
-      ret = fileHelper.DataSourceToNetwork(csvOutput)
+      ret = fileHelper.DataSourceToNetwork(dumpSource)
+      if not ret['OK'] and not fileHelper.finishedTransmission():
+        fileHelper.sendError(ret['Message'])
       return ret
 
     except Exception as e:
       gLogger.exception("Exception while sending seDump", repr(e))
       return S_ERROR("Exception while sendind seDump: %s" % repr(e))
-    finally:
-      csvOutput.close()
@@ -1,6 +1,11 @@
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
+
+import zlib
+
+import pytest
+
 # sut
 from DIRAC.DataManagementSystem.Service.StorageElementHandler import getDiskSpace, getFreeDiskSpace, getTotalDiskSpace
 
@@ -14,3 +19,31 @@ def test_getDiskSpace():
 
   res = getFreeDiskSpace()
   assert res['OK']
+
+
+def test_SEDumpSource():
+  from DIRAC.DataManagementSystem.Service.FileCatalogHandler import SEDumpSource
+
+  chunks = [{'OK': True, 'Value': [('/vo/f%d' % i, 'ad%d' % i, i) for i in range(j * 100, j * 100 + 100)]}
+            for j in range(3)]
+  expected = ''.join('/vo/f%d|ad%d|%d\r\n' % (i, i, i) for i in range(300))
+
+  source = SEDumpSource(iter(chunks))
+  data = ''
+  buf = source.read(1000)
+  while buf:
+    data += buf
+    buf = source.read(1000)
+  assert data == expected
+
+  source = SEDumpSource(iter(chunks), compress=True)
+  data = ''
+  buf = source.read(100)
+  while buf:
+    data += buf
+    buf = source.read(100)
+  assert zlib.decompress(data, 16 + zlib.MAX_WBITS) == expected
+
+  source = SEDumpSource(iter([chunks[0], {'OK': False, 'Message': 'Lost connection'}]))
+  with pytest.raises(IOError):
+    source.read(100000)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+""" Dump the content of a StorageElement according to the DIRAC FileCatalog into a file,
+    one replica per line formatted as lfn|checksum|size
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+from DIRAC.Core.Base import Script
+
+compress = False
+catalogURL = 'DataManagement/FileCatalog'
+Script.registerSwitch("z", "Compress", "   Transfer the dump gzip compressed and write it compressed")
+Script.registerSwitch("U:", "URL=", "   FileCatalog service [default %s]" % catalogURL)
+
+Script.setUsageMessage("""
+Dump the content of a StorageElement according to the DIRAC FileCatalog,
+the dump is written to the output file as it is received from the service
+
+Usage:
+   %s <SE> <outputFile>
+""" % Script.scriptName)
+
+Script.parseCommandLine(ignoreErrors=False)
+for switch in Script.getUnprocessedSwitches():
+  if switch[0].lower() in ("z", "compress"):
+    compress = True
+  elif switch[0] in ("U", "URL"):
+    catalogURL = switch[1]
+
+import DIRAC
+from DIRAC import gLogger
+
+args = Script.getPositionalArgs()
+if len(args) != 2:
+  Script.showHelp()
+  DIRAC.exit(1)
+seName, outputFile = args
+
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+res = FileCatalogClient(url=catalogURL).getSEDump(seName, outputFile, compress=compress)
+if not res['OK']:
+  gLogger.error("Failed to get the dump of %s" % seName, res['Message'])
+  DIRAC.exit(-2)
+
+gLogger.notice("Dump of %s written to %s" % (seName, outputFile))
+DIRAC.exit(0)
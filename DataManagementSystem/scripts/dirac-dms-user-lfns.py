@@ -17,12 +17,14 @@ years = 0
 wildcard = None
 baseDir = ''
 emptyDirsFlag = False
+maxWorkers = 8
 Script.registerSwitch("D:", "Days=", "Match files older than number of days [%s]" % days)
 Script.registerSwitch("M:", "Months=", "Match files older than number of months [%s]" % months)
 Script.registerSwitch("Y:", "Years=", "Match files older than number of years [%s]" % years)
 Script.registerSwitch("w:", "Wildcard=", "Wildcard for matching filenames [All]")
 Script.registerSwitch("b:", "BaseDir=", "Base directory to begin search (default /[vo]/user/[initial]/[username])")
 Script.registerSwitch("e", "EmptyDirs", "Create a list of empty directories")
+Script.registerSwitch("p:", "Parallel=", "Number of directories listed in parallel [%s]" % maxWorkers)
 
 Script.setUsageMessage('\n'.join([__doc__.split('\n')[1],
                                   'Usage:',
@@ -43,11 +45,14 @@ for switch in Script.getUnprocessedSwitches():
     baseDir = switch[1]
   if switch[0].lower() == "e" or switch[0].lower() == "emptydirs":
     emptyDirsFlag = True
+  if switch[0].lower() == "p" or switch[0].lower() == "parallel":
+    maxWorkers = int(switch[1])
 
 import DIRAC
 from DIRAC import gLogger
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getVOForGroup
 from DIRAC.Core.Security.ProxyInfo import getProxyInfo
+from DIRAC.DataManagementSystem.Client.DirectoryWalker import DirectoryWalker
 from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
 from datetime import datetime, timedelta
 import sys
@@ -97,29 +102,23 @@ if not baseDir:
 baseDir = baseDir.rstrip('/')
 
 gLogger.notice('Will search for files in %s%s' % (baseDir, (' matching %s' % wildcard) if wildcard else ''))
-activeDirs = [baseDir]
-
 allFiles = []
 emptyDirs = []
 
-while len(activeDirs) > 0:
-  currentDir = activeDirs.pop()
-  res = fc.listDirectory(currentDir, withMetadata, timeout=360)
+walker = DirectoryWalker(fc, maxWorkers=maxWorkers, verbose=withMetadata, timeout=360)
+for currentDir, res in walker.walk(baseDir,
+                                   dirFilter=lambda _subdir, dirDict: (not withMetadata) or
+                                   isOlderThan(dirDict['CreationDate'], totalDays)):
   if not res['OK']:
     gLogger.error("Error retrieving directory contents", "%s %s" % (currentDir, res['Message']))
-  elif currentDir in res['Value']['Failed']:
-    gLogger.error("Error retrieving directory contents", "%s %s" % (currentDir, res['Value']['Failed'][currentDir]))
   else:
-    dirContents = res['Value']['Successful'][currentDir]
+    dirContents = res['Value']
     subdirs = dirContents['SubDirs']
     files = dirContents['Files']
     if not subdirs and not files:
       emptyDirs.append(currentDir)
       gLogger.notice('%s: empty directory' % currentDir)
     else:
-      for subdir in sorted(subdirs, reverse=True):
-        if (not withMetadata) or isOlderThan(subdirs[subdir]['CreationDate'], totalDays):
-          activeDirs.append(subdir)
       for filename in sorted(files):
         fileOK = False
         if (not withMetadata) or isOlderThan(files[filename]['MetaData']['CreationDate'], totalDays):
@@ -11,7 +11,7 @@ from DIRAC.Core.DISET.TransferClient import TransferClient
 from DIRAC.Core.Security.ProxyInfo import getVOfromProxyGroup
 
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getVOMSAttributeForGroup, getDNForUsername
-from DIRAC.Resources.Catalog.Utilities import checkCatalogArguments
+from DIRAC.Resources.Catalog.Utilities import checkCatalogArguments, checkArgumentFormat
 from DIRAC.Resources.Catalog.FileCatalogClientBase import FileCatalogClientBase
 
 __RCSID__ = "$Id$"
@@ -30,7 +30,8 @@ class FileCatalogClient(FileCatalogClientBase):
        'findDirectoriesByMetadata', 'getReplicasByMetadata', 'findFilesByMetadataDetailed',
        'findFilesByMetadataWeb', 'getCompatibleMetadata', 'getMetadataSet', 'getDatasets',
        'getFileDescendents', 'getFileAncestors', 'getDirectoryUserMetadata', 'getFileUserMetadata',
-       'checkDataset', 'getDatasetParameters', 'getDatasetFiles', 'getDatasetAnnotation']
+       'checkDataset', 'getDatasetParameters', 'getDatasetFiles', 'getDatasetAnnotation',
+       'findFilesInSubtree', 'getFileLineage']
 
   WRITE_METHODS = [
       'createLink',
@@ -67,7 +68,8 @@ class FileCatalogClient(FileCatalogClientBase):
       'addGroup',
       'deleteGroup',
       'repairCatalog',
-      'rebuildDirectoryUsage']
+      'rebuildDirectoryUsage',
+      'rebuildMetadataIndex']
 
   NO_LFN_METHODS = [
       'findFilesByMetadata',
@@ -92,10 +94,14 @@ class FileCatalogClient(FileCatalogClientBase):
       'addGroup',
       'deleteGroup',
       'repairCatalog',
-      'rebuildDirectoryUsage']
+      'rebuildDirectoryUsage',
+      'rebuildMetadataIndex',
+      'checkMetadataIndex',
+      'findFilesInSubtree']
 
   ADMIN_METHODS = ['addUser', 'deleteUser', 'addGroup', 'deleteGroup', 'getUsers', 'getGroups',
-                   'getCatalogCounters', 'repairCatalog', 'rebuildDirectoryUsage']
+                   'getCatalogCounters', 'repairCatalog', 'rebuildDirectoryUsage',
+                   'rebuildMetadataIndex', 'checkMetadataIndex']
 
   def __init__(self, url=None, **kwargs):
     """ Constructor function.
@@ -116,13 +122,44 @@ class FileCatalogClient(FileCatalogClientBase):
 
     # If there is no PFN returned, just set the LFN instead
     lfnDict = result['Value']
-    for lfn in lfnDict['Successful']:
-      for se in lfnDict['Successful'][lfn]:
-        if not lfnDict['Successful'][lfn][se]:
-          lfnDict['Successful'][lfn][se] = lfn
+    self.__setMissingPFNs(lfnDict['Successful'])
 
     return S_OK(lfnDict)
 
+  def getReplicasIterator(self, lfns, allStatus=False, timeout=120):
+    """ Get the replicas of the given files, sent by the service in chunks of files.
+        Only one chunk at a time is kept in memory.
+
+        :return: S_OK(iterator), the iterator yields S_OK({'Successful': {}, 'Failed': {}}) for each chunk,
+                 or a last S_ERROR if the service fails
+    """
+    result = checkArgumentFormat(lfns)
+    if not result['OK']:
+      return result
+    rpcClient = self._getRPC(timeout=timeout)
+    result = rpcClient.executeStreamingRPC('getReplicas', (result['Value'], allStatus))
+    if not result['OK']:
+      return result
+    return S_OK(self.__processStream(result['Value'], self.__setMissingPFNs))
+
+  @staticmethod
+  def __setMissingPFNs(successful):
+    """ If there is no PFN returned, just set the LFN instead
+    """
+    for lfn in successful:
+      for se in successful[lfn]:
+        if not successful[lfn][se]:
+          successful[lfn][se] = lfn
+
+  @staticmethod
+  def __processStream(stream, processSuccessful):
+    """ Apply processSuccessful to the Successful dictionary of every chunk of a stream
+    """
+    for result in stream:
+      if result['OK']:
+        processSuccessful(result['Value']['Successful'])
+      yield result
+
   @checkCatalogArguments
   def setReplicaProblematic(self, lfns, revert=False):
     """
@@ -203,15 +240,36 @@ class FileCatalogClient(FileCatalogClientBase):
     result = rpcClient.listDirectory(lfn, verbose)
     if not result['OK']:
       return result
-    # Force returned directory entries to be LFNs
+    self.__setDirectoryEntriesLFNs(result['Value']['Successful'])
+    return result
+
+  def listDirectoryIterator(self, lfns, verbose=False, timeout=120):
+    """ List the given directories' contents, sent by the service in chunks of directories.
+        Only one chunk at a time is kept in memory.
+
+        :return: S_OK(iterator), the iterator yields S_OK({'Successful': {}, 'Failed': {}}) for each chunk,
+                 or a last S_ERROR if the service fails
+    """
+    result = checkArgumentFormat(lfns)
+    if not result['OK']:
+      return result
+    rpcClient = self._getRPC(timeout=timeout)
+    result = rpcClient.executeStreamingRPC('listDirectory', (result['Value'], verbose))
+    if not result['OK']:
+      return result
+    return S_OK(self.__processStream(result['Value'], self.__setDirectoryEntriesLFNs))
+
+  @staticmethod
+  def __setDirectoryEntriesLFNs(successful):
+    """ Force returned directory entries to be LFNs
+    """
     for entryType in ['Files', 'SubDirs', 'Links']:
-      for path in result['Value']['Successful']:
-        entryDict = result['Value']['Successful'][path][entryType]
+      for path in successful:
+        entryDict = successful[path][entryType]
         for fname in entryDict.keys():
           detailsDict = entryDict.pop(fname)
           lfn = os.path.join(path, os.path.basename(fname))
           entryDict[lfn] = detailsDict
-    return result
 
   @checkCatalogArguments
   def getDirectoryMetadata(self, lfns, timeout=120):
@@ -287,6 +345,30 @@ class FileCatalogClient(FileCatalogClientBase):
     else:
       return S_ERROR('Illegal return value type %s' % type(result['Value']))
 
+  def findFilesInSubtree(self, path, filters=None, chunkSize=10000, lastFileID=0, timeout=120):
+    """ Find a page of the files of a directory subtree, the search being done by the service
+
+        :param str path: top directory of the subtree
+        :param dict filters: optional MinSize, MaxSize, Status, CreatedAfter, CreatedBefore,
+                             ModifiedAfter and ModifiedBefore filters
+        :param int chunkSize: maximum number of files in the page
+        :param int lastFileID: LastFileID of the previous page, 0 for the first one
+
+        :return: S_OK( { 'LFNs' : list, 'LastFileID' : int, 'Completed' : bool } )
+    """
+    rpcClient = self._getRPC(timeout=timeout)
+    return rpcClient.findFilesInSubtree(path, filters if filters else {}, chunkSize, lastFileID)
+
+  def findFilesInSubtreeIterator(self, path, filters=None, chunkSize=10000, timeout=120):
+    """ Find the files of a directory subtree, sent by the service in pages of chunkSize files.
+        Only one page at a time is kept in memory.
+
+        :return: S_OK(iterator), the iterator yields S_OK( { 'LFNs', 'LastFileID', 'Completed' } )
+                 for each page, or a last S_ERROR if the service fails
+    """
+    rpcClient = self._getRPC(timeout=timeout)
+    return rpcClient.executeStreamingRPC('findFilesInSubtree', (path, filters if filters else {}, chunkSize))
+
   def getFileUserMetadata(self, path, timeout=120):
     """Get the meta data attached to a file, but also to
     the its corresponding directory
@@ -326,6 +408,19 @@ class FileCatalogClient(FileCatalogClientBase):
     """
     return self._getRPC(timeout=timeout).changePathMode(lfns, recursive)
 
+  @checkCatalogArguments
+  def getFileLineage(self, lfns, maxDepth=1, descendents=False, timeout=120):
+    """ Get the lineage graph of the given files, expanded by the service level by level
+
+        :param lfns: list of LFNs
+        :param int maxDepth: number of levels of ancestors (descendents) to expand
+        :param bool descendents: expand the descendents instead of the ancestors
+
+        :return: S_OK( { 'Successful' : { lfn : [ direct ancestors (descendents) ] }, 'Failed' : {} } ),
+                 the adjacency covering the lfns and their relatives less than maxDepth levels away
+    """
+    return self._getRPC(timeout=timeout).getFileLineage(lfns, maxDepth, descendents)
+
   ########################################################################
   # ACL Operations
   #
@@ -513,6 +608,14 @@ class FileCatalogClient(FileCatalogClientBase):
     """ Rebuild DirectoryUsage table from scratch """
     return self._getRPC(timeout=timeout).rebuildDirectoryUsage()
 
+  def rebuildMetadataIndex(self, timeout=120):
+    """ Rebuild the index of the inherited directory metadata from scratch """
+    return self._getRPC(timeout=timeout).rebuildMetadataIndex()
+
+  def checkMetadataIndex(self, timeout=120):
+    """ Check the index of the inherited directory metadata against the directory metadata """
+    return self._getRPC(timeout=timeout).checkMetadataIndex()
+
   def repairCatalog(self, timeout=120):
     """ Repair the catalog inconsistencies """
     return self._getRPC(timeout=timeout).repairCatalog()
@@ -665,17 +768,19 @@ class FileCatalogClient(FileCatalogClientBase):
 
   #############################################################################
 
-  def getSEDump(self, seName, outputFilename):
+  def getSEDump(self, seName, outputFilename, compress=False):
     """
         Dump the content of an SE in the given file.
         The file contains a list of [lfn,checksum,size] dumped as csv,
-        separated by '|'
+        separated by '|'. The dump is streamed by the service and written to the file
+        as it is received.
 
         :param seName: name of the StorageElement
         :param outputFilename: path to the file where to dump it
+        :param bool compress: transfer the dump gzip compressed, and write it compressed in the file
 
         :returns: result from the TransferClient
     """
 
     dfc = TransferClient(self.serverURL)
-    return dfc.receiveFile(outputFilename, seName)
+    return dfc.receiveFile(outputFilename, seName, token='gzip' if compress else '')
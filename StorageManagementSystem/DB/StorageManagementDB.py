@@ -670,23 +670,20 @@ class StorageManagementDB(DB):
       if not res['OK']:
         return res
       existingReplicas = res['Value']
+      for lfn in existingReplicas:
+        gLogger.verbose(
+            'StorageManagementDB.setRequest: Replica already exists in CacheReplicas table %s @ %s' %
+            (lfn, se))
       # Insert the CacheReplicas that do not already exist
-      for lfn in lfns:
-        if lfn in existingReplicas:
-          gLogger.verbose(
-              'StorageManagementDB.setRequest: Replica already exists in CacheReplicas table %s @ %s' %
-              (lfn, se))
-          existingFileState = existingReplicas[lfn][1]
-          taskState = self.__getTaskStateFromReplicaState(existingFileState)
-        else:
-          res = self._insertReplicaInformation(lfn, se, 'Stage', connection=connection)
-          if not res['OK']:
-            self._cleanTask(taskID, connection=connection)
-            return res
-
-          existingReplicas[lfn] = (res['Value'], 'New')
-          newFileState = existingReplicas[lfn][1]
-          taskState = self.__getTaskStateFromReplicaState(newFileState)
+      newLFNs = sorted(set(lfns) - set(existingReplicas))
+      if newLFNs:
+        res = self._insertReplicasInformation(newLFNs, se, 'Stage', connection=connection)
+        if not res['OK']:
+          self._cleanTask(taskID, connection=connection)
+          return res
+        existingReplicas.update(res['Value'])
+      for lfn in set(lfns):
+        taskState = self.__getTaskStateFromReplicaState(existingReplicas[lfn][1])
         if taskState not in taskStates:
           taskStates.append(taskState)
 
@@ -776,6 +773,34 @@ class StorageManagementDB(DB):
     # gLogger.verbose("_insertReplicaInformation: Inserted Replica ('%s','%s') and obtained ReplicaID %s" % (lfn,storageElement,replicaID))
     return S_OK(replicaID)
 
+  def _insertReplicasInformation(self, lfns, storageElement, rType, connection=False):
+    """ Enter several replicas into the CacheReplicas table with multi-row statements
+
+        :return: S_OK( { lfn : ( replicaID, status ) } )
+    """
+    connection = self.__getConnection(connection)
+    res = self.insertMultipleFields('CacheReplicas',
+                                    ['Type', 'SE', 'LFN', 'PFN', 'Size', 'FileChecksum', 'GUID',
+                                     'SubmitTime', 'LastUpdate'],
+                                    [[rType, storageElement, lfn, '', 0, '', '', 'UTC_TIMESTAMP()', 'UTC_TIMESTAMP()']
+                                     for lfn in lfns],
+                                    conn=connection)
+    if not res['OK']:
+      gLogger.error(
+          "_insertReplicasInformation: Failed to insert to CacheReplicas table.",
+          res['Message'])
+      return res
+    # The IDs of the new replicas are not returned by a multi-row INSERT
+    res = self._getExistingReplicas(storageElement, lfns, connection=connection)
+    if not res['OK']:
+      return res
+    missing = set(lfns) - set(res['Value'])
+    if missing:
+      return S_ERROR("Failed to insert %d replicas to CacheReplicas table" % len(missing))
+    gLogger.verbose("%s.%s_DB: inserted %d CacheReplicas at %s" %
+                    (self._caller(), '_insertReplicasInformation', len(lfns), storageElement))
+    return res
+
   def _insertTaskReplicaInformation(self, taskID, replicaIDs, connection=False):
     """ Enter the replicas into TaskReplicas table """
     connection = self.__getConnection(connection)
@@ -932,45 +957,33 @@ class StorageManagementDB(DB):
 
   def updateReplicaInformation(self, replicaTuples):
     """ This method set the replica size information and pfn for the requested storage element.  """
-    for replicaID, pfn, size in replicaTuples:
-      # reqSelect = "SELECT * FROM CacheReplicas WHERE ReplicaID = %s and Status != 'Cancelled';" % ( replicaID )
-      reqSelect = "SELECT ReplicaID FROM CacheReplicas WHERE ReplicaID = %s and Status != 'Cancelled';" % (
-          replicaID)
-      resSelect = self._query(reqSelect)
-      if not resSelect['OK']:
-        gLogger.warn("%s.%s_DB: problem retrieving record: %s. %s" %
-                     (self._caller(), 'updateReplicaInformation', reqSelect, resSelect['Message']))
-
-      req = "UPDATE CacheReplicas SET PFN = '%s', Size = %s, Status = 'Waiting' WHERE ReplicaID = %s and Status != 'Cancelled';" % (
-          pfn, size, replicaID)
-      res = self._update(req)
-      if not res['OK']:
-        gLogger.error(
-            'StagerDB.updateReplicaInformation: Failed to insert replica information.',
-            res['Message'])
+    if not replicaTuples:
+      return S_OK()
+    # All the replicas are updated with a single statement, executed for each replica
+    res = self._updatemany("UPDATE CacheReplicas SET PFN = %s, Size = %s, Status = 'Waiting' "
+                           "WHERE ReplicaID = %s and Status != 'Cancelled';",
+                           [(pfn, size, replicaID) for replicaID, pfn, size in replicaTuples])
+    if not res['OK']:
+      gLogger.error(
+          'StagerDB.updateReplicaInformation: Failed to insert replica information.',
+          res['Message'])
+      return res
 
-      replicaIDs = []
+    replicaIDs = [replicaID for replicaID, _pfn, _size in replicaTuples]
+    reqSelect = "SELECT * FROM CacheReplicas WHERE ReplicaID IN (%s);" % intListToString(replicaIDs)
+    resSelect = self._query(reqSelect)
+    if not resSelect['OK']:
+      gLogger.warn("%s.%s_DB: problem retrieving record: %s. %s" %
+                   (self._caller(), 'updateReplicaInformation', reqSelect, resSelect['Message']))
+    else:
       for record in resSelect['Value']:
-        replicaIDs.append(record[0])
         gLogger.verbose(
-            "%s.%s_DB: to_update CacheReplicas =  %s" %
+            "%s.%s_DB: updated CacheReplicas = %s" %
             (self._caller(), 'updateReplicaInformation', record))
 
-      reqSelect1 = "SELECT * FROM CacheReplicas WHERE ReplicaID IN (%s);" % intListToString(
-          replicaIDs)
-      resSelect1 = self._query(reqSelect1)
-      if not resSelect1['OK']:
-        gLogger.warn("%s.%s_DB: problem retrieving record: %s. %s" %
-                     (self._caller(), 'updateReplicaInformation', reqSelect1, resSelect1['Message']))
-      else:
-        for record in resSelect1['Value']:
-          gLogger.verbose(
-              "%s.%s_DB: updated CacheReplicas = %s" %
-              (self._caller(), 'updateReplicaInformation', record))
-
-      gLogger.debug(
-          'StagerDB.updateReplicaInformation: Successfully updated CacheReplicas record With Status=Waiting, for ReplicaID= %s' %
-          (replicaID))
+    gLogger.debug(
+        'StagerDB.updateReplicaInformation: Successfully updated %s CacheReplicas records With Status=Waiting' %
+        res['Value'])
     return S_OK()
 
   ####################################################################
@@ -17,7 +17,7 @@ import time
 import datetime
 from Queue import Queue
 
-from DIRAC import S_OK
+from DIRAC import S_OK, S_ERROR
 
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Security.ProxyInfo import getProxyInfo
@@ -526,18 +526,23 @@ class TaskManagerAgentBase(AgentModule, TransformationAgentsUtilities):
                          method=method, transID=transID)
           return res
 
-    # For the tasks for which an associated request was found update the task details in the transformationDB
+    # For the tasks for which an associated request was found update the task details in the transformationDB,
+    # with a single call per chunk of tasks of a transformation
+    transTaskIDs = {}
     for taskName, extTaskID in taskNameIDs.items():
       transID, taskID = self._parseTaskName(taskName)
       self._logInfo("Setting status of %s to Submitted with ID %s" % (taskName, extTaskID),
                     method=method, transID=transID)
-      setTaskStatusAndWmsID = clients['TransformationClient'].setTaskStatusAndWmsID(transID, taskID,
-                                                                                    'Submitted', str(extTaskID))
-      if not setTaskStatusAndWmsID['OK']:
+      transTaskIDs.setdefault(transID, {})[taskID] = str(extTaskID)
+    for transID, taskWmsIDs in transTaskIDs.items():
+      res = clients['TaskManager'].updateTasksStatusAndWmsIDs(transID, taskWmsIDs, 'Submitted', method=method)
+      if not res['OK']:
+        return res
+      if res['Value']:
         self._logError("Failed to update task status and ID after recovery:",
-                       "%s %s" % (taskName, setTaskStatusAndWmsID['Message']),
+                       "%d tasks %s" % (len(res['Value']), list(res['Value'].values())[0]),
                        method=method, transID=transID)
-        return setTaskStatusAndWmsID
+        return S_ERROR("Failed to update the status of %d tasks" % len(res['Value']))
 
     return S_OK()
 
@@ -14,25 +14,73 @@ from __future__ import print_function
 
 from past.builtins import long
 import time
+import math
 import Queue
 import os
 import datetime
-import pickle
+import itertools
+import threading
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
-from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
 from DIRAC.Core.Utilities.List import breakListIntoChunks, randomize
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
+from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 from DIRAC.TransformationSystem.Client.TransformationClient import TransformationClient
 from DIRAC.TransformationSystem.Agent.TransformationAgentsUtilities import TransformationAgentsUtilities
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
 
 __RCSID__ = "$Id$"
 
 AGENT_NAME = 'Transformation/TransformationAgent'
-gSynchro = Synchronizer()
+
+
+class _TransformationProgress(object):
+  """ Progress of the processing of a transformation, whose files may be split in slices processed by several threads
+  """
+
+  def __init__(self, transDict):
+    self.transDict = transDict
+    self.startTime = time.time()
+    # Number of work items (the transformation and its slices) not yet done
+    self.pending = 1
+    self.slices = 1
+    # Number of files obtained for the transformation, None until they are obtained
+    self.unusedFiles = None
+    self.createdTasks = 0
+    self.lfnsInTasks = 0
+    self.allCreated = True
+    self.timeout = False
+    self.failed = False
+    self.lock = threading.Lock()
+
+  def addSlices(self, slices):
+    """ Account for slices put in the queue
+    """
+    with self.lock:
+      self.pending += slices
+      self.slices += slices
+
+  def addResult(self, createdTasks, lfnsInTasks, allCreated, timeout):
+    """ Account for the tasks created for a slice
+    """
+    with self.lock:
+      self.createdTasks += createdTasks
+      self.lfnsInTasks += lfnsInTasks
+      self.allCreated = self.allCreated and allCreated
+      self.timeout = self.timeout or timeout
+
+  def workDone(self, failed=False):
+    """ Account for a work item done
+
+        :return: True if it was the last one of the transformation
+    """
+    with self.lock:
+      self.failed = self.failed or failed
+      self.pending -= 1
+      return self.pending == 0
 
 
 class TransformationAgent(AgentModule, TransformationAgentsUtilities):
@@ -55,12 +103,15 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     self.transfClient = None
 
     # parameters for the threading
-    self.transQueue = Queue.Queue()
+    self.transQueue = Queue.PriorityQueue()
+    self.queueCounter = itertools.count()
     self.transInQueue = []
+    self.transInProgress = {}
+    self.filesPerSlice = 0
+    self.monitoredTransformations = set()
 
     # parameters for caching
     self.workDirectory = ''
-    self.cacheFile = ''
     self.controlDirectory = ''
 
     self.lastFileOffset = {}
@@ -99,20 +150,24 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     # clients
     self.transfClient = TransformationClient()
 
-    # for caching using a pickle file
+    # for caching in the work directory
     self.workDirectory = self.am_getWorkDirectory()
-    self.cacheFile = os.path.join(self.workDirectory, 'ReplicaCache.pkl')
     self.controlDirectory = self.am_getControlDirectory()
 
     # remember the offset if any in TS
     self.lastFileOffset = {}
 
     # Validity of the cache
-    self.replicaCache = {}
     self.replicaCacheValidity = self.am_getOption('ReplicaCacheValidity', 2)
+    compactionMinRecords = self.am_getOption('ReplicaCacheCompactionMinRecords', 10000)
+    self.replicaCache = ReplicaCache(self.workDirectory, int(self.replicaCacheValidity * 86400),
+                                     compactionMinRecords=compactionMinRecords)
 
     self.noUnusedDelay = self.am_getOption('NoUnusedDelay', 6)
 
+    # Replication and removal transformations are processed by slices of files, which any thread can take
+    self.filesPerSlice = self.am_getOption('FilesPerSlice', 20000)
+
     # Get it threaded
     maxNumberOfThreads = self.am_getOption('maxThreadsInPool', 1)
     threadPool = ThreadPool(maxNumberOfThreads, maxNumberOfThreads)
@@ -131,6 +186,8 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     method = 'finalize'
     if self.transInQueue:
       self.transInQueue = []
+      # The slices still in the queue are skipped, the threads finish the ones they process
+      self.__emptyQueue()
       self._logInfo("Wait for threads to get empty before terminating the agent (%d tasks)" %
                     len(self.transInThread), method=method)
       self._logInfo('Remaining transformations:',
@@ -167,10 +224,32 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       if transID not in self.transInQueue:
         count += 1
         self.transInQueue.append(transID)
-        self.transQueue.put(transDict)
+        self.__queue(transDict, self.unusedFiles.get(transID, 0))
     self._logInfo("Out of %d transformations, %d put in thread queue" % (len(res['Value']), count))
     return S_OK()
 
+  def __queue(self, transDict, nFiles, transFiles=None):
+    """ Put a transformation, or a slice of its files, in the queue. The smallest numbers of files (by order of
+        magnitude) are processed first, then the oldest transformations, i.e. those with the lowest ID
+
+        :param dict transDict: transformation parameters
+        :param int nFiles: number of files to process, as far as it is known
+        :param list transFiles: files of the slice, None for the whole transformation
+    """
+    priority = (int(math.log10(nFiles)) if nFiles > 0 else 0, long(transDict['TransformationID']))
+    self.transQueue.put((priority, next(self.queueCounter), transDict, transFiles))
+
+  def __emptyQueue(self):
+    """ Remove all the items from the queue, the slices being accounted as failed
+    """
+    while True:
+      try:
+        _priority, _count, transDict, transFiles = self.transQueue.get_nowait()
+      except Queue.Empty:
+        break
+      if transFiles is not None:
+        self.__workDone(long(transDict['TransformationID']), None, failed=True)
+
   def getTransformations(self):
     """ Obtain the transformations to be executed - this is executed at the start of every loop (it's really the
         only real thing in the execute()
@@ -209,38 +288,104 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             'DataManager': threadDataManager}
 
   def _execute(self, threadID):
-    """ thread - does the real job: processing the transformations to be processed
+    """ thread - does the real job: processing the transformations, or the slices of their files, to be processed
     """
 
     # Each thread will have its own clients
     clients = self._getClients()
 
     while True:
-      transDict = self.transQueue.get()
-      try:
-        transID = long(transDict['TransformationID'])
-        if transID not in self.transInQueue:
-          break
+      _priority, _count, transDict, transFiles = self.transQueue.get()
+      transID = long(transDict['TransformationID'])
+      if transID not in self.transInQueue:
+        if transFiles is not None:
+          self.__workDone(transID, clients, failed=True)
+        break
+      if transFiles is None:
+        self.transInProgress[transID] = _TransformationProgress(transDict)
         self.transInThread[transID] = ' [Thread%d] [%s] ' % (threadID, str(transID))
         self._logInfo("Processing transformation %s." % transID, transID=transID)
-        startTime = time.time()
-        res = self.processTransformation(transDict, clients)
+      else:
+        self._logInfo("Processing a slice of %d files in thread %d." % (len(transFiles), threadID), transID=transID)
+      failed = True
+      try:
+        if transFiles is None:
+          res = self.processTransformation(transDict, clients)
+        else:
+          res = self._processSlice(transDict, transFiles, clients)
+          if res['OK']:
+            self.transInProgress[transID].addResult(*res['Value'])
         if not res['OK']:
           self._logInfo("Failed to process transformation:", res['Message'], transID=transID)
+        failed = not res['OK']
       except Exception as x:  # pylint: disable=broad-except
         self._logException('Exception in plugin', lException=x, transID=transID)
       finally:
-        if not transID:
-          transID = 'None'
-        self._logInfo("Processed transformation in %.1f seconds" % (time.time() - startTime), transID=transID)
-        if transID in self.transInQueue:
-          self.transInQueue.remove(transID)
-        self.transInThread.pop(transID, None)
-        self._logVerbose("%d transformations still in queue" % len(self.transInQueue))
+        self.__workDone(transID, clients, failed=failed)
     return S_OK()
 
+  def __workDone(self, transID, clients, failed=False):
+    """ Account for the end of the processing of a transformation or of a slice. After the last one,
+        update the status of the transformation, and publish its processing metrics
+    """
+    method = '__workDone'
+    progress = self.transInProgress.get(transID)
+    if progress is None or not progress.workDone(failed):
+      return
+    if progress.unusedFiles is not None:
+      transDict = progress.transDict
+      self.pluginTimeout[transID] = progress.timeout
+      if progress.createdTasks:
+        self._logInfo("Successfully created %d tasks for transformation." % progress.createdTasks,
+                      method=method, transID=transID)
+      else:
+        self._logInfo("No new tasks created for transformation.",
+                      method=method, transID=transID)
+      self.unusedFiles[transID] = progress.unusedFiles - progress.lfnsInTasks
+      # If not all files were obtained, move the offset
+      lastOffset = self.lastFileOffset.get(transID)
+      if lastOffset:
+        self.lastFileOffset[transID] = max(0, lastOffset - progress.lfnsInTasks)
+
+      # If this production is to Flush
+      if transDict['Status'] == 'Flush' and progress.allCreated and not progress.failed:
+        res = clients['TransformationClient'].setTransformationParameter(transID, 'Status', 'Active')
+        if not res['OK']:
+          self._logError("Failed to update transformation status to 'Active':", res['Message'],
+                         method=method, transID=transID)
+        else:
+          self._logInfo("Updated transformation status to 'Active'.",
+                        method=method, transID=transID)
+      self.__publishMetrics(transID, progress)
+    self._logInfo("Processed transformation in %.1f seconds%s" %
+                  (time.time() - progress.startTime,
+                   (' (%d slices)' % progress.slices) if progress.slices > 1 else ''), transID=transID)
+    if transID in self.transInQueue:
+      self.transInQueue.remove(transID)
+    self.transInThread.pop(transID, None)
+    self.transInProgress.pop(transID, None)
+    self._logVerbose("%d transformations still in queue" % len(self.transInQueue))
+
+  def __publishMetrics(self, transID, progress):
+    """ Send to the monitoring the processing time of a transformation, and the numbers of files processed
+        and of tasks created
+    """
+    if transID not in self.monitoredTransformations:
+      self.monitoredTransformations.add(transID)
+      gMonitor.registerActivity("ProcessingTime_%s" % transID, "Processing time of transformation %s" % transID,
+                                "Transformation Monitoring", "seconds", gMonitor.OP_MEAN)
+      gMonitor.registerActivity("ProcessedFiles_%s" % transID, "Files processed for transformation %s" % transID,
+                                "Transformation Monitoring", "Files", gMonitor.OP_SUM)
+      gMonitor.registerActivity("CreatedTasks_%s" % transID, "Tasks created for transformation %s" % transID,
+                                "Transformation Monitoring", "Tasks", gMonitor.OP_SUM)
+    gMonitor.addMark("ProcessingTime_%s" % transID, time.time() - progress.startTime)
+    gMonitor.addMark("ProcessedFiles_%s" % transID, progress.unusedFiles)
+    gMonitor.addMark("CreatedTasks_%s" % transID, progress.createdTasks)
+
   def processTransformation(self, transDict, clients):
-    """ process a single transformation (in transDict)
+    """ process a single transformation (in transDict). When called by the threads of the agent, the files
+        of replication and removal transformations are split in slices: the first one is processed here
+        and the others are put in the queue, so that they are processed by any thread.
     """
     method = 'processTransformation'
     transID = transDict['TransformationID']
@@ -253,8 +398,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     if not transFiles['Value']:
       return S_OK()
 
-    if transID not in self.replicaCache:
-      self.__readCache(transID)
+    self.__readCache(transID)
     transFiles = transFiles['Value']
     unusedLfns = [f['LFN'] for f in transFiles]
     unusedFiles = len(unusedLfns)
@@ -269,9 +413,49 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       if len(lfnsToProcess) != totLfns:
         self._logInfo("Reduced number of files from %d to %d" % (totLfns, len(lfnsToProcess)),
                       method=method, transID=transID)
+        lfnsToProcess = set(lfnsToProcess)
         transFiles = [f for f in transFiles if f['LFN'] in lfnsToProcess]
-    else:
-      lfnsToProcess = unusedLfns
+
+    # The replica cache is prepared once for all the slices
+    self.__prepareCache(transDict)
+    progress = self.transInProgress.get(transID)
+    inThread = progress is not None
+    if not inThread:
+      # Not called by the threads of the agent: all the files and the bookkeeping are processed here
+      progress = self.transInProgress.setdefault(transID, _TransformationProgress(transDict))
+    progress.unusedFiles = unusedFiles
+
+    # Files of data processing transformations are grouped by the plugins, hence not split
+    if inThread and not forJobs and self.filesPerSlice and len(transFiles) > self.filesPerSlice:
+      slices = breakListIntoChunks(transFiles, self.filesPerSlice)
+      self._logInfo("Processing %d files in %d slices of %d files" %
+                    (len(transFiles), len(slices), self.filesPerSlice),
+                    method=method, transID=transID)
+      progress.addSlices(len(slices) - 1)
+      for sliceFiles in slices[1:]:
+        self.__queue(transDict, len(sliceFiles), sliceFiles)
+      transFiles = slices[0]
+    failed = True
+    try:
+      res = self._processSlice(transDict, transFiles, clients)
+      if res['OK']:
+        progress.addResult(*res['Value'])
+      failed = not res['OK']
+    finally:
+      if not inThread:
+        self.__workDone(transID, clients, failed=failed)
+    return res if failed else S_OK()
+
+  def _processSlice(self, transDict, transFiles, clients):
+    """ Create the tasks of a transformation for some of its files: get their replicas and run the plugin
+
+        :return: S_OK( ( number of tasks created, number of files in the tasks, all tasks created, plugin timeout ) )
+    """
+    method = '_processSlice'
+    transID = transDict['TransformationID']
+    forJobs = transDict['Type'].lower() not in ('replication', 'removal')
+    plugin = transDict.get('Plugin', 'Standard')
+    lfnsToProcess = [f['LFN'] for f in transFiles]
 
     # Check the data is available with replicas
     res = self.__getDataReplicas(transDict, lfnsToProcess, clients, forJobs=forJobs)
@@ -299,10 +483,11 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                      method=method, transID=transID)
       return res
     tasks = res['Value']
-    self.pluginTimeout[transID] = res.get('Timeout', False)
+    timeout = res.get('Timeout', False)
     # Create the tasks
     allCreated = True
     created = 0
+    lfnsToProcess = set(lfnsToProcess)
     lfnsInTasks = []
     for se, lfns in tasks:
       res = clients['TransformationClient'].addTaskForTransformation(transID, lfns, se)
@@ -313,29 +498,8 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       else:
         created += 1
         lfnsInTasks += [lfn for lfn in lfns if lfn in lfnsToProcess]
-    if created:
-      self._logInfo("Successfully created %d tasks for transformation." % created,
-                    method=method, transID=transID)
-    else:
-      self._logInfo("No new tasks created for transformation.",
-                    method=method, transID=transID)
-    self.unusedFiles[transID] = unusedFiles - len(lfnsInTasks)
-    # If not all files were obtained, move the offset
-    lastOffset = self.lastFileOffset.get(transID)
-    if lastOffset:
-      self.lastFileOffset[transID] = max(0, lastOffset - len(lfnsInTasks))
     self.__removeFilesFromCache(transID, lfnsInTasks)
-
-    # If this production is to Flush
-    if transDict['Status'] == 'Flush' and allCreated:
-      res = clients['TransformationClient'].setTransformationParameter(transID, 'Status', 'Active')
-      if not res['OK']:
-        self._logError("Failed to update transformation status to 'Active':", res['Message'],
-                       method=method, transID=transID)
-      else:
-        self._logInfo("Updated transformation status to 'Active'.",
-                      method=method, transID=transID)
-    return S_OK()
+    return S_OK((created, len(lfnsInTasks), allCreated, timeout))
 
   ######################################################################
   #
@@ -435,14 +599,14 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       return lfns
     return randomize(lfns)[:maxFiles]
 
-  def __getDataReplicas(self, transDict, lfns, clients, forJobs=True):
-    """ Get the replicas for the LFNs and check their statuses. It first looks within the cache.
+  def __prepareCache(self, transDict):
+    """ Clear the replica cache of a transformation if requested, or remove its expired replicas
     """
-    method = '__getDataReplicas'
+    method = '__prepareCache'
     transID = transDict['TransformationID']
     if 'RemoveFile' in transDict['Body']:
       # When removing files, we don't care about their replicas
-      return S_OK(dict.fromkeys(lfns, ['None']))
+      return
     clearCacheFile = os.path.join(self.controlDirectory, 'ClearCache_%s' % str(transID))
     try:
       clearCache = os.path.exists(clearCacheFile)
@@ -457,21 +621,23 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     else:
       # If the cache needs to be cleaned
       self.__cleanCache(transID)
+
+  def __getDataReplicas(self, transDict, lfns, clients, forJobs=True):
+    """ Get the replicas for the LFNs and check their statuses. It first looks within the cache.
+    """
+    method = '__getDataReplicas'
+    transID = transDict['TransformationID']
+    if 'RemoveFile' in transDict['Body']:
+      # When removing files, we don't care about their replicas
+      return S_OK(dict.fromkeys(lfns, ['None']))
     startTime = time.time()
-    dataReplicas = {}
     nLfns = len(lfns)
     self._logVerbose("Getting replicas for %d files" % nLfns, method=method, transID=transID)
-    cachedReplicaSets = self.replicaCache.get(transID, {})
-    cachedReplicas = {}
-    # Merge all sets of replicas
-    for replicas in cachedReplicaSets.itervalues():
-      cachedReplicas.update(replicas)
-    self._logInfo("Number of cached replicas: %d" % len(cachedReplicas), method=method, transID=transID)
-    setCached = set(cachedReplicas)
+    self._logInfo("Number of cached replicas: %d" % self.replicaCache.getSize(transID),
+                  method=method, transID=transID)
     setLfns = set(lfns)
-    for lfn in setLfns & setCached:
-      dataReplicas[lfn] = cachedReplicas[lfn]
-    newLFNs = setLfns - setCached
+    dataReplicas = self.replicaCache.get(transID, setLfns)
+    newLFNs = setLfns - set(dataReplicas)
     self._logInfo("ReplicaCache hit for %d out of %d LFNs" % (len(dataReplicas), nLfns),
                   method=method, transID=transID)
     if newLFNs:
@@ -563,42 +729,28 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
   def __updateCache(self, transID, newReplicas):
     """ Add replicas to the cache
     """
-    self.replicaCache.setdefault(transID, {})[datetime.datetime.utcnow()] = newReplicas
-#    if len( newReplicas ) > 5000:
-#      self.__writeCache( transID )
+    self.replicaCache.add(transID, newReplicas)
 
   def __clearCacheForTrans(self, transID):
     """ Remove all replicas for a transformation
     """
-    self.replicaCache.pop(transID, None)
+    self.replicaCache.clear(transID)
 
   def __cleanReplicas(self, transID, lfns):
     """ Remove cached replicas that are not in a list
     """
-    cachedReplicas = set()
-    for replicas in self.replicaCache.get(transID, {}).itervalues():
-      cachedReplicas.update(replicas)
-    toRemove = cachedReplicas - set(lfns)
+    toRemove = set(self.replicaCache.getLFNs(transID)) - set(lfns)
     if toRemove:
       self._logInfo("Remove %d files from cache" % len(toRemove), method='__cleanReplicas', transID=transID)
       self.__removeFromCache(transID, toRemove)
 
   def __cleanCache(self, transID):
-    """ Cleans the cache
+    """ Cleans the cache: remove the expired replicas
     """
     try:
-      if transID in self.replicaCache:
-        timeLimit = datetime.datetime.utcnow() - datetime.timedelta(days=self.replicaCacheValidity)
-        for updateTime in set(self.replicaCache[transID]):
-          nCache = len(self.replicaCache[transID][updateTime])
-          if updateTime < timeLimit or not nCache:
-            self._logInfo("Clear %s replicas for transformation %s, time %s" %
-                          ('%d cached' % nCache if nCache else 'empty cache', str(transID), str(updateTime)),
-                          transID=transID, method='__cleanCache')
-            del self.replicaCache[transID][updateTime]
-        # Remove empty transformations
-        if not self.replicaCache[transID]:
-          del self.replicaCache[transID]
+      expired = self.replicaCache.expire(transID)
+      if expired:
+        self._logInfo("Cleared %d expired replicas" % expired, transID=transID, method='__cleanCache')
     except Exception as x:
       self._logException("Exception when cleaning replica cache:", lException=x)
 
@@ -609,72 +761,23 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       self.__writeCache(transID)
 
   def __removeFromCache(self, transID, lfns):
-    if transID not in self.replicaCache:
-      return
-    removed = 0
-    if self.replicaCache[transID] and lfns:
-      for lfn in lfns:
-        for timeKey in self.replicaCache[transID]:
-          if self.replicaCache[transID][timeKey].pop(lfn, None):
-            removed += 1
-    return removed
-
-  def __cacheFile(self, transID):
-    return self.cacheFile.replace('.pkl', '_%s.pkl' % str(transID))
-
-  @gSynchro
+    return self.replicaCache.remove(transID, lfns)
+
   def __readCache(self, transID):
-    """ Reads from the cache
+    """ Reads from the cache files, if not yet done
     """
-    if transID in self.replicaCache:
-      return
-    try:
-      method = '__readCache'
-      fileName = self.__cacheFile(transID)
-      if not os.path.exists(fileName):
-        self.replicaCache[transID] = {}
-      else:
-        with open(fileName, 'r') as cacheFile:
-          self.replicaCache[transID] = pickle.load(cacheFile)
-        self._logInfo("Successfully loaded replica cache from file %s (%d files)" %
-                      (fileName, self.__filesInCache(transID)),
-                      method=method, transID=transID)
-    except Exception as x:
-      self._logException("Failed to load replica cache from file %s" % fileName, lException=x,
-                         method=method, transID=transID)
-      self.replicaCache[transID] = {}
-
-  def __filesInCache(self, transID):
-    cache = self.replicaCache.get(transID, {})
-    return sum(len(lfns) for lfns in cache.itervalues())
+    if transID not in self.replicaCache:
+      self.replicaCache.load(transID)
+      self._logVerbose("Loaded replica cache (%d files)" % self.replicaCache.getSize(transID),
+                       method='__readCache', transID=transID)
 
-  @gSynchro
   def __writeCache(self, transID=None):
-    """ Writes the cache
+    """ Writes the changes of the cache: they are appended to the cache log files
     """
-    method = '__writeCache'
-    try:
-      startTime = time.time()
-      transList = [transID] if transID else set(self.replicaCache)
-      filesInCache = 0
-      nCache = 0
-      for t_id in transList:
-        # Protect the copy of the cache
-        filesInCache += self.__filesInCache(t_id)
-        # write to a temporary file in order to avoid corrupted files
-        cacheFile = self.__cacheFile(t_id)
-        tmpFile = cacheFile + '.tmp'
-        with open(tmpFile, 'w') as fd:
-          pickle.dump(self.replicaCache.get(t_id, {}), fd)
-        # Now rename the file as it shold
-        os.rename(tmpFile, cacheFile)
-        nCache += 1
-      self._logInfo("Successfully wrote %d replica cache file(s) (%d files) in %.1f seconds"
-                    % (nCache, filesInCache, time.time() - startTime),
-                    method=method, transID=transID if transID else None)
-    except Exception as x:
-      self._logException("Could not write replica cache file %s" % cacheFile, lException=x,
-                         method=method, transID=t_id)
+    startTime = time.time()
+    self.replicaCache.flush(transID)
+    self._logVerbose("Wrote replica cache in %.1f seconds" % (time.time() - startTime),
+                     method='__writeCache', transID=transID if transID else None)
 
   def __generatePluginObject(self, plugin, clients):
     """ This simply instantiates the TransformationPlugin class with the relevant plugin name
@@ -703,7 +806,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       try:
         if transID in self.replicaCache:
           self._logInfo("Removed cached replicas for transformation", method='pluginCallBack', transID=transID)
-          self.replicaCache.pop(transID)
+          self.__clearCacheForTrans(transID)
           self.__writeCache(transID)
       except BaseException:
         pass
@@ -143,6 +143,8 @@ class TransformationPlugin(PluginBase):
     groupSize = self.params['GroupSize']  # Number of files per tasks
 
     fileGroups = getFileGroups(self.data)  # groups by SE
+    # The sites of the SEs are resolved once, not for each file
+    targetSites = dict((targetSE, self._getSiteForSE(targetSE)['Value']) for targetSE in targetSEs)
     targetSELfns = {}
     for replicaSE, lfns in fileGroups.items():
       ses = replicaSE.split(',')
@@ -150,12 +152,13 @@ class TransformationPlugin(PluginBase):
       if not atSource:
         continue
 
+      groupSourceSites = self._getSitesForSEs(ses)
       for lfn in lfns:
         targets = []
-        sourceSites = self._getSitesForSEs(ses)
+        sourceSites = list(groupSourceSites)
         random.shuffle(targetSEs)
         for targetSE in targetSEs:
-          site = self._getSiteForSE(targetSE)['Value']
+          site = targetSites[targetSE]
           if site not in sourceSites:
             if (destinations) and (len(targets) >= destinations):
               continue
@@ -51,6 +51,7 @@ class ValidateOutputDataAgent(AgentModule):
     self.directoryLocations = sorted(self.am_getOption('DirectoryLocations', ['TransformationDB',
                                                                               'MetadataCatalog']))
     self.transfidmeta = self.am_getOption('TransfIDMeta', "TransformationID")
+    self.checkDescendants = self.am_getOption('CheckDescendants', False)
     self.enableFlag = True
 
   #############################################################################
@@ -208,10 +209,43 @@ class ValidateOutputDataAgent(AgentModule):
         gLogger.error(iRes['Message'])
         return iRes
 
+    ######################################################
+    #
+    # This check verifies that the processed input files have descendants
+    #
+    if self.checkDescendants:
+      res = self.checkProcessedFilesDescendants(transID)
+      if not res['OK']:
+        return res
+
     gLogger.info("-" * 40)
     gLogger.info("Completed integrity check for transformation %s" % transID)
     return S_OK()
 
+  def checkProcessedFilesDescendants(self, transID):
+    """ Check in the catalog lineage that the processed input files of the transformation have descendants,
+        the files without descendants are set problematic
+    """
+    res = self.transClient.getTransformationFiles({'TransformationID': transID, 'Status': 'Processed'})
+    if not res['OK']:
+      gLogger.error("Failed to get the processed files", res['Message'])
+      return res
+    lfns = [fileDict['LFN'] for fileDict in res['Value']]
+    if not lfns:
+      return S_OK()
+    res = self.consistencyInspector.checkDescendants(lfns)
+    if not res['OK']:
+      return res
+    withoutDesc = self.consistencyInspector.prcdWithoutDesc
+    gLogger.info("%d processed files of transformation %s, %d without descendants" %
+                 (len(lfns), transID, len(withoutDesc)))
+    if withoutDesc:
+      res = self.integrityClient.setFileProblematic(withoutDesc, 'NoDescendants', sourceComponent=AGENT_NAME)
+      if not res['OK']:
+        gLogger.error("Failed to set the files without descendants problematic", res['Message'])
+        return res
+    return S_OK()
+
   def finalizeCheck(self, transID):
     """ Move to 'WaitingIntegrity' or 'ValidatedOutput'
     """
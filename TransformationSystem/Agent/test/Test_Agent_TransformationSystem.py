@@ -15,7 +15,7 @@ from mock import MagicMock
 from DIRAC import gLogger
 # sut
 from DIRAC.TransformationSystem.Agent.TaskManagerAgentBase import TaskManagerAgentBase
-from DIRAC.TransformationSystem.Agent.TransformationAgent import TransformationAgent
+from DIRAC.TransformationSystem.Agent.TransformationAgent import TransformationAgent, _TransformationProgress
 
 mockAM = MagicMock()
 
@@ -105,7 +105,7 @@ def test_updateFileStatusSuccess(mocker,
 
 @pytest.mark.parametrize(', '.join(["tcMockGetTransformationTasksReturnValue",
                                     "tmMockUpdateTransformationReservedTasksReturnValue",
-                                    "tcMockSetTaskStatusAndWmsIDReturnValue",
+                                    "tmMockUpdateTasksStatusAndWmsIDsReturnValue",
                                     "expected"]),
                          [(sError, None, None, False),  # errors getting
                           (sOk, None, None, True),  # no tasks
@@ -113,21 +113,24 @@ def test_updateFileStatusSuccess(mocker,
                           (tasks, {'OK': True,
                                    'Value': {'NoTasks': [], 'TaskNameIDs': {'1_1': 123, '2_1': 456}}},
                            sError, False),  # tasks, something to update, fail
+                          (tasks, {'OK': True,
+                                   'Value': {'NoTasks': [], 'TaskNameIDs': {'1_1': 123, '2_1': 456}}},
+                           {'OK': True, 'Value': {1: 'a mess'}}, False),  # tasks, something to update, some fail
                           (tasks, {'OK': True,
                                    'Value': {'NoTasks': ['3_4', '5_6'],
                                              'TaskNameIDs': {'1_1': 123, '2_1': 456}}},
-                           {'OK': True}, True)])  # tasks, something to update, no fail
+                           {'OK': True, 'Value': {}}, True)])  # tasks, something to update, no fail
 def test_checkReservedTasks(mocker,
                             tcMockGetTransformationTasksReturnValue,
                             tmMockUpdateTransformationReservedTasksReturnValue,
-                            tcMockSetTaskStatusAndWmsIDReturnValue,
+                            tmMockUpdateTasksStatusAndWmsIDsReturnValue,
                             expected):
   mocker.patch('DIRAC.TransformationSystem.Agent.TaskManagerAgentBase.AgentModule', side_effect=mockAM)
   mocker.patch('DIRAC.TransformationSystem.Agent.TaskManagerAgentBase.FileReport', side_effect=MagicMock())
   tmab = TaskManagerAgentBase()
   tc_mock.getTransformationTasks.return_value = tcMockGetTransformationTasksReturnValue
   tm_mock.updateTransformationReservedTasks.return_value = tmMockUpdateTransformationReservedTasksReturnValue
-  tc_mock.setTaskStatusAndWmsID.return_value = tcMockSetTaskStatusAndWmsIDReturnValue
+  tm_mock.updateTasksStatusAndWmsIDs.return_value = tmMockUpdateTasksStatusAndWmsIDsReturnValue
   res = tmab.checkReservedTasks(transIDOPBody, clients)
   assert res['OK'] == expected
 
@@ -209,3 +212,65 @@ def test__getTransformationFiles(mocker, transDict, getTFiles, expected):
   tc_mock.getTransformationFiles.return_value = getTFiles
   res = TransformationAgent()._getTransformationFiles(transDict, {'TransformationClient': tc_mock})
   assert res['OK'] == expected
+
+
+@pytest.fixture
+def transformationAgent(mocker):
+  mocker.patch('DIRAC.TransformationSystem.Agent.TransformationAgent.AgentModule', side_effect=mockAM)
+  mocker.patch('DIRAC.TransformationSystem.Agent.TransformationAgent.Operations').return_value.getValue.return_value = 0
+  mocker.patch('DIRAC.TransformationSystem.Agent.TransformationAgent.gMonitor')
+  ta = TransformationAgent()
+  ta.filesPerSlice = 1
+  ta.replicaCache = MagicMock()
+  ta.replicaCache.getSize.return_value = 0
+  ta.replicaCache.expire.return_value = 0
+  ta.replicaCache.remove.return_value = 0
+  mocker.patch.object(ta, '_getTransformationFiles', return_value=goodFiles)
+  mocker.patch.object(ta, '_TransformationAgent__getDataReplicas', return_value={'OK': True, 'Value': {}})
+  pluginMock = MagicMock()
+  pluginMock.run.return_value = {'OK': True, 'Value': [('SE', [trFile['LFN'] for trFile in goodFiles['Value']])]}
+  mocker.patch.object(ta, '_TransformationAgent__generatePluginObject', return_value={'OK': True, 'Value': pluginMock})
+  tc_mock.addTaskForTransformation.return_value = {'OK': True}
+  tc_mock.setTransformationParameter.reset_mock()
+  return ta
+
+
+def test_processTransformation(transformationAgent):
+  """ Called outside of the threads, the transformation is processed at once
+  """
+  ta = transformationAgent
+  transDict = {'TransformationID': 17042, 'Type': 'Replication', 'Status': 'Flush', 'Plugin': 'Broadcast', 'Body': ''}
+  res = ta.processTransformation(transDict, {'TransformationClient': tc_mock})
+  assert res['OK']
+  assert ta.transQueue.empty()
+  assert ta.transInProgress == {}
+  assert ta.unusedFiles[17042] == 0
+  tc_mock.setTransformationParameter.assert_called_once_with(17042, 'Status', 'Active')
+
+
+def test_processTransformationSlices(transformationAgent):
+  """ In the threads, the slices are queued and the last one does the bookkeeping
+  """
+  ta = transformationAgent
+  clients = {'TransformationClient': tc_mock}
+  transDict = {'TransformationID': 17042, 'Type': 'Replication', 'Status': 'Flush', 'Plugin': 'Broadcast', 'Body': ''}
+  ta.transInQueue = [17042]
+  ta.transInProgress[17042] = _TransformationProgress(transDict)
+  res = ta.processTransformation(transDict, clients)
+  assert res['OK']
+  # The first slice is processed, the second one is queued, after an older transformation with less files
+  ta._TransformationAgent__queue({'TransformationID': 1}, 0)
+  ta._TransformationAgent__queue({'TransformationID': 2}, 100)
+  items = [ta.transQueue.get() for _ in range(3)]
+  assert [item[2]['TransformationID'] for item in items] == [1, 17042, 2]
+  ta._TransformationAgent__workDone(17042, clients)
+  assert ta.transInQueue == [17042]
+  tc_mock.setTransformationParameter.assert_not_called()
+
+  res = ta._processSlice(transDict, items[1][3], clients)
+  assert res['Value'] == (1, 1, True, False)
+  ta.transInProgress[17042].addResult(*res['Value'])
+  ta._TransformationAgent__workDone(17042, clients)
+  assert ta.transInQueue == []
+  assert ta.unusedFiles[17042] == 0
+  tc_mock.setTransformationParameter.assert_called_once_with(17042, 'Status', 'Active')
@@ -133,6 +133,20 @@ def test__Standard_Flush_G1(setup):
   assert res['Value'] == sortedData
 
 
+def test__Standard_Data_G2(setup):
+  """Test StandardPlugin: input data, active, files at several SEs are only in one task."""
+  pluginStandard = TransformationPlugin('Standard')
+  params = dict(paramsBase)
+  params['GroupSize'] = 2
+  pluginStandard.setParameters(params)
+  pluginStandard.setInputData(data)
+  res = pluginStandard.run()
+  assert res['OK']
+  assert [(ses, sorted(lfns)) for ses, lfns in res['Value']] == [('SE1,SE2', ['/this/is/also/at.12', '/this/is/at.12']),
+                                                                 ('SE2', ['/this/is/als/at.2', '/this/is/at.2']),
+                                                                 ('SE1', ['/this/is/at.1', '/this/is/at_123'])]
+
+
 def test__Broadcast_Active_G1(setup):
   """Test BroadcastPlugin: input data, Active"""
   thePlugin = TransformationPlugin('Broadcast')
@@ -18,7 +18,7 @@ import os
 
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.Core.Security.ProxyInfo import getProxyInfo
-from DIRAC.Core.Utilities.List import fromChar
+from DIRAC.Core.Utilities.List import fromChar, breakListIntoChunks
 from DIRAC.Core.Utilities.ModuleFactory import ModuleFactory
 from DIRAC.Core.Utilities.DErrno import ETSDATA, ETSUKN
 from DIRAC.Interfaces.API.Job import Job
@@ -35,6 +35,8 @@ from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getDNForUsername
 from DIRAC.TransformationSystem.Agent.TransformationAgentsUtilities import TransformationAgentsUtilities
 
 COMPONENT_NAME = 'TaskManager'
+# Maximum number of tasks whose status and external ID are updated by a single call
+TASK_UPDATE_CHUNK_SIZE = 1000
 
 
 class TaskBase(TransformationAgentsUtilities):
@@ -75,25 +77,54 @@ class TaskBase(TransformationAgentsUtilities):
     return S_ERROR("Not implemented")
 
   def updateDBAfterTaskSubmission(self, taskDict):
-    """ Sets tasks status after the submission to "Submitted", in case of success
+    """ Sets tasks status after the submission to "Submitted", in case of success.
+        The tasks of a transformation are updated by chunks, with a single call per chunk.
     """
     updated = 0
     startTime = time.time()
+    transTaskIDs = {}
     for taskID, task in taskDict.iteritems():
       transID = task['TransformationID']
       if task['Success']:
-        res = self.transClient.setTaskStatusAndWmsID(transID, taskID, 'Submitted',
-                                                     str(task['ExternalID']))
-        if not res['OK']:
-          self._logWarn("Failed to update task status after submission",
-                        "%s %s" % (task['ExternalID'], res['Message']),
-                        transID=transID, method='updateDBAfterSubmission')
-        updated += 1
+        transTaskIDs.setdefault(transID, {})[taskID] = str(task['ExternalID'])
+    for transID, taskWmsIDs in transTaskIDs.iteritems():
+      res = self.updateTasksStatusAndWmsIDs(transID, taskWmsIDs, 'Submitted', method='updateDBAfterSubmission')
+      if not res['OK']:
+        return res
+      updated += len(taskWmsIDs)
     if updated:
       self._logInfo("Updated %d tasks in %.1f seconds" % (updated, time.time() - startTime),
                     transID=transID, method='updateDBAfterSubmission')
     return S_OK()
 
+  def updateTasksStatusAndWmsIDs(self, transID, taskWmsIDs, status, method='updateTasksStatusAndWmsIDs'):
+    """ Set the status and external ID of tasks of a transformation, with a single call per chunk of
+        TASK_UPDATE_CHUNK_SIZE tasks. If the bulk call fails, e.g. because the service does not provide it,
+        the tasks of the chunk are updated one by one.
+
+        :param int transID: transformation ID
+        :param dict taskWmsIDs: { taskID : external ID }
+        :param str status: new status of the tasks
+        :param str method: name of the calling method, for the log messages
+
+        :return: S_OK( { taskID : error message } for the tasks that could not be updated )
+    """
+    failed = {}
+    for taskIDs in breakListIntoChunks(sorted(taskWmsIDs), TASK_UPDATE_CHUNK_SIZE):
+      res = self.transClient.setTasksStatusAndWmsIDs(transID, dict((taskID, taskWmsIDs[taskID])
+                                                                   for taskID in taskIDs), status)
+      if res['OK']:
+        continue
+      self._logWarn("Failed to update the status of %d tasks, update them one by one" % len(taskIDs),
+                    res['Message'], transID=transID, method=method)
+      for taskID in taskIDs:
+        res = self.transClient.setTaskStatusAndWmsID(transID, taskID, status, taskWmsIDs[taskID])
+        if not res['OK']:
+          self._logWarn("Failed to update task status", "%s %s" % (taskWmsIDs[taskID], res['Message']),
+                        transID=transID, method=method)
+          failed[taskID] = res['Message']
+    return S_OK(failed)
+
   def updateTransformationReservedTasks(self, _taskDicts):  # pylint: disable=no-self-use
     """ To make sure the method is implemented in the derived class """
     return S_ERROR("Not implemented")
@@ -569,6 +600,7 @@ class WorkflowTasks(TaskBase):
 
     # Collect per job parameters sequences
     paramSeqDict = {}
+    jobXML = None
     # tasks must be sorted because we use bulk submission and we must find the correspondance
     for taskID in sorted(taskDict):
       paramsDict = taskDict[taskID]
@@ -616,7 +648,10 @@ class WorkflowTasks(TaskBase):
 
       outputParameterList = []
       if self.outputDataModule:
-        res = self.getOutputData({'Job': oJob._toXML(),  # pylint: disable=protected-access
+        # The workflow is only serialized again if the previous task changed it
+        if jobXML is None:
+          jobXML = oJob._toXML()  # pylint: disable=protected-access
+        res = self.getOutputData({'Job': jobXML,
                                   'TransformationID': transID,
                                   'TaskID': taskID, 'InputData': inputData})
         if not res['OK']:
@@ -626,14 +661,18 @@ class WorkflowTasks(TaskBase):
         for name, output in res['Value'].iteritems():
           seqDict[name] = output
           outputParameterList.append(name)
-          if oJob.workflow.findParameter(name):
-            oJob._setParamValue(name, "%%(%s)s" % name)  # pylint: disable=protected-access
+          parameter = oJob.workflow.findParameter(name)
+          if parameter:
+            if parameter.getValue() != "%%(%s)s" % name:
+              oJob._setParamValue(name, "%%(%s)s" % name)  # pylint: disable=protected-access
+              jobXML = None
           else:
             oJob._addParameter(oJob.workflow,  # pylint: disable=protected-access
                                name,
                                'JDL',
                                "%%(%s)s" % name,
                                name)
+            jobXML = None
 
       for pName, seq in seqDict.iteritems():
         paramSeqDict.setdefault(pName, []).append(seq)
@@ -656,6 +695,11 @@ class WorkflowTasks(TaskBase):
   def __prepareTasks(self, transBody, taskDict, owner, ownerGroup, ownerDN):
     """ Prepare transformation tasks with a job object per task
 
+    This is the default path (BulkSubmission disabled): each task is an independent job, so that a task
+    which can't be prepared or submitted does not fail the others, and tasks with and without input data
+    can be mixed, which the parametric job of __prepareTasksBulk does not allow.
+    Only the update of the tasks in the database after their submission is done in bulk.
+
     :param str transBody: transformation job template
     :param dict taskDict: dictionary of per task parameters
     :param owner: owner of the transformation
@@ -38,6 +38,7 @@ class TransformationClient(Client):
 
           setTaskStatus(transName, taskID, status)
           setTaskStatusAndWmsID(transName, taskID, status, taskWmsID)
+          setTasksStatusAndWmsIDs(transName, taskWmsIDs, status)
           getTransformationTaskStats(transName)
           deleteTasks(transName, taskMin, taskMax)
           extendTransformation( transName, nTasks)
@@ -149,22 +149,17 @@ class PluginUtilities(object):
       self.logDebug("fileGroups set: ", seFiles)
 
       for replicaSE in sortSEs(seFiles):
-        lfns = seFiles[replicaSE]
+        # In case the file was at more than one site, it may already be in a task of another SE:
+        # only the files still in the global dict are considered
+        lfns = [lfn for lfn in seFiles[replicaSE] if lfn in files]
         if lfns:
           tasksLfns = breakListIntoChunks(lfns, self.groupSize)
-          lfnsInTasks = []
           for taskLfns in tasksLfns:
             if flush or (len(taskLfns) >= self.groupSize):
               tasks.append((replicaSE, taskLfns))
-              lfnsInTasks += taskLfns
-          # In case the file was at more than one site, remove it from the other sites' list
-          # Remove files from global list
-          for lfn in lfnsInTasks:
-            files.pop(lfn)
-          if not groupSE:
-            # Remove files from other SEs
-            for se in [se for se in seFiles if se != replicaSE]:
-              seFiles[se] = [lfn for lfn in seFiles[se] if lfn not in lfnsInTasks]
+              # Remove files from global list
+              for lfn in taskLfns:
+                del files[lfn]
       self.logVerbose(
           "groupByReplicas: %d tasks created (groupSE %s)" %
           (len(tasks) - nTasks, str(groupSE)), "%d files not included in tasks" %
@@ -245,19 +240,16 @@ class PluginUtilities(object):
       seFiles = getFileGroups(files, groupSE=groupSE)
 
       for replicaSE in sorted(seFiles) if groupSE else sortSEs(seFiles):
-        lfns = seFiles[replicaSE]
+        # Files already in a task of another SE are no longer in the global dict
+        lfns = [lfn for lfn in seFiles[replicaSE] if lfn in files]
+        if not lfns:
+          continue
         newTasks = self.createTasksBySize(lfns, replicaSE, fileSizes=fileSizes, flush=flush)
-        lfnsInTasks = []
-        for task in newTasks:
-          lfnsInTasks += task[1]
+        lfnsInTasks = [lfn for task in newTasks for lfn in task[1]]
         tasks += newTasks
 
         # Remove the selected files from the size cache
         self.clearCachedFileSize(lfnsInTasks)
-        if not groupSE:
-          # Remove files from other SEs
-          for se in [se for se in seFiles if se != replicaSE]:
-            seFiles[se] = [lfn for lfn in seFiles[se] if lfn not in lfnsInTasks]
         # Remove files from global list
         for lfn in lfnsInTasks:
           files.pop(lfn)
@@ -300,16 +292,14 @@ class PluginUtilities(object):
     """ Get file size from a cache, if not from the catalog
     #FIXME: have to fill the cachedLFNSize!
     """
-    lfns = list(lfns)
-    cachedLFNSize = dict(self.cachedLFNSize)
+    lfns = set(lfns)
+    cachedLFNSize = self.cachedLFNSize
 
-    fileSizes = {}
-    for lfn in [lfn for lfn in lfns if lfn in cachedLFNSize]:
-      fileSizes[lfn] = cachedLFNSize[lfn]
+    fileSizes = dict((lfn, cachedLFNSize[lfn]) for lfn in lfns if lfn in cachedLFNSize)
     self.logDebug(
         "Found cache hit for File size for %d files out of %d" %
         (len(fileSizes), len(lfns)))
-    lfns = [lfn for lfn in lfns if lfn not in cachedLFNSize]
+    lfns = [lfn for lfn in lfns if lfn not in fileSizes]
     if lfns:
       fileSizes = self._getFileSizeFromCatalog(lfns, fileSizes)
       if not fileSizes['OK']:
@@ -340,8 +330,8 @@ class PluginUtilities(object):
   def clearCachedFileSize(self, lfns):
     """ Utility function
     """
-    for lfn in [lfn for lfn in lfns if lfn in self.cachedLFNSize]:
-      self.cachedLFNSize.pop(lfn)
+    for lfn in lfns:
+      self.cachedLFNSize.pop(lfn, None)
 
   def getPluginParam(self, name, default=None):
     """ Get plugin parameters using specific settings or settings defined in the CS
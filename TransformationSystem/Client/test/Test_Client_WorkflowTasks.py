@@ -123,3 +123,52 @@ def test__handleDestination(mocker, paramsDict, expected):
   mocker.patch('DIRAC.TransformationSystem.Client.TaskManagerPlugin.getSitesForSE', side_effect=ourgetSitesForSE)
   res = wfTasks._handleDestination(paramsDict)
   assert sorted(res) == sorted(expected)
+
+
+def test_updateDBAfterTaskSubmission(mocker):
+  mocker.patch('DIRAC.TransformationSystem.Client.TaskManager.TASK_UPDATE_CHUNK_SIZE', new=2)
+  transClient = MagicMock()
+  transClient.setTasksStatusAndWmsIDs.return_value = {'OK': True, 'Value': 2}
+  wfTasksUpdate = WorkflowTasks(transClient=transClient,
+                                submissionClient=WMSClientMock,
+                                jobMonitoringClient=jobMonitoringClient,
+                                outputDataModule="mock")
+  submittedTasks = {1: {'TransformationID': 1, 'Success': True, 'ExternalID': 11},
+                    2: {'TransformationID': 1, 'Success': True, 'ExternalID': 12},
+                    3: {'TransformationID': 1, 'Success': True, 'ExternalID': 13},
+                    4: {'TransformationID': 1, 'Success': False},
+                    5: {'TransformationID': 2, 'Success': True, 'ExternalID': 15}}
+  res = wfTasksUpdate.updateDBAfterTaskSubmission(submittedTasks)
+  assert res['OK']
+  # One call per chunk of tasks of a transformation
+  calls = sorted((call[0] for call in transClient.setTasksStatusAndWmsIDs.call_args_list),
+                 key=lambda args: (args[0], sorted(args[1])))
+  assert calls == [(1, {1: '11', 2: '12'}, 'Submitted'),
+                   (1, {3: '13'}, 'Submitted'),
+                   (2, {5: '15'}, 'Submitted')]
+  transClient.setTaskStatusAndWmsID.assert_not_called()
+
+  # If the bulk update fails, the tasks are updated one by one
+  transClient.setTasksStatusAndWmsIDs.return_value = {'OK': False, 'Message': 'Unknown method'}
+  transClient.setTaskStatusAndWmsID.return_value = {'OK': True}
+  res = wfTasksUpdate.updateDBAfterTaskSubmission(submittedTasks)
+  assert res['OK']
+  assert transClient.setTaskStatusAndWmsID.call_count == 4
+
+
+def test_updateTasksStatusAndWmsIDs(mocker):
+  mocker.patch('DIRAC.TransformationSystem.Client.TaskManager.TASK_UPDATE_CHUNK_SIZE', new=2)
+  transClient = MagicMock()
+  transClient.setTasksStatusAndWmsIDs.side_effect = [{'OK': True, 'Value': 2},
+                                                     {'OK': False, 'Message': 'Unknown method'}]
+  transClient.setTaskStatusAndWmsID.side_effect = [{'OK': True}, {'OK': False, 'Message': 'No such task'}]
+  wfTasksUpdate = WorkflowTasks(transClient=transClient,
+                                submissionClient=WMSClientMock,
+                                jobMonitoringClient=jobMonitoringClient,
+                                outputDataModule="mock")
+  res = wfTasksUpdate.updateTasksStatusAndWmsIDs(1, {1: '11', 2: '12', 3: '13', 4: '14'}, 'Submitted')
+  assert res['OK']
+  # Only the second chunk is updated task by task
+  calls = [call[0] for call in transClient.setTaskStatusAndWmsID.call_args_list]
+  assert calls == [(1, 3, 'Submitted', '13'), (1, 4, 'Submitted', '14')]
+  assert res['Value'] == {4: 'No such task'}
@@ -26,11 +26,15 @@ from DIRAC.Core.Utilities.List import stringListToString, intListToString, break
 from DIRAC.Core.Utilities.Shifter import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Utilities.Subprocess import pythonCall
-from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaFilterIndex import MetaFilterIndex
 
 __RCSID__ = "$Id$"
 
 MAX_ERROR_COUNT = 10
+# Statuses of the transformations whose input meta query filters the new files
+FILTER_STATUSES = ['New', 'Active', 'Stopped', 'Flush', 'Completing']
+# Lifetime in seconds of the compiled filter index, in case another service instance changed the transformations
+FILTER_INDEX_LIFETIME = 600
 
 #############################################################################
 
@@ -114,8 +118,11 @@ class TransformationDB(DB):
                                  'ParameterType'
                                  ]
 
-    # Intialize filter Queries with Input Meta Queries
+    # Intialize filter Queries with Input Meta Queries, the index is compiled when first used
     self.filterQueries = []
+    self.filterIndex = None
+    self.filterIndexTime = 0
+    self.filterIndexLock = threading.Lock()
     res = self.__updateFilterQueries()
     if not res['OK']:
       gLogger.fatal("Failed to create filter queries")
@@ -197,10 +204,6 @@ class TransformationDB(DB):
         gLogger.error("Failed to add output meta query to the transformation", res['Message'])
         return self.deleteTransformation(transID, connection=connection)
 
-    # If the transformation has an input data specification
-    if inputMetaQuery:
-      self.filterQueries.append((transID, inputMetaQuery))
-
     if inheritedFrom:
       res = self._getTransformationID(inheritedFrom, connection=connection)
       if not res['OK']:
@@ -394,25 +397,57 @@ class TransformationDB(DB):
     return self._update(req, connection)
 
   def __updateFilterQueries(self, connection=False):
-    """ Get filters for all defined input streams in all the transformations.
+    """ Get filters for all defined input streams in all the transformations, with a single query.
+        The filter index is compiled again when next used.
     """
-    resultList = []
-    res = self.getTransformations(condDict={'Status': ['New', 'Active', 'Stopped', 'Flush', 'Completing']},
-                                  connection=connection)
+    req = "SELECT Q.TransformationID, Q.MetaDataName, Q.MetaDataValue, Q.MetaDataType"
+    req += " FROM TransformationMetaQueries AS Q JOIN Transformations AS T"
+    req += " ON T.TransformationID = Q.TransformationID"
+    req += " WHERE Q.QueryType = 'Input' AND T.Status IN (%s)" % stringListToString(FILTER_STATUSES)
+    req += " ORDER BY Q.TransformationID"
+    res = self._query(req, connection)
     if not res['OK']:
       return res
 
-    transIDs = res['Value']
-    for transDict in transIDs:
-      transID = str(transDict['TransformationID'])
-      res = self.getTransformationMetaQuery(transID, 'Input')
-      if not res['OK']:
-        continue
-      resultList.append((transID, res['Value']))
+    queries = {}
+    for transID, parameterName, parameterValue, parameterType in res['Value']:
+      queries.setdefault(transID, {})[parameterName] = self.__decodeMetaQueryValue(parameterValue, parameterType)
+    resultList = [(transID, queries[transID]) for transID in sorted(queries)]
 
-    self.filterQueries = resultList
+    with self.filterIndexLock:
+      self.filterQueries = resultList
+      self.filterIndex = None
     return S_OK(resultList)
 
+  def __getFilterIndex(self):
+    """ Get the compiled index of the filter queries, compiling it if needed
+    """
+    with self.filterIndexLock:
+      if self.filterIndex is not None and time.time() - self.filterIndexTime < FILTER_INDEX_LIFETIME:
+        return S_OK(self.filterIndex)
+      expired = self.filterIndex is not None
+    if expired:
+      # Take into account the changes done by other service instances
+      res = self.__updateFilterQueries()
+      if not res['OK']:
+        return res
+
+    res = FileCatalog().getMetadataFields()
+    if not res['OK']:
+      gLogger.error("Error in getMetadataFields: %s" % res['Message'])
+      return res
+    if not res['Value']:
+      gLogger.error("Error: no metadata fields defined")
+      return S_ERROR("No metadata fields defined")
+    typeDict = dict(res['Value']['FileMetaFields'])
+    typeDict.update(res['Value']['DirectoryMetaFields'])
+
+    with self.filterIndexLock:
+      self.filterIndex = MetaFilterIndex(self.filterQueries, typeDict)
+      self.filterIndexTime = time.time()
+      gLogger.verbose("Compiled the filter index of %d transformations" % len(self.filterIndex))
+      return S_OK(self.filterIndex)
+
   ###########################################################################
   #
   # These methods manipulate the AdditionalParameters tables
@@ -427,6 +462,11 @@ class TransformationDB(DB):
     message = ''
     if paramName in self.TRANSPARAMS:
       res = self.__updateTransformationParameter(transID, paramName, paramValue, connection=connection)
+      if res['OK'] and paramName == 'Status':
+        # The transformations filtering the new files may have changed
+        result = self.__updateFilterQueries(connection=connection)
+        if not result['OK']:
+          gLogger.error("Failed to update the filter queries", result['Message'])
       if res['OK']:
         pv = self._escapeString(paramValue)
         if not pv['OK']:
@@ -933,6 +973,38 @@ class TransformationDB(DB):
       return res
     return self.__setTaskParameterValue(transID, taskID, 'ExternalStatus', status, connection=connection)
 
+  def setTasksStatusAndWmsIDs(self, transName, taskWmsIDs, status, connection=False):
+    """ Set the status and the ExternalIDs of several tasks of a transformation with a single statement
+
+    :param transName: transformation name or ID
+    :param dict taskWmsIDs: { taskID : ExternalID }
+    :param str status: status of the tasks
+    :param connection: DB connection
+
+    :return: S_OK( number of tasks updated ) / S_ERROR
+    """
+    res = self._getConnectionTransID(connection, transName)
+    if not res['OK']:
+      return res
+    connection = res['Value']['Connection']
+    transID = res['Value']['TransformationID']
+    if not taskWmsIDs:
+      return S_OK(0)
+    res = self._escapeString(status)
+    if not res['OK']:
+      return res
+    status = res['Value']
+    taskIDs = sorted(int(taskID) for taskID in taskWmsIDs)
+    res = self._escapeValues([str(taskWmsIDs[taskID]) for taskID in sorted(taskWmsIDs, key=int)])
+    if not res['OK']:
+      return res
+    cases = ' '.join('WHEN %d THEN %s' % (taskID, wmsID) for taskID, wmsID in zip(taskIDs, res['Value']))
+    # The ExternalID is set before the status, as in setTaskStatusAndWmsID
+    req = "UPDATE TransformationTasks SET ExternalID = CASE TaskID %s END, ExternalStatus = %s," % (cases, status)
+    req += " LastUpdateTime = UTC_TIMESTAMP() WHERE TransformationID = %d AND TaskID IN (%s);" % (
+        transID, intListToString(taskIDs))
+    return self._update(req, connection)
+
   def setTaskStatus(self, transName, taskID, status, connection=False):
     """ Set status for job with taskID in production with transformationID """
     res = self._getConnectionTransID(connection, transName)
@@ -1011,7 +1083,12 @@ class TransformationDB(DB):
       return res
     connection = res['Value']['Connection']
     transID = res['Value']['TransformationID']
-    return self.__addMetaQuery(transID, queryDict, queryType, author=author, connection=connection)
+    res = self.__addMetaQuery(transID, queryDict, queryType, author=author, connection=connection)
+    if res['OK'] and queryType == 'Input':
+      result = self.__updateFilterQueries(connection=connection)
+      if not result['OK']:
+        gLogger.error("Failed to update the filter queries", result['Message'])
+    return res
 
   def __addMetaQuery(self, transID, queryDict, queryType, author='', connection=False):
     """ Insert the Meta Query into the TransformationMetaQuery table """
@@ -1059,6 +1136,7 @@ class TransformationDB(DB):
       return res
     connection = res['Value']['Connection']
     transID = res['Value']['TransformationID']
+    isInputQuery = queryType == 'Input'
     res = self._escapeString(queryType)
     if not res['OK']:
       return S_ERROR("Failed to parse the transformation query type")
@@ -1071,6 +1149,10 @@ class TransformationDB(DB):
       # Add information to the transformation logging
       message = 'Deleted meta data query'
       self.__updateTransformationLogging(transID, message, author, connection=connection)
+      if isInputQuery:
+        result = self.__updateFilterQueries(connection=connection)
+        if not result['OK']:
+          gLogger.error("Failed to update the filter queries", result['Message'])
     return res
 
   def getTransformationMetaQuery(self, transName, queryType, connection=False):
@@ -1098,19 +1180,24 @@ class TransformationDB(DB):
       return res
     queryDict = {}
     for parameterName, parameterValue, parameterType in res['Value']:
-      if re.search(';;;', str(parameterValue)):
-        parameterValue = parameterValue.split(';;;')
-        if parameterType == 'Integer':
-          parameterValue = [int(x) for x in parameterValue]
-      elif parameterType == 'Integer':
-        parameterValue = int(parameterValue)
-      elif parameterType == 'Dict':
-        parameterValue = eval(parameterValue)
-      queryDict[parameterName] = parameterValue
+      queryDict[parameterName] = self.__decodeMetaQueryValue(parameterValue, parameterType)
     if not queryDict:
       return S_ERROR(ENOENT, "No MetaQuery found for transformation")
     return S_OK(queryDict)
 
+  @staticmethod
+  def __decodeMetaQueryValue(parameterValue, parameterType):
+    """ Decode a value of the TransformationMetaQueries table """
+    if re.search(';;;', str(parameterValue)):
+      parameterValue = parameterValue.split(';;;')
+      if parameterType == 'Integer':
+        parameterValue = [int(x) for x in parameterValue]
+    elif parameterType == 'Integer':
+      parameterValue = int(parameterValue)
+    elif parameterType == 'Dict':
+      parameterValue = eval(parameterValue)
+    return parameterValue
+
   ###########################################################################
   #
   # These methods manipulate the TaskInputs table
@@ -1649,37 +1736,12 @@ class TransformationDB(DB):
 
   def _filterFileByMetadata(self, metadatadict):
     """Pass the input metadatadict through those currently active"""
-    transIDs = []
-    queries = self.filterQueries
-
-    catalog = FileCatalog()
-    gLogger.info('Filter file by queries', queries)
-    res = catalog.getMetadataFields()
-
+    res = self.__getFilterIndex()
     if not res['OK']:
-      gLogger.error("Error in getMetadataFields: %s" % res['Message'])
       return res
-    if not res['Value']:
-      gLogger.error("Error: no metadata fields defined")
+    res = res['Value'].filter(metadatadict)
+    if not res['OK']:
+      gLogger.error("Error in applying query: %s" % res['Message'])
       return res
-    typeDict = res['Value']['FileMetaFields']
-    typeDict.update(res['Value']['DirectoryMetaFields'])
-
-    for transID, query in queries:
-      gLogger.info("Check the transformation status")
-      res = self.getTransformationParameters(transID, 'Status')
-      if res['Value'] not in ['New', 'Active', 'Stopped', 'Completing', 'Flush']:
-        continue
-      mq = MetaQuery(query, typeDict)
-      gLogger.info("Apply query %s to metadata %s" % (mq.getMetaQuery(), metadatadict))
-      res = mq.applyQuery(metadatadict)
-      if not res['OK']:
-        gLogger.error("Error in applying query: %s" % res['Message'])
-        return res
-      elif res['Value']:
-        gLogger.info("Apply query result is True")
-        transIDs.append(transID)
-      else:
-        gLogger.info("Apply query result is False")
-
-    return transIDs
+    gLogger.verbose("Transformations passing the filter for metadata %s: %s" % (metadatadict, res['Value']))
+    return res['Value']
@@ -262,6 +262,12 @@ class TransformationManagerHandler(RequestHandler):
     res = database.setTaskStatusAndWmsID(transName, taskID, status, taskWmsID)
     return self._parseRes(res)
 
+  types_setTasksStatusAndWmsIDs = [transTypes, dict, basestring]
+
+  def export_setTasksStatusAndWmsIDs(self, transName, taskWmsIDs, status):
+    res = database.setTasksStatusAndWmsIDs(transName, taskWmsIDs, status)
+    return self._parseRes(res)
+
   types_getTransformationTaskStats = [transTypes]
 
   def export_getTransformationTaskStats(self, transName):
@@ -0,0 +1,131 @@
+""" Index of the input meta queries of the transformations, routing the metadata of a file to the
+    transformations whose query it satisfies
+
+    The queries are compiled once into MetaQuery objects and indexed by the metadata keys they
+    require. For each key, the transformations requiring an equal value (or a value in a list) are
+    indexed by that value. The candidate transformations of a file are those for which all the
+    required keys are present with a matching value, and only their queries are applied.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+import DIRAC.Core.Utilities.Time as Time
+
+
+def _getTypedValue(value, metaType):
+  """ Convert a metadata value like MetaQuery.applyQuery does
+  """
+  if metaType[0:3].lower() == 'int':
+    return int(value)
+  elif metaType[0:5].lower() == 'float':
+    return float(value)
+  elif metaType[0:4].lower() == 'date':
+    return Time.fromString(value)
+  return value
+
+
+class MetaFilterIndex(object):
+  """ Compiled index of the input meta queries of the transformations
+  """
+
+  def __init__(self, filterQueries, typeDict):
+    """ c'tor
+
+        :param list filterQueries: [ ( transID, query dictionary ) ]
+        :param dict typeDict: { metadata key : type } of the catalog metadata fields
+    """
+    self.typeDict = typeDict
+    # Order of the transformations, as in filterQueries
+    self.__order = {}
+    self.__metaQueries = {}
+    # { transID : number of required keys }
+    self.__nRequired = {}
+    # Transformations without required key
+    self.__unconditional = []
+    # { key : set( transIDs ) } for the keys with any value
+    self.__anyValue = {}
+    # { key : { typed value : set( transIDs ) } } for the keys with an equality condition
+    self.__byValue = {}
+
+    for transID, query in filterQueries:
+      self.__order[transID] = len(self.__order)
+      self.__metaQueries[transID] = MetaQuery(query, typeDict)
+      nRequired = 0
+      for key, value in query.items():
+        if str(value).lower() == 'missing':
+          continue
+        nRequired += 1
+        values = self.__getEqualityValues(key, value)
+        if values is None:
+          self.__anyValue.setdefault(key, set()).add(transID)
+        else:
+          valueIndex = self.__byValue.setdefault(key, {})
+          for typedValue in values:
+            valueIndex.setdefault(typedValue, set()).add(transID)
+      self.__nRequired[transID] = nRequired
+      if not nRequired:
+        self.__unconditional.append(transID)
+
+  def __getEqualityValues(self, key, value):
+    """ Get the typed values for which the condition on a key can be true if it is an equality,
+        None if it is another condition, or if the values can't be indexed
+    """
+    if isinstance(value, dict):
+      if list(value) not in (['='], ['in']):
+        return None
+      value = list(value.values())[0]
+    if str(value).lower() == 'any':
+      return None
+    values = value if isinstance(value, list) else [value]
+    try:
+      typedValues = set(_getTypedValue(val, self.typeDict[key]) for val in values)
+    except (KeyError, ValueError, TypeError):
+      return None
+    return typedValues
+
+  def __len__(self):
+    return len(self.__metaQueries)
+
+  def getCandidates(self, metadataDict):
+    """ Get the transformations for which all the keys required by the query are in the metadata
+        with a possible value. They are returned in the order of the queries.
+    """
+    counts = {}
+    for key, value in metadataDict.items():
+      if value is None:
+        continue
+      transIDs = set(self.__anyValue.get(key, ()))
+      valueIndex = self.__byValue.get(key)
+      if valueIndex:
+        try:
+          transIDs.update(valueIndex.get(_getTypedValue(value, self.typeDict[key]), ()))
+        except (KeyError, ValueError, TypeError):
+          # The query will tell why the value does not match
+          for valueTransIDs in valueIndex.values():
+            transIDs.update(valueTransIDs)
+      for transID in transIDs:
+        counts[transID] = counts.get(transID, 0) + 1
+    candidates = [transID for transID, count in counts.items() if count == self.__nRequired[transID]]
+    candidates += self.__unconditional
+    return sorted(candidates, key=self.__order.get)
+
+  def filter(self, metadataDict):
+    """ Get the transformations whose query is satisfied by the metadata
+
+        :param dict metadataDict: metadata of a file or a directory
+
+        :return: S_OK( list of transIDs ) / S_ERROR if a query can't be applied
+    """
+    transIDs = []
+    for transID in self.getCandidates(metadataDict):
+      res = self.__metaQueries[transID].applyQuery(metadataDict)
+      if not res['OK']:
+        return res
+      if res['Value']:
+        transIDs.append(transID)
+    return S_OK(transIDs)
@@ -0,0 +1,331 @@
+""" Compact replica cache of the TransformationAgent
+
+    The cache of a transformation maps each LFN to a single integer, made of the bitmask of the SEs
+    of its replicas (the SE names being interned as bit indexes) and of the time it was cached,
+    so that the entries expire individually.
+
+    The changes are persisted incrementally by appending records to a log file, which is compacted
+    into a snapshot file once it holds more records than the cache has entries. Both files start with
+    the generation of the snapshot, so that a log left over by an interrupted compaction is ignored.
+    The records, one per line, are:
+
+      - S <index> <SE>: the SE has the given bit index
+      - A <time> <hexadecimal mask> <LFN>: the replicas of the LFN, cached at time
+      - R <LFN>: the LFN is removed
+      - C: all the LFNs are removed
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import os
+import time
+import pickle
+import calendar
+import threading
+
+from DIRAC import gLogger
+
+# The log is compacted when it has more records than the cache has entries, and at least this number
+COMPACTION_MIN_RECORDS = 10000
+# Number of bits of the entries used by the time at which they were cached
+TIME_BITS = 32
+TIME_MASK = (1 << TIME_BITS) - 1
+
+
+class _TransformationCache(object):
+  """ Replica cache of a single transformation
+  """
+  __slots__ = ('entries', 'seNames', 'seIndexes', 'pending', 'logRecords', 'generation')
+
+  def __init__(self):
+    # { lfn : ( SE bitmask << TIME_BITS ) | time }
+    self.entries = {}
+    self.seNames = []
+    self.seIndexes = {}
+    # Records not yet appended to the log
+    self.pending = []
+    self.logRecords = 0
+    self.generation = 0
+
+  def addSE(self, seName, index=None):
+    """ Intern an SE name, returning its bit index
+    """
+    if seName not in self.seIndexes:
+      if index is None:
+        index = len(self.seNames)
+        self.pending.append('S\t%d\t%s\n' % (index, seName))
+      self.seNames.extend([None] * (index + 1 - len(self.seNames)))
+      self.seNames[index] = seName
+      self.seIndexes[seName] = index
+    return self.seIndexes[seName]
+
+  def getMask(self, ses):
+    mask = 0
+    for seName in ses:
+      mask |= 1 << self.addSE(seName)
+    return mask
+
+  def getSEs(self, value):
+    mask = value >> TIME_BITS
+    return [seName for index, seName in enumerate(self.seNames) if mask >> index & 1]
+
+
+class ReplicaCache(object):
+  """ Replica cache of the transformations, persisted in cacheDirectory as ReplicaCache_<transID>.snap
+      and ReplicaCache_<transID>.log files. All the methods are thread safe.
+  """
+
+  def __init__(self, cacheDirectory, validity, compactionMinRecords=COMPACTION_MIN_RECORDS):
+    """ c'tor
+
+        :param str cacheDirectory: directory of the cache files
+        :param int validity: validity of the cached replicas in seconds
+        :param int compactionMinRecords: minimum number of records of a log before its compaction
+    """
+    self.cacheDirectory = cacheDirectory
+    self.validity = validity
+    self.compactionMinRecords = compactionMinRecords
+    self.log = gLogger.getSubLogger('ReplicaCache')
+    self.__caches = {}
+    self.__lock = threading.RLock()
+
+  def __contains__(self, transID):
+    return transID in self.__caches
+
+  def __fileName(self, transID, extension):
+    return os.path.join(self.cacheDirectory, 'ReplicaCache_%s.%s' % (transID, extension))
+
+  def __timeLimit(self):
+    return int(time.time()) - self.validity
+
+  def getTransformations(self):
+    """ Get the transformations of the loaded caches
+    """
+    with self.__lock:
+      return list(self.__caches)
+
+  def getSize(self, transID):
+    """ Get the number of LFNs in the cache of a transformation
+    """
+    with self.__lock:
+      cache = self.__caches.get(transID)
+      return len(cache.entries) if cache else 0
+
+  def getLFNs(self, transID):
+    """ Get the LFNs in the cache of a transformation
+    """
+    with self.__lock:
+      cache = self.__caches.get(transID)
+      return list(cache.entries) if cache else []
+
+  def get(self, transID, lfns):
+    """ Get the cached replicas of the given LFNs
+
+        :return: { lfn : [ SEs ] } for the LFNs in the cache which are not expired
+    """
+    with self.__lock:
+      cache = self.__caches.get(transID)
+      if not cache:
+        return {}
+      timeLimit = self.__timeLimit()
+      replicas = {}
+      for lfn in lfns:
+        value = cache.entries.get(lfn)
+        if value is not None and value & TIME_MASK >= timeLimit:
+          replicas[lfn] = cache.getSEs(value)
+      return replicas
+
+  def add(self, transID, replicas):
+    """ Add replicas to the cache of a transformation
+
+        :param dict replicas: { lfn : [ SEs ] }
+    """
+    with self.__lock:
+      cache = self.__caches.setdefault(transID, _TransformationCache())
+      now = int(time.time())
+      for lfn, ses in replicas.items():
+        mask = cache.getMask(ses)
+        cache.entries[lfn] = mask << TIME_BITS | now
+        cache.pending.append('A\t%d\t%x\t%s\n' % (now, mask, lfn))
+
+  def remove(self, transID, lfns):
+    """ Remove LFNs from the cache of a transformation
+
+        :return: number of LFNs removed
+    """
+    with self.__lock:
+      cache = self.__caches.get(transID)
+      if not cache:
+        return 0
+      removed = 0
+      for lfn in lfns:
+        if cache.entries.pop(lfn, None) is not None:
+          cache.pending.append('R\t%s\n' % lfn)
+          removed += 1
+      return removed
+
+  def clear(self, transID):
+    """ Remove all the LFNs from the cache of a transformation
+    """
+    with self.__lock:
+      cache = self.__caches.get(transID)
+      if cache and cache.entries:
+        cache.entries.clear()
+        cache.pending.append('C\n')
+
+  def expire(self, transID):
+    """ Remove the expired LFNs from the cache of a transformation. They are not logged,
+        as the expired records are skipped when the cache is loaded
+
+        :return: number of LFNs expired
+    """
+    with self.__lock:
+      cache = self.__caches.get(transID)
+      if not cache:
+        return 0
+      timeLimit = self.__timeLimit()
+      expired = [lfn for lfn, value in cache.entries.items() if value & TIME_MASK < timeLimit]
+      for lfn in expired:
+        del cache.entries[lfn]
+      return len(expired)
+
+  def load(self, transID):
+    """ Load the cache of a transformation from its files, if it is not loaded yet.
+        A cache in the pickle format of the former versions of the TransformationAgent is converted.
+    """
+    with self.__lock:
+      if transID in self.__caches:
+        return
+      cache = _TransformationCache()
+      self.__caches[transID] = cache
+      snapshotFile = self.__fileName(transID, 'snap')
+      logFile = self.__fileName(transID, 'log')
+      pickleFile = self.__fileName(transID, 'pkl')
+      try:
+        if os.path.exists(snapshotFile):
+          self.__replay(cache, snapshotFile)
+        if os.path.exists(logFile):
+          cache.logRecords = self.__replay(cache, logFile, generation=cache.generation)
+          if cache.logRecords is None:
+            # Left over by an interrupted compaction, the new records must not be appended to it
+            os.remove(logFile)
+            cache.logRecords = 0
+        elif os.path.exists(pickleFile):
+          self.__importPickle(cache, pickleFile)
+          self.__compact(transID, cache)
+          os.remove(pickleFile)
+      except Exception as x:  # pylint: disable=broad-except
+        self.log.exception("Failed to load the replica cache of transformation %s" % transID, lException=x)
+        cache = _TransformationCache()
+        self.__caches[transID] = cache
+        cache.generation = int(time.time())
+        self.__compact(transID, cache)
+      self.log.verbose("Loaded the replica cache of transformation %s" % transID,
+                       "(%d files, %d log records)" % (len(cache.entries), cache.logRecords))
+
+  def __replay(self, cache, fileName, generation=None):
+    """ Apply the records of a file to a cache
+
+        :param int generation: expected generation of the file, the records are ignored if it differs
+        :return: number of records applied, None if the file is ignored
+    """
+    timeLimit = self.__timeLimit()
+    records = 0
+    with open(fileName, 'r') as fd:
+      header = fd.readline().rstrip('\n').split('\t')
+      if header[0] != 'V':
+        raise ValueError("%s is not a replica cache file" % fileName)
+      if generation is None:
+        cache.generation = int(header[1])
+      elif int(header[1]) != generation:
+        self.log.warn("Ignoring the log of a former generation", fileName)
+        return None
+      for line in fd:
+        # The last line may be truncated if the agent stopped while writing it
+        if not line.endswith('\n'):
+          break
+        fields = line[:-1].split('\t', 3)
+        tag = fields[0]
+        if tag == 'A':
+          cachedTime = int(fields[1])
+          if cachedTime >= timeLimit:
+            cache.entries[fields[3]] = int(fields[2], 16) << TIME_BITS | cachedTime
+          else:
+            cache.entries.pop(fields[3], None)
+        elif tag == 'R':
+          cache.entries.pop(fields[1], None)
+        elif tag == 'S':
+          cache.addSE(fields[2], index=int(fields[1]))
+        elif tag == 'C':
+          cache.entries.clear()
+        records += 1
+    return records
+
+  def __importPickle(self, cache, fileName):
+    """ Convert a cache { datetime : { lfn : [ SEs ] } } written by pickle
+    """
+    with open(fileName, 'r') as fd:
+      replicaSets = pickle.load(fd)
+    timeLimit = self.__timeLimit()
+    for updateTime in sorted(replicaSets):
+      cachedTime = calendar.timegm(updateTime.utctimetuple())
+      if cachedTime < timeLimit:
+        continue
+      for lfn, ses in replicaSets[updateTime].items():
+        cache.entries[lfn] = cache.getMask(ses) << TIME_BITS | cachedTime
+    self.log.info("Converted the replica cache file %s" % fileName, "(%d files)" % len(cache.entries))
+
+  def flush(self, transID=None):
+    """ Persist the changes of the cache of a transformation, or of all of them: the records are
+        appended to the log, which is compacted into a new snapshot if it became too large
+    """
+    with self.__lock:
+      transIDs = [transID] if transID is not None else list(self.__caches)
+      for tID in transIDs:
+        cache = self.__caches.get(tID)
+        if not cache or not cache.pending:
+          continue
+        try:
+          if cache.logRecords + len(cache.pending) > max(self.compactionMinRecords, len(cache.entries)):
+            self.__compact(tID, cache)
+          else:
+            self.__append(tID, cache)
+        except Exception as x:  # pylint: disable=broad-except
+          self.log.exception("Failed to write the replica cache of transformation %s" % tID, lException=x)
+
+  def __append(self, transID, cache):
+    """ Append the pending records to the log
+    """
+    logFile = self.__fileName(transID, 'log')
+    newLog = not os.path.exists(logFile)
+    with open(logFile, 'a') as fd:
+      if newLog:
+        fd.write('V\t%d\n' % cache.generation)
+      fd.writelines(cache.pending)
+    cache.logRecords += len(cache.pending)
+    cache.pending = []
+
+  def __compact(self, transID, cache):
+    """ Write a snapshot of the cache with the next generation, and remove the log
+    """
+    startTime = time.time()
+    snapshotFile = self.__fileName(transID, 'snap')
+    tmpFile = snapshotFile + '.tmp'
+    generation = cache.generation + 1
+    with open(tmpFile, 'w') as fd:
+      fd.write('V\t%d\n' % generation)
+      fd.writelines('S\t%d\t%s\n' % (index, seName) for index, seName in enumerate(cache.seNames) if seName)
+      fd.writelines('A\t%d\t%x\t%s\n' % (value & TIME_MASK, value >> TIME_BITS, lfn)
+                    for lfn, value in cache.entries.items())
+    os.rename(tmpFile, snapshotFile)
+    cache.generation = generation
+    logFile = self.__fileName(transID, 'log')
+    if os.path.exists(logFile):
+      os.remove(logFile)
+    cache.logRecords = 0
+    cache.pending = []
+    self.log.verbose("Compacted the replica cache of transformation %s" % transID,
+                     "(%d files in %.1f seconds)" % (len(cache.entries), time.time() - startTime))
@@ -0,0 +1,51 @@
+""" Test the MetaFilterIndex of the TransformationDB
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import itertools
+
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaFilterIndex import MetaFilterIndex
+
+__RCSID__ = "$Id$"
+
+typeDict = {'Run': 'INT', 'Type': 'VARCHAR(128)', 'Energy': 'FLOAT', 'Stream': 'VARCHAR(32)'}
+
+filterQueries = [(1, {'Type': 'RAW'}),
+                 (2, {'Type': ['RAW', 'DST'], 'Run': {'>': 100}}),
+                 (3, {'Run': [100, 200], 'Stream': 'Missing'}),
+                 (4, {'Energy': {'=': 6.5}, 'Type': 'Any'}),
+                 (5, {'Run': {'in': [150, 250]}, 'Type': {'!=': 'RAW'}}),
+                 (6, {})]
+
+
+def test_filter():
+  index = MetaFilterIndex(filterQueries, typeDict)
+  assert len(index) == 6
+
+  assert index.filter({'Type': 'RAW', 'Run': '150'})['Value'] == [1, 2, 6]
+  assert index.filter({'Type': 'DST', 'Run': 100})['Value'] == [3, 6]
+  # Transformation 5 is a candidate, but its query is not satisfied
+  assert index.getCandidates({'Type': 'RAW', 'Run': 250}) == [1, 2, 5, 6]
+  assert index.filter({'Type': 'RAW', 'Run': 250})['Value'] == [1, 2, 6]
+  assert index.filter({'Energy': '6.5', 'Type': 'SIM'})['Value'] == [4, 6]
+  assert index.filter({'Energy': 6.5})['Value'] == [6]
+  # The type of the metadata values is checked by the query
+  assert index.filter({'Run': 'abc'})['OK'] is False
+
+
+def test_sameAsMetaQuery():
+  """ The index gives the same result as applying all the queries """
+  index = MetaFilterIndex(filterQueries, typeDict)
+  metaQueries = [(transID, MetaQuery(query, typeDict)) for transID, query in filterQueries]
+  values = {'Type': [None, 'RAW', 'DST', 'SIM'],
+            'Run': [None, 50, 100, '150', 200, 250],
+            'Energy': [None, 6.5, '7'],
+            'Stream': [None, 'EW']}
+  keys = sorted(values)
+  for combination in itertools.product(*[values[key] for key in keys]):
+    metadataDict = dict((key, value) for key, value in zip(keys, combination) if value is not None)
+    expected = [transID for transID, metaQuery in metaQueries if metaQuery.applyQuery(metadataDict)['Value']]
+    assert index.filter(metadataDict)['Value'] == expected, metadataDict
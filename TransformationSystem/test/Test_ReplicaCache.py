@@ -0,0 +1,115 @@
+""" Test the ReplicaCache of the TransformationAgent
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+import datetime
+import pickle
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
+
+__RCSID__ = "$Id$"
+
+
+def test_cache(tmpdir):
+  cache = ReplicaCache(str(tmpdir), 3600)
+  cache.load(1)
+  assert 1 in cache
+  assert cache.getSize(1) == 0
+
+  cache.add(1, {'/a': ['SE1', 'SE2'], '/b': ['SE3'], '/c': ['SE2']})
+  assert cache.get(1, ['/a', '/b', '/d']) == {'/a': ['SE1', 'SE2'], '/b': ['SE3']}
+  assert cache.remove(1, ['/b', '/d']) == 1
+  cache.flush()
+  assert os.path.exists(os.path.join(str(tmpdir), 'ReplicaCache_1.log'))
+
+  # A new cache replays the log
+  newCache = ReplicaCache(str(tmpdir), 3600)
+  newCache.load(1)
+  assert sorted(newCache.getLFNs(1)) == ['/a', '/c']
+  assert newCache.get(1, ['/a', '/c']) == {'/a': ['SE1', 'SE2'], '/c': ['SE2']}
+
+  newCache.clear(1)
+  newCache.add(1, {'/e': ['SE3']})
+  newCache.flush(1)
+  cache = ReplicaCache(str(tmpdir), 3600)
+  cache.load(1)
+  assert cache.get(1, ['/a', '/c', '/e']) == {'/e': ['SE3']}
+
+
+def test_compaction(tmpdir):
+  cache = ReplicaCache(str(tmpdir), 3600, compactionMinRecords=5)
+  cache.load(2)
+  for i in range(10):
+    cache.add(2, {'/f%d' % i: ['SE%d' % (i % 3)]})
+    cache.remove(2, ['/f%d' % (i - 1)])
+    cache.flush(2)
+  # The log is rewritten as a snapshot when it has more records than the entries
+  assert os.path.exists(os.path.join(str(tmpdir), 'ReplicaCache_2.snap'))
+  with open(os.path.join(str(tmpdir), 'ReplicaCache_2.log')) as fd:
+    assert len(fd.readlines()) <= 6
+
+  newCache = ReplicaCache(str(tmpdir), 3600)
+  newCache.load(2)
+  assert newCache.get(2, ['/f%d' % i for i in range(10)]) == {'/f9': ['SE0']}
+
+
+def test_interruptedCompaction(tmpdir):
+  cache = ReplicaCache(str(tmpdir), 3600, compactionMinRecords=2)
+  cache.load(5)
+  cache.add(5, {'/a': ['SE1']})
+  cache.flush(5)
+  logFile = os.path.join(str(tmpdir), 'ReplicaCache_5.log')
+  with open(logFile) as fd:
+    formerLog = fd.read()
+  cache.add(5, {'/b': ['SE1']})
+  cache.flush(5)
+  # The agent stopped after writing the snapshot, before removing the log
+  with open(logFile, 'w') as fd:
+    fd.write(formerLog)
+
+  cache = ReplicaCache(str(tmpdir), 3600, compactionMinRecords=2)
+  cache.load(5)
+  assert sorted(cache.getLFNs(5)) == ['/a', '/b']
+  cache.add(5, {'/c': ['SE2']})
+  cache.flush(5)
+  # The changes made after the recovery are not lost
+  newCache = ReplicaCache(str(tmpdir), 3600)
+  newCache.load(5)
+  assert sorted(newCache.getLFNs(5)) == ['/a', '/b', '/c']
+
+
+def test_expiry(tmpdir, mocker):
+  cache = ReplicaCache(str(tmpdir), 3600)
+  cache.load(3)
+  now = time.time()
+  mocker.patch('DIRAC.TransformationSystem.Utilities.ReplicaCache.time.time', return_value=now - 7200)
+  cache.add(3, {'/old': ['SE1']})
+  mocker.patch('DIRAC.TransformationSystem.Utilities.ReplicaCache.time.time', return_value=now)
+  cache.add(3, {'/new': ['SE1']})
+  cache.flush()
+
+  assert cache.get(3, ['/old', '/new']) == {'/new': ['SE1']}
+  assert cache.expire(3) == 1
+  assert cache.getLFNs(3) == ['/new']
+
+  # The expired records are skipped when loading
+  newCache = ReplicaCache(str(tmpdir), 3600)
+  newCache.load(3)
+  assert newCache.getLFNs(3) == ['/new']
+
+
+def test_pickleConversion(tmpdir):
+  now = datetime.datetime.utcnow()
+  with open(os.path.join(str(tmpdir), 'ReplicaCache_4.pkl'), 'w') as fd:
+    pickle.dump({now - datetime.timedelta(days=3): {'/old': ['SE1']},
+                 now: {'/new': ['SE1', 'SE2']}}, fd)
+
+  cache = ReplicaCache(str(tmpdir), 86400)
+  cache.load(4)
+  assert cache.get(4, ['/old', '/new']) == {'/new': ['SE1', 'SE2']}
+  assert not os.path.exists(os.path.join(str(tmpdir), 'ReplicaCache_4.pkl'))
+  assert os.path.exists(os.path.join(str(tmpdir), 'ReplicaCache_4.snap'))
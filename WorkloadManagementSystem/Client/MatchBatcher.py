@@ -0,0 +1,286 @@
+""" Batched job matching
+
+    Concurrent job requests reaching the Matcher service within a short time window
+    are processed together: requests for identical resources share a single task queue
+    match, and the JobDB, JobLoggingDB and PilotAgentsDB updates of the whole batch are
+    done with bulk statements.
+
+    The batches are processed by the threads of the requests themselves: the first
+    request to arrive leads the batch, and hands over the leadership to the first
+    pending request before processing it, so that the next batch is collected while
+    the current one is being processed.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import threading
+import time
+
+from DIRAC import gLogger
+
+from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
+from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
+
+# Parameters of the resource description that are specific to the pilot and do not affect the matching
+PILOT_SPECIFIC_PARAMETERS = ('DIRACVersion', 'ReleaseVersion', 'ReleaseProject', 'VirtualOrganization',
+                             'PilotReference', 'PilotBenchmark', 'PilotInfoReportedFlag')
+
+
+class _MatchRequest(object):
+  """ A job request waiting to be processed in a batch
+  """
+
+  def __init__(self, resourceDescription, credDict, opsHelper):
+    self.resourceDescription = resourceDescription
+    self.credDict = credDict
+    self.opsHelper = opsHelper
+    self.startTime = time.time()
+    self.matcher = None
+    self.resourceDict = None
+    self.jobID = None
+    self.jobAttributes = None
+    self.result = None
+    self.error = None
+    self.lead = False
+    self.finished = False
+    self.wakeUp = threading.Event()
+
+  def setResult(self, result):
+    if not self.finished:
+      self.result = result
+      self.finished = True
+      self.wakeUp.set()
+
+  def setError(self, error):
+    if not self.finished:
+      self.error = error
+      self.finished = True
+      self.wakeUp.set()
+
+
+class MatchBatcher(object):
+  """ Coalesce concurrent job requests into batches
+  """
+
+  def __init__(self, pilotAgentsDB, jobDB, tqDB, jlDB, batchWindow=0.005, maxBatchSize=50):
+    """ c'tor
+
+        :param float batchWindow: time in seconds during which requests are collected into a batch
+        :param int maxBatchSize: maximum number of requests in a batch
+    """
+    self.pilotAgentsDB = pilotAgentsDB
+    self.jobDB = jobDB
+    self.tqDB = tqDB
+    self.jlDB = jlDB
+    self.batchWindow = batchWindow
+    self.maxBatchSize = maxBatchSize
+    self.log = gLogger.getSubLogger("MatchBatcher")
+    self.__lock = threading.Lock()
+    self.__pending = []
+    self.__leaderActive = False
+
+  def selectJob(self, resourceDescription, credDict, opsHelper=None):
+    """ Same as Matcher.selectJob, but processed in a batch with the concurrent requests
+
+        :returns: dict describing the matched job, empty if no job matched
+        :raises RuntimeError: if the request can't be served
+    """
+    request = _MatchRequest(resourceDescription, credDict, opsHelper)
+    with self.__lock:
+      self.__pending.append(request)
+      if not self.__leaderActive:
+        self.__leaderActive = True
+        request.lead = True
+        request.wakeUp.set()
+    while not request.finished:
+      request.wakeUp.wait()
+      request.wakeUp.clear()
+      if request.lead:
+        request.lead = False
+        self.__lead()
+    if request.error:
+      raise RuntimeError(request.error)
+    return request.result
+
+  def __lead(self):
+    """ Collect the pending requests during the batch window and process them
+    """
+    time.sleep(self.batchWindow)
+    with self.__lock:
+      batch = self.__pending[:self.maxBatchSize]
+      del self.__pending[:self.maxBatchSize]
+      if self.__pending:
+        nextLeader = self.__pending[0]
+        nextLeader.lead = True
+        nextLeader.wakeUp.set()
+      else:
+        self.__leaderActive = False
+    try:
+      self._processBatch(batch)
+    except Exception as excp:  # pylint: disable=broad-except
+      self.log.exception("Error processing batch of job requests", lException=excp)
+    finally:
+      for request in batch:
+        request.setError("Internal error processing the job request")
+
+  def _processBatch(self, batch):
+    """ Match the jobs for a list of requests
+    """
+    self.log.verbose("Processing batch of job requests", "(%d requests)" % len(batch))
+    groups = {}
+    for request in batch:
+      try:
+        request.matcher = Matcher(pilotAgentsDB=self.pilotAgentsDB,
+                                  jobDB=self.jobDB,
+                                  tqDB=self.tqDB,
+                                  jlDB=self.jlDB,
+                                  opsHelper=request.opsHelper)
+        request.resourceDict = request.matcher._getResourceDict(request.resourceDescription, request.credDict)
+        request.matcher._printResourceDict(request.resourceDescription, request.resourceDict)
+      except RuntimeError as rte:
+        request.setError(str(rte))
+        continue
+      groups.setdefault(self.__getGroupKey(request), []).append(request)
+
+    for group in groups.values():
+      self.__matchGroup(group)
+
+    matched = [request for request in batch if request.jobID and not request.finished]
+    if not matched:
+      return
+    matched = self.__checkJobs(matched)
+    self.__reportStatus(matched)
+
+    pilotJobDict = {}
+    results = []
+    for request in matched:
+      try:
+        resultDict = request.matcher._getJobDescription(request.jobID)
+      except RuntimeError as rte:
+        request.setError(str(rte))
+        continue
+      matchTime = time.time() - request.startTime
+      self.log.info("Match time", "[%s]" % str(matchTime))
+      gMonitor.addMark("matchTime", matchTime)
+
+      resourceDict = request.resourceDict
+      if request.matcher.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
+        request.matcher.limiter.updateDelayCounters(resourceDict['Site'], request.jobID)
+      if not resourceDict.get('PilotInfoReportedFlag', False):
+        request.matcher._updatePilotInfo(resourceDict)
+      pilotReference = resourceDict.get('PilotReference', '')
+      if pilotReference and pilotReference != 'Unknown':
+        pilotJobDict[pilotReference] = request.jobID
+
+      resultDict['DN'] = request.jobAttributes['OwnerDN']
+      resultDict['Group'] = request.jobAttributes['OwnerGroup']
+      resultDict['PilotInfoReportedFlag'] = True
+      results.append((request, resultDict))
+
+    self.__updatePilotJobMapping(pilotJobDict)
+    for request, resultDict in results:
+      request.setResult(resultDict)
+
+  @staticmethod
+  def __getGroupKey(request):
+    """ Requests with the same key can be served by the same task queue match
+    """
+    resourceDict = request.resourceDict
+    if 'JobID' in resourceDict:
+      # Requests for a given job are never grouped
+      return id(request)
+    keyItems = []
+    for key in sorted(resourceDict):
+      if key in PILOT_SPECIFIC_PARAMETERS:
+        continue
+      value = resourceDict[key]
+      if isinstance(value, (list, tuple)):
+        value = tuple(sorted(value))
+      keyItems.append((key, value))
+    return tuple(keyItems)
+
+  def __matchGroup(self, group):
+    """ Extract from the task queues the jobs for a group of identical requests
+    """
+    resourceDict = group[0].resourceDict
+    negativeCond = group[0].matcher.limiter.getNegativeCondForSite(resourceDict['Site'])
+    result = self.tqDB.matchAndGetJobs(resourceDict, len(group), negativeCond=negativeCond)
+    if not result['OK']:
+      for request in group:
+        request.setError(result['Message'])
+      return
+    jobTQList = result['Value']
+    for request, (jobID, _tqID) in zip(group, jobTQList):
+      request.jobID = jobID
+    for request in group[len(jobTQList):]:
+      self.log.info("No match found")
+      request.setResult({})
+
+  def __checkJobs(self, requests):
+    """ Check in a single query that the matched jobs are still waiting
+    """
+    result = self.jobDB.getAttributesForJobList([request.jobID for request in requests],
+                                                ['OwnerDN', 'OwnerGroup', 'Status'])
+    if not result['OK']:
+      for request in requests:
+        request.setError('Could not retrieve job attributes')
+      return []
+    checked = []
+    for request in requests:
+      jobAttributes = result['Value'].get(int(request.jobID))
+      if not jobAttributes:
+        request.setError("No attributes returned for job")
+        continue
+      if jobAttributes['Status'] != 'Waiting':
+        self.log.error('Job matched by the TQ is not in Waiting state', str(request.jobID))
+        result = self.tqDB.deleteJob(request.jobID)
+        if not result['OK']:
+          request.setError(result['Message'])
+        else:
+          request.setError("Job %s is not in Waiting state" % str(request.jobID))
+        continue
+      request.jobAttributes = jobAttributes
+      checked.append(request)
+    return checked
+
+  def __reportStatus(self, requests):
+    """ Report the Matched status of the jobs, with one update per site and a single logging insert
+
+        Do not fail if errors happen here
+    """
+    jobsBySite = {}
+    for request in requests:
+      jobsBySite.setdefault(request.resourceDict['Site'], []).append(request.jobID)
+    attNames = ['Status', 'MinorStatus', 'ApplicationStatus', 'Site']
+    for site, jobIDs in jobsBySite.items():
+      result = self.jobDB.setJobAttributes(jobIDs, attNames, ['Matched', 'Assigned', 'Unknown', site])
+      if not result['OK']:
+        self.log.error("Problem reporting job status",
+                       "setJobAttributes, jobIDs = %s: %s" % (jobIDs, result['Message']))
+
+    jobIDs = [request.jobID for request in requests]
+    result = self.jlDB.addLoggingRecords(jobIDs, status='Matched', minor='Assigned', source='Matcher')
+    if not result['OK']:
+      self.log.error("Problem reporting job status",
+                     "addLoggingRecords, jobIDs = %s: %s" % (jobIDs, result['Message']))
+
+  def __updatePilotJobMapping(self, pilotJobDict):
+    """ Update pilot to job mapping information of the whole batch
+    """
+    if not pilotJobDict:
+      return
+    result = self.pilotAgentsDB.setCurrentJobIDs(pilotJobDict)
+    if not result['OK']:
+      self.log.error("Problem updating pilot information",
+                     "; setCurrentJobIDs: %s" % result['Message'])
+    jobPilotDict = dict((jobID, pilotRef) for pilotRef, jobID in pilotJobDict.items())
+    result = self.pilotAgentsDB.setJobsForPilots(jobPilotDict)
+    if not result['OK']:
+      self.log.error("Problem updating pilot information",
+                     "; setJobsForPilots: %s" % result['Message'])
+    elif result['Value']:
+      self.log.error("Problem updating pilot information",
+                     "; setJobsForPilots. PilotJobReferences not found: %s" % ', '.join(result['Value']))
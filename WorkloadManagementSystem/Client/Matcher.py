@@ -68,21 +68,7 @@ class Matcher(object):
     startTime = time.time()
 
     resourceDict = self._getResourceDict(resourceDescription, credDict)
-
-    # Make a nice print of the resource matching parameters
-    toPrintDict = dict(resourceDict)
-    if "MaxRAM" in resourceDescription:
-      toPrintDict['MaxRAM'] = resourceDescription['MaxRAM']
-    if "NumberOfProcessors" in resourceDescription:
-      toPrintDict['NumberOfProcessors'] = resourceDescription['NumberOfProcessors']
-    toPrintDict['Tag'] = []
-    if "Tag" in resourceDict:
-      for tag in resourceDict['Tag']:
-        if not tag.endswith('GB') and not tag.endswith('Processors'):
-          toPrintDict['Tag'].append(tag)
-    if not toPrintDict['Tag']:
-      toPrintDict.pop('Tag')
-    self.log.info('Resource description for matching', printDict(toPrintDict))
+    self._printResourceDict(resourceDescription, resourceDict)
 
     negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
     result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
@@ -109,23 +95,12 @@ class Matcher(object):
 
     self._reportStatus(resourceDict, jobID)
 
-    result = self.jobDB.getJobJDL(jobID)
-    if not result['OK']:
-      raise RuntimeError("Failed to get the job JDL")
-
-    resultDict = {}
-    resultDict['JDL'] = result['Value']
-    resultDict['JobID'] = jobID
+    resultDict = self._getJobDescription(jobID)
 
     matchTime = time.time() - startTime
     self.log.info("Match time", "[%s]" % str(matchTime))
     gMonitor.addMark("matchTime", matchTime)
 
-    # Get some extra stuff into the response returned
-    resOpt = self.jobDB.getJobOptParameters(jobID)
-    if resOpt['OK']:
-      for key, value in resOpt['Value'].items():
-        resultDict[key] = value
     resAtt = self.jobDB.getJobAttributes(jobID, ['OwnerDN', 'OwnerGroup'])
     if not resAtt['OK']:
       raise RuntimeError('Could not retrieve job attributes')
@@ -146,6 +121,41 @@ class Matcher(object):
 
     return resultDict
 
+  def _printResourceDict(self, resourceDescription, resourceDict):
+    """ Make a nice print of the resource matching parameters
+    """
+    toPrintDict = dict(resourceDict)
+    if "MaxRAM" in resourceDescription:
+      toPrintDict['MaxRAM'] = resourceDescription['MaxRAM']
+    if "NumberOfProcessors" in resourceDescription:
+      toPrintDict['NumberOfProcessors'] = resourceDescription['NumberOfProcessors']
+    toPrintDict['Tag'] = []
+    if "Tag" in resourceDict:
+      for tag in resourceDict['Tag']:
+        if not tag.endswith('GB') and not tag.endswith('Processors'):
+          toPrintDict['Tag'].append(tag)
+    if not toPrintDict['Tag']:
+      toPrintDict.pop('Tag')
+    self.log.info('Resource description for matching', printDict(toPrintDict))
+
+  def _getJobDescription(self, jobID):
+    """ Get the JDL and the optimizer parameters of the matched job, to be returned to the pilot
+    """
+    result = self.jobDB.getJobJDL(jobID)
+    if not result['OK']:
+      raise RuntimeError("Failed to get the job JDL")
+
+    resultDict = {}
+    resultDict['JDL'] = result['Value']
+    resultDict['JobID'] = jobID
+
+    # Get some extra stuff into the response returned
+    resOpt = self.jobDB.getJobOptParameters(jobID)
+    if resOpt['OK']:
+      for key, value in resOpt['Value'].items():
+        resultDict[key] = value
+    return resultDict
+
   def _getResourceDict(self, resourceDescription, credDict):
     """ from resourceDescription to resourceDict (just various mods)
     """
@@ -0,0 +1,100 @@
+""" Test for the batched matching of job requests
+"""
+# pylint: disable=protected-access, missing-docstring, invalid-name
+
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.Client.MatchBatcher import MatchBatcher
+
+MODULE_NAME = "DIRAC.WorkloadManagementSystem.Client.MatchBatcher"
+
+
+def _fakeMatcher(**kwargs):
+  matcher = MagicMock()
+  matcher.opsHelper.getValue.return_value = False
+  matcher._getResourceDict.side_effect = lambda resourceDescription, _credDict: dict(resourceDescription)
+  matcher._getJobDescription.side_effect = lambda jobID: {'JobID': jobID, 'JDL': '[]'}
+  matcher.limiter.getNegativeCondForSite.return_value = {}
+  return matcher
+
+
+def _runBatch(batcher, resourceDescriptions):
+  results = [None] * len(resourceDescriptions)
+  errors = [None] * len(resourceDescriptions)
+
+  def request(index):
+    try:
+      results[index] = batcher.selectJob(resourceDescriptions[index], {'group': 'user'})
+    except RuntimeError as rte:
+      errors[index] = str(rte)
+
+  threads = [threading.Thread(target=request, args=(index,)) for index in range(len(resourceDescriptions))]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join(10)
+  return results, errors
+
+
+def test_batchMatching(mocker):
+  mocker.patch(MODULE_NAME + ".Matcher", side_effect=_fakeMatcher)
+  pilotAgentsDB = MagicMock()
+  pilotAgentsDB.setCurrentJobIDs.return_value = S_OK()
+  pilotAgentsDB.setJobsForPilots.return_value = S_OK([])
+  jobDB = MagicMock()
+  jobDB.setJobAttributes.return_value = S_OK()
+  jobDB.getAttributesForJobList.side_effect = lambda jobIDs, _attrs: S_OK(dict(
+      (jobID, {'OwnerDN': '/DN/user', 'OwnerGroup': 'user', 'Status': 'Waiting'}) for jobID in jobIDs))
+  jlDB = MagicMock()
+  jlDB.addLoggingRecords.return_value = S_OK()
+  tqDB = MagicMock()
+  tqDB.matchAndGetJobs.side_effect = lambda resourceDict, numJobs, **kwargs: S_OK(
+      [(100 + i, 1) for i in range(min(numJobs, 3))])
+
+  # Long window so that all the requests end up in the same batch
+  batcher = MatchBatcher(pilotAgentsDB, jobDB, tqDB, jlDB, batchWindow=0.5)
+  descriptions = [{'Site': 'Site.A', 'CPUTime': 1000, 'PilotReference': 'pilot%d' % i} for i in range(4)]
+  results, errors = _runBatch(batcher, descriptions)
+
+  assert errors == [None] * 4
+  # Identical resources are matched together, only 3 jobs available
+  tqDB.matchAndGetJobs.assert_called_once()
+  assert sorted(result.get('JobID') for result in results if result) == [100, 101, 102]
+  assert len([result for result in results if result == {}]) == 1
+  for result in results:
+    if result:
+      assert result['DN'] == '/DN/user'
+      assert result['PilotInfoReportedFlag']
+  # Bulk updates
+  jobDB.setJobAttributes.assert_called_once()
+  assert sorted(jobDB.setJobAttributes.call_args[0][0]) == [100, 101, 102]
+  jlDB.addLoggingRecords.assert_called_once()
+  pilotAgentsDB.setCurrentJobIDs.assert_called_once()
+  assert len(pilotAgentsDB.setCurrentJobIDs.call_args[0][0]) == 3
+  pilotAgentsDB.setJobsForPilots.assert_called_once()
+
+
+def test_notWaitingJob(mocker):
+  mocker.patch(MODULE_NAME + ".Matcher", side_effect=_fakeMatcher)
+  jobDB = MagicMock()
+  jobDB.getAttributesForJobList.return_value = S_OK({100: {'OwnerDN': '/DN/user',
+                                                           'OwnerGroup': 'user',
+                                                           'Status': 'Killed'}})
+  tqDB = MagicMock()
+  tqDB.matchAndGetJobs.return_value = S_OK([(100, 1)])
+  tqDB.deleteJob.return_value = S_OK(True)
+
+  batcher = MatchBatcher(MagicMock(), jobDB, tqDB, MagicMock(), batchWindow=0.01)
+  results, errors = _runBatch(batcher, [{'Site': 'Site.A', 'CPUTime': 1000}])
+
+  assert results == [None]
+  assert 'not in Waiting state' in errors[0]
+  tqDB.deleteJob.assert_called_once_with(100)
+  jobDB.setJobAttributes.assert_not_called()
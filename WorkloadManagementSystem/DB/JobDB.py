@@ -261,28 +261,13 @@ class JobDB(DB):
     if isinstance(jobID, (basestring, int, long)):
       jobID = [jobID]
 
-    jobIDList = []
-    for jID in jobID:
-      ret = self._escapeString(str(jID))
-      if not ret['OK']:
-        return ret
-      jobIDList.append(ret['Value'])
-
-    # self.log.debug('JobDB.getParameters: Getting Parameters for jobs %s' % ','.join(jobIDList))
-
     resultDict = {}
     if paramList:
       if isinstance(paramList, six.string_types):
         paramList = paramList.split(',')
-      paramNameList = []
-      for pn in paramList:
-        ret = self._escapeString(pn)
-        if not ret['OK']:
-          return ret
-        paramNameList.append(ret['Value'])
       cmd = "SELECT JobID, Name, Value FROM JobParameters WHERE JobID IN (%s) AND Name IN (%s)" % \
-            (','.join(jobIDList), ','.join(paramNameList))
-      result = self._query(cmd)
+            (','.join(['%s'] * len(jobID)), ','.join(['%s'] * len(paramList)))
+      result = self._query(cmd, args=[str(jID) for jID in jobID] + list(paramList))
       if result['OK']:
         if result['Value']:
           for res_jobID, res_name, res_value in result['Value']:
@@ -318,30 +303,20 @@ class JobDB(DB):
         If recheduleCounter = -1, all cycles are returned.
     """
 
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
     # self.log.debug('JobDB.getAtticJobParameters: Getting Attic Parameters for job %s' % jobID)
 
     resultDict = {}
+    args = [str(jobID)]
     paramCondition = ''
     if paramList:
-      paramNameList = []
-      for x in paramList:
-        ret = self._escapeString(x)
-        if not ret['OK']:
-          return ret
-        paramNameList.append(x)
-      paramNames = ','.join(paramNameList)
-      paramCondition = " AND Name in (%s)" % paramNames
+      paramCondition = " AND Name in (%s)" % ','.join(['%s'] * len(paramList))
+      args.extend(paramList)
     rCounter = ''
     if rescheduleCounter != -1:
       rCounter = ' AND RescheduleCycle=%d' % int(rescheduleCounter)
     cmd = "SELECT Name, Value, RescheduleCycle from AtticJobParameters"
-    cmd += " WHERE JobID=%s %s %s" % (jobID, paramCondition, rCounter)
-    result = self._query(cmd)
+    cmd += " WHERE JobID=%%s %s %s" % (paramCondition, rCounter)
+    result = self._query(cmd, args=args)
     if result['OK']:
       if result['Value']:
         for name, value, counter in result['Value']:
@@ -362,23 +337,12 @@ class JobDB(DB):
         return an empty dictionary if matching job found
     """
 
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
-    attrNameList = []
-    for x in attrList if attrList else self.jobAttributeNames:
-      ret = self._escapeString(x)
-      if not ret['OK']:
-        return ret
-      x = "`" + ret['Value'][1:-1] + "`"
-      attrNameList.append(x)
-    attrNames = ','.join(attrNameList)
+    attrNames = ','.join("`%s`" % x.replace('`', '').replace('%', '%%')
+                         for x in (attrList if attrList else self.jobAttributeNames))
     # self.log.debug('JobDB.getAllJobAttributes: Getting Attributes for job = %s.' % jobID)
 
-    cmd = 'SELECT %s FROM Jobs WHERE JobID=%s' % (attrNames, jobID)
-    res = self._query(cmd)
+    cmd = 'SELECT %s FROM Jobs WHERE JobID=%%s' % attrNames
+    res = self._query(cmd, args=(str(jobID),))
     if not res['OK']:
       return res
 
@@ -434,26 +398,17 @@ class JobDB(DB):
         empty, get all the parameters then
     """
 
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
     resultDict = {}
 
+    args = [str(jobID)]
     if paramList:
-      paramNameList = []
-      for x in paramList:
-        ret = self._escapeString(x)
-        if not ret['OK']:
-          return ret
-        paramNameList.append(ret['Value'])
-      paramNames = ','.join(paramNameList)
-      cmd = "SELECT Name, Value from OptimizerParameters WHERE JobID=%s and Name in (%s)" % (jobID, paramNames)
+      cmd = "SELECT Name, Value from OptimizerParameters WHERE JobID=%%s and Name in (%s)" % \
+          ','.join(['%s'] * len(paramList))
+      args.extend(paramList)
     else:
-      cmd = "SELECT Name, Value from OptimizerParameters WHERE JobID=%s" % jobID
+      cmd = "SELECT Name, Value from OptimizerParameters WHERE JobID=%s"
 
-    result = self._query(cmd)
+    result = self._query(cmd, args=args)
     if result['OK']:
       if result['Value']:
         for name, value in result['Value']:
@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     deleteJob()
     getWMSTimeStamps()
@@ -88,6 +89,28 @@ class JobLoggingDB(DB):
 
     return self._update(cmd)
 
+#############################################################################
+  def addLoggingRecords(self, jobIDs, status='idem', minor='idem', application='idem', source='Unknown'):
+    """ Add the same status record for several jobs in a single statement.
+        The current UTC time is used as time stamp.
+    """
+    if not jobIDs:
+      return S_OK()
+
+    event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
+    self.log.info("Adding record for jobs ", "%s: '%s' from %s" % (','.join(str(jobID) for jobID in jobIDs),
+                                                                   event, source))
+
+    _date = Time.dateTime()
+    epoc = time.mktime(_date.timetuple()) + _date.microsecond / 1000000. - MAGIC_EPOC_NUMBER
+    time_order = round(epoc, 3)
+
+    return self.insertMultipleFields('LoggingInfo',
+                                     ['JobId', 'Status', 'MinorStatus', 'ApplicationStatus',
+                                      'StatusTime', 'StatusTimeOrder', 'StatusSource'],
+                                     [[int(jobID), status, minor, application[:255],
+                                       str(_date), time_order, source[:32]] for jobID in jobIDs])
+
 #############################################################################
   def getJobLoggingInfo(self, jobID):
     """ Returns a Status,MinorStatus,ApplicationStatus,StatusTime,StatusSource tuple
@@ -459,6 +459,53 @@ AND SubmissionTime < DATE_SUB(UTC_TIMESTAMP(),INTERVAL %d DAY)" %
     result = self._update(req)
     return result
 
+##########################################################################################
+  def setJobsForPilots(self, jobPilotDict):
+    """ Store in a single statement the jobIDs of the jobs executed by several pilots
+
+        :param dict jobPilotDict: { jobID : pilotRef }
+        :return: S_OK( list of pilot references not found ) / S_ERROR
+    """
+    if not jobPilotDict:
+      return S_OK([])
+    result = self._escapeValues(list(set(jobPilotDict.values())))
+    if not result['OK']:
+      return result
+    refString = ','.join(result['Value'])
+    req = "SELECT PilotJobReference, PilotID from PilotAgents WHERE PilotJobReference in ( %s )" % refString
+    result = self._query(req)
+    if not result['OK']:
+      return result
+    pilotIDs = dict(result['Value'])
+    values = ["(%d,%d,UTC_TIMESTAMP())" % (pilotIDs[pilotRef], int(jobID))
+              for jobID, pilotRef in jobPilotDict.items() if pilotRef in pilotIDs]
+    if values:
+      req = "INSERT INTO JobToPilotMapping (PilotID,JobID,StartTime) VALUES %s" % ','.join(values)
+      result = self._update(req)
+      if not result['OK']:
+        return result
+    return S_OK([pilotRef for pilotRef in jobPilotDict.values() if pilotRef not in pilotIDs])
+
+##########################################################################################
+  def setCurrentJobIDs(self, pilotJobDict):
+    """ Set the current DIRAC job ID of several pilot agents in a single statement
+
+        :param dict pilotJobDict: { pilotRef : jobID }
+    """
+    if not pilotJobDict:
+      return S_OK()
+    pilotRefs = list(pilotJobDict)
+    result = self._escapeValues(pilotRefs)
+    if not result['OK']:
+      return result
+    escapedRefs = result['Value']
+    cases = ' '.join(["WHEN %s THEN %d" % (escapedRef, int(pilotJobDict[pilotRef]))
+                      for pilotRef, escapedRef in zip(pilotRefs, escapedRefs)])
+    refString = ','.join(escapedRefs)
+    req = "UPDATE PilotAgents SET CurrentJobID = CASE PilotJobReference %s END " % cases
+    req += "WHERE PilotJobReference in ( %s )" % refString
+    return self._update(req)
+
 ##########################################################################################
   def getJobsForPilot(self, pilotID):
     """ Get IDs of Jobs that were executed by a pilot
@@ -20,6 +20,7 @@ from DIRAC.Core.Security import Properties
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.WorkloadManagementSystem.private.SharesCorrector import SharesCorrector
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 
 DEFAULT_GROUP_SHARE = 1000
 TQ_MIN_SHARE = 0.001
@@ -65,9 +66,40 @@ class TaskQueueDB(DB):
     self.__opsHelper = Operations()
     self.__ensureInsertionIsSingle = False
     self.__sharesCorrector = SharesCorrector(self.__opsHelper)
+    self.__tqIndex = None
     result = self.__initializeDB()
     if not result['OK']:
       raise Exception("Can't create tables: %s" % result['Message'])
+    self.enableMatchingIndex(self.__getCSOption("UseTaskQueueIndex", False))
+
+  def enableMatchingIndex(self, enabled=True):
+    """ Enable or disable the in-memory task queue index used for matching
+
+        When enabled, the task queues matching a resource are selected in memory and
+        MySQL is only queried to extract a job from the selected task queues.
+    """
+    if enabled and self.__tqIndex is None:
+      self.__tqIndex = TaskQueueIndex(multiValueMatchFields, bannedJobMatchFields)
+    elif not enabled:
+      self.__tqIndex = None
+
+  def __getMatchingIndex(self):
+    """ Get the task queue index, reloading it from the DB if it is too old.
+        Task queues can be created by other processes, hence the periodic reload.
+
+        :returns: TaskQueueIndex or None if the index is disabled or can't be loaded
+    """
+    tqIndex = self.__tqIndex
+    if tqIndex is None:
+      return None
+    if tqIndex.isStale(self.__getCSOption("TQIndexRefreshPeriod", 30)):
+      result = self.retrieveTaskQueues()
+      if not result['OK']:
+        self.log.error("Can't load the task queue index, using SQL matching", result['Message'])
+        return None
+      tqIndex.load(result['Value'])
+      self.log.verbose("Loaded task queue index", "(%d TQs)" % len(result['Value']))
+    return tqIndex
 
   def enableAllTaskQueues(self):
     """ Enable all Task queues
@@ -320,6 +352,9 @@ class TaskQueueDB(DB):
         "DELETE FROM `tq_TaskQueues` WHERE TQId in ( %s )" % ','.join(orphanedTQs), conn=connObj)
     if not result['OK']:
       return result
+    if self.__tqIndex is not None:
+      for tqId in orphanedTQs:
+        self.__tqIndex.removeTaskQueue(int(tqId))
     return S_OK()
 
   def __setTaskQueueEnabled(self, tqId, enabled=True, connObj=False):
@@ -363,6 +398,7 @@ class TaskQueueDB(DB):
     if not retVal['OK']:
       return S_ERROR("Can't insert job: %s" % retVal['Message'])
     connObj = retVal['Value']
+    rawTQDefDict = dict(tqDefDict)
     if not skipTQDefCheck:
       tqDefDict = dict(tqDefDict)
       retVal = self._checkTaskQueueDefinition(tqDefDict)
@@ -385,6 +421,13 @@ class TaskQueueDB(DB):
         return retVal
       tqId = retVal['Value']
       newTQ = True
+      if self.__tqIndex is not None:
+        if skipTQDefCheck:
+          # The definition is already escaped, let the index reload it from the DB
+          self.__tqIndex.invalidate()
+        else:
+          rawTQDefDict['CPUTime'] = tqDefDict['CPUTime']
+          self.__tqIndex.addTaskQueue(tqId, rawTQDefDict)
     else:
       tqId = tqInfo['tqId']
       self.log.info("Found TQ for job requirements",
@@ -516,9 +559,38 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC" % (sqlCmd, result['Value'])
         :param dict tqDefDict: dict for TQ definition
         :returns: S_OK() / S_ERROR
     """
+    retVal = self.__matchAndGetJobs(tqMatchDict, 1, numJobsPerTry=numJobsPerTry,
+                                    numQueuesPerTry=numQueuesPerTry, negativeCond=negativeCond)
+    if not retVal['OK']:
+      return retVal
+    tqMatchDict, jobTQList = retVal['Value']
+    if not jobTQList:
+      return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+    jobId, tqId = jobTQList[0]
+    return S_OK({'matchFound': True, 'jobId': jobId, 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
+
+  def matchAndGetJobs(self, tqMatchDict, numJobs, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None):
+    """ Match several jobs for identical resources, with a single task queue match
+
+        :param dict tqMatchDict: resource description
+        :param int numJobs: maximum number of jobs to extract from the task queues
+        :returns: S_OK( [ ( jobId, tqId ) ] ) / S_ERROR
+    """
+    retVal = self.__matchAndGetJobs(tqMatchDict, numJobs, numJobsPerTry=numJobsPerTry,
+                                    numQueuesPerTry=numQueuesPerTry, negativeCond=negativeCond)
+    if not retVal['OK']:
+      return retVal
+    return S_OK(retVal['Value'][1])
+
+  def __matchAndGetJobs(self, tqMatchDict, numJobs, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None):
+    """ Extract up to numJobs jobs from the task queues matching the requirements
+
+        :returns: S_OK( ( escaped tqMatchDict, [ ( jobId, tqId ) ] ) ) / S_ERROR
+    """
     if negativeCond is None:
       negativeCond = {}
     # Make a copy to avoid modification of original if escaping needs to be done
+    rawMatchDict = dict(tqMatchDict)
     tqMatchDict = dict(tqMatchDict)
     retVal = self._checkMatchDefinition(tqMatchDict)
     if not retVal['OK']:
@@ -532,28 +604,27 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC" % (sqlCmd, result['Value'])
 FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s"
     prioSQL = "SELECT `tq_Jobs`.Priority FROM `tq_Jobs` \
 WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
-    postJobSQL = " ORDER BY `tq_Jobs`.JobId ASC LIMIT %s" % numJobsPerTry
+    postJobSQL = " ORDER BY `tq_Jobs`.JobId ASC LIMIT %s" % max(numJobsPerTry, numJobs)
+    extractedJobs = []
     for _ in xrange(self.__maxMatchRetry):
       noJobsFound = False
       if 'JobID' in tqMatchDict:
         # A certain JobID is required by the resource, so all TQ are to be considered
-        retVal = self.matchAndGetTaskQueue(tqMatchDict,
-                                           numQueuesToGet=0,
-                                           skipMatchDictDef=True,
-                                           connObj=connObj)
+        retVal = self.__matchTaskQueues(tqMatchDict, rawMatchDict,
+                                        numQueuesToGet=0,
+                                        connObj=connObj)
         preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict['JobID'])
       else:
-        retVal = self.matchAndGetTaskQueue(tqMatchDict,
-                                           numQueuesToGet=numQueuesPerTry,
-                                           skipMatchDictDef=True,
-                                           negativeCond=negativeCond,
-                                           connObj=connObj)
+        retVal = self.__matchTaskQueues(tqMatchDict, rawMatchDict,
+                                        numQueuesToGet=numQueuesPerTry,
+                                        negativeCond=negativeCond,
+                                        connObj=connObj)
       if not retVal['OK']:
         return retVal
       tqList = retVal['Value']
       if not tqList:
         self.log.info("No TQ matches requirements")
-        return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+        return S_OK((tqMatchDict, extractedJobs))
       for tqId, tqOwnerDN, tqOwnerGroup in tqList:
         self.log.info("Trying to extract jobs from TQ", tqId)
         retVal = self._query(prioSQL % tqId, conn=connObj)
@@ -579,14 +650,21 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
             msgFix = "Could not take job"
             msgVar = " %s out from the TQ %s: %s" % (jobId, tqId, retVal['Message'])
             self.log.error(msgFix, msgVar)
+            if extractedJobs:
+              # Do not lose the jobs already taken out from the TQs
+              return S_OK((tqMatchDict, extractedJobs))
             return S_ERROR(msgFix + msgVar)
           if retVal['Value']:
             self.log.info("Extracted job with prio from TQ",
                           "(%s : %s : %s)" % (jobId, prio, tqId))
-            return S_OK({'matchFound': True, 'jobId': jobId, 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
+            extractedJobs.append((jobId, tqId))
+            if len(extractedJobs) >= numJobs:
+              return S_OK((tqMatchDict, extractedJobs))
         self.log.info("No jobs could be extracted from TQ", tqId)
+      if extractedJobs:
+        return S_OK((tqMatchDict, extractedJobs))
     if noJobsFound:
-      return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+      return S_OK((tqMatchDict, extractedJobs))
 
     self.log.info("Could not find a match after %s match retries" % self.__maxMatchRetry)
     return S_ERROR("Could not find a match after %s match retries" % self.__maxMatchRetry)
@@ -600,9 +678,32 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
     # Make a copy to avoid modification of original if escaping needs to be done
     tqMatchDict = dict(tqMatchDict)
     if not skipMatchDictDef:
+      rawMatchDict = dict(tqMatchDict)
       retVal = self._checkMatchDefinition(tqMatchDict)
       if not retVal['OK']:
         return retVal
+      return self.__matchTaskQueues(tqMatchDict, rawMatchDict, numQueuesToGet=numQueuesToGet,
+                                    negativeCond=negativeCond, connObj=connObj)
+    return self.__matchTaskQueuesInDB(tqMatchDict, numQueuesToGet=numQueuesToGet,
+                                      negativeCond=negativeCond, connObj=connObj)
+
+  def __matchTaskQueues(self, tqMatchDict, rawMatchDict, numQueuesToGet=1, negativeCond=None, connObj=False):
+    """ Get the queues that match the requirements, from the in-memory index if enabled
+
+        :param dict tqMatchDict: checked and escaped match dict
+        :param dict rawMatchDict: the same match dict before escaping
+    """
+    tqIndex = self.__getMatchingIndex()
+    if tqIndex is not None:
+      return tqIndex.match(rawMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond)
+    return self.__matchTaskQueuesInDB(tqMatchDict, numQueuesToGet=numQueuesToGet,
+                                      negativeCond=negativeCond, connObj=connObj)
+
+  def __matchTaskQueuesInDB(self, tqMatchDict, numQueuesToGet=1, negativeCond=None, connObj=False):
+    """ Get the queues that match the (checked and escaped) requirements with an SQL query
+    """
+    if negativeCond is None:
+      negativeCond = {}
     retVal = self.__generateTQMatchSQL(tqMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond)
     if not retVal['OK']:
       return retVal
@@ -1008,6 +1109,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       retVal = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn=connObj)
       if not retVal['OK']:
         return retVal
+      if self.__tqIndex is not None:
+        self.__tqIndex.removeTaskQueue(int(tqId))
       self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
       self.log.info("Deleted empty and enabled TQ", tqId)
       return S_OK()
@@ -1036,6 +1139,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
     if not retVal['OK']:
       return S_ERROR("Could not delete task queue %s: %s" % (tqId, retVal['Message']))
     delTQ = retVal['Value']
+    if self.__tqIndex is not None:
+      self.__tqIndex.removeTaskQueue(int(tqId))
     sqlCmd = "DELETE FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s" % tqId
     retVal = self._update(sqlCmd, conn=connObj)
     if not retVal['OK']:
@@ -1293,6 +1398,8 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
       tqList = ", ".join([str(tqId) for tqId in prioDict[prio]])
       updateSQL = "UPDATE `tq_TaskQueues` SET Priority=%.4f WHERE TQId in ( %s )" % (prio, tqList)
       self._update(updateSQL, conn=connObj)
+    if self.__tqIndex is not None:
+      self.__tqIndex.setPriorities(tqDict)
     return S_OK()
 
   @staticmethod
@@ -37,3 +37,11 @@ class JobDBTest(unittest.TestCase):
     print(result)
     self.assertTrue(result['OK'])
     self.assertEqual(result['Value'], ['/vo/user/lfn1', '/vo/user/lfn2'])
+
+  def test_getJobAttributes(self):
+    self.jobDB._query.return_value = S_OK((('Running', 'LCG.CERN.cern'),))
+    result = self.jobDB.getJobAttributes(1234, ['Status', 'Site'])
+    self.assertTrue(result['OK'])
+    self.assertEqual(result['Value'], {'Status': 'Running', 'Site': 'LCG.CERN.cern'})
+    # The job ID is given as parameter of the query
+    self.jobDB._query.assert_called_once_with('SELECT `Status`,`Site` FROM Jobs WHERE JobID=%s', args=('1234',))
@@ -14,7 +14,7 @@ from DIRAC import gLogger, S_OK, S_ERROR
 
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Utilities.Decorators import deprecated
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 
@@ -24,11 +24,13 @@ from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
 from DIRAC.WorkloadManagementSystem.DB.PilotAgentsDB import PilotAgentsDB
 
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
+from DIRAC.WorkloadManagementSystem.Client.MatchBatcher import MatchBatcher
 from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
 gJobDB = False
 gTaskQueueDB = False
+gMatchBatcher = None
 
 
 def initializeMatcherHandler(serviceInfo):
@@ -39,12 +41,20 @@ def initializeMatcherHandler(serviceInfo):
   global gTaskQueueDB
   global jlDB
   global pilotAgentsDB
+  global gMatchBatcher
 
   gJobDB = JobDB()
   gTaskQueueDB = TaskQueueDB()
   jlDB = JobLoggingDB()
   pilotAgentsDB = PilotAgentsDB()
 
+  if getServiceOption(serviceInfo, 'BatchMatching', False):
+    # Window in milliseconds during which concurrent requests are grouped
+    batchWindow = getServiceOption(serviceInfo, 'BatchWindow', 5)
+    gMatchBatcher = MatchBatcher(pilotAgentsDB, gJobDB, gTaskQueueDB, jlDB,
+                                 batchWindow=batchWindow / 1000.,
+                                 maxBatchSize=getServiceOption(serviceInfo, 'MaxBatchSize', 50))
+
   gMonitor.registerActivity('matchTime', "Job matching time",
                             'Matching', "secs", gMonitor.OP_MEAN, 300)
   gMonitor.registerActivity('matchesDone', "Job Match Request",
@@ -89,12 +99,15 @@ class MatcherHandler(RequestHandler):
 
     try:
       opsHelper = Operations(group=credDict['group'])
-      matcher = Matcher(pilotAgentsDB=pilotAgentsDB,
-                        jobDB=gJobDB,
-                        tqDB=gTaskQueueDB,
-                        jlDB=jlDB,
-                        opsHelper=opsHelper)
-      result = matcher.selectJob(resourceDescription, credDict)
+      if gMatchBatcher:
+        result = gMatchBatcher.selectJob(resourceDescription, credDict, opsHelper=opsHelper)
+      else:
+        matcher = Matcher(pilotAgentsDB=pilotAgentsDB,
+                          jobDB=gJobDB,
+                          tqDB=gTaskQueueDB,
+                          jlDB=jlDB,
+                          opsHelper=opsHelper)
+        result = matcher.selectJob(resourceDescription, credDict)
     except RuntimeError as rte:
       self.log.error("Error requesting job: ", rte)
       return S_ERROR("Error requesting job")
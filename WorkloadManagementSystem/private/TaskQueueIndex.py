@@ -0,0 +1,301 @@
+""" Memory resident index of the task queues used to match resources without querying MySQL
+
+    The index keeps, for every task queue with waiting jobs, its owner, setup, CPU segment,
+    priority and the values of the multi-value requirements (Sites, Platforms, Tags...).
+    Inverted indexes by owner group, setup, CPU segment and multi-value requirement allow
+    to select the candidate task queues for a resource description with a few set operations.
+
+    The matching rules are exactly the ones applied by the SQL generated in
+    TaskQueueDB.__generateTQMatchSQL, including the case insensitive comparison of MySQL.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__RCSID__ = "$Id$"
+
+import random
+import string
+import threading
+import time
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Security import Properties
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+
+def _normalize(value):
+  """ Normalize a value the way MySQL compares VARCHARs (case insensitive, trailing spaces ignored)
+  """
+  return str(value).strip().lower()
+
+
+def _asList(value):
+  if isinstance(value, (list, tuple, set)):
+    return list(value)
+  return [value]
+
+
+def _isAny(value):
+  """ True if the value (or any of the values of a list) means "any"
+  """
+  for val in _asList(value):
+    if ''.join([c for c in str(val) if c not in string.punctuation]).lower() == 'any':
+      return True
+  return False
+
+
+class TaskQueueIndex(object):
+  """ In-memory index of task queues
+
+      Task queues are described with the dictionaries returned by TaskQueueDB.retrieveTaskQueues
+  """
+
+  def __init__(self, multiValueMatchFields, bannedMatchFields):
+    """ c'tor
+
+        :param tuple multiValueMatchFields: match fields with multiple values (Site, Platform, Tag...)
+        :param tuple bannedMatchFields: match fields that the task queues can ban (BannedSites...)
+    """
+    self.__matchFields = tuple(multiValueMatchFields)
+    self.__bannedFields = tuple(bannedMatchFields)
+    self.__lock = threading.RLock()
+    self.__lastLoad = 0
+    self.__clear()
+
+  def __clear(self):
+    self.__tqs = {}
+    self.__groupIndex = {}
+    self.__setupIndex = {}
+    self.__cpuIndex = {}
+    # field -> value -> set of TQs requiring that value
+    self.__valueIndex = dict((field, {}) for field in self.__matchFields)
+    # field -> set of TQs without requirement on the field
+    self.__noValueIndex = dict((field, set()) for field in self.__matchFields)
+
+  @staticmethod
+  def __addToIndex(index, key, tqId):
+    if key not in index:
+      index[key] = set()
+    index[key].add(tqId)
+
+  @staticmethod
+  def __removeFromIndex(index, key, tqId):
+    tqIds = index.get(key)
+    if tqIds is None:
+      return
+    tqIds.discard(tqId)
+    if not tqIds:
+      index.pop(key)
+
+  def __insert(self, tqId, tqDef):
+    tqData = {'OwnerDN': tqDef['OwnerDN'],
+              'OwnerGroup': tqDef['OwnerGroup'],
+              'NormOwnerDN': _normalize(tqDef['OwnerDN']),
+              'NormOwnerGroup': _normalize(tqDef['OwnerGroup']),
+              'Setup': _normalize(tqDef['Setup']),
+              'CPUTime': int(tqDef['CPUTime']),
+              'Priority': float(tqDef.get('Priority', 1))}
+    for field in self.__matchFields + tuple(["Banned%s" % field for field in self.__bannedFields]):
+      values = tqDef.get("%ss" % field, [])
+      tqData[field] = frozenset([_normalize(value) for value in values if str(value).strip()])
+    self.__tqs[tqId] = tqData
+    self.__addToIndex(self.__groupIndex, tqData['NormOwnerGroup'], tqId)
+    self.__addToIndex(self.__setupIndex, tqData['Setup'], tqId)
+    self.__addToIndex(self.__cpuIndex, tqData['CPUTime'], tqId)
+    for field in self.__matchFields:
+      if not tqData[field]:
+        self.__noValueIndex[field].add(tqId)
+      for value in tqData[field]:
+        self.__addToIndex(self.__valueIndex[field], value, tqId)
+
+  def __remove(self, tqId):
+    tqData = self.__tqs.pop(tqId, None)
+    if tqData is None:
+      return False
+    self.__removeFromIndex(self.__groupIndex, tqData['NormOwnerGroup'], tqId)
+    self.__removeFromIndex(self.__setupIndex, tqData['Setup'], tqId)
+    self.__removeFromIndex(self.__cpuIndex, tqData['CPUTime'], tqId)
+    for field in self.__matchFields:
+      self.__noValueIndex[field].discard(tqId)
+      for value in tqData[field]:
+        self.__removeFromIndex(self.__valueIndex[field], value, tqId)
+    return True
+
+  def load(self, tqDataDict):
+    """ Replace the content of the index
+
+        :param dict tqDataDict: { tqId : tqDefinition } as returned by TaskQueueDB.retrieveTaskQueues
+    """
+    with self.__lock:
+      self.__clear()
+      for tqId, tqDef in tqDataDict.items():
+        self.__insert(tqId, tqDef)
+      self.__lastLoad = time.time()
+
+  def invalidate(self):
+    """ Force a reload at the next isStale check
+    """
+    self.__lastLoad = 0
+
+  def isStale(self, maxAge):
+    """ Check if the index has been loaded more than maxAge seconds ago
+    """
+    return time.time() - self.__lastLoad > maxAge
+
+  def addTaskQueue(self, tqId, tqDef):
+    """ Add (or replace) a task queue in the index
+    """
+    with self.__lock:
+      self.__remove(tqId)
+      self.__insert(tqId, tqDef)
+
+  def removeTaskQueue(self, tqId):
+    """ Remove a task queue from the index
+
+        :returns: True if the task queue was in the index
+    """
+    with self.__lock:
+      return self.__remove(tqId)
+
+  def setPriorities(self, tqPriorities):
+    """ Update the priorities of the task queues
+
+        :param dict tqPriorities: { tqId : priority }
+    """
+    with self.__lock:
+      for tqId, priority in tqPriorities.items():
+        if tqId in self.__tqs:
+          self.__tqs[tqId]['Priority'] = float(priority)
+
+  def getTaskQueueIDs(self):
+    """ Get the list of indexed task queues
+    """
+    with self.__lock:
+      return list(self.__tqs)
+
+  def __unionOf(self, index, values):
+    tqIds = set()
+    for value in values:
+      tqIds.update(index.get(_normalize(value), ()))
+    return tqIds
+
+  def __ownerCandidates(self, tqMatchDict):
+    """ Set of TQs compatible with OwnerDN/OwnerGroup, None if there is no owner condition
+    """
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      dns = set([_normalize(dn) for dn in _asList(tqMatchDict['OwnerDN'])])
+      candidates = set()
+      for group in _asList(tqMatchDict['OwnerGroup']):
+        groupTQs = self.__groupIndex.get(_normalize(group), set())
+        if Properties.JOB_SHARING in Registry.getPropertiesForGroup(group):
+          candidates.update(groupTQs)
+        else:
+          candidates.update([tqId for tqId in groupTQs if self.__tqs[tqId]['NormOwnerDN'] in dns])
+      return candidates
+    candidates = None
+    if 'OwnerGroup' in tqMatchDict:
+      candidates = self.__unionOf(self.__groupIndex, _asList(tqMatchDict['OwnerGroup']))
+    if 'OwnerDN' in tqMatchDict:
+      dns = set([_normalize(dn) for dn in _asList(tqMatchDict['OwnerDN'])])
+      dnTQs = set([tqId for tqId in (self.__tqs if candidates is None else candidates)
+                   if self.__tqs[tqId]['NormOwnerDN'] in dns])
+      candidates = dnTQs
+    return candidates
+
+  def __passesNegativeDict(self, tqData, negativeCond):
+    """ Evaluate a negative condition dict: not ( cond1 and cond2 ) = ( not cond1 or not cond2 )
+    """
+    for field, values in negativeCond.items():
+      if field in self.__matchFields:
+        if not set([_normalize(value) for value in _asList(values)]) & tqData[field]:
+          return True
+      elif field in ('OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime'):
+        normField = {'OwnerDN': 'NormOwnerDN', 'OwnerGroup': 'NormOwnerGroup'}.get(field, field)
+        for value in _asList(values):
+          if _normalize(value) != _normalize(tqData[normField]):
+            return True
+    return False
+
+  def match(self, tqMatchDict, numQueuesToGet=1, negativeCond=None):
+    """ Get the task queues that match a resource description
+
+        :param dict tqMatchDict: resource description (non escaped values)
+        :param int numQueuesToGet: maximum number of task queues to return, 0 for all of them
+        :param negativeCond: dict or list of dicts of conditions the task queues must not fulfil
+        :returns: S_OK( [ ( tqId, ownerDN, ownerGroup ) ] ) sorted by random / priority
+    """
+    tqMatchDict = dict(tqMatchDict)
+    if 'Tag' not in tqMatchDict and 'RequiredTag' not in tqMatchDict:
+      tqMatchDict['Tag'] = []
+    tagValues = _asList(tqMatchDict.get('Tag', []))
+    requiredTags = _asList(tqMatchDict.get('RequiredTag', []))
+    if not requiredTags or _isAny(requiredTags):
+      requiredTags = []
+    elif not set(requiredTags).issubset(set(tagValues)):
+      return S_ERROR('Wrong conditions')
+    requiredTags = set([_normalize(tag) for tag in requiredTags])
+
+    with self.__lock:
+      candidates = self.__ownerCandidates(tqMatchDict)
+      if candidates is None:
+        candidates = set(self.__tqs)
+
+      if 'Setup' in tqMatchDict:
+        candidates &= self.__unionOf(self.__setupIndex, _asList(tqMatchDict['Setup']))
+      if 'CPUTime' in tqMatchDict:
+        maxCPU = max([int(cpuTime) for cpuTime in _asList(tqMatchDict['CPUTime'])])
+        cpuTQs = set()
+        for cpuSegment, tqIds in self.__cpuIndex.items():
+          if cpuSegment <= maxCPU:
+            cpuTQs.update(tqIds)
+        candidates &= cpuTQs
+
+      tagSet = None
+      for field in self.__matchFields:
+        if field not in tqMatchDict:
+          continue
+        values = _asList(tqMatchDict[field])
+        if field == 'Tag':
+          if _isAny(values):
+            continue
+          # All the tags of the TQ have to be provided by the resource
+          tagSet = set([_normalize(value) for value in values])
+          continue
+        if not values or _isAny(values):
+          continue
+        candidates &= self.__noValueIndex[field] | self.__unionOf(self.__valueIndex[field], values)
+        if field in self.__bannedFields:
+          bannedField = "Banned%s" % field
+          normValues = set([_normalize(value) for value in values])
+          candidates = set([tqId for tqId in candidates
+                            if normValues - self.__tqs[tqId][bannedField]])
+
+      bannedConds = []
+      for field in self.__matchFields:
+        bannedValues = tqMatchDict.get("Banned%s" % field)
+        if not bannedValues or _isAny(bannedValues):
+          continue
+        bannedConds.append((field, set([_normalize(value) for value in _asList(bannedValues)])))
+
+      if negativeCond and isinstance(negativeCond, dict):
+        negativeCond = [negativeCond]
+
+      matched = []
+      for tqId in candidates:
+        tqData = self.__tqs[tqId]
+        if tagSet is not None and not tqData['Tag'] <= tagSet:
+          continue
+        if requiredTags and not requiredTags <= tqData['Tag']:
+          continue
+        if any(not bannedValues - tqData[field] for field, bannedValues in bannedConds):
+          continue
+        if negativeCond and not any(self.__passesNegativeDict(tqData, negDict) for negDict in negativeCond):
+          continue
+        matched.append((random.random() / tqData['Priority'] if tqData['Priority'] else float('inf'),
+                        tqId, tqData['OwnerDN'], tqData['OwnerGroup']))
+
+    matched.sort()
+    if numQueuesToGet:
+      matched = matched[:numQueuesToGet]
+    return S_OK([(tqId, ownerDN, ownerGroup) for _, tqId, ownerDN, ownerGroup in matched])
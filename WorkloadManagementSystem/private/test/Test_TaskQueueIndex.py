@@ -0,0 +1,94 @@
+""" Test of the in-memory task queue index
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=protected-access, missing-docstring, invalid-name
+
+import pytest
+
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+multiValueMatchFields = ('GridCE', 'Site', 'GridMiddleware', 'Platform',
+                         'PilotType', 'SubmitPool', 'JobType', 'Tag')
+
+TQS = {1: {'OwnerDN': '/DN/user1', 'OwnerGroup': 'user', 'Setup': 'Test', 'CPUTime': 3600, 'Priority': 1.,
+           'Sites': ['Site.A']},
+       2: {'OwnerDN': '/DN/user2', 'OwnerGroup': 'user', 'Setup': 'Test', 'CPUTime': 86400, 'Priority': 1.,
+           'Platforms': ['x86_64-slc6'], 'BannedSites': ['Site.B']},
+       3: {'OwnerDN': '/DN/prod', 'OwnerGroup': 'prod', 'Setup': 'Test', 'CPUTime': 360, 'Priority': 1.,
+           'Tags': ['MultiProcessor'], 'JobTypes': ['MCSimulation']},
+       4: {'OwnerDN': '/DN/prod', 'OwnerGroup': 'prod', 'Setup': 'Other', 'CPUTime': 360, 'Priority': 1.}}
+
+
+@pytest.fixture
+def tqIndex(mocker):
+  mocker.patch("DIRAC.WorkloadManagementSystem.private.TaskQueueIndex.Registry.getPropertiesForGroup",
+               side_effect=lambda group: ['JobSharing'] if group == 'prod' else [])
+  index = TaskQueueIndex(multiValueMatchFields, ('Site',))
+  index.load(TQS)
+  return index
+
+
+def _match(tqIndex, matchDict, negativeCond=None):
+  result = tqIndex.match(matchDict, numQueuesToGet=0, negativeCond=negativeCond)
+  assert result['OK'], result
+  return sorted(tq[0] for tq in result['Value'])
+
+
+@pytest.mark.parametrize("matchDict, expected", [
+    ({'Setup': 'Test', 'CPUTime': 100000}, [1, 2]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Tag': ['MultiProcessor']}, [1, 2, 3]),
+    ({'Setup': 'test ', 'CPUTime': 3600, 'Tag': 'any'}, [1, 3]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Site': 'Site.A'}, [1, 2]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Site': 'Site.B'}, []),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Site': 'Site.C', 'Platform': 'x86_64-slc6'}, [2]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Platform': 'x86_64-slc5'}, [1]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'BannedSite': 'Site.A'}, [2]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Tag': ['MultiProcessor'], 'RequiredTag': ['MultiProcessor']}, [3]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Tag': ['MultiProcessor'], 'JobType': ['User']}, [1, 2]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'OwnerGroup': 'user', 'OwnerDN': '/DN/user2'}, [2]),
+    ({'Setup': 'Test', 'CPUTime': 100000, 'Tag': ['MultiProcessor'],
+      'OwnerGroup': ['user', 'prod'], 'OwnerDN': '/DN/user1'}, [1, 3]),
+    ({'Setup': ['Test', 'Other'], 'CPUTime': 100000, 'OwnerGroup': 'prod'}, [4]),
+])
+def test_match(tqIndex, matchDict, expected):
+  assert _match(tqIndex, matchDict) == expected
+
+
+def test_matchErrors(tqIndex):
+  result = tqIndex.match({'Setup': 'Test', 'CPUTime': 100000, 'RequiredTag': ['GPU']})
+  assert not result['OK']
+
+
+def test_negativeCond(tqIndex):
+  matchDict = {'Setup': 'Test', 'CPUTime': 100000}
+  assert _match(tqIndex, matchDict, negativeCond={'Site': 'Site.A'}) == [2]
+  assert _match(tqIndex, matchDict, negativeCond={'OwnerDN': ['/DN/user2']}) == [1]
+  assert _match(tqIndex, matchDict, negativeCond=[{'Site': 'Site.A'}, {'OwnerGroup': ['prod']}]) == [1, 2]
+
+
+def test_incrementalUpdates(tqIndex):
+  matchDict = {'Setup': 'Test', 'CPUTime': 100000, 'Site': 'Site.D'}
+  assert _match(tqIndex, matchDict) == [2]
+  tqIndex.addTaskQueue(5, {'OwnerDN': '/DN/user1', 'OwnerGroup': 'user', 'Setup': 'Test',
+                           'CPUTime': 3600, 'Sites': ['Site.D']})
+  assert _match(tqIndex, matchDict) == [2, 5]
+  assert tqIndex.removeTaskQueue(2)
+  assert not tqIndex.removeTaskQueue(2)
+  assert _match(tqIndex, matchDict) == [5]
+  assert sorted(tqIndex.getTaskQueueIDs()) == [1, 3, 4, 5]
+
+
+def test_priorities(tqIndex):
+  tqIndex.setPriorities({1: 1000000., 2: 0.000001})
+  result = tqIndex.match({'Setup': 'Test', 'CPUTime': 100000}, numQueuesToGet=1)
+  assert result['OK']
+  assert result['Value'] == [(1, '/DN/user1', 'user')]
+
+
+def test_staleness(tqIndex):
+  assert not tqIndex.isStale(30)
+  tqIndex.invalidate()
+  assert tqIndex.isStale(30)
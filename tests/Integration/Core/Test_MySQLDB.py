@@ -275,3 +275,60 @@ def test_deleteEntries(name, fields, requiredFields, values, table, cond, expect
   result = mysqlDB.getCounters(name, fields, {})
   assert result['OK']
   assert result['Value'] == []
+
+
+@pytest.mark.parametrize("name, fields, requiredFields, values, table", [
+    (name, fields, reqFields, genVal1(), table)
+])
+def test_insertMultipleFields(name, fields, requiredFields, values, table):
+  """ Create a table, insert elements with multi-row statements, also split in several statements
+  """
+  mysqlDB = setupDB()
+
+  result = mysqlDB._createTables(table, force=True)
+  assert result['OK']
+
+  result = mysqlDB.insertMultipleFields(name, requiredFields, values)
+  assert result['OK']
+  assert result['Value'] == 100
+
+  # Force the split of the rows in several statements
+  mysqlDB._MySQL__maxAllowedPacket = 500
+  result = mysqlDB.insertMultipleFields(name, requiredFields, values)
+  assert result['OK']
+  assert result['Value'] == 100
+
+  result = mysqlDB.getCounters(name, fields, {})
+  assert result['OK']
+  assert result['Value'] == [({'Surname': 'Surn1', 'Name': 'name1'}, 200)]
+
+
+@pytest.mark.parametrize("name, requiredFields, values, table", [
+    (name, reqFields, genVal1(), table)
+])
+def test_upsertAndUpdateMultipleFields(name, requiredFields, values, table):
+  """ Create a table, insert elements, update some of them with an upsert and with updateMultipleFields
+  """
+  mysqlDB = setupDBCreateTableInsertFields(table, requiredFields, values)
+
+  # Rows 1 and 2 exist, row 101 is new
+  result = mysqlDB.insertMultipleFields(name, ['ID'] + requiredFields,
+                                        [[1, 'name2', 'Surn2', 1000], [2, 'name2', 'Surn2', 1001],
+                                         [101, 'name3', 'Surn3', 1002]],
+                                        onDuplicateUpdate=['Name', 'Count'])
+  assert result['OK']
+  assert result['Value'] == 5
+
+  result = mysqlDB.getFields(name, ['ID', 'Name', 'Surname', 'Count'], {'Count': [1000, 1001, 1002]})
+  assert result['OK']
+  assert sorted(result['Value']) == [(1, 'name2', 'Surn1', 1000), (2, 'name2', 'Surn1', 1001),
+                                     (101, 'name3', 'Surn3', 1002)]
+
+  result = mysqlDB.updateMultipleFields(name, ['Name', 'Count'], ['ID'],
+                                        [['name4', 2000, 1], ["name'5", 2001, 2], ['name6', 2002, 1000]])
+  assert result['OK']
+  assert result['Value'] == 2
+
+  result = mysqlDB.getFields(name, ['ID', 'Name'], {'Count': [2000, 2001]})
+  assert result['OK']
+  assert sorted(result['Value']) == [(1, 'name4'), (2, "name'5")]
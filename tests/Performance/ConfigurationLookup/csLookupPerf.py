@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+""" This script measures the time spent by the Registry and Operations helpers to look up options
+    in a large configuration, with the index of the options and the cache of the cast values of
+    ConfigurationData (after) and with the lookups walking the CFG tree for each call (before).
+
+    The configuration has a Registry with many users and groups, and an Operations section.
+
+    Usage:
+      csLookupPerf.py [nUsers] [repetitions]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+import sys
+import time
+
+from mock import patch
+from diraccfg import CFG
+
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
+
+
+def buildCFG(nUsers):
+  lines = ["Registry", "{", "Users", "{"]
+  for i in range(nUsers):
+    lines += ["user%05d" % i, "{", "DN = /DC=ch/DC=cern/OU=Users/CN=user%05d" % i,
+              "Email = user%05d@cern.ch" % i, "}"]
+  lines += ["}", "Groups", "{"]
+  for i in range(nUsers // 10):
+    lines += ["group%04d" % i, "{",
+              "Users = %s" % ", ".join("user%05d" % j for j in range(i * 10, i * 10 + 10)),
+              "Properties = NormalUser, PrivateLimitedDelegation", "VO = vo%d" % (i % 5), "}"]
+  lines += ["}", "}", "Operations", "{", "Defaults", "{", "JobScheduling", "{",
+            "CheckJobLimits = True", "MaxRescheduling = 3", "}", "}", "}"]
+  cfg = CFG()
+  cfg.loadFromBuffer("\n".join(lines))
+  return cfg
+
+
+def referenceExtractOption(path, cfg=False, disableDangerZones=False):
+  """ Lookup walking the merged CFG as done before the index of the options
+  """
+  if not cfg:
+    cfg = gConfigurationData.mergedCFG
+  try:
+    levelList = [level.strip() for level in path.split("/") if level.strip() != ""]
+    for section in levelList[:-1]:
+      cfg = cfg[section]
+    if levelList[-1] in cfg.listOptions():
+      return cfg[levelList[-1]]
+  except Exception:
+    pass
+  return None
+
+
+def helpersLookups(nUsers):
+  for i in range(0, nUsers, nUsers // 20):
+    Registry.getUsernameForDN("/DC=ch/DC=cern/OU=Users/CN=user%05d" % i)
+    Registry.getGroupsForUser("user%05d" % i)
+    Registry.getUserOption("user%05d" % i, "Email")
+  for i in range(nUsers // 10):
+    Registry.getPropertiesForGroup("group%04d" % i)
+    Registry.getVOForGroup("group%04d" % i)
+  for _ in range(100):
+    Operations().getValue("JobScheduling/MaxRescheduling", 0)
+
+
+def bestTime(function, arg, repetitions):
+  timings = []
+  for _ in range(repetitions):
+    before = time.time()
+    function(arg)
+    timings.append(time.time() - before)
+  return min(timings)
+
+
+if __name__ == '__main__':
+  nUsers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  nRepetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+  gConfigurationData.mergeWithLocal(buildCFG(nUsers))
+
+  after = bestTime(helpersLookups, nUsers, nRepetitions)
+  with patch.object(gConfigurationData, 'extractOptionFromCFG', side_effect=referenceExtractOption), \
+          patch.object(gConfigurationData, 'getTypedValuesCache', side_effect=dict):
+    before = bestTime(helpersLookups, nUsers, nRepetitions)
+  print("Registry and Operations helpers with %d users: %.1f ms (before %.1f ms, x%.2f)" %
+        (nUsers, 1000. * after, 1000. * before, before / after))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+""" This script measures the time spent by DEncode to encode and decode typical DISET payloads,
+    and compares the encode and decode functions with the per type reference functions
+    of g_dEncodeFunctions and g_dDecodeFunctions.
+
+    The payloads are:
+      * a getReplicas response (dict of LFNs with a dict of SE -> PFN each)
+      * a dict of nested job parameters (integer keys, floats, longs, tuples, booleans, None)
+      * a list of job status records as returned by the JobMonitoring service
+
+    Usage:
+      dencodePerf.py [size] [repetitions]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+import datetime
+
+from DIRAC.Core.Utilities.DEncode import encode, decode, g_dEncodeFunctions, g_dDecodeFunctions
+
+
+def getReplicasPayload(size):
+  successful = {}
+  for i in range(size):
+    lfn = '/vo/MC/2018/SIM/00012345/%04d/00012345_%08d_1.sim' % (i // 1000, i)
+    successful[lfn] = {'CERN-DST': 'root://eos.cern.ch//eos/vo/grid/prod%s' % lfn,
+                       'RAL-DST': 'root://ral.ac.uk//castor/vo%s' % lfn,
+                       'IN2P3-DST': 'srm://ccsrm.in2p3.fr/pnfs/in2p3.fr/data/vo%s' % lfn}
+  return {'OK': True, 'Value': {'Successful': successful, 'Failed': {}}}
+
+
+def jobParametersPayload(size):
+  jobParameters = {}
+  for jobID in range(size):
+    jobParameters[jobID] = {'JobID': jobID,
+                            'Status': 'Done',
+                            'MinorStatus': 'Execution Complete',
+                            'CPUNormalizationFactor': 12.5,
+                            'TotalCPUTime(s)': 3600.25,
+                            'MemoryUsed(kb)': 2 ** 40 + jobID,
+                            'HostName': 'wn%05d.cern.ch' % jobID,
+                            'Pilot': ('https://lb.cern.ch:9000/%d' % jobID, None),
+                            'LocalAccount': 'pilvo%03d' % (jobID % 100),
+                            'OutputSandboxUploaded': True,
+                            'Parameters': [('NumberOfProcessors', '1'), ('Tag', ['MultiProcessor', 'SL6'])]}
+  return {'OK': True, 'Value': jobParameters}
+
+
+def jobStatusPayload(size):
+  now = datetime.datetime.utcnow()
+  records = [('Waiting', 'Pilot Agent Submission', 'Unknown', now, 'JobScheduling')] * 5
+  return {'OK': True, 'Value': [dict(JobID=jobID, Site='LCG.CERN.cern', Owner='user', LoggingInfo=records)
+                                for jobID in range(size)]}
+
+
+def referenceEncode(data):
+  eList = []
+  g_dEncodeFunctions[type(data)](data, eList)
+  return ''.join(eList)
+
+
+def referenceDecode(data):
+  return g_dDecodeFunctions[data[0]](data, 0)
+
+
+def bestTime(function, data, repetitions):
+  timings = []
+  for _ in range(repetitions):
+    before = time.time()
+    function(data)
+    timings.append(time.time() - before)
+  return min(timings)
+
+
+if __name__ == '__main__':
+  payloadSize = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+  nRepetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+  for name, payload in (('getReplicas', getReplicasPayload(payloadSize)),
+                        ('jobParameters', jobParametersPayload(payloadSize // 4)),
+                        ('jobStatus', jobStatusPayload(payloadSize // 4))):
+    encoded = encode(payload)
+    if encoded != referenceEncode(payload) or decode(encoded) != referenceDecode(encoded):
+      print("%s: DEncode output differs from the reference implementation" % name)
+      sys.exit(1)
+    refEncode = bestTime(referenceEncode, payload, nRepetitions)
+    fastEncode = bestTime(encode, payload, nRepetitions)
+    refDecode = bestTime(referenceDecode, encoded, nRepetitions)
+    fastDecode = bestTime(decode, encoded, nRepetitions)
+    print("%s (%d bytes): encode %.1f ms (reference %.1f ms, x%.2f), decode %.1f ms (reference %.1f ms, x%.2f)" %
+          (name, len(encoded),
+           1000. * fastEncode, 1000. * refEncode, refEncode / fastEncode,
+           1000. * fastDecode, 1000. * refDecode, refDecode / fastDecode))
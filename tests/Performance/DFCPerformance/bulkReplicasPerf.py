@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+""" This script measures the time taken by a getReplicas call for a large number of LFNs (100000 by
+    default), spread over many directories. The files are registered in a test directory, the
+    getReplicas call is repeated and the files are removed at the end.
+
+    To compare the single query lookup of the FileIDs with the lookup by directory, run it
+    once with the default BulkQueryThreshold of the FileCatalog service and once with
+    BulkQueryThreshold = 0.
+
+    Usage:
+      bulkReplicasPerf.py [nFiles] [filesPerDirectory] [repetitions]
+
+    Tunable parameters:
+      * hostname, port: the FileCatalog service to test
+      * baseDir: directory in which the test files are registered, it must be writable
+      * storageElements: the SEs of the replicas
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+import random
+import sys
+import time
+
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+port = 9197
+hostname = 'yourmachine.somewhere.something'
+servAddress = 'dips://%s:%s/DataManagement/FileCatalog' % (hostname, port)
+
+baseDir = '/vo/test/bulkReplicasPerf'
+storageElements = ['se0', 'se1', 'se2', 'se3', 'se4', 'se5', 'se6', 'se7', 'se8', 'se9']
+
+fc = FileCatalogClient(servAddress)
+
+
+def makeLFNs(nFiles, filesPerDirectory):
+  lfnDict = {}
+  for i in range(nFiles):
+    lfn = '%s/%04d/%06d.txt' % (baseDir, i // filesPerDirectory, i)
+    lfnDict[lfn] = {'PFN': lfn, 'SE': random.choice(storageElements), 'Size': random.randint(1, 1000),
+                    'GUID': 'bulkReplicasPerf%010d' % i, 'Checksum': '%08x' % i}
+  return lfnDict
+
+
+def bulkCall(method, lfns):
+  for chunk in breakListIntoChunks(sorted(lfns), 1000):
+    res = method(dict((lfn, lfns[lfn]) for lfn in chunk) if isinstance(lfns, dict) else chunk)
+    if not res['OK']:
+      print('Failed', res['Message'])
+      sys.exit(1)
+
+
+def bestTime(lfns, repetitions):
+  timings = []
+  for _ in range(repetitions):
+    before = time.time()
+    res = fc.getReplicas(lfns)
+    timings.append(time.time() - before)
+    if not res['OK']:
+      print('Failed', res['Message'])
+      sys.exit(1)
+    if len(res['Value']['Successful']) != len(lfns):
+      print('Only %d replicas found out of %d' % (len(res['Value']['Successful']), len(lfns)))
+  return min(timings)
+
+
+if __name__ == '__main__':
+  nFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  filesPerDirectory = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+  nRepetitions = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+  lfnDict = makeLFNs(nFiles, filesPerDirectory)
+  lfns = sorted(lfnDict)
+  bulkCall(fc.addFile, lfnDict)
+  try:
+    best = bestTime(lfns, nRepetitions)
+    print("getReplicas of %d LFNs in %d directories: %.2f s (%.0f LFNs/s)" %
+          (nFiles, (nFiles - 1) // filesPerDirectory + 1, best, nFiles / best))
+  finally:
+    bulkCall(fc.removeFile, lfns)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+""" This script compares the server side search of the files of a directory subtree (findFilesInSubtree)
+    with the client side walk of the subtree (DirectoryWalker, listing the directories by batches).
+    The files are registered in a test directory tree, each search is repeated and the files are
+    removed at the end.
+
+    Three searches are timed:
+      * the walk of the subtree with the DirectoryWalker
+      * the findFilesInSubtree pages, requested one after the other
+      * the findFilesInSubtree stream
+    and then the same searches selecting only the files larger than half the maximum size,
+    the files listed by the DirectoryWalker being filtered by the client.
+
+    Usage:
+      subtreePerf.py [nFiles] [filesPerDirectory] [directoriesPerDirectory] [repetitions]
+
+    Tunable parameters:
+      * hostname, port: the FileCatalog service to test
+      * baseDir: directory in which the test files are registered, it must be writable
+      * storageElements: the SEs of the replicas
+      * chunkSize: number of files per findFilesInSubtree page
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+import random
+import sys
+import time
+
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+from DIRAC.DataManagementSystem.Client.DirectoryWalker import DirectoryWalker
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+port = 9197
+hostname = 'yourmachine.somewhere.something'
+servAddress = 'dips://%s:%s/DataManagement/FileCatalog' % (hostname, port)
+
+baseDir = '/vo/test/subtreePerf'
+storageElements = ['se0', 'se1', 'se2', 'se3', 'se4', 'se5', 'se6', 'se7', 'se8', 'se9']
+chunkSize = 10000
+maxSize = 1000
+
+fc = FileCatalogClient(servAddress)
+
+
+def makeDirectory(index, directoriesPerDirectory):
+  """ Directory of the given index in a tree of directoriesPerDirectory subdirectories per directory
+  """
+  path = ''
+  while True:
+    path = '/d%d%s' % (index % directoriesPerDirectory, path)
+    index //= directoriesPerDirectory
+    if not index:
+      return baseDir + path
+
+
+def makeLFNs(nFiles, filesPerDirectory, directoriesPerDirectory):
+  lfnDict = {}
+  for i in range(nFiles):
+    lfn = '%s/%06d.txt' % (makeDirectory(i // filesPerDirectory, directoriesPerDirectory), i)
+    lfnDict[lfn] = {'PFN': lfn, 'SE': random.choice(storageElements), 'Size': random.randint(1, maxSize),
+                    'GUID': 'subtreePerf%010d' % i, 'Checksum': '%08x' % i}
+  return lfnDict
+
+
+def bulkCall(method, lfns):
+  for chunk in breakListIntoChunks(sorted(lfns), 1000):
+    res = method(dict((lfn, lfns[lfn]) for lfn in chunk) if isinstance(lfns, dict) else chunk)
+    if not res['OK']:
+      print('Failed', res['Message'])
+      sys.exit(1)
+
+
+def walkSubtree(minSize):
+  walker = DirectoryWalker(fc)
+  res = walker.getFiles(baseDir)
+  if not res['OK'] or res['Value']['Failed']:
+    print('Failed', res.get('Message', res['Value']['Failed']))
+    sys.exit(1)
+  files = res['Value']['Files']
+  if minSize:
+    return [lfn for lfn in files if files[lfn]['MetaData']['Size'] >= minSize]
+  return list(files)
+
+
+def pageSubtree(minSize):
+  filters = {'MinSize': minSize} if minSize else {}
+  lfns = []
+  lastFileID = 0
+  while True:
+    res = fc.findFilesInSubtree(baseDir, filters, chunkSize, lastFileID)
+    if not res['OK']:
+      print('Failed', res['Message'])
+      sys.exit(1)
+    lfns += res['Value']['LFNs']
+    if res['Value']['Completed']:
+      return lfns
+    lastFileID = res['Value']['LastFileID']
+
+
+def streamSubtree(minSize):
+  res = fc.findFilesInSubtreeIterator(baseDir, {'MinSize': minSize} if minSize else {}, chunkSize)
+  if not res['OK']:
+    print('Failed', res['Message'])
+    sys.exit(1)
+  lfns = []
+  for result in res['Value']:
+    if not result['OK']:
+      print('Failed', result['Message'])
+      sys.exit(1)
+    lfns += result['Value']['LFNs']
+  return lfns
+
+
+def bestTime(search, minSize, expected, repetitions):
+  timings = []
+  for _ in range(repetitions):
+    before = time.time()
+    lfns = search(minSize)
+    timings.append(time.time() - before)
+    if sorted(lfns) != expected:
+      print('%s found %d files instead of %d' % (search.__name__, len(lfns), len(expected)))
+  return min(timings)
+
+
+if __name__ == '__main__':
+  nFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  filesPerDirectory = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+  directoriesPerDirectory = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+  nRepetitions = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+
+  lfnDict = makeLFNs(nFiles, filesPerDirectory, directoriesPerDirectory)
+  lfns = sorted(lfnDict)
+  bulkCall(fc.addFile, lfnDict)
+  try:
+    for minSize in (0, maxSize // 2):
+      expected = sorted(lfn for lfn in lfns if lfnDict[lfn]['Size'] >= minSize)
+      print("%d files out of %d in %d directories, MinSize %d" %
+            (len(expected), nFiles, (nFiles - 1) // filesPerDirectory + 1, minSize))
+      for search in (walkSubtree, pageSubtree, streamSubtree):
+        best = bestTime(search, minSize, expected, nRepetitions)
+        print("  %-14s %.2f s (%.0f LFNs/s)" % (search.__name__, best, len(expected) / best))
+  finally:
+    bulkCall(fc.removeFile, lfns)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+""" This script measures the time spent inserting and updating rows in a MySQL table with
+    one statement per row (insertFields, updateFields) and with the bulk methods of the
+    MySQL class (insertMultipleFields, updateMultipleFields).
+
+    A MySQL server is needed, the table BulkPerfTest is created (and dropped) in the given DB.
+
+    Usage:
+      mysqlBulkPerf.py [host] [user] [password] [dbName] [nRows]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+TABLE = 'BulkPerfTest'
+TABLE_DEF = {TABLE: {'Fields': {'ID': 'INTEGER NOT NULL',
+                                'Status': 'VARCHAR(32) NOT NULL',
+                                'Source': 'VARCHAR(255) NOT NULL',
+                                'Size': 'BIGINT NOT NULL DEFAULT 0',
+                                'LastUpdate': 'DATETIME'},
+                     'PrimaryKey': 'ID'}}
+FIELDS = ['ID', 'Status', 'Source', 'Size', 'LastUpdate']
+
+
+def getRows(nRows, status):
+  return [[i, status, 'srm://se.example.org/data/vo/file_%08d' % i, i * 1024, 'UTC_TIMESTAMP()']
+          for i in range(nRows)]
+
+
+def timeIt(function, *args):
+  before = time.time()
+  result = function(*args)
+  if not result['OK']:
+    print("ERROR:", result['Message'])
+    sys.exit(1)
+  return time.time() - before
+
+
+def insertOneByOne(db, rows):
+  for row in rows:
+    result = db.insertFields(TABLE, FIELDS, row)
+    if not result['OK']:
+      return result
+  return result
+
+
+def updateOneByOne(db, rows):
+  for iD, status, size in rows:
+    result = db.updateFields(TABLE, ['Status', 'Size'], [status, size], condDict={'ID': iD})
+    if not result['OK']:
+      return result
+  return result
+
+
+if __name__ == '__main__':
+  host, user, password, dbName = (sys.argv[1:5] + ['localhost', 'Dirac', 'Dirac', 'AccountingDB'])[:4]
+  nRows = int(sys.argv[5]) if len(sys.argv) > 5 else 10000
+
+  db = MySQL(host, user, password, dbName)
+  timings = {}
+  rows = getRows(nRows, 'New')
+  updates = [[iD, 'Updated', size + 1] for iD, _status, _source, size, _lastUpdate in rows]
+
+  timeIt(db._createTables, TABLE_DEF, True)
+  timings['insert'] = timeIt(insertOneByOne, db, rows)
+  timings['update'] = timeIt(updateOneByOne, db, updates)
+
+  timeIt(db._createTables, TABLE_DEF, True)
+  timings['bulkInsert'] = timeIt(db.insertMultipleFields, TABLE, FIELDS, rows)
+  timings['bulkUpdate'] = timeIt(db.updateMultipleFields, TABLE, ['Status', 'Size'], ['ID'],
+                                 [[status, size, iD] for iD, status, size in updates])
+  timings['upsert'] = timeIt(db.insertMultipleFields, TABLE, FIELDS, getRows(nRows, 'Upserted'), None,
+                             ['Status', 'LastUpdate'])
+
+  db._update('DROP TABLE `%s`' % TABLE)
+
+  print("%d rows: insert %.2f s, bulk insert %.2f s (x%.1f), update %.2f s, bulk update %.2f s (x%.1f), "
+        "bulk upsert %.2f s" %
+        (nRows, timings['insert'], timings['bulkInsert'], timings['insert'] / timings['bulkInsert'],
+         timings['update'], timings['bulkUpdate'], timings['update'] / timings['bulkUpdate'],
+         timings['upsert']))
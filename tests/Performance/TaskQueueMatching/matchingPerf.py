@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+""" This script replays recorded pilot resource descriptions against the TaskQueueDB
+    and compares the latency of the task queue matching done with the SQL query
+    with the one done with the in-memory task queue index (JobScheduling/UseTaskQueueIndex).
+
+    The resource descriptions are read from a file with one JSON dictionary per line,
+    as built by Matcher._processResourceDescription (e.g. dumped from the Matcher logs).
+    Only task queues are matched: no job is extracted from the TaskQueueDB.
+
+    Usage:
+      matchingPerf.py <resourceDescriptions.json> [numQueuesToGet] [repetitions]
+
+    It produces the file matchingPerf.txt with the per-call timings of both methods.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+import json
+import sys
+import time
+
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+
+
+def loadResourceDescriptions(fileName):
+  descriptions = []
+  with open(fileName) as fd:
+    for line in fd:
+      line = line.strip()
+      if line:
+        descriptions.append(json.loads(line))
+  return descriptions
+
+
+def timeMatching(tqDB, descriptions, numQueuesToGet, repetitions):
+  timings = []
+  nMatched = 0
+  for _ in range(repetitions):
+    for resourceDict in descriptions:
+      before = time.time()
+      result = tqDB.matchAndGetTaskQueue(resourceDict, numQueuesToGet=numQueuesToGet)
+      timings.append(time.time() - before)
+      if result['OK'] and result['Value']:
+        nMatched += 1
+  return timings, nMatched
+
+
+def summary(name, timings, nMatched):
+  timings = sorted(timings)
+  nCalls = len(timings)
+  print("%s: %d calls, %d with matching TQs, mean %.3f ms, median %.3f ms, p95 %.3f ms, max %.3f ms" %
+        (name, nCalls, nMatched,
+         1000. * sum(timings) / nCalls,
+         1000. * timings[nCalls // 2],
+         1000. * timings[int(nCalls * 0.95)],
+         1000. * timings[-1]))
+
+
+if __name__ == '__main__':
+  if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
+  resourceDescriptions = loadResourceDescriptions(sys.argv[1])
+  numQueues = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+  nRepetitions = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+  if not resourceDescriptions:
+    print("No resource description found in %s" % sys.argv[1])
+    sys.exit(1)
+
+  taskQueueDB = TaskQueueDB()
+  print("%d task queues in the DB" % taskQueueDB.getNumTaskQueues()['Value'])
+
+  taskQueueDB.enableMatchingIndex(False)
+  sqlTimings, sqlMatched = timeMatching(taskQueueDB, resourceDescriptions, numQueues, nRepetitions)
+
+  taskQueueDB.enableMatchingIndex(True)
+  # First call loads the index, don't count it
+  before = time.time()
+  taskQueueDB.matchAndGetTaskQueue(resourceDescriptions[0], numQueuesToGet=numQueues)
+  print("Index loaded in %.3f s" % (time.time() - before))
+  indexTimings, indexMatched = timeMatching(taskQueueDB, resourceDescriptions, numQueues, nRepetitions)
+
+  summary("SQL", sqlTimings, sqlMatched)
+  summary("Index", indexTimings, indexMatched)
+
+  with open('matchingPerf.txt', 'w') as fd:
+    fd.write("Call\tSQLTime\tIndexTime\n")
+    for iCall, (sqlTime, indexTime) in enumerate(zip(sqlTimings, indexTimings)):
+      fd.write("%s\t%s\t%s\n" % (iCall, sqlTime, indexTime))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+""" This script measures the time spent by the Standard, BySize and Broadcast TransformationPlugins
+    to group a large number of files with replicas at several SEs into tasks.
+
+    The SEs, their sites and the file sizes are fictitious: the catalog is replaced by an in-memory
+    dictionary of sizes, the SEs are all considered as disk SEs and SE-nn is at site Site.nn.
+    Each plugin is run with an Active transformation (only the full tasks are created, so that
+    files at several SEs are considered more than once) and with a Flushed transformation.
+
+    Usage:
+      pluginPerf.py [nFiles] [nSEs] [repetitions]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+import random
+import sys
+import time
+
+from DIRAC import S_OK
+from DIRAC.TransformationSystem.Agent.TransformationPlugin import TransformationPlugin
+import DIRAC.TransformationSystem.Client.Utilities as Utilities
+
+# The fictitious SEs are all disk SEs
+Utilities.sortSEs = sorted
+
+
+class SizeCatalog(object):
+  """ In-memory catalog of the file sizes
+  """
+
+  def __init__(self, fileSizes):
+    self.fileSizes = fileSizes
+    self.calls = 0
+
+  def getFileSize(self, lfns):
+    self.calls += 1
+    return S_OK({'Successful': dict((lfn, self.fileSizes[lfn]) for lfn in lfns), 'Failed': {}})
+
+
+class BenchmarkPlugin(TransformationPlugin):
+  """ TransformationPlugin with the sites of the fictitious SEs
+  """
+
+  @classmethod
+  def _getSiteForSE(cls, se):
+    return S_OK('Site.%s' % se.split('-')[1])
+
+  @classmethod
+  def _getSitesForSEs(cls, seList):
+    return ['Site.%s' % se.split('-')[1] for se in seList]
+
+
+def makeData(nFiles, nSEs):
+  storageElements = ['SE-%02d' % i for i in range(nSEs)]
+  replicas = {}
+  fileSizes = {}
+  for i in range(nFiles):
+    lfn = '/vo/data/2019/RAW/%04d/%08d.raw' % (i // 1000, i)
+    replicas[lfn] = random.sample(storageElements, random.choice((1, 1, 2, 3)))
+    fileSizes[lfn] = random.randint(1, 5000) * 1000 * 1000
+  return storageElements, replicas, fileSizes
+
+
+def runPlugin(plugin, status, storageElements, replicas, fileSizes):
+  catalog = SizeCatalog(fileSizes)
+  thePlugin = BenchmarkPlugin(plugin, transClient=object(), dataManager=object(), fc=catalog)
+  thePlugin.setParameters({'TransformationID': 1, 'Status': status, 'GroupSize': 100,
+                           'SourceSE': storageElements[:len(storageElements) // 2],
+                           'TargetSE': storageElements[len(storageElements) // 2:]})
+  thePlugin.setInputData(replicas)
+  before = time.time()
+  res = thePlugin.run()
+  elapsed = time.time() - before
+  if not res['OK']:
+    print('Failed', res['Message'])
+    sys.exit(1)
+  return elapsed, res['Value'], catalog.calls
+
+
+if __name__ == '__main__':
+  nFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+  nSEs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+  nRepetitions = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+  storageElements, replicas, fileSizes = makeData(nFiles, nSEs)
+  print("%d files at %d SEs" % (nFiles, nSEs))
+  for plugin in ('Standard', 'BySize', 'Broadcast'):
+    for status in ('Active', 'Flush'):
+      timings = []
+      for _ in range(nRepetitions):
+        elapsed, tasks, catalogCalls = runPlugin(plugin, status, storageElements, replicas, fileSizes)
+        timings.append(elapsed)
+      nLFNs = sum(len(lfns) for _se, lfns in tasks)
+      print("  %-9s %-6s %.2f s (%.0f files/s), %d tasks with %d files, %d catalog calls" %
+            (plugin, status, min(timings), nFiles / min(timings), len(tasks), nLFNs, catalogCalls))